@@ -0,0 +1,305 @@
+"""
+author:
+Description: 라우트별 동시 처리 한도와 우선순위, 대기열, 초과 요청 빠른 거절(503), 사용자별 요청 속도 제한(429)
+Fixed:
+Usage:
+    VET_ADMISSION=1 로 켜면 main.py 가 AdmissionMiddleware 를 추가한다.
+
+    - 요청은 라우트에 따라 등급을 나눈다 (ROUTE_CLASSES). 숫자가 작을수록 우선한다.
+        booking (0) : 예약 생성/취소
+        default (1) : 나머지
+        browse  (2) : 병원 목록/검색, 예약 가능 병원/시간 조회
+      워커 전체 동시 처리 수는 VET_ADMISSION_CAPACITY (기본: DB 풀 크기 x 2) 개이고,
+      등급마다 그중 쓸 수 있는 몫(limit)이 있어 조회가 몰려도 예약용 자리가 남는다.
+    - 자리가 없으면 등급별 대기열(queue 개까지)에서 max_wait 초까지 기다린다. 자리가 나면 높은 등급부터 들어간다.
+      대기열이 꽉 찼거나 max_wait 가 지나면 바로 503 + Retry-After 로 돌려보낸다.
+    - rate 가 0 보다 큰 등급은 사용자마다 Redis 토큰 버킷(초당 rate 개, 최대 burst 개)으로 제한하고 넘으면 429 + Retry-After.
+      사용자는 VET_AUTH=1 이면 검증한 토큰의 uid 이다. 토큰이 없으면 VET_ADMISSION_RATE_BY_IP=1 일 때만
+      클라이언트 IP 로 제한하고, 아니면 제한하지 않는다.
+      프록시 뒤에서는 모든 요청이 프록시 IP 로 보여 서비스 전체가 버킷 하나를 나눠 쓰게 되므로, 실제 클라이언트 IP 가
+      들어오게 한 뒤에만 켠다 (serve.py --forwarded-allow-ips <프록시 IP> 또는
+      uvicorn --proxy-headers --forwarded-allow-ips <프록시 IP>). 통신사 NAT 뒤 사용자들은 IP 를 함께 쓴다는 점도 감안한다.
+      Redis 장애 시에는 제한하지 않는다 (fail open).
+    - /health, /metrics 와 SSE 구독, 예약 내역 내보내기는 제한하지 않는다.
+    - 등급별 값은 VET_ADMISSION_<등급>_<항목> 으로 바꾼다. 예) VET_ADMISSION_BROWSE_LIMIT=8, VET_ADMISSION_BOOKING_RATE=0.2
+    - 통과/대기/거절 수는 GET /metrics 의 counters (admission.<등급>.*) 와 "admission" 에서 본다.
+"""
+
+import asyncio, hashlib, math, os, time
+from collections import deque
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from redis.exceptions import NoScriptError
+import auth, hosts, metrics
+from breaker import CircuitOpenError
+
+ENABLED = os.getenv("VET_ADMISSION", "0") == "1"
+CAPACITY = int(os.getenv("VET_ADMISSION_CAPACITY", str(hosts.VET_DB_POOL_SIZE * 2)))
+# 토큰이 없는 요청을 클라이언트 IP 로 제한할지 (신뢰하는 프록시 헤더로 실제 IP 를 받을 때만 켠다)
+RATE_BY_IP = os.getenv("VET_ADMISSION_RATE_BY_IP", "0") == "1"
+
+EXEMPT_PREFIXES = ("/health/", "/metrics/")
+# 연결이 계속 열려 있는 SSE 와 긴 다운로드 (내보내기는 reservation.py 에서 따로 동시 수를 제한한다)
+EXEMPT_ROUTES = {"/available/subscribe", "/reservation/clinic/{clinic_id}/feed", "/reservation/clinic/{clinic_id}/export"}
+
+# (메서드, 라우트 경로) -> 등급. 없으면 default
+ROUTE_CLASSES = {
+    ("POST", "/reservation/{user_id}"): "booking",
+    ("DELETE", "/reservation/{user_id}"): "booking",
+    ("GET", "/clinic/"): "browse",
+    ("GET", "/clinic/{id}"): "browse",
+    ("GET", "/clinic/cards"): "browse",
+    ("GET", "/clinic/changes"): "browse",
+    ("GET", "/available/available_clinic"): "browse",
+    ("GET", "/available/available_clinic_noredis"): "browse",
+    ("GET", "/available/can_reservation"): "browse",
+    ("GET", "/available/slots/{clinic_id}"): "browse",
+}
+
+
+class RouteClass:
+    def __init__(self, name, priority, limit, queue, max_wait, rate=0.0, burst=0):
+        def setting(field, default):
+            return type(default)(os.getenv(f"VET_ADMISSION_{name.upper()}_{field}", str(default)))
+
+        self.name = name
+        self.priority = priority
+        self.limit = max(1, setting("LIMIT", limit))        # 동시에 처리할 수 있는 수
+        self.queue = setting("QUEUE", queue)                # 기다릴 수 있는 수
+        self.max_wait = setting("MAX_WAIT", max_wait)       # 기다리는 최대 시간 (초)
+        self.rate = setting("RATE", rate)                   # 사용자당 초당 요청 수 (0 이면 제한 없음)
+        self.burst = max(1, setting("BURST", burst))
+
+
+CLASSES = sorted([
+    RouteClass("booking", 0, CAPACITY, CAPACITY * 2, 5.0, rate=0.5, burst=5),
+    RouteClass("default", 1, CAPACITY * 3 // 4, CAPACITY, 2.0),
+    RouteClass("browse", 2, CAPACITY // 2, CAPACITY, 1.0, rate=10.0, burst=20),
+], key=lambda c: c.priority)
+CLASS_BY_NAME = {c.name: c for c in CLASSES}
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """전체 capacity 와 등급별 limit 안에서만 동시에 처리하고, 나머지는 등급별 대기열에서 기다리게 한다"""
+
+    def __init__(self, capacity=CAPACITY, classes=CLASSES):
+        self.capacity = capacity
+        self.classes = sorted(classes, key=lambda c: c.priority)
+        self.active = 0
+        self.running = {c.name: 0 for c in self.classes}
+        self.waiting = {c.name: deque() for c in self.classes}
+
+    def _fits(self, cls):
+        return self.active < self.capacity and self.running[cls.name] < cls.limit
+
+    def _ahead(self, cls):
+        """먼저 들어가야 할 대기자가 있는지: 같은 등급 대기자, 또는 전체 자리만 나면 들어갈 더 높은 등급 대기자"""
+        if self.waiting[cls.name]:
+            return True
+        return any(
+            self.waiting[c.name] and self.running[c.name] < c.limit
+            for c in self.classes if c.priority < cls.priority
+        )
+
+    def _take(self, cls):
+        self.active += 1
+        self.running[cls.name] += 1
+
+    async def acquire(self, cls):
+        if self._fits(cls) and not self._ahead(cls):
+            self._take(cls)
+            return
+        queue = self.waiting[cls.name]
+        if len(queue) >= cls.queue:
+            raise Rejected("shed", cls.max_wait)
+        metrics.incr(f"admission.{cls.name}.queued")
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), cls.max_wait)
+        except asyncio.TimeoutError:
+            # 시간이 다 된 순간 자리를 받았으면 그대로 처리한다
+            if waiter.done():
+                return
+            raise Rejected("timeout", cls.max_wait)
+        except asyncio.CancelledError:
+            # 기다리다 연결이 끊겼다: 받아 둔 자리가 있으면 돌려준다
+            if waiter.done():
+                self.release(cls)
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+                queue.remove(waiter)
+
+    def release(self, cls):
+        self.active -= 1
+        self.running[cls.name] -= 1
+        # 높은 등급부터 들어갈 수 있는 만큼 깨운다
+        for c in self.classes:
+            queue = self.waiting[c.name]
+            while queue and self._fits(c):
+                self._take(c)
+                queue.popleft().set_result(None)
+
+    def snapshot(self):
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "classes": {
+                c.name: {
+                    "running": self.running[c.name], "waiting": len(self.waiting[c.name]),
+                    "limit": c.limit, "queue": c.queue, "max_wait": c.max_wait, "rate": c.rate, "burst": c.burst,
+                }
+                for c in self.classes
+            },
+        }
+
+
+limiter = Limiter()
+metrics.register("admission", limiter.snapshot)
+
+
+# ---------- 사용자별 토큰 버킷 (Redis) ----------
+
+# 여러 워커가 같은 버킷을 쓰므로 읽고 쓰는 것을 한 번에 처리한다. 시각은 호출한 서버의 것을 쓴다.
+TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait_ms = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return wait_ms
+"""
+TOKEN_BUCKET_SHA = hashlib.sha1(TOKEN_BUCKET.encode()).hexdigest()
+
+
+def _rate_key(cls, client_id):
+    return f"ratelimit:{cls.name}:{client_id}"
+
+
+async def rate_limit_wait(cls, client_id):
+    """토큰을 하나 쓰고, 남은 토큰이 없으면 다음 토큰까지 기다려야 하는 초 (0 이면 통과)"""
+    args = (1, _rate_key(cls, client_id), cls.rate, cls.burst, f"{time.time():.3f}")
+    try:
+        redis_client = await hosts.get_redis_connection()
+        try:
+            wait_ms = await redis_client.evalsha(TOKEN_BUCKET_SHA, *args)
+        except NoScriptError:
+            wait_ms = await redis_client.eval(TOKEN_BUCKET, *args)
+        return int(wait_ms) / 1000
+    except CircuitOpenError:
+        return 0
+    except Exception as e:
+        print(f"Redis rate limit error: {e}")
+        return 0
+
+
+# ---------- 미들웨어 ----------
+
+_route_cache = {}
+_ROUTE_CACHE_SIZE = 4096
+
+
+def classify(scope):
+    """(등급 또는 제외면 None, 경로 파라미터)"""
+    path = scope["path"]
+    if path.startswith(EXEMPT_PREFIXES) or path.rstrip("/") in ("/health", "/metrics"):
+        return None, {}
+    cache_key = (scope["method"], path)
+    cached = _route_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = CLASS_BY_NAME["default"], {}
+    for route in getattr(scope.get("app"), "routes", []):
+        match, child = route.matches(scope)
+        if match == Match.FULL:
+            route_path = getattr(route, "path", "")
+            if route_path in EXEMPT_ROUTES:
+                result = None, {}
+            else:
+                name = ROUTE_CLASSES.get((scope["method"], route_path), "default")
+                result = CLASS_BY_NAME[name], child.get("path_params", {})
+            break
+    if len(_route_cache) >= _ROUTE_CACHE_SIZE:
+        _route_cache.clear()
+    _route_cache[cache_key] = result
+    return result
+
+
+async def _client_id(scope):
+    # 경로/쿼리의 user_id 는 클라이언트가 마음대로 바꿀 수 있어 쓰지 않는다
+    # (바꿔 가며 보내면 제한을 피하고, 남의 id 로 보내면 그 사람이 막힌다)
+    if auth.AUTH_ENABLED:
+        for name, value in scope.get("headers", ()):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token.strip():
+                    try:
+                        return f"user:{(await auth.verify_token(token.strip()))['sub']}"
+                    except HTTPException:
+                        pass  # 잘못된 토큰은 토큰 없는 요청과 같게, 인증이 필요한 라우트면 거기서 401
+                break
+    # 토큰이 없으면 IP 로 (켜져 있을 때만). None 이면 제한하지 않는다
+    client = scope.get("client")
+    if not RATE_BY_IP or not client:
+        return None
+    return f"ip:{client[0]}"
+
+
+def _reject(status, detail, retry_after):
+    return JSONResponse({"detail": detail}, status_code=status,
+                        headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, limiter=limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        cls, _ = classify(scope)
+        if cls is None:
+            await self.app(scope, receive, send)
+            return
+
+        client_id = await _client_id(scope) if cls.rate > 0 else None
+        if client_id is not None:
+            wait = await rate_limit_wait(cls, client_id)
+            if wait > 0:
+                metrics.incr(f"admission.{cls.name}.rate_limited")
+                await _reject(429, "요청이 너무 많습니다. 잠시 후 다시 시도해주세요.", wait)(scope, receive, send)
+                return
+
+        try:
+            await self.limiter.acquire(cls)
+        except Rejected as e:
+            metrics.incr(f"admission.{cls.name}.{e.reason}")
+            await _reject(503, "요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해주세요.", e.retry_after)(
+                scope, receive, send)
+            return
+        metrics.incr(f"admission.{cls.name}.admitted")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(cls)
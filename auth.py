@@ -0,0 +1,158 @@
+"""
+author:
+Description: Firebase ID 토큰 인증 (서명 키를 캐시해 서버 안에서 검증)
+Fixed:
+Usage:
+    VET_AUTH=1 로 켜면 main.py 가 VET_AUTH_ROUTERS 에 적은 라우터에 require_user 를 붙인다.
+    클라이언트는 Firebase 로그인 후 받은 ID 토큰을 Authorization: Bearer <토큰> 으로 보낸다.
+
+    @router.get("/me")
+    async def me(user: dict = Depends(auth.require_user)):
+        return user["sub"], user.get("email")
+
+    - 서명 키(공개 인증서)는 Google 에서 받아 Cache-Control max-age 동안 보관한다.
+      모르는 kid 가 오면(키 교체) VET_AUTH_KEYS_MIN_REFRESH 초에 한 번까지 다시 받는다.
+      다시 받기에 실패하면 가지고 있던 키로 계속 검증한다.
+    - 검증한 토큰은 만료 시각까지 워커 메모리(LRU, VET_AUTH_CACHE_SIZE 개)에 두어
+      같은 토큰의 다음 요청은 해시 조회만 한다.
+    - 로컬 검증이라 토큰 폐기(revoke)는 토큰이 만료될 때(최대 1시간)까지 반영되지 않는다.
+    - 로컬 키로 시험할 때는 VET_FIREBASE_CERTS_URL 을 바꾸거나 key_store.set_certs() 로 인증서를 넣는다.
+"""
+
+import asyncio, hashlib, os, re, time
+import requests
+from fastapi import Depends, Header, HTTPException, Request
+from jose import jwk, jwt
+from jose.exceptions import ExpiredSignatureError, JWTError
+import hosts, metrics
+from cache import LocalCache
+
+AUTH_ENABLED = os.getenv("VET_AUTH", "0") == "1"
+AUTH_ROUTERS = [n for n in os.getenv("VET_AUTH_ROUTERS", "pet,favorite,mypage").replace(" ", "").split(",") if n]
+CERTS_URL = os.getenv(
+    "VET_FIREBASE_CERTS_URL",
+    "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com",
+)
+TOKEN_CACHE_SIZE = int(os.getenv("VET_AUTH_CACHE_SIZE", "10000"))
+KEYS_MIN_REFRESH = float(os.getenv("VET_AUTH_KEYS_MIN_REFRESH", "60"))
+KEYS_DEFAULT_MAX_AGE = 3600  # Cache-Control 이 없을 때
+LEEWAY = int(os.getenv("VET_AUTH_LEEWAY", "5"))  # 서버 간 시계 차이 허용 (초)
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class KeyStore:
+    """kid -> 공개 키. 만료되면 요청 처리 중에 한 번만(single flight) 다시 받는다."""
+
+    def __init__(self, url=CERTS_URL):
+        self.url = url
+        self.keys = {}
+        self.expires_at = 0.0
+        self.fetched_at = 0.0
+        self.stats = {"fetches": 0, "fetch_errors": 0}
+        self._lock = None
+
+    def set_certs(self, certs, max_age=KEYS_DEFAULT_MAX_AGE):
+        """{kid: PEM 인증서} 를 키로 바꿔 보관한다. 매 요청마다 인증서를 파싱하지 않도록 미리 만든다."""
+        self.keys = {kid: jwk.construct(cert, "RS256") for kid, cert in certs.items()}
+        self.fetched_at = time.time()
+        self.expires_at = self.fetched_at + max_age
+
+    def _fetch(self):
+        resp = requests.get(self.url, timeout=5)
+        resp.raise_for_status()
+        match = _MAX_AGE.search(resp.headers.get("Cache-Control", ""))
+        return resp.json(), int(match.group(1)) if match else KEYS_DEFAULT_MAX_AGE
+
+    async def refresh(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        fetched_at = self.fetched_at
+        async with self._lock:
+            if self.fetched_at != fetched_at:
+                return  # 기다리는 동안 다른 요청이 받아 왔다
+            self.stats["fetches"] += 1
+            try:
+                certs, max_age = await asyncio.get_running_loop().run_in_executor(None, self._fetch)
+                self.set_certs(certs, max_age)
+            except Exception as e:
+                self.stats["fetch_errors"] += 1
+                print(f"Auth key fetch error: {e}")
+                # 가지고 있던 키로 계속 검증하고 잠시 뒤 다시 시도
+                self.fetched_at = time.time()
+                self.expires_at = self.fetched_at + KEYS_MIN_REFRESH
+
+    async def get(self, kid):
+        now = time.time()
+        if now >= self.expires_at or (kid not in self.keys and now - self.fetched_at >= KEYS_MIN_REFRESH):
+            await self.refresh()
+        return self.keys.get(kid)
+
+    def snapshot(self):
+        return {"keys": len(self.keys), "expires_in": round(self.expires_at - time.time(), 1), **self.stats}
+
+
+key_store = KeyStore()
+verified_tokens = LocalCache(TOKEN_CACHE_SIZE, 0)
+metrics.register("auth", lambda: {**key_store.snapshot(), "cached_tokens": len(verified_tokens)})
+
+
+def _unauthorized(detail):
+    metrics.incr("auth.rejected")
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+async def verify_token(token):
+    """Firebase ID 토큰을 검증하고 claims 를 돌려준다. 실패하면 401 HTTPException."""
+    cache_key = hashlib.sha256(token.encode()).digest()
+    item = verified_tokens.get(cache_key)
+    if item is not None:
+        metrics.incr("auth.cache_hit")
+        return item[1]
+
+    project_id = hosts.firebase_project_id()
+    try:
+        header = jwt.get_unverified_header(token)
+    except JWTError:
+        raise _unauthorized("유효하지 않은 토큰입니다.")
+    if header.get("alg") != "RS256" or not header.get("kid"):
+        raise _unauthorized("유효하지 않은 토큰입니다.")
+    key = await key_store.get(header["kid"])
+    if key is None:
+        if not key_store.keys:
+            raise HTTPException(status_code=503, detail="인증 키를 가져올 수 없습니다.")
+        raise _unauthorized("유효하지 않은 토큰입니다.")
+
+    try:
+        claims = jwt.decode(
+            token, key, algorithms=["RS256"], audience=project_id,
+            issuer=f"https://securetoken.google.com/{project_id}", options={"leeway": LEEWAY},
+        )
+    except ExpiredSignatureError:
+        raise _unauthorized("토큰이 만료되었습니다.")
+    except JWTError:
+        raise _unauthorized("유효하지 않은 토큰입니다.")
+    now = time.time()
+    if not claims.get("sub") or claims.get("auth_time", 0) > now + LEEWAY:
+        raise _unauthorized("유효하지 않은 토큰입니다.")
+
+    metrics.incr("auth.verified")
+    verified_tokens.set(cache_key, claims, ttl=claims["exp"] - now)
+    return claims
+
+
+async def require_user(request: Request, authorization: str = Header(None)):
+    """Authorization: Bearer <Firebase ID 토큰> 을 검증하고 claims 를 request.state.user 에 둔다"""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise _unauthorized("인증 토큰이 필요합니다.")
+    claims = await verify_token(token.strip())
+    request.state.user = claims
+    return claims
+
+
+def dependencies(router_name):
+    """main.py 의 include_router(dependencies=...) 에 넘길 목록"""
+    if AUTH_ENABLED and router_name in AUTH_ROUTERS:
+        return [Depends(require_user)]
+    return []
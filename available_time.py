@@ -5,66 +5,95 @@ Fixed:
 Usage: 
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Query
 from fastapi.responses import FileResponse
-import os, json
+import os, math
 import hosts
+from cache import get_cached_or_fetch
+from feed import slot_feed
+from timeslot import format_rows, format_time, normalize, parse_bound, parse_time
+from datetime import timedelta
+import schedule, user
 
 router = APIRouter()
+# 진료 규칙/휴진을 바꾸는 라우트: VET_CLINIC_SESSION_REQUIRED=1 이면 그 병원의 로그인 세션이 필요 (user.py)
+CLINIC_SESSION = user.clinic_session_dependencies()
 
 UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
-def generate_cache_key(endpoint: str, params: dict):
-    return f"{endpoint}:{json.dumps(params, sort_keys=True)}"
 
-async def get_cached_or_fetch(cache_key, fetch_func):
-    redis_client = await hosts.get_redis_connection()
+# rules: 진료 시간 규칙 + 예약으로 계산 (schedule.py), table: 기존 available_time 테이블
+AVAILABILITY_SOURCE = os.getenv("VET_AVAILABILITY_SOURCE", "rules")
+
+def _fetch_available_from_table(slot):
+    conn = hosts.connect()
     try:
-        cached_data = await redis_client.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
+        curs = conn.cursor()
+        sql = """
+        SELECT 
+            c.id, c.name, c.latitude, c.longitude, c.address, c.image, ava.time
+        FROM 
+            clinic c LEFT OUTER JOIN
+        (SELECT a.clinic_id, a.time 
+         FROM available_time a LEFT OUTER JOIN reservation r 
+         ON (a.time = r.time AND a.clinic_id = r.clinic_id) 
+         WHERE r.time IS NULL AND a.time = %s) AS ava 
+        ON (c.id = ava.clinic_id)
+        WHERE ava.time IS NOT NULL
+        """
+        curs.execute(sql, (slot,))
+        rows = curs.fetchall()
+        return format_rows(rows, 6)
     except Exception as e:
-        print(f"Redis get error: {e}")
+        print("Database error:", e)
+        return []
+    finally:
+        conn.close()
 
-    # Cache miss, fetch from DB
-    data = await fetch_func()
+def _fetch_open_unreserved(clinic_ids, slot):
+    # 규칙상 진료 중인 병원 중 해당 시각 예약이 없는 병원 (clinic PK + reservation (clinic_id, time) 키 조회)
+    if not clinic_ids:
+        return []
+    conn = hosts.connect()
     try:
-        await redis_client.set(cache_key, json.dumps(data), ex=3600)
+        curs = conn.cursor()
+        placeholders = ", ".join(["%s"] * len(clinic_ids))
+        sql = f"""
+        SELECT c.id, c.name, c.latitude, c.longitude, c.address, c.image
+        FROM clinic c LEFT OUTER JOIN reservation r
+            ON (r.clinic_id = c.id AND r.time = %s)
+        WHERE c.id IN ({placeholders}) AND r.clinic_id IS NULL
+        ORDER BY c.id
+        """
+        curs.execute(sql, (slot, *sorted(clinic_ids)))
+        return [list(row) + [format_time(slot)] for row in curs.fetchall()]
     except Exception as e:
-        print(f"Redis set error: {e}")
-    return data
+        print("Database error:", e)
+        return []
+    finally:
+        conn.close()
+
+async def _fetch_available_clinic(time):
+    slot = parse_time(time)
+    if AVAILABILITY_SOURCE == "table":
+        return _fetch_available_from_table(slot)
+    try:
+        book = await schedule.get_rule_book()
+    except Exception as e:
+        print("Database error:", e)
+        return []
+    return _fetch_open_unreserved(book.open_clinics(slot), slot)
 
 # 예약 가능한 병원id, 이름, password, 경도, 위도, 주소, 이미지, 예약 시간 (예약된 리스트 빼고 나타냄)
 @router.get('/available_clinic')
 async def get_available_clinic(time: str):
-    cache_key = generate_cache_key("available_clinic", {"time": time})
+    time = normalize(time)
+    cache_key = await schedule.availability_key("available_clinic", {"time": time})
 
     async def fetch_data():
-        conn = hosts.connect()
-        try:
-            curs = conn.cursor()
-            sql = """
-            SELECT 
-                c.id, c.name, c.latitude, c.longitude, c.address, c.image, ava.time
-            FROM 
-                clinic c LEFT OUTER JOIN
-            (SELECT a.clinic_id, a.time 
-             FROM available_time a LEFT OUTER JOIN reservation r 
-             ON (a.time = r.time AND a.clinic_id = r.clinic_id) 
-             WHERE r.time IS NULL AND a.time = %s) AS ava 
-            ON (c.id = ava.clinic_id)
-            WHERE ava.time IS NOT NULL
-            """
-            curs.execute(sql, (time,))
-            rows = curs.fetchall()
-            return rows
-        except Exception as e:
-            print("Database error:", e)
-            return []
-        finally:
-            conn.close()
+        return await _fetch_available_clinic(time)
 
     rows = await get_cached_or_fetch(cache_key, fetch_data)
 
@@ -74,34 +103,52 @@ async def get_available_clinic(time: str):
     return {"results": rows}
 
 
-@router.get('/available_clinic_noredis')
-async def get_available_clinic_noredis(time: str):
+def _distance_km(lat1, lng1, lat2, lng2):
+    # 하버사인 공식
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 6371 * 2 * math.asin(math.sqrt(a))
 
-    conn = hosts.connect()
-    try:
-        curs = conn.cursor()
-        sql = """
-        SELECT 
-            c.id, c.name, c.latitude, c.longitude, c.address, c.image, ava.time
-        FROM 
-            clinic c LEFT OUTER JOIN
-        (SELECT a.clinic_id, a.time 
-            FROM available_time a LEFT OUTER JOIN reservation r 
-            ON (a.time = r.time AND a.clinic_id = r.clinic_id) 
-            WHERE r.time IS NULL AND a.time = %s) AS ava 
-        ON (c.id = ava.clinic_id)
-        WHERE ava.time IS NOT NULL
-        """
-        curs.execute(sql, (time,))
-        rows = curs.fetchall()
-        return rows
-    except Exception as e:
-        print("Database error:", e)
-        return []
-    finally:
-        conn.close()
+# 긴급예약 화면: 특정 시간 슬롯의 예약 가능 병원 변화를 실시간으로 받는다 (Server-Sent Events)
+# 처음 접속하면 snapshot 이벤트로 현재 목록(/available_clinic과 같은 형식)을 보내고 (id 가 있어 여기서부터 이어 받을 수 있다),
+# 이후 예약/취소가 생길 때마다 unavailable/available 이벤트로 해당 병원만 보낸다.
+# 취소됐지만 다시 예약할 수 없는 슬롯(지난 시각, 진료 시간 밖, 휴진)은 available 대신 cancelled 로 보낸다.
+# latitude, longitude, radius_km를 주면 반경 안의 병원만 받는다.
+@router.get('/subscribe')
+async def subscribe_available_clinic(
+    time: str,
+    latitude: float = None,
+    longitude: float = None,
+    radius_km: float = None,
+    last_event_id: str = Header(None),
+):
+    time = normalize(time)
+
+    def near(lat, lng):
+        if latitude is None or longitude is None or not radius_km:
+            return True
+        return _distance_km(latitude, longitude, float(lat), float(lng)) <= radius_km
+
+    async def load_snapshot():
+        # 피드가 구독을 시작한 뒤에 읽는다 (feed.Hub.stream)
+        cache_key = await schedule.availability_key("available_clinic", {"time": time})
+
+        async def fetch_data():
+            return await _fetch_available_clinic(time)
+
+        rows = await get_cached_or_fetch(cache_key, fetch_data)
+        return "snapshot", {"results": [row for row in rows if near(row[2], row[3])]}
+
+    return slot_feed.response(
+        time, last_event_id, None if last_event_id else load_snapshot,
+        predicate=lambda data: near(data["latitude"], data["longitude"]),
+    )
 
 
+@router.get('/available_clinic_noredis')
+async def get_available_clinic_noredis(time: str):
+    return await _fetch_available_clinic(time)
+
 
 @router.get("/view/{file_name}")
 async def get_file(file_name: str):
@@ -113,32 +160,149 @@ async def get_file(file_name: str):
 # clinic_info, location에서 예약 버튼 활성화 관리
 @router.get("/can_reservation")
 async def can_reservation(time: str = None, clinic_id: str = None):
-    cache_key = generate_cache_key("can_reservation", {"time": time, "clinic_id": clinic_id})
+    time = normalize(time) if time else None
+    cache_key = await schedule.availability_key("can_reservation", {"time": time, "clinic_id": clinic_id})
 
     async def fetch_data():
-        conn = hosts.connect()
-        try:
-            curs = conn.cursor()
-            sql = """
-                SELECT 
-                    c.name, c.latitude, c.longitude, c.address, c.image, ava.time, c.id
-                FROM 
-                    clinic c LEFT OUTER JOIN
-                (SELECT a.clinic_id, a.time 
-                 FROM available_time a LEFT OUTER JOIN reservation r 
-                 ON (a.time = r.time AND a.clinic_id = r.clinic_id) 
-                 WHERE r.time IS NULL AND a.time = %s) AS ava 
-                ON (c.id = ava.clinic_id)
-                WHERE ava.time IS NOT NULL AND c.id = %s
-                """
-            curs.execute(sql, (time, clinic_id))
-            rows = curs.fetchone()
-            return rows
-        except Exception as e:
-            print("Database error:", e)
+        if not time or not clinic_id:
             return None
-        finally:
-            conn.close()
+        slot = parse_time(time)
+        if AVAILABILITY_SOURCE == "table":
+            rows = _fetch_available_from_table(slot)
+        else:
+            try:
+                book = await schedule.get_rule_book()
+            except Exception as e:
+                print("Database error:", e)
+                return None
+            rows = _fetch_open_unreserved({clinic_id} if book.is_open(clinic_id, slot) else set(), slot)
+        for id, name, latitude, longitude, address, image, slot_time in rows:
+            if id == clinic_id:
+                return [name, latitude, longitude, address, image, slot_time, id]
+        return None
 
     result = await get_cached_or_fetch(cache_key, fetch_data)
     return {"result": result}
+
+
+# 병원 한 곳의 예약 가능 슬롯 (from 이상 to 미만, 최대 14일)
+# 진료 시간 규칙을 구간만큼만 펼친 뒤 이미 예약된 슬롯을 뺀다
+@router.get("/slots/{clinic_id}")
+async def get_available_slots(clinic_id: str, from_: str = Query(..., alias="from"), to: str = None):
+    start = parse_bound(from_)
+    end = parse_bound(to) if to else start + timedelta(days=1)
+    if not start < end <= start + timedelta(days=14):
+        raise HTTPException(status_code=400, detail="조회 기간은 0일 초과 14일 이하입니다.")
+
+    book = await schedule.get_rule_book()
+    slots = list(book.expand(clinic_id, start, end))
+    if not slots:
+        return {"results": []}
+
+    conn = hosts.connect()
+    try:
+        curs = conn.cursor()
+        sql = "SELECT time FROM reservation WHERE clinic_id = %s AND time >= %s AND time < %s"
+        curs.execute(sql, (clinic_id, start, end))
+        reserved = {format_time(row[0]) for row in curs.fetchall()}
+    finally:
+        conn.close()
+
+    return {"results": [format_time(slot) for slot in slots if format_time(slot) not in reserved]}
+
+
+# ====================================
+# 진료 시간 규칙 / 휴진 관리
+# ====================================
+
+@router.get("/rules/{clinic_id}")
+async def get_schedule_rules(clinic_id: str):
+    book = await schedule.get_rule_book()
+    rules = sorted(book.by_clinic.get(clinic_id, ()), key=lambda r: (r.weekday, r.open))
+    return {
+        "rules": [
+            {"weekday": r.weekday, "open": r.open.strftime("%H:%M"), "close": r.close.strftime("%H:%M"),
+             "slot_minutes": r.slot_minutes}
+            for r in rules
+        ],
+        "closures": [
+            {"id": c.id, "start": format_time(c.start), "end": format_time(c.end), "reason": c.reason}
+            for c in book.closures.get(clinic_id, ())
+        ],
+    }
+
+# 요일별 규칙 전체 교체 (weekday: 0=월 ~ 6=일, 야간: {"open": "22:00", "close": "06:00"})
+# body 예: [{"weekday": 0, "open": "09:00", "close": "18:00", "slot_minutes": 30}, ...]
+@router.put("/rules/{clinic_id}", dependencies=CLINIC_SESSION)
+async def update_schedule_rules(clinic_id: str, rules: list):
+    try:
+        values = []
+        for r in rules:
+            weekday, open_, close = int(r["weekday"]), schedule.to_time(r["open"]), schedule.to_time(r["close"])
+            slot_minutes = int(r.get("slot_minutes") or schedule.DEFAULT_SLOT_MINUTES)
+            # close <= open 은 자정을 넘기는 규칙 (같으면 24시간)
+            if not (0 <= weekday <= 6 and slot_minutes > 0):
+                raise ValueError(r)
+            values.append((clinic_id, weekday, open_.strftime("%H:%M"), close.strftime("%H:%M"), slot_minutes))
+    except (KeyError, TypeError, ValueError, IndexError, AttributeError):
+        raise HTTPException(status_code=400, detail="잘못된 규칙 형식입니다.")
+
+    conn = hosts.connect()
+    try:
+        curs = conn.cursor()
+        curs.execute("DELETE FROM clinic_schedule_rule WHERE clinic_id = %s", (clinic_id,))
+        for value in values:
+            curs.execute(
+                "INSERT INTO clinic_schedule_rule (clinic_id, weekday, open_time, close_time, slot_minutes) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                value,
+            )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print("Error:", e)
+        raise HTTPException(status_code=500, detail="Failed to update schedule rules.")
+    finally:
+        conn.close()
+
+    await schedule.rules_changed()
+    return {"result": "OK"}
+
+@router.post("/closures/{clinic_id}", dependencies=CLINIC_SESSION)
+async def add_closure(clinic_id: str, start: str, end: str, reason: str = None):
+    start_at, end_at = parse_bound(start), parse_bound(end)
+    if end_at <= start_at:
+        raise HTTPException(status_code=400, detail="end는 start보다 뒤여야 합니다.")
+
+    conn = hosts.connect()
+    try:
+        curs = conn.cursor()
+        curs.execute(
+            "INSERT INTO clinic_closure (clinic_id, start_at, end_at, reason) VALUES (%s, %s, %s, %s)",
+            (clinic_id, start_at, end_at, reason),
+        )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print("Error:", e)
+        raise HTTPException(status_code=500, detail="Failed to add closure.")
+    finally:
+        conn.close()
+
+    await schedule.rules_changed()
+    return {"result": "OK"}
+
+@router.delete("/closures/{clinic_id}/{closure_id}", dependencies=CLINIC_SESSION)
+async def delete_closure(clinic_id: str, closure_id: int):
+    conn = hosts.connect()
+    try:
+        curs = conn.cursor()
+        result = curs.execute("DELETE FROM clinic_closure WHERE id = %s AND clinic_id = %s", (closure_id, clinic_id))
+        conn.commit()
+    finally:
+        conn.close()
+    if result == 0:
+        raise HTTPException(status_code=404, detail="Closure not found.")
+
+    await schedule.rules_changed()
+    return {"result": "OK"}
@@ -0,0 +1,6 @@
+"""
+author: 
+Description: 로컬 대역(stand-in)으로 API를 띄워 성능을 측정하는 벤치마크 모음
+Fixed: 
+Usage: python -m bench.loadtest --help
+"""
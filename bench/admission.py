@@ -0,0 +1,177 @@
+"""
+author:
+Description: 조회 폭주 중 예약 지연/거절 측정 (admission.py 동시 처리 한도, 우선순위, 속도 제한 확인)
+Fixed:
+Usage:
+    python -m bench.admission --duration 5 --browsers 200 --bookers 8 --capacity 8
+
+    1) 확인 (실제 앱, 로컬 대역): 라우트 등급 분류, 예약 속도 제한(burst 후 429 + Retry-After,
+       user_id 를 바꿔도 같은 클라이언트면 제한, 다른 클라이언트는 따로, VET_ADMISSION_RATE_BY_IP 를 끄면 IP 로 제한하지 않음),
+       Redis 장애 시 제한하지 않음, /health 제외, 메트릭 노출. 틀리면 종료코드 1.
+    2) 폭주: DB 풀(--pool 개 연결, 쿼리당 --service-ms)을 흉내 낸 라우트에 조회 요청 --browsers 개와
+       예약 요청 --bookers 개를 동시에 계속 보낸다. 미들웨어 없이 / 있을 때의
+       예약·조회 p50/p99, 처리량, 503 수를 JSON 으로 출력한다.
+"""
+
+import argparse, asyncio, json, os, tempfile, time
+
+from bench.loadtest import percentile
+
+
+def surge_app(pool, service_ms, limiter=None):
+    """예약/조회 라우트만 있는 앱. 요청마다 DB 연결 하나를 잡고 service_ms 동안 쓴다."""
+    from fastapi import FastAPI
+    import admission
+    app = FastAPI()
+    if limiter is not None:
+        app.add_middleware(admission.AdmissionMiddleware, limiter=limiter)
+    state = {"db": None}
+
+    async def use_db():
+        if state["db"] is None:
+            state["db"] = asyncio.Semaphore(pool)
+        async with state["db"]:
+            await asyncio.sleep(service_ms / 1000)
+
+    @app.post("/reservation/{user_id}")
+    async def book(user_id: str):
+        await use_db()
+        return {"results": "OK"}
+
+    @app.get("/available/available_clinic")
+    async def browse(time: str = None):
+        await use_db()
+        return {"results": []}
+
+    return app
+
+
+async def surge(app, duration, browsers, bookers):
+    import httpx
+    samples = {"booking": [], "browse": []}
+    statuses = {"booking": {}, "browse": {}}
+    stop = time.perf_counter() + duration
+
+    async def user(kind, idx):
+        method, url = ("POST", f"/reservation/user{idx}") if kind == "booking" else ("GET", "/available/available_clinic")
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            resp = await client.request(method, url)
+            statuses[kind][resp.status_code] = statuses[kind].get(resp.status_code, 0) + 1
+            if resp.status_code == 200:
+                samples[kind].append((time.perf_counter() - started) * 1000)
+            else:
+                # 거절되면 클라이언트는 바로 다시 보내지 않는다
+                await asyncio.sleep(min(float(resp.headers.get("Retry-After", "1")), 0.2))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(user("browse", i) for i in range(browsers)), *(user("booking", i) for i in range(bookers)))
+        elapsed = time.perf_counter() - started
+
+    result = {}
+    for kind, values in samples.items():
+        values.sort()
+        result[kind] = {
+            "ok_per_sec": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50), 1) if values else None,
+            "p99_ms": round(percentile(values, 99), 1) if values else None,
+            "statuses": statuses[kind],
+        }
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="조회 폭주 중 예약 지연 측정")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--browsers", type=int, default=200)
+    parser.add_argument("--bookers", type=int, default=8)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--pool", type=int, default=8)
+    parser.add_argument("--service-ms", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    os.environ["VET_ADMISSION"] = "1"
+    os.environ["VET_ADMISSION_RATE_BY_IP"] = "1"  # 벤치 클라이언트는 프록시 없이 바로 붙는다
+    os.environ["VET_ADMISSION_CAPACITY"] = str(args.capacity)
+    from bench import loadtest
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-admission-"), args.seed, 20, 20)
+    import admission, hosts, httpx, metrics
+
+    async def checks():
+        booking = admission.CLASS_BY_NAME["booking"]
+        user = data["user_ids"][0]
+        uid = data["user_ids"][1]
+        pet = data["pet_ids"][uid][0]
+
+        def cls_of(method, path):
+            cls, _ = admission.classify({"type": "http", "method": method, "path": path, "query_string": b"",
+                                         "app": client._transport.app})
+            return cls.name if cls else None
+
+        results = {
+            "class_booking": (cls_of("POST", f"/reservation/{user}"), "booking"),
+            "class_browse": (cls_of("GET", "/available/available_clinic"), "browse"),
+            "class_default": (cls_of("GET", f"/reservation/user/{user}"), "default"),
+            "exempt_health": (cls_of("GET", "/health/live"), None),
+            "exempt_sse": (cls_of("GET", "/available/subscribe"), None),
+        }
+        statuses = []
+        for _ in range(booking.burst + 1):
+            resp = await client.post(f"/reservation/{uid}", params={
+                "clinic_id": data["clinic_ids"][0], "time": "2030-01-01 09:00", "symptoms": "응급", "pet_id": pet})
+            statuses.append(resp.status_code)
+        results["booking_burst_allowed"] = (sum(s != 429 for s in statuses), booking.burst)
+        results["booking_rate_limited"] = (statuses[-1], 429)
+        results["retry_after"] = (resp.headers.get("Retry-After"), str(int(1 / booking.rate)))
+        # 경로의 user_id 를 바꿔도 같은 클라이언트면 같은 버킷, 다른 클라이언트는 같은 user_id 라도 따로
+        results["rotating_user_id_limited"] = ((await client.post(f"/reservation/{user}", params={
+            "clinic_id": data["clinic_ids"][1], "time": "2030-01-01 09:00", "symptoms": "응급",
+            "pet_id": data["pet_ids"][user][0]})).status_code, 429)
+        other = httpx.AsyncClient(transport=httpx.ASGITransport(app=client._transport.app, client=("10.0.0.2", 123)),
+                                  base_url="http://bench")
+        async with other:
+            results["other_client_not_limited"] = ((await other.post(f"/reservation/{uid}", params={
+                "clinic_id": data["clinic_ids"][1], "time": "2030-01-01 09:00", "symptoms": "응급",
+                "pet_id": pet})).status_code != 429, True)
+        # IP 제한을 끄면(기본, 프록시 헤더 없이 프록시 뒤에서 돌 때) 토큰 없는 요청은 제한하지 않는다
+        admission.RATE_BY_IP = False
+        results["ip_limit_off_by_default"] = ((await client.post(f"/reservation/{uid}", params={
+            "clinic_id": data["clinic_ids"][0], "time": "2030-01-01 10:00", "symptoms": "응급",
+            "pet_id": pet})).status_code != 429, True)
+        admission.RATE_BY_IP = True
+        # Redis 가 죽으면 제한하지 않는다
+        hosts.redis_breaker.state, hosts.redis_breaker.opened_at = "open", time.monotonic()
+        results["fail_open_on_redis_outage"] = ((await client.post(f"/reservation/{uid}", params={
+            "clinic_id": data["clinic_ids"][0], "time": "2030-01-01 09:30", "symptoms": "응급",
+            "pet_id": pet})).status_code != 429, True)
+        hosts.redis_breaker.reset()
+        counters = metrics.snapshot()["counters"]
+        results["metrics_rate_limited"] = (counters.get("admission.booking.rate_limited", 0) >= 1, True)
+        results["metrics_admitted"] = (counters.get("admission.booking.admitted", 0) >= booking.burst, True)
+        return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+    async def _main():
+        async with client:
+            result = {"checks": await checks()}
+        # 폭주 측정에서는 속도 제한 없이 동시 처리 한도만 본다
+        for cls in admission.CLASSES:
+            cls.rate = 0
+        result["without_admission"] = await surge(
+            surge_app(args.pool, args.service_ms), args.duration, args.browsers, args.bookers)
+        limiter = admission.Limiter(args.capacity)
+        result["with_admission"] = await surge(
+            surge_app(args.pool, args.service_ms, limiter), args.duration, args.browsers, args.bookers)
+        result["admission"] = limiter.snapshot()
+        result["counters"] = {k: v for k, v in metrics.snapshot()["counters"].items() if k.startswith("admission.")}
+        return result
+
+    result = asyncio.run(_main())
+    print(json.dumps({"settings": vars(args), **result}, ensure_ascii=False, indent=2))
+    if not all(r["ok"] for r in result["checks"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+author:
+Description: Firebase ID 토큰 로컬 검증 확인과 요청당 인증 비용 측정
+Fixed:
+Usage:
+    python -m bench.auth --requests 2000
+
+    로컬에서 만든 RSA 키/인증서로 토큰을 발급하고, 인증서는 로컬 HTTP 서버(Cache-Control max-age)로 내려준다.
+    1) 확인: 정상/만료/다른 프로젝트/다른 발급자/위조 서명/모르는 kid/헤더 없음, 키 교체 시 다시 받기
+    2) 측정: 토큰 검증(서명 확인) vs 캐시 적중 비용, 인증이 붙은 라우트(/pet/)의 요청 지연
+    확인 항목이 하나라도 틀리면 종료코드 1.
+"""
+
+import argparse, asyncio, json, os, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.loadtest import percentile
+
+
+def serve_certs(state):
+    """state["certs"] 를 Cache-Control max-age=state["max_age"] 로 내려주는 로컬 서버"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["hits"] += 1
+            body = json.dumps(state["certs"]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", f"public, max-age={state['max_age']}, must-revalidate")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/certs"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="토큰 로컬 검증 확인/측정")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    os.environ["VET_AUTH"] = "1"
+    os.environ["VET_AUTH_ROUTERS"] = "pet"
+    os.environ["VET_FIREBASE_PROJECT_ID"] = "vet-bench"
+    os.environ["VET_AUTH_KEYS_MIN_REFRESH"] = "0"
+    from bench import loadtest, standins
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-auth-"), args.seed, 50, 50)
+    import auth, metrics
+    from fastapi import HTTPException
+
+    issuer = standins.FirebaseTokenIssuer("vet-bench", kid="key-1")
+    state = {"certs": dict(issuer.certs), "max_age": 3600, "hits": 0}
+    server, url = serve_certs(state)
+    auth.key_store.url = url
+    user = data["user_ids"][0]
+
+    async def status_of(token):
+        auth.verified_tokens.clear()
+        try:
+            await auth.verify_token(token)
+            return 200
+        except HTTPException as e:
+            return e.status_code
+
+    async def checks():
+        other = standins.FirebaseTokenIssuer("vet-bench", kid="key-1")
+        valid = issuer.token(user)
+        tampered = valid[:-4] + ("AAAA" if not valid.endswith("AAAA") else "BBBB")
+        results = {
+            "valid": (await status_of(valid), 200),
+            "expired": (await status_of(issuer.token(user, expires_in=-60)), 401),
+            "other_project": (await status_of(issuer.token(user, aud="other-project")), 401),
+            "other_issuer": (await status_of(issuer.token(user, iss="https://example.com/vet-bench")), 401),
+            "forged_signature": (await status_of(other.token(user)), 401),
+            "tampered": (await status_of(tampered), 401),
+            "unknown_kid": (await status_of(issuer.token(user, kid="nope")), 401),
+            "no_header": ((await client.get("/pet/", params={"user_id": user})).status_code, 401),
+            "bearer_ok": ((await client.get("/pet/", params={"user_id": user},
+                                            headers={"Authorization": f"Bearer {valid}"})).status_code, 200),
+            "unprotected_router": ((await client.get("/species/types")).status_code, 200),
+        }
+        # 키 교체: 새 kid 로 서명한 토큰이 오면 인증서를 다시 받아 검증한다
+        rotated = standins.FirebaseTokenIssuer("vet-bench", kid="key-2")
+        state["certs"] = {**issuer.certs, **rotated.certs}
+        hits = state["hits"]
+        results["rotated_kid"] = (await status_of(rotated.token(user)), 200)
+        results["rotation_refetched"] = (state["hits"] - hits, 1)
+        # max-age 가 지나면 다시 받고, 그 전에는 받지 않는다
+        auth.key_store.expires_at = time.time() - 1
+        hits = state["hits"]
+        await status_of(rotated.token(user))
+        await status_of(rotated.token(user))
+        results["refetch_after_max_age"] = (state["hits"] - hits, 1)
+        return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+    async def timing(func, n):
+        values = []
+        for _ in range(n):
+            start = time.perf_counter()
+            await func()
+            values.append((time.perf_counter() - start) * 1e6)
+        values.sort()
+        return {"p50_us": round(percentile(values, 50), 1), "p99_us": round(percentile(values, 99), 1)}
+
+    async def measure():
+        token = issuer.token(user)
+        await auth.verify_token(token)
+
+        async def uncached():
+            auth.verified_tokens.clear()
+            await auth.verify_token(token)
+
+        async def cached():
+            await auth.verify_token(token)
+
+        async def request_with_token():
+            await client.get("/pet/", params={"user_id": user}, headers={"Authorization": f"Bearer {token}"})
+
+        async def request_unprotected():
+            await client.get("/species/types")
+
+        n = args.requests
+        return {
+            "verify_signature": await timing(uncached, max(1, n // 10)),
+            "verify_cached": await timing(cached, n),
+            "request_pet_with_auth": await timing(request_with_token, n),
+            "request_species_no_auth": await timing(request_unprotected, n),
+        }
+
+    async def _main():
+        async with client:
+            return await checks(), await measure()
+
+    results, timings = asyncio.run(_main())
+    server.shutdown()
+    print(json.dumps({
+        "checks": results,
+        "timings": timings,
+        "auth": metrics.snapshot()["auth"],
+        "counters": {k: v for k, v in metrics.snapshot()["counters"].items() if k.startswith("auth.")},
+    }, ensure_ascii=False, indent=2))
+    if not all(r["ok"] for r in results.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+author:
+Description: 인기 슬롯 동시 예약 벤치마크 (중복 예약 여부 검증 포함)
+Fixed:
+Usage:
+    python -m bench.booking --slots 50 --contenders 64
+    python -m bench.booking --target http://localhost:8000 --clinic-id clinic0001 ...
+
+    슬롯마다 contenders 명이 동시에 POST /reservation/{user_id} 를 보내고
+    200은 정확히 1건, 나머지는 409여야 한다. 초당 처리한 예약 시도/성공 수를 JSON으로 출력한다.
+    예약 전에 첫 슬롯을 포함하는 병원 예약 현황(연/월/일/시/분, 'T' 형식 포함)을 읽어 캐시를 채워 두고,
+    예약 뒤 모든 현황에 그 예약이 보이는지도 확인한다 (오래된 캐시면 violations).
+"""
+
+import argparse, asyncio, json, tempfile, time
+from datetime import datetime, timedelta
+
+from bench.loadtest import percentile
+
+
+def hot_slots(n, base=datetime(2030, 1, 1, 9, 0)):
+    # 시드 데이터와 겹치지 않는 미래 슬롯
+    return [(base + timedelta(minutes=30 * i)).strftime("%Y-%m-%d %H:%M") for i in range(n)]
+
+
+async def contend(client, data, clinic_id, slot, contenders):
+    async def attempt(i):
+        uid = data["user_ids"][i % len(data["user_ids"])]
+        start = time.perf_counter()
+        resp = await client.post(f"/reservation/{uid}", params={
+            "clinic_id": clinic_id, "time": slot, "symptoms": "응급", "pet_id": data["pet_ids"][uid][0],
+        })
+        return resp.status_code, (time.perf_counter() - start) * 1000
+
+    return await asyncio.gather(*(attempt(i) for i in range(contenders)))
+
+
+def view_prefixes(slot):
+    # 병원 예약 현황 조회가 받는 접두어들
+    return [slot[:4], slot[:7], slot[:10], slot[:13], slot[:13].replace(" ", "T"), slot]
+
+
+async def view_counts(client, clinic_id, slot):
+    counts = {}
+    for prefix in view_prefixes(slot):
+        resp = await client.get(f"/reservation/clinic/{clinic_id}", params={"time": prefix})
+        counts[prefix] = sum(row[5] == slot for row in resp.json()["results"])
+    return counts
+
+
+def count_rows(db_path, clinic_id, slots):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    try:
+        return {
+            slot: conn.execute(
+                "SELECT COUNT(*) FROM reservation WHERE clinic_id = ? AND time = ?", (clinic_id, f"{slot}:00")
+            ).fetchone()[0]
+            for slot in slots
+        }
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="동시 예약 벤치마크")
+    parser.add_argument("--slots", type=int, default=50)
+    parser.add_argument("--contenders", type=int, default=64)
+    parser.add_argument("--clinic-id", default="clinic0000")
+    parser.add_argument("--target", default="")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    slots = hot_slots(args.slots)
+
+    async def _main():
+        import httpx
+        from bench import loadtest, standins
+        if args.target:
+            data = standins.seed_plan(args.seed)
+            client = httpx.AsyncClient(base_url=args.target, timeout=30)
+        else:
+            client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-booking-"), args.seed, 20, 200)
+        results = {}
+        async with client:
+            await view_counts(client, args.clinic_id, slots[0])
+            started = time.perf_counter()
+            for slot in slots:
+                results[slot] = await contend(client, data, args.clinic_id, slot, args.contenders)
+            elapsed = time.perf_counter() - started
+            views = await view_counts(client, args.clinic_id, slots[0])
+        return data, results, elapsed, views
+
+    data, results, elapsed, views = asyncio.run(_main())
+
+    statuses = {}
+    latencies = []
+    double_booked = []
+    for slot, attempts in results.items():
+        winners = sum(1 for status, _ in attempts if status == 200)
+        if winners != 1:
+            double_booked.append({"slot": slot, "winners": winners})
+        for status, latency in attempts:
+            statuses[status] = statuses.get(status, 0) + 1
+            latencies.append(latency)
+    for prefix, rows in views.items():
+        if rows != 1:
+            double_booked.append({"slot": slots[0], "view": prefix, "rows": rows})
+    if "db_path" in data:
+        for slot, rows in count_rows(data["db_path"], args.clinic_id, slots).items():
+            if rows != 1:
+                double_booked.append({"slot": slot, "rows": rows})
+
+    latencies.sort()
+    attempts = args.slots * args.contenders
+    print(json.dumps({
+        "slots": args.slots,
+        "contenders": args.contenders,
+        "attempts_per_s": round(attempts / elapsed, 2),
+        "bookings_per_s": round(statuses.get(200, 0) / elapsed, 2),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "violations": double_booked,
+    }, ensure_ascii=False, indent=2))
+    if double_booked:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
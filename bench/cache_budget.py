@@ -0,0 +1,133 @@
+"""
+author:
+Description: 캐시 값 압축, 네임스페이스 예산, 한 번 찾고 마는 검색어의 짧은 TTL 확인과 Redis 사용량 비교
+Fixed:
+Usage:
+    python -m bench.cache_budget --searches 2000 --clinics 500
+
+    1) 확인 (실제 앱, 로컬 대역): 큰 값은 "z:" 로 압축 저장되고 응답은 같음, 이전 형식 값도 읽힘,
+       처음 찾는 검색어는 cold_ttl, 다시 찾으면 ttl, 키 수/바이트 예산을 넘지 않음(처음 본 검색어 기록 포함),
+       무효화하면 기록도 빠짐,
+       GET /metrics/cache. 틀리면 종료코드 1.
+    2) 측정: 서로 다른 검색어 --searches 개(대부분 한 번, 일부 반복)를 보낸 뒤의 clinic_search 키 수/바이트, Redis 전체 키 수와
+       TTL 분포를 압축/예산 없이(이전 방식) / 있을 때로 비교한다.
+"""
+
+import argparse, asyncio, json, random, tempfile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="캐시 예산 확인")
+    parser.add_argument("--searches", type=int, default=2000)
+    parser.add_argument("--repeat-share", type=float, default=0.1, help="반복해서 찾는 검색어 비율")
+    parser.add_argument("--max-keys", type=int, default=500)
+    parser.add_argument("--clinics", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from bench import loadtest
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-cache-budget-"), args.seed, args.clinics, 20)
+    import cache, metrics
+    redis = data["redis"]
+    search_policy = cache.POLICIES["clinic_search"]
+    seen_key = f"{cache.META_PREFIX}clinic_search:seen"
+
+    async def namespace_keys(ns):
+        return [key async for key in redis.scan_iter(match=f"{ns}:*", count=1000)]
+
+    async def checks():
+        results = {}
+        list_key = cache.generate_cache_key("clinic_list", {})
+        cached = (await client.get("/clinic/")).json()
+        raw = await redis.get(list_key)
+        results["list_compressed"] = (raw.startswith(cache.COMPRESSED_PREFIX), True)
+        results["list_same_response"] = ((await client.get("/clinic/")).json(), cached)
+        results["list_smaller"] = (len(raw) < len(json.dumps(cached["results"])) / 3, True)
+
+        # 이전 형식 (봉투/압축 없이 저장된 값)
+        await redis.set(list_key, json.dumps(cached["results"]), ex=60)
+        results["legacy_value"] = ((await client.get("/clinic/")).json(), cached)
+
+        once = cache.generate_cache_key("clinic_search", {"search": "동물병원12"})
+        await client.get("/clinic/", params={"search": "동물병원12"})
+        results["first_search_cold_ttl"] = (0 < await redis.ttl(once) <= search_policy.cold_ttl, True)
+        await cache.invalidate(once)
+        await client.get("/clinic/", params={"search": "동물병원12"})
+        results["repeat_search_full_ttl"] = (await redis.ttl(once) > search_policy.cold_ttl, True)
+
+        # 예산
+        saved = search_policy.max_keys, search_policy.max_bytes
+        search_policy.max_keys = 20
+        for i in range(60):
+            await client.get("/clinic/", params={"search": f"없는검색어{i}"})
+        results["max_keys"] = (len(await namespace_keys("clinic_search")), 20)
+        results["usage_keys"] = ((await cache.usage())["namespaces"]["clinic_search"]["keys"], 20)
+        results["evicted_counted"] = (metrics.snapshot()["counters"].get("cache.evicted", 0) >= 40, True)
+        # 처음 본 검색어 기록은 네임스페이스 ZSET 하나에 SEEN_MAX 개까지만, 검색어마다 키를 만들지 않는다
+        saved_seen = cache.SEEN_MAX
+        cache.SEEN_MAX = 30
+        for i in range(60):
+            await client.get("/clinic/", params={"search": f"처음찾는검색어{i}"})
+        results["seen_bounded"] = ((await redis.zcard(seen_key), await namespace_keys(f"{cache.META_PREFIX}seen")),
+                                   (30, []))
+        cache.SEEN_MAX = saved_seen
+        search_policy.max_keys, search_policy.max_bytes = 0, 20000
+        for i in range(60):
+            await client.get("/clinic/", params={"search": f"동물병원{i}"})
+        usage = (await cache.usage())["namespaces"]["clinic_search"]
+        results["max_bytes"] = (usage["bytes"] <= 20000, True)
+        results["usage_bytes_exact"] = (usage["bytes"], sum(
+            len(v) for v in await redis.mget(await namespace_keys("clinic_search"))))
+        search_policy.max_keys, search_policy.max_bytes = saved
+
+        await cache.invalidate_pattern("clinic_search:*")
+        results["invalidate_clears_usage"] = ("clinic_search" in (await cache.usage())["namespaces"], False)
+        resp = await client.get("/metrics/cache")
+        results["metrics_route"] = ((resp.status_code, "clinic_list" in resp.json()["namespaces"]), (200, True))
+        return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+    async def measure(label):
+        await cache.invalidate_pattern("clinic_search:*")
+        await redis.delete(seen_key)
+        rng = random.Random(args.seed)
+        popular = [f"동물병원{i}" for i in range(int(args.searches * args.repeat_share))]
+        for i in range(args.searches):
+            term = rng.choice(popular) if popular and rng.random() < 0.5 else f"동물병원{rng.randrange(10 ** 6)}"
+            await client.get("/clinic/", params={"search": term})
+        keys = await namespace_keys("clinic_search")
+        values = await redis.mget(keys) if keys else []
+        ttls = [await redis.ttl(key) for key in keys]
+        short = sum(0 < ttl <= search_policy.cold_ttl for ttl in ttls) if search_policy.cold_ttl else 0
+        return {
+            "keys": len(keys),
+            "redis_keys": await redis.dbsize(),
+            "seen_entries": await redis.zcard(seen_key),
+            "bytes": sum(len(v) for v in values if v),
+            "short_ttl_keys": short,
+            "full_ttl_keys": len(keys) - short,
+        }
+
+    async def _main():
+        async with client:
+            result = {"checks": await checks(), "searches": {}}
+            saved = (cache.COMPRESS_MIN_BYTES, search_policy.cold_ttl, search_policy.max_keys, search_policy.max_bytes)
+            cache.COMPRESS_MIN_BYTES = 0
+            search_policy.cold_ttl, search_policy.max_keys, search_policy.max_bytes = 0, 0, 0
+            result["searches"]["before"] = await measure("before")
+            cache.COMPRESS_MIN_BYTES, search_policy.cold_ttl = saved[0], saved[1]
+            search_policy.max_keys, search_policy.max_bytes = args.max_keys, saved[3]
+            result["searches"]["after"] = await measure("after")
+            result["usage"] = await cache.usage()
+            result["counters"] = {k: v for k, v in metrics.snapshot()["counters"].items()
+                                  if k.startswith("cache.") and k.split(".")[1] in (
+                                      "compressed", "compressed_saved_bytes", "evicted", "cold_set", "too_large")}
+            return result
+
+    result = asyncio.run(_main())
+    print(json.dumps({"settings": vars(args), **result}, ensure_ascii=False, indent=2))
+    if not all(r["ok"] for r in result["checks"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
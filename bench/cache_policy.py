@@ -0,0 +1,127 @@
+"""
+author:
+Description: 캐시 만료 직후 요청이 DB 비용을 떠안는지 정책별로 비교 (hard / stale-while-revalidate / refresh-ahead)
+Fixed:
+Usage:
+    python -m bench.cache_policy --ttl 1 --duration 6 --db-delay-ms 50
+
+    GET /clinic/ (clinic_list) 를 일정 간격으로 보내면서 정책마다
+    DB 조회를 기다린 요청 수(지연이 --db-delay-ms 이상)와 p50/p99/max 를 JSON으로 출력한다.
+    DB 지연은 hosts.connect() 에 time.sleep 을 넣어 흉내낸다.
+    먼저 백그라운드 갱신 확인: 갱신이 끝나면 새 값, 갱신 중에 무효화된 키는 되살리지 않음,
+    갱신 중에 무효화 후 새로 채운 값을 쓰기 이전에 읽은 값으로 덮어쓰지 않음. 틀리면 종료코드 1.
+"""
+
+import argparse, asyncio, json, tempfile, time
+
+from bench.loadtest import percentile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="캐시 정책 비교")
+    parser.add_argument("--ttl", type=float, default=1.0, help="clinic_list 신선 기간(초)")
+    parser.add_argument("--duration", type=float, default=6.0, help="정책별 측정 시간(초)")
+    parser.add_argument("--interval-ms", type=float, default=10.0, help="요청 간격")
+    parser.add_argument("--db-delay-ms", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from bench import loadtest
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-cache-policy-"), args.seed, 200, 50)
+    import cache, hosts, metrics
+
+    real_connect = hosts.connect
+
+    def slow_connect(*a, **kw):
+        time.sleep(args.db_delay_ms / 1000)
+        return real_connect(*a, **kw)
+
+    hosts.connect = slow_connect
+
+    policies = {
+        "hard": cache.CachePolicy(ttl=args.ttl, jitter=0),
+        "stale_while_revalidate": cache.CachePolicy(ttl=args.ttl, stale_ttl=args.ttl * 10, jitter=0),
+        "refresh_ahead": cache.CachePolicy(ttl=args.ttl, refresh_ahead=args.ttl / 2, hot_hits=3, jitter=0),
+    }
+
+    async def measure(name, policy):
+        cache.POLICIES["clinic_list"] = policy
+        await data["redis"].delete(cache.generate_cache_key("clinic_list", {}))
+        await client.get("/clinic/")
+        before = dict(metrics.snapshot()["counters"])
+        latencies = []
+        deadline = time.perf_counter() + args.duration
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            resp = await client.get("/clinic/")
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert resp.status_code == 200
+            await asyncio.sleep(args.interval_ms / 1000)
+        counters = metrics.snapshot()["counters"]
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "waited_for_db": sum(1 for v in latencies if v >= args.db_delay_ms),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "max_ms": round(latencies[-1], 3),
+            "cache": {k: v - before.get(k, 0) for k, v in counters.items()
+                      if k.startswith("cache.") and v - before.get(k, 0)},
+        }
+
+    async def refresh_checks():
+        policy = cache.CachePolicy(ttl=0.2, stale_ttl=60, jitter=0)
+
+        def value(v):
+            async def fetch():
+                return v
+            return fetch
+
+        async def refresh_racing(key, during):
+            """만료된 키의 백그라운드 갱신(during() 전에 DB 에서 "fetched" 를 읽음)이 끝나기 전에 during() 을 실행한다"""
+            await cache.get_cached_or_fetch(key, value("v1"), policy)
+            await asyncio.sleep(0.3)
+            gate = asyncio.Event()
+
+            async def slow_fetch():
+                await gate.wait()
+                return "fetched"
+            await cache.get_cached_or_fetch(key, slow_fetch, policy)
+            task = cache._refreshing[key]
+            await during()
+            gate.set()
+            await task
+            return await data["redis"].get(key)
+
+        async def nothing():
+            pass
+
+        key = cache.generate_cache_key("bench_refresh", {"case": 1})
+        raw = await refresh_racing(key, nothing)
+        results = {"refreshed": (raw and cache._unwrap(raw)[0], "fetched")}
+        key = cache.generate_cache_key("bench_refresh", {"case": 2})
+        results["invalidated_not_revived"] = (await refresh_racing(key, lambda: cache.invalidate(key)), None)
+
+        key = cache.generate_cache_key("bench_refresh", {"case": 3})
+
+        async def invalidate_and_refill():
+            await cache.invalidate(key)
+            await cache.get_cached_or_fetch(key, value("new"), policy)
+        raw = await refresh_racing(key, invalidate_and_refill)
+        results["refill_not_overwritten"] = (raw and cache._unwrap(raw)[0], "new")
+        return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+    async def _main():
+        async with client:
+            checks = await refresh_checks()
+            return checks, {name: await measure(name, policy) for name, policy in policies.items()}
+
+    checks, results = asyncio.run(_main())
+    print(json.dumps({"ttl": args.ttl, "db_delay_ms": args.db_delay_ms, "checks": checks, "policies": results},
+                     ensure_ascii=False, indent=2))
+    if not all(r["ok"] for r in checks.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
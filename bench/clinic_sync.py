@@ -0,0 +1,130 @@
+"""
+author:
+Description: 병원 목록 변경분 동기화(GET /clinic/changes) 확인과 앱 시작 시 응답 크기 비교
+Fixed:
+Usage:
+    python -m bench.clinic_sync --clinics 2000
+
+    1) 확인: since=0 이 전체 목록, 생성/수정/삭제가 각각 변경분으로 나오는지(병원당 최신 하나, 삭제는 deleted),
+       limit 페이지 이어받기, 비밀번호가 응답에 없는지, 서버보다 큰 since 는 reset,
+       병원을 만들거나 진료 시간을 바꾸면 진료 규칙(예약 가능 여부)도 따라 바뀌는지. 틀리면 종료코드 1.
+    2) 비교: 전체 목록(GET /clinic/) vs 마지막 동기화 이후 병원 --edits 개가 바뀐 뒤의 변경분 응답 크기/지연
+"""
+
+import argparse, asyncio, json, tempfile, time
+
+from bench.loadtest import percentile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="병원 목록 변경분 동기화 확인")
+    parser.add_argument("--clinics", type=int, default=2000)
+    parser.add_argument("--edits", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from bench import loadtest
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-sync-"), args.seed, args.clinics, 10)
+    n = len(data["clinic_ids"])
+
+    async def changes(since, **params):
+        resp = await client.get("/clinic/changes", params={"since": since, **params})
+        return resp.json()
+
+    async def sync_all(since, limit):
+        """has_more 가 없을 때까지 이어받아 {id: 항목} 과 마지막 next"""
+        state, pages = {}, 0
+        while True:
+            page = await changes(since, limit=limit)
+            pages += 1
+            for change in page["changes"]:
+                state[change["id"]] = change
+            since = page["next"]
+            if not page["has_more"]:
+                return state, since, pages
+
+    async def checks():
+        results = {}
+        full = await changes(0, limit=n + 10)
+        results["full_count"] = (len(full["changes"]), n)
+        results["full_next"] = (full["next"], n)
+        results["no_password"] = (any("password" in c for c in full["changes"]), False)
+        state, token, pages = await sync_all(0, limit=n // 3 + 1)
+        results["paged_count"] = ((len(state), token, pages), (n, n, 3))
+
+        new_id = "clinic-sync-new"
+        await client.post("/clinic/", json={"id": new_id, "name": "새병원", "password": "pw", "address": "서울"})
+        await client.put(f"/clinic/{data['clinic_ids'][0]}", json={"name": "이름바꾼병원", "password": "pw"})
+        await client.put(f"/clinic/{data['clinic_ids'][0]}", json={"name": "또바꾼병원", "password": "pw"})
+        deleted = (await client.delete(f"/clinic/{data['clinic_ids'][1]}")).status_code
+        delta = await changes(token)
+        by_id = {c["id"]: c for c in delta["changes"]}
+        results["delta_ids"] = (sorted(by_id), sorted([new_id, data["clinic_ids"][0], data["clinic_ids"][1]]))
+        results["latest_update_only"] = (by_id.get(data["clinic_ids"][0], {}).get("name"), "또바꾼병원")
+        results["delete_status"] = (deleted, 200)
+        results["tombstone"] = (by_id.get(data["clinic_ids"][1], {}).get("deleted"), True)
+        results["delete_missing"] = ((await client.delete("/clinic/no-such-clinic")).status_code, 404)
+        results["delta_next"] = (delta["next"], token + 4)  # 생성 1 + 수정 2 + 삭제 1
+        results["empty_after_sync"] = (len((await changes(delta["next"]))["changes"]), 0)
+        results["list_sees_update"] = (
+            any("또바꾼병원" in json.dumps(row, ensure_ascii=False) for row in (await client.get("/clinic/")).json()["results"]),
+            True)
+        results["reset"] = ((await changes(delta["next"] + 100))["reset"], True)
+        results["bad_since"] = ((await client.get("/clinic/changes", params={"since": -1})).status_code, 400)
+
+        # 진료 시간 -> 규칙: 만들면 바로 예약 가능, 시간을 바꾸면 규칙도 바뀌고 요일별로 따로 정한 규칙은 그대로
+        hours_id = "clinic-sync-hours"
+
+        async def can(slot):
+            resp = await client.get("/available/can_reservation", params={"time": slot, "clinic_id": hours_id})
+            return resp.json()["result"] is not None
+
+        monday, saturday = "2030-01-07", "2030-01-12"
+        await client.post("/clinic/", json={"id": hours_id, "name": "시간병원", "password": "pw",
+                                            "starttime": "09:00", "endtime": "18:00"})
+        results["created_clinic_open"] = ((await can(f"{monday} 10:00"), await can(f"{monday} 19:00")), (True, False))
+        rules = [{"weekday": w, "open": "09:00", "close": "18:00"} for w in range(5)]
+        rules.append({"weekday": 5, "open": "10:00", "close": "13:00"})
+        await client.put(f"/available/rules/{hours_id}", json=rules)
+        await client.put(f"/clinic/{hours_id}", json={"name": "시간병원", "password": "pw",
+                                                     "starttime": "20:00", "endtime": "02:00"})
+        results["updated_hours_moved"] = ((await can(f"{monday} 10:00"), await can(f"{monday} 23:30"),
+                                           await can("2030-01-08 01:00")), (False, True, True))
+        results["custom_rule_kept"] = (await can(f"{saturday} 10:00"), True)
+        return ({name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()},
+                (await changes(delta["next"]))["next"])
+
+    async def measure(token):
+        for i in range(args.edits):
+            await client.put(f"/clinic/{data['clinic_ids'][2 + i]}", json={"name": f"수정{i}"})
+
+        async def timing(url, params):
+            values, size = [], 0
+            for _ in range(args.requests):
+                started = time.perf_counter()
+                resp = await client.get(url, params=params)
+                values.append((time.perf_counter() - started) * 1000)
+                size = len(resp.content)
+            values.sort()
+            return {"bytes": size, "p50_ms": round(percentile(values, 50), 2), "p99_ms": round(percentile(values, 99), 2)}
+
+        return {
+            "full_list": await timing("/clinic/", None),
+            "full_sync_since_0": await timing("/clinic/changes", {"since": 0, "limit": 5000}),
+            f"delta_after_{args.edits}_edits": await timing("/clinic/changes", {"since": token}),
+        }
+
+    async def _main():
+        async with client:
+            results, token = await checks()
+            return results, await measure(token)
+
+    results, timings = asyncio.run(_main())
+    print(json.dumps({"clinics": n, "checks": results, "timings": timings}, ensure_ascii=False, indent=2))
+    if not all(r["ok"] for r in results.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+author:
+Description: 워커 콜드 스타트 측정 (import 시간, 메모리) 및 회귀 확인
+Fixed:
+Usage:
+    python -m bench.coldstart
+    python -m bench.coldstart --runs 5 --max-import-ms 800 --max-rss-mb 70
+    python -m bench.coldstart --touch s3,firebase     # 처음 사용할 때 드는 비용도 함께 측정
+
+    새 파이썬 프로세스에서 main(또는 --module)을 import 하는 데 걸린 시간과 RSS 를 잰다.
+    -X importtime 결과를 최상위 패키지별로 합쳐 시간이 큰 --top 개를 함께 출력한다.
+    import 만으로 --forbid 모듈(기본: boto3, firebase_admin)이 로드되었거나
+    중앙값이 --max-import-ms / --max-rss-mb 를 넘으면 종료코드 1 (배포 전 회귀 확인용).
+"""
+
+import argparse, json, os, statistics, subprocess, sys, tempfile
+
+from bench import standins
+
+CHILD = r"""
+import json, resource, sys, time
+started = time.perf_counter()
+__import__(sys.argv[1])
+import_ms = (time.perf_counter() - started) * 1000
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+result = {"import_ms": import_ms, "rss_mb": rss_mb(), "modules": sorted(m for m in sys.modules if "." not in m)}
+touch = {}
+if sys.argv[2]:
+    import hosts
+    for name in sys.argv[2].split(","):
+        started = time.perf_counter()
+        hosts.service(name)
+        touch[name] = round((time.perf_counter() - started) * 1000, 1)
+    result["touch_ms"] = touch
+    result["rss_after_touch_mb"] = rss_mb()
+print(json.dumps(result))
+"""
+
+
+def child_env():
+    env = dict(os.environ)
+    env.setdefault("VET_FIREBASE_KEY", json.dumps(standins.fake_firebase_key()))
+    env.setdefault("VET_PORT", "3306")
+    env.setdefault("AWS_S3_BUCKET_NAME", "vet-bench")
+    env.setdefault("AWS_REGION", "ap-northeast-2")
+    env.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    env.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (standins.REPO_ROOT, env.get("PYTHONPATH")) if p)
+    return env
+
+
+def parse_importtime(stderr, top):
+    """-X importtime 출력의 self 시간을 최상위 패키지별로 합쳐 큰 순서대로"""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+    rows = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return [{"package": name, "self_ms": round(us / 1000, 1)} for name, us in rows[:top]]
+
+
+def run_once(module, touch, env, cwd, importtime=False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", CHILD, module, touch]
+    proc = subprocess.run(cmd, env=env, cwd=cwd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="콜드 스타트 측정")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--touch", default="", help="import 후 처음 사용할 서비스 (예: s3,firebase)")
+    parser.add_argument("--forbid", default="boto3,firebase_admin", help="import 만으로 로드되면 안 되는 모듈")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-rss-mb", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    env = child_env()
+    # 라우터들이 import 시점에 cwd 기준 uploads 폴더를 만든다
+    cwd = tempfile.mkdtemp(prefix="vet-coldstart-")
+    runs = [run_once(args.module, args.touch, env, cwd)[0] for _ in range(args.runs)]
+    _, importtime = run_once(args.module, "", env, cwd, importtime=True)
+
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "import_ms_median": round(statistics.median(r["import_ms"] for r in runs), 1),
+        "import_ms_max": round(max(r["import_ms"] for r in runs), 1),
+        "rss_mb_median": round(statistics.median(r["rss_mb"] for r in runs), 1),
+        "top_imports": parse_importtime(importtime, args.top),
+    }
+    if args.touch:
+        report["touch_ms_median"] = {
+            name: statistics.median(r["touch_ms"][name] for r in runs) for name in runs[0]["touch_ms"]
+        }
+        report["rss_after_touch_mb_median"] = round(statistics.median(r["rss_after_touch_mb"] for r in runs), 1)
+
+    failures = []
+    loaded = set(runs[0]["modules"])
+    for name in [m for m in args.forbid.split(",") if m]:
+        if name in loaded:
+            failures.append(f"{name} loaded at import")
+    if args.max_import_ms is not None and report["import_ms_median"] > args.max_import_ms:
+        failures.append(f"import {report['import_ms_median']}ms > {args.max_import_ms}ms")
+    if args.max_rss_mb is not None and report["rss_mb_median"] > args.max_rss_mb:
+        failures.append(f"rss {report['rss_mb_median']}MB > {args.max_rss_mb}MB")
+    report["failures"] = failures
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
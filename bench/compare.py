@@ -0,0 +1,64 @@
+"""
+author:
+Description: 두 부하 테스트 결과(JSON)의 라우트별 차이 비교
+Fixed:
+Usage: python -m bench.compare before.json after.json [--fail-on-regression 10]
+"""
+
+import argparse, json, sys
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def _delta(before, after):
+    if not before:
+        return None
+    return round((after - before) / before * 100, 1)
+
+
+def compare(before, after):
+    rows = []
+    for name in sorted(set(before["routes"]) | set(after["routes"])):
+        b = before["routes"].get(name)
+        a = after["routes"].get(name)
+        row = {"route": name}
+        for m in METRICS:
+            row[m] = (b and b[m], a and a[m], _delta(b[m], a[m]) if a and b else None)
+        row["errors"] = (b and b["errors"], a and a["errors"])
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="부하 테스트 결과 비교")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--fail-on-regression", type=float, default=0,
+                        help="p95가 이 비율(%%) 이상 나빠진 라우트가 있으면 종료코드 1")
+    args = parser.parse_args(argv)
+
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+
+    print(f"{'route':28} {'rps':>22} {'p50_ms':>22} {'p95_ms':>22} {'p99_ms':>22}")
+    regressed = []
+    for row in compare(before, after):
+        cells = []
+        for m in METRICS:
+            b, a, d = row[m]
+            cells.append(f"{b if b is not None else '-':>8} → {a if a is not None else '-':>8} "
+                         f"{'' if d is None else f'{d:+.1f}%':>7}")
+        print(f"{row['route']:28} " + " ".join(cells))
+        d95 = row["p95_ms"][2]
+        if args.fail_on_regression and d95 is not None and d95 >= args.fail_on_regression:
+            regressed.append(row["route"])
+
+    if regressed:
+        print("regressed:", ", ".join(regressed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
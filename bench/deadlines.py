@@ -0,0 +1,196 @@
+"""
+author:
+Description: 조회 제한 시간(504, KILL QUERY)과 클라이언트가 끊긴 요청의 쿼리 취소 확인, 버려진 쿼리가 DB 를 잡는 시간 비교
+Fixed:
+Usage:
+    python -m bench.deadlines --abandoned 20 --slow-ms 10
+
+    SQLite 대역에 progress handler 를 걸어 쿼리를 느리게 만든다 (VM 명령 100 개마다 --slow-ms 만큼 쉰다).
+    KILL QUERY 는 sqlite3 의 interrupt() 로 대신한다 (standins.attach).
+    1) 확인 (실제 앱, 로컬 대역): SELECT 에 MAX_EXECUTION_TIME 힌트, 빠른 조회는 그대로 200,
+       느린 검색/병원 예약 현황은 제한 시간 뒤 504 이고 쿼리가 멈춤, 504 는 캐시하지 않음,
+       클라이언트가 끊기면 핸들러와 쿼리가 바로 멈춤, 라우트별 횟수. 틀리면 종료코드 1.
+    2) 측정: 느린 검색 --abandoned 개를 보내고 --disconnect-ms 뒤 클라이언트가 끊었을 때
+       DB 쿼리가 실행된 시간의 합/최대를 이전 방식(제한/취소 없음)과 비교한다.
+"""
+
+import argparse, asyncio, json, tempfile, time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="조회 제한 시간 확인")
+    parser.add_argument("--abandoned", type=int, default=20)
+    parser.add_argument("--disconnect-ms", type=float, default=100)
+    parser.add_argument("--slow-ms", type=float, default=10, help="느린 쿼리: VM 명령 100 개마다 쉬는 시간")
+    parser.add_argument("--clinics", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from bench import loadtest, standins
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-deadlines-"), args.seed, args.clinics, 20)
+    import cache, clinic, deadline, hosts, metrics, reservation
+    from main import app
+
+    slow = {"ms": 0}
+    runs = []  # 실행된 조회 (시작, 끝)
+
+    conns = {"open": 0}
+
+    class CountedConnection(standins.SQLiteConnection):
+        def close(self):
+            conns["open"] -= 1
+            super().close()
+
+    def connect(*a, **kw):
+        conn = CountedConnection(data["db_path"])
+        conns["open"] += 1
+
+        def handler():
+            if slow["ms"]:
+                time.sleep(slow["ms"] / 1000)
+            return 0
+        conn._conn.set_progress_handler(handler, 100)
+        return conn
+
+    hosts.connect = connect
+
+    def timed(func):
+        def wrapper(*a):
+            started = time.perf_counter()
+            try:
+                return func(*a)
+            finally:
+                runs.append((started, time.perf_counter()))
+        return wrapper
+
+    clinic._select_clinics = timed(clinic._select_clinics)
+    reservation._select_schedule = timed(reservation._select_schedule)
+
+    async def idle(limit=120):
+        # 버려진 조회까지 모두 끝나 연결을 닫을 때까지
+        started = time.perf_counter()
+        while conns["open"] and time.perf_counter() - started < limit:
+            await asyncio.sleep(0.01)
+
+    def counter(name):
+        return metrics.snapshot()["counters"].get(name, 0)
+
+    async def disconnecting(path, query, after_ms, asgi):
+        """ASGI 앱을 직접 불러 after_ms 뒤 클라이언트가 끊긴 것처럼 한다"""
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                 "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+                 "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1),
+                 "server": ("bench", 80), "app": app}
+        sent = []
+        first = [True]
+
+        async def receive():
+            if first[0]:
+                first[0] = False
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.sleep(after_ms / 1000)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message["type"])
+
+        started = time.perf_counter()
+        await asgi(scope, receive, send)
+        return sent, (time.perf_counter() - started) * 1000
+
+    async def checks():
+        results = {}
+        probe = await deadline.query("clinic_search", lambda conn, text: deadline.sql(text), "SELECT * FROM clinic")
+        results["hint"] = (probe, f"SELECT /*+ MAX_EXECUTION_TIME({deadline.DEADLINES['clinic_search']}) */ * FROM clinic")
+        results["no_hint_outside_query"] = (deadline.sql("SELECT 1"), "SELECT 1")
+
+        resp = await client.get("/clinic/", params={"search": "동물병원1"})
+        results["fast_search"] = ((resp.status_code, len(resp.json()["results"]) > 0), (200, True))
+
+        saved = dict(deadline.DEADLINES), deadline.KILL_GRACE
+        deadline.DEADLINES.update(clinic_search=200, reservation_clinic=50)
+        deadline.KILL_GRACE = 0.1
+        slow["ms"] = args.slow_ms
+        try:
+            runs.clear()
+            started = time.perf_counter()
+            resp = await client.get("/clinic/", params={"search": "느린검색"})
+            elapsed = time.perf_counter() - started
+            await asyncio.sleep(0.05)
+            results["slow_search_504"] = (resp.status_code, 504)
+            results["slow_search_answered_at_deadline"] = (elapsed < 0.6, True)
+            results["slow_search_query_stopped"] = ((len(runs), runs and runs[0][1] - started < 0.6), (1, True))
+            results["slow_search_counted"] = ((counter("db.deadline.clinic_search.timeout"),
+                                               counter("db.deadline.clinic_search.killed")), (1, 1))
+            key = cache.generate_cache_key("clinic_search", {"search": "느린검색"})
+            results["timeout_not_cached"] = (await data["redis"].exists(key), 0)
+
+            # 병원 예약 현황은 인덱스로 몇 행만 읽으므로 더 느리게
+            slow["ms"] = 100
+            resp = await client.get(f"/reservation/clinic/{data['clinic_ids'][0]}", params={"time": data["times"][0][:7]})
+            results["slow_reservation_clinic_504"] = (resp.status_code, 504)
+            slow["ms"] = args.slow_ms
+
+            # 끊긴 클라이언트
+            deadline.DEADLINES.update(clinic_search=0)
+            await idle()
+            runs.clear()
+            sent, elapsed_ms = await disconnecting("/clinic/", "search=%EB%81%8A%EA%B9%80", 100, app)
+            await asyncio.sleep(0.05)
+            results["disconnect_handler_cancelled"] = ((sent, elapsed_ms < 300), ([], True))
+            results["disconnect_query_stopped"] = ((len(runs), runs and (runs[0][1] - runs[0][0]) * 1000 < 300),
+                                                   (1, True))
+            results["disconnect_counted"] = ((counter("requests.disconnected.list_clinics"),
+                                              counter("db.deadline.clinic_search.cancelled"),
+                                              counter("db.deadline.clinic_search.killed")), (1, 1, 2))
+        finally:
+            slow["ms"] = 0
+            deadline.DEADLINES.clear()
+            deadline.DEADLINES.update(saved[0])
+            deadline.KILL_GRACE = saved[1]
+
+        resp = await client.get("/metrics/")
+        results["metrics"] = (resp.json()["query_deadlines"]["deadlines_ms"], deadline.DEADLINES)
+        return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+    async def measure(label, asgi):
+        runs.clear()
+        slow["ms"] = args.slow_ms
+        try:
+            started = time.perf_counter()
+            await asyncio.gather(*(disconnecting("/clinic/", f"search=abandoned{label}{i}", args.disconnect_ms, asgi)
+                                   for i in range(args.abandoned)))
+            # 이전 방식은 응답을 버린 뒤에도 쿼리가 끝까지 돈다
+            await idle()
+        finally:
+            slow["ms"] = 0
+        busy = sorted((end - start) * 1000 for start, end in runs)
+        return {
+            "requests": args.abandoned,
+            "queries_run": len(runs),
+            "db_busy_total_ms": round(sum(busy)),
+            "db_busy_max_ms": round(busy[-1]) if busy else 0,
+            "last_query_end_ms": round((max(end for _, end in runs) - started) * 1000) if runs else 0,
+        }
+
+    async def _main():
+        async with client:
+            result = {"checks": await checks(), "abandoned": {}}
+            saved = deadline.DEADLINES["clinic_search"]
+            # 이전 방식: 제한 시간 없이, 끊겨도 핸들러가 끝까지 (미들웨어 없이 라우터를 바로 부른다)
+            deadline.DEADLINES["clinic_search"] = 0
+            result["abandoned"]["before"] = await measure("before", app.router)
+            deadline.DEADLINES["clinic_search"] = saved
+            result["abandoned"]["after"] = await measure("after", app)
+            result["counters"] = {k: v for k, v in metrics.snapshot()["counters"].items()
+                                  if k.startswith(("db.deadline.", "requests.disconnected."))}
+            return result
+
+    result = asyncio.run(_main())
+    print(json.dumps({"settings": vars(args), **result}, ensure_ascii=False, indent=2))
+    if not all(r["ok"] for r in result["checks"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
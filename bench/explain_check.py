@@ -0,0 +1,185 @@
+"""
+author:
+Description: 라우터가 실제로 실행하는 모든 쿼리를 로컬 MySQL에서 EXPLAIN 해 풀 스캔 회귀를 잡는 검사
+Fixed:
+Usage:
+    # 빈 로컬 DB(VET_DB 등 환경변수)에 기본 스키마 + 마이그레이션 + 시드 데이터를 올린 뒤 검사
+    python -m bench.explain_check --setup
+    python -m bench.explain_check            # 이미 준비된 DB에서 검사만
+
+    앱을 프로세스 안에서 띄우고 각 엔드포인트를 한 번씩 호출하면서 hosts.connect()로 실행된
+    SQL과 파라미터를 기록한다. 기록된 SELECT/UPDATE/DELETE를 같은 파라미터로 EXPLAIN 해서
+    type=ALL(풀 테이블 스캔)인 테이블이 있으면 종료코드 1로 실패한다.
+    전체 목록 조회처럼 의도된 풀 스캔은 ALLOWED_FULL_SCANS에 이유와 함께 등록한다.
+"""
+
+import argparse, asyncio, os, random, re, sys, tempfile
+
+from bench import standins
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema_mysql.sql")
+
+# (SQL 정규식, 이유) - 의도적으로 전체를 읽는 쿼리
+ALLOWED_FULL_SCANS = [
+    (r"^SELECT \* FROM clinic$", "전체 병원 목록"),
+    (r"^SELECT name, address, image FROM clinic$", "병원 카드 전체 목록"),
+    (r"^SELECT category FROM species$", "전체 세부 종류 목록"),
+    (r"name LIKE %s OR address LIKE %s", "앞뒤 와일드카드 검색은 B-tree 인덱스를 쓸 수 없음"),
+    (r"FROM clinic_schedule_rule$", "진료 규칙 전체를 워커 메모리에 적재 (schedule.load_rule_book)"),
+]
+
+# loadtest 혼합 트래픽에 없는 나머지 엔드포인트
+def _extra_requests(data):
+    cid = data["clinic_ids"][1]
+    uid = data["user_ids"][1]
+    day = data["times"][0][:10]
+    return [
+        ("GET", f"/clinic/{cid}/name", None),
+        ("GET", "/clinic/by-name/동물병원1/id", None),
+        ("GET", "/clinic/cards", None),
+        ("GET", "/clinic/changes", {"since": len(data["clinic_ids"]) // 2}),
+        ("GET", "/species/categories", None),
+        ("GET", "/user/selectclinic", {"id": cid, "password": "qwer1234"}),
+        ("GET", "/user/get_user_name", {"id": uid}),
+        ("GET", f"/reservation/clinic/{cid}/schedule", {"from": day}),
+        ("GET", f"/reservation/clinic/{cid}/export", {"from": day}),
+        ("GET", f"/available/slots/{cid}", {"from": day}),
+        ("GET", f"/available/rules/{cid}", None),
+        ("POST", "/favorite/", {"clinic_id": data["clinic_ids"][-1], "user_id": uid}),
+        ("DELETE", "/favorite/", {"clinic_id": data["clinic_ids"][-1], "user_id": uid}),
+        ("GET", f"/favorite/{uid}/likes", {"clinic_ids": ",".join(data["clinic_ids"][:20])}),
+        ("PUT", f"/mypage/{uid}", {"name": "사용자"}),
+    ]
+
+
+class RecordingCursor:
+    def __init__(self, cursor, log):
+        self._cursor = cursor
+        self._log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def execute(self, sql, params=None):
+        self._log.append((sql, params))
+        return self._cursor.execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class RecordingConnection:
+    def __init__(self, conn, log):
+        self._conn = conn
+        self._log = log
+
+    def cursor(self, *args):
+        return RecordingCursor(self._conn.cursor(*args), self._log)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def setup(conn, clinics, users):
+    import migrate
+    curs = conn.cursor()
+    for sql in migrate.statements(SCHEMA_PATH):
+        curs.execute(sql)
+    conn.commit()
+    migrate.migrate(conn)
+    standins.seed(conn, clinics=clinics, users=users)
+    curs.execute("ANALYZE TABLE clinic, user, pet, favorite, reservation, available_time, species, clinic_schedule_rule, clinic_closure")
+    curs.fetchall()
+
+
+def normalize_sql(sql):
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def allowed(sql):
+    for pattern, reason in ALLOWED_FULL_SCANS:
+        if re.search(pattern, sql):
+            return reason
+    return None
+
+
+def record_queries(data):
+    import httpx
+    import hosts, migrate
+    from bench.loadtest import _mix
+    from main import app
+
+    log = []
+    hosts.connect = lambda *args, **kwargs: RecordingConnection(migrate.connect(), log)
+
+    async def drive():
+        rng = random.Random(0)
+        requests = [builder(rng, data) for _, _, builder in _mix()] + _extra_requests(data)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://explain") as client:
+            for method, url, params in requests:
+                resp = await client.request(method, url, params=params)
+                if resp.status_code >= 500:
+                    print(f"warning: {method} {url} -> {resp.status_code}")
+
+    asyncio.run(drive())
+    return log
+
+
+def explain(conn, log):
+    import pymysql
+    seen = {}
+    for sql, params in log:
+        key = normalize_sql(sql)
+        if key in seen or not re.match(r"^(SELECT|UPDATE|DELETE)\b", key, re.I):
+            continue
+        with conn.cursor(pymysql.cursors.DictCursor) as curs:
+            curs.execute("EXPLAIN " + sql, params)
+            seen[key] = curs.fetchall()
+    return seen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="쿼리 실행계획 검사")
+    parser.add_argument("--setup", action="store_true", help="빈 DB에 스키마/마이그레이션/시드 적용")
+    parser.add_argument("--clinics", type=int, default=200)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    standins.prepare_env(tempfile.mkdtemp(prefix="vet-explain-"))
+    standins.install_services()
+    import migrate
+
+    conn = migrate.connect()
+    try:
+        if args.setup:
+            setup(conn, args.clinics, args.users)
+        data = standins.seed_plan(clinics=args.clinics, users=args.users)
+        plans = explain(conn, record_queries(data))
+    finally:
+        conn.close()
+
+    failures = []
+    for sql, rows in plans.items():
+        scans = [r for r in rows if r.get("type") == "ALL" and not str(r.get("table", "")).startswith("<")]
+        reason = allowed(sql)
+        status = "ok"
+        if scans:
+            status = f"full scan allowed: {reason}" if reason else "FULL SCAN"
+            if not reason:
+                failures.append((sql, scans))
+        if args.verbose or status == "FULL SCAN":
+            print(f"[{status}] {sql}")
+            for r in rows:
+                print(f"    table={r.get('table')} type={r.get('type')} key={r.get('key')} rows={r.get('rows')}")
+
+    print(f"{len(plans)} queries explained, {len(failures)} full table scans")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+author:
+Description: 병원 예약 내역 내보내기(NDJSON/CSV 스트리밍)의 메모리 사용량과 연결 끊김 시 조기 중단 확인
+Fixed:
+Usage:
+    python -m bench.export --rows 20000,100000
+
+    한 병원에 --rows 건의 예약을 넣고 GET /reservation/clinic/{id}/export 를 ASGI 로 직접 호출한다
+    (httpx ASGITransport 는 응답을 모아 두므로 쓰지 않는다). 받은 바이트는 세기만 하고 버린다.
+    1) 확인: 행 수/CSV 헤더/기간 필터/잘못된 format, 몇 조각 받고 끊으면 끝까지 읽지 않고 멈추는지
+    2) 측정: 행 수별 내보내기 시간, 처리량, 파이썬 메모리 최대 증가량(tracemalloc)과
+       비교용 fetchall 방식(전체를 읽어 JSON 한 덩어리로)의 최대 증가량
+    확인 항목이 하나라도 틀리면 종료코드 1.
+"""
+
+import argparse, asyncio, json, tempfile, time, tracemalloc
+from datetime import datetime, timedelta
+
+CLINIC_ID = "clinic-export"
+BASE = datetime(2020, 1, 1, 9, 0)
+
+
+def add_history(db_path, user_id, pet_id, rows):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("DELETE FROM reservation WHERE clinic_id = ?", (CLINIC_ID,))
+        conn.executemany(
+            "INSERT INTO reservation (user_id, clinic_id, time, symptoms, pet_id) VALUES (?, ?, ?, ?, ?)",
+            ((user_id, CLINIC_ID, (BASE + timedelta(minutes=30 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+              "기침과 구토가 있어요", pet_id) for i in range(rows)),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def call(app, path, query, disconnect_after=None):
+    """ASGI 로 직접 호출한다. disconnect_after 조각을 받으면 클라이언트가 끊은 것처럼 한다."""
+    state = {"status": None, "chunks": 0, "bytes": 0, "head": b""}
+    gone = asyncio.Event()
+
+    async def receive():
+        if disconnect_after is None:
+            await asyncio.Event().wait()
+        await gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            state["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            if len(state["head"]) < 65536:
+                state["head"] += body[:65536]
+            state["chunks"] += 1
+            state["bytes"] += len(body)
+            if disconnect_after is not None and state["chunks"] >= disconnect_after:
+                gone.set()
+                # 끊긴 뒤에는 보내지 못하고 기다리게 해 취소되는지 본다
+                await asyncio.sleep(3600)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query.encode(),
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    await app(scope, receive, send)
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="예약 내역 내보내기 측정")
+    parser.add_argument("--rows", default="20000,100000")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from bench import loadtest
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-export-"), args.seed, 5, 5)
+    from main import app
+    import hosts, metrics, reservation
+    user_id = data["user_ids"][0]
+    pet_id = data["pet_ids"][user_id][0]
+    path = f"/reservation/clinic/{CLINIC_ID}/export"
+
+    async def checks():
+        rows = 5000
+        add_history(data["db_path"], user_id, pet_id, rows)
+        full = await call(app, path, "")
+        first = json.loads(full["head"].decode().splitlines()[0])
+        csv = await call(app, path, "format=csv")
+        ranged = await call(app, path, "from=2020-01-01&to=2020-01-02&format=csv")
+        before = dict(metrics.snapshot()["counters"])
+        await call(app, path, "", disconnect_after=2)
+        after = metrics.snapshot()["counters"]
+        results = {
+            "status": (full["status"], 200),
+            "first_row_time": (first["time"], BASE.strftime("%Y-%m-%d %H:%M")),
+            "first_row_name": (first["name"] is not None, True),
+            "csv_header": (csv["head"].decode("utf-8").splitlines()[0], "﻿" + ",".join(reservation.EXPORT_COLUMNS)),
+            # 09:00 부터 30분 간격으로 그날 자정 전까지
+            "range_rows": (len(ranged["head"].decode("utf-8").splitlines()) - 1, 30),
+            "bad_format": ((await call(app, path, "format=xml"))["status"], 400),
+            "bad_range": ((await call(app, path, "from=2020-02-01&to=2020-01-01"))["status"], 400),
+            "disconnect_stops_early": (
+                after.get("export.rows", 0) - before.get("export.rows", 0) < rows, True),
+            "disconnect_counted": (after.get("export.aborted", 0) - before.get("export.aborted", 0), 1),
+            "no_running_exports": (reservation.ReservationExport.running, 0),
+        }
+        return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+    async def measure(rows):
+        add_history(data["db_path"], user_id, pet_id, rows)
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        result = await call(app, path, "")
+        elapsed = time.perf_counter() - started
+        stream_peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        # 비교: 기존 조회처럼 전부 읽어 하나의 JSON 으로
+        conn = hosts.connect()
+        try:
+            body = json.dumps({"results": reservation._select_schedule(conn, CLINIC_ID, BASE, BASE + timedelta(days=36500))},
+                              ensure_ascii=False)
+        finally:
+            conn.close()
+        fetchall_peak = tracemalloc.get_traced_memory()[1] - baseline
+        del body
+        tracemalloc.stop()
+        return {
+            "status": result["status"],
+            "mb": round(result["bytes"] / 1e6, 1),
+            "seconds": round(elapsed, 2),
+            "rows_per_sec": round(rows / elapsed),
+            "stream_peak_mb": round(stream_peak / 1e6, 2),
+            "fetchall_peak_mb": round(fetchall_peak / 1e6, 2),
+        }
+
+    async def _main():
+        result = {"checks": await checks(), "rows": {}}
+        for rows in [int(r) for r in args.rows.split(",") if r]:
+            result["rows"][rows] = await measure(rows)
+        return result
+
+    result = asyncio.run(_main())
+    print(json.dumps({"batch": reservation.EXPORT_BATCH, **result}, ensure_ascii=False, indent=2))
+    if not all(r["ok"] for r in result["checks"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+author:
+Description: 즐겨찾기 정규화 (user_id, clinic_id) 와 사용자별 Redis set 확인, 카드 화면 즐겨찾기 여부 확인 비용 측정
+Fixed:
+Usage:
+    python -m bench.favorites --cards 20 --rounds 50
+
+    1) 확인 (실제 앱, 로컬 대역): 추가/중복 400/없는 병원 404/목록(비밀번호 None)/병원 수정이 목록에 반영/
+       여러 병원 한 번에 확인(/likes)/무효화 전에 읽은 목록으로 다시 채우지 않음/삭제/Redis 장애 시 DB 로 확인/
+       병원 삭제 시 즐겨찾기에서도 빠짐.
+       틀리면 종료코드 1.
+    2) 측정: 카드 --cards 장의 즐겨찾기 여부를 카드마다 /like 로 묻는 것과 /likes 한 번으로 묻는 것의
+       화면당 시간, 요청 수, DB 쿼리 수를 JSON 으로 출력한다.
+"""
+
+import argparse, asyncio, json, tempfile, time
+
+from bench.loadtest import percentile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="즐겨찾기 확인 비용 측정")
+    parser.add_argument("--cards", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--clinics", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from bench import loadtest
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-favorites-"), args.seed, args.clinics, 20)
+    import favorite, hosts
+
+    queries = {"n": 0}
+    real_connect = hosts.connect
+
+    def counting_connect():
+        conn = real_connect()
+        real_cursor = conn.cursor
+
+        def cursor(*a, **kw):
+            curs = real_cursor(*a, **kw)
+            real_execute = curs.execute
+
+            def execute(*ea, **ekw):
+                queries["n"] += 1
+                return real_execute(*ea, **ekw)
+            curs.execute = execute
+            return curs
+        conn.cursor = cursor
+        return conn
+
+    hosts.connect = counting_connect
+
+    async def checks():
+        user = "bench-favorite-user"
+        first, second, gone = data["clinic_ids"][:3]
+        add = lambda cid: client.post("/favorite/", params={"clinic_id": cid, "user_id": user})
+        results = {
+            "empty_list": ((await client.get(f"/favorite/{user}")).status_code, 404),
+            "add": ((await add(first)).status_code, 200),
+            "duplicate": ((await add(first)).status_code, 400),
+            "unknown_clinic": ((await add("no-such-clinic")).status_code, 404),
+        }
+        await add(second)
+        await add(gone)
+        listed = (await client.get(f"/favorite/{user}")).json()["results"]
+        results["list_ids"] = ([row[1] for row in listed], sorted([first, second, gone]))
+        results["list_user"] = (sorted({row[0] for row in listed}), [user])
+        results["list_no_password"] = ([row[3] for row in listed], [None] * 3)
+
+        detail = (await client.get(f"/clinic/{first}")).json()
+        clinic = dict(zip(["id", "name", "password", "latitude", "longitude", "start_time", "end_time",
+                           "introduction", "address", "phone", "image"], detail))
+        clinic["name"] = "이름이 바뀐 병원"
+        await client.put(f"/clinic/{first}", json=clinic)
+        listed = (await client.get(f"/favorite/{user}")).json()["results"]
+        results["clinic_update_reflected"] = (listed[[row[1] for row in listed].index(first)][2], "이름이 바뀐 병원")
+
+        likes = (await client.get(f"/favorite/{user}/likes", params={
+            "clinic_ids": f"{first},{data['clinic_ids'][5]},{second}"})).json()["results"]
+        results["likes"] = (likes, {first: 1, data["clinic_ids"][5]: 0, second: 1})
+        results["like"] = ((await client.get(f"/favorite/{user}/like", params={"clinic_id": second})).json(), 1)
+        results["likes_too_many"] = ((await client.get(f"/favorite/{user}/likes", params={
+            "clinic_ids": ",".join(f"c{i}" for i in range(201))})).status_code, 400)
+
+        # 쓰기 전에 DB 를 읽은 조회가 무효화 뒤에 이전 목록을 채우려 하면 넣지 않는다
+        late = data["clinic_ids"][6]
+        redis_client = await hosts.get_redis_connection()
+        await redis_client.delete(favorite._ids_key(user))
+        _, gen = await favorite._read(redis_client, user, "smembers")
+        stale = favorite._load_ids(user)
+        await add(late)
+        await favorite._store_ids(redis_client, user, stale, gen)
+        results["stale_refill_skipped"] = ((await redis_client.exists(favorite._ids_key(user)),
+                                            (await client.get(f"/favorite/{user}/like", params={
+                                                "clinic_id": late})).json()), (0, 1))
+        await client.delete("/favorite/", params={"clinic_id": late, "user_id": user})
+
+        results["delete"] = ((await client.delete("/favorite/", params={
+            "clinic_id": second, "user_id": user})).status_code, 200)
+        results["like_after_delete"] = ((await client.get(f"/favorite/{user}/like", params={
+            "clinic_id": second})).json(), 0)
+
+        # Redis 가 죽어도 DB 로 답한다
+        hosts.redis_breaker.state, hosts.redis_breaker.opened_at = "open", time.monotonic()
+        results["fail_open_like"] = ((await client.get(f"/favorite/{user}/like", params={"clinic_id": first})).json(), 1)
+        results["fail_open_list"] = (len((await client.get(f"/favorite/{user}")).json()["results"]), 2)
+        hosts.redis_breaker.reset()
+
+        results["clinic_delete"] = ((await client.delete(f"/clinic/{gone}")).status_code, 200)
+        listed = (await client.get(f"/favorite/{user}")).json()["results"]
+        results["deleted_clinic_removed"] = ([row[1] for row in listed], [first])
+        results["deleted_clinic_like"] = ((await client.get(f"/favorite/{user}/like", params={
+            "clinic_id": gone})).json(), 0)
+        return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+    async def measure(mode):
+        user_ids = data["user_ids"]
+        elapsed_ms = []
+        queries["n"] = 0
+        for i in range(args.rounds):
+            user = user_ids[i % len(user_ids)]
+            cards = data["clinic_ids"][(i * args.cards) % len(data["clinic_ids"]):][:args.cards]
+            started = time.perf_counter()
+            if mode == "per_card":
+                for cid in cards:
+                    await client.get(f"/favorite/{user}/like", params={"clinic_id": cid})
+            else:
+                await client.get(f"/favorite/{user}/likes", params={"clinic_ids": ",".join(cards)})
+            elapsed_ms.append((time.perf_counter() - started) * 1000)
+        elapsed_ms.sort()
+        return {
+            "screen_p50_ms": round(percentile(elapsed_ms, 50), 2),
+            "screen_p99_ms": round(percentile(elapsed_ms, 99), 2),
+            "db_queries_per_screen": round(queries["n"] / args.rounds, 2),
+            "requests_per_screen": args.cards if mode == "per_card" else 1,
+        }
+
+    async def _main():
+        async with client:
+            result = {"checks": await checks(), "screens": {}}
+            for mode in ("per_card", "batch"):
+                result["screens"][mode] = await measure(mode)
+            return result
+
+    result = asyncio.run(_main())
+    print(json.dumps({"settings": vars(args), **result}, ensure_ascii=False, indent=2))
+    if not all(r["ok"] for r in result["checks"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+author:
+Description: 작업 큐/워커 확인 (묶어 보내기, 재시도, dead, 죽은 워커 작업 회수, Redis 장애 시 메모리 큐)과
+             예약 응답 시간 비교 (알림을 요청 안에서 보낼 때 / 작업 큐로 넘길 때)
+Fixed:
+Usage:
+    python -m bench.jobs --bookings 50 --fcm-ms 80
+
+    FCM 은 notify._send_each 를 바꿔 --fcm-ms 만큼 걸리는 가짜 send_each 로 대신한다.
+    1) 확인 (실제 앱, 로컬 대역): 예약하면 병원/사용자 알림 작업 2개가 쌓이고 응답은 FCM 을 기다리지 않음,
+       워커가 여러 작업을 send_each 한 번으로 보냄, 일시 오류는 재시도 후 성공, 거절은 바로 dead,
+       VET_JOBS_MAX_ATTEMPTS 번 실패하면 dead, requeue_dead, 시간 초과된 알림은 다시 보내지 않고 dead, heartbeat 가 끊긴 워커의 작업 회수,
+       Redis 장애 중에는 메모리 큐로 처리, 워커 루프가 넣자마자 깨어남, GET /metrics/jobs. 틀리면 종료코드 1.
+    2) 측정: 예약 --bookings 번의 p50/p99 를 알림을 요청 안에서 보낼 때(이전 방식)와 작업 큐로 넘길 때로 비교하고,
+       큐로 넘긴 알림을 워커가 모두 보내는 데 걸린 시간과 send_each 호출 수.
+"""
+
+import argparse, asyncio, json, math, tempfile, time
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+
+from bench.loadtest import percentile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="작업 큐 확인")
+    parser.add_argument("--bookings", type=int, default=50)
+    parser.add_argument("--fcm-ms", type=float, default=80, help="가짜 FCM send_each 한 번에 걸리는 시간")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from bench import loadtest
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-jobs-"), args.seed, 20, 20)
+    import hosts, jobs, metrics, notify
+    from firebase_admin import exceptions
+    redis = data["redis"]
+    notify.ENABLED = True
+    jobs.RETRY_BASE = 0  # 재시도를 바로 (maintain 에서 대기열로)
+
+    fcm = {"calls": [], "fail": {}}
+
+    def fake_send_each(messages):
+        # fail: 토픽 -> 남은 실패 횟수와 예외
+        time.sleep(args.fcm_ms / 1000)
+        fcm["calls"].append([m.topic for m in messages])
+        responses = []
+        for message in messages:
+            count, error = fcm["fail"].get(message.topic, (0, None))
+            if count:
+                fcm["fail"][message.topic] = (count - 1, error)
+                responses.append(SimpleNamespace(success=False, exception=error))
+            else:
+                responses.append(SimpleNamespace(success=True, exception=None))
+        return SimpleNamespace(responses=responses, success_count=sum(r.success for r in responses))
+
+    notify._send_each = fake_send_each
+
+    def future_slots(n, offset_days):
+        base = (datetime.now() + timedelta(days=offset_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return [(base + timedelta(minutes=30 * i)).strftime("%Y-%m-%d %H:%M") for i in range(n)]
+
+    async def book(i, slot):
+        uid = data["user_ids"][i % len(data["user_ids"])]
+        return await client.post(f"/reservation/{uid}", params={
+            "clinic_id": data["clinic_ids"][i % len(data["clinic_ids"])], "time": slot, "symptoms": "응급",
+            "pet_id": data["pet_ids"][uid][0],
+        })
+
+    async def drain():
+        while await jobs.run_once():
+            pass
+
+    async def stats():
+        return await jobs.stats()
+
+    async def checks():
+        results = {}
+        slot = future_slots(1, 30)[0]
+        started = time.perf_counter()
+        resp = await book(0, slot)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        results["booking_ok"] = (resp.status_code, 200)
+        results["booking_queued_two"] = ((await stats())["redis"]["ready"], 2)
+        results["booking_not_waiting_fcm"] = ((elapsed_ms < args.fcm_ms, len(fcm["calls"])), (True, 0))
+
+        await drain()
+        clinic_topic = notify.topic("clinic", data["clinic_ids"][0])
+        user_topic = notify.topic("user", data["user_ids"][0])
+        results["sent_in_one_batch"] = (list(fcm["calls"]), [[clinic_topic, user_topic]])
+        results["topic_name_safe"] = (user_topic, "user-" + data["user_ids"][0].replace("@", "%40"))
+
+        fcm["calls"].clear()
+        for i in range(250):
+            await notify.send(f"bench-{i}", "제목", "내용")
+        await drain()
+        results["batched_sends"] = ((len(fcm["calls"]), sum(map(len, fcm["calls"]))),
+                                    (math.ceil(250 / notify.BATCH), 250))
+
+        # 일시 오류 -> 재시도 -> 성공
+        fcm["fail"]["bench-retry"] = (1, exceptions.UnavailableError("unavailable"))
+        await notify.send("bench-retry", "제목", "내용")
+        await drain()
+        results["retry_scheduled"] = ((await stats())["redis"]["delayed"], 1)
+        await jobs.maintain()
+        await drain()
+        after = await stats()
+        results["retry_succeeded"] = ((after["redis"]["delayed"], after["redis"]["dead"]), (0, 0))
+
+        # 거절 (잘못된 요청) -> 재시도 없이 dead
+        fcm["fail"]["bench-bad"] = (1, exceptions.InvalidArgumentError("bad topic"))
+        await notify.send("bench-bad", "제목", "내용")
+        await drain()
+        dead = await redis.lrange("jobs:default:dead", 0, -1)
+        results["permanent_dead"] = ((len(dead), json.loads(dead[0])["attempts"]), (1, 1))
+
+        # 계속 실패 -> MAX_ATTEMPTS 번 뒤 dead
+        async def always_fail(args):
+            raise RuntimeError("boom")
+        jobs.register("bench_fail", always_fail)
+        await jobs.enqueue("bench_fail", {})
+        for _ in range(jobs.MAX_ATTEMPTS):
+            await jobs.maintain()
+            await drain()
+        dead = await redis.lrange("jobs:default:dead", 0, -1)
+        results["max_attempts_dead"] = ((len(dead), json.loads(dead[0])["attempts"]), (2, jobs.MAX_ATTEMPTS))
+
+        # 원인을 고친 뒤 되살린다
+        async def fixed(args):
+            return None
+        jobs.register("bench_fail", fixed)
+        requeued = await jobs.requeue_dead()
+        after = await stats()
+        results["requeue_dead"] = ((requeued, after["redis"]["ready"], after["redis"]["dead"]), (2, 2, 0))
+        await drain()
+        results["requeued_done"] = ((await stats())["redis"], {"ready": 0, "processing": 0, "delayed": 0, "dead": 0})
+
+        # send_each 가 VET_JOBS_TIMEOUT 을 넘기면: 스레드는 끝까지 보내므로 재시도하지 않는다 (한 번만 간다)
+        fcm["calls"].clear()
+        saved_timeout, jobs.JOB_TIMEOUT = jobs.JOB_TIMEOUT, args.fcm_ms / 1000 / 4
+        await notify.send("bench-slow", "제목", "내용")
+        await drain()
+        jobs.JOB_TIMEOUT = saved_timeout
+        await asyncio.sleep(args.fcm_ms / 1000)
+        await jobs.maintain()
+        await drain()
+        timed_out = await stats()
+        results["timeout_not_retried"] = ((timed_out["redis"]["delayed"], timed_out["redis"]["dead"], list(fcm["calls"])),
+                                          (0, 1, [["bench-slow"]]))
+        await redis.delete("jobs:default:dead")
+
+        # heartbeat 가 끊긴 워커가 꺼내 간 작업
+        orphan = json.dumps(jobs._job("notify", {"topic": "bench-orphan", "title": "t", "body": "b"}))
+        await redis.lpush("jobs:default:processing:gone-host:1", orphan)
+        await redis.lpush("jobs:default:processing:alive-host:2", orphan)
+        await redis.set("jobs:worker:alive-host:2", 1, ex=60)
+        await jobs.maintain()
+        results["dead_worker_recovered"] = (((await stats())["redis"]["ready"],
+                                             await redis.llen("jobs:default:processing:alive-host:2")), (1, 1))
+        await redis.delete("jobs:default:processing:alive-host:2", "jobs:worker:alive-host:2")
+        await drain()
+
+        # Redis 장애: 메모리 큐에 넣고 처리
+        fcm["calls"].clear()
+        hosts.redis_breaker.state, hosts.redis_breaker.opened_at = "open", time.monotonic()
+        await notify.send("bench-outage", "제목", "내용")
+        results["outage_local_queue"] = (len(jobs.local_queue.ready), 1)
+        await drain()
+        hosts.redis_breaker.reset()
+        results["outage_sent"] = (list(fcm["calls"]), [["bench-outage"]])
+
+        # 워커 루프: 넣으면 IDLE_WAIT 을 기다리지 않고 바로 처리
+        fcm["calls"].clear()
+        task = asyncio.get_running_loop().create_task(jobs.run())
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        await notify.send("bench-loop", "제목", "내용")
+        while not fcm["calls"] and time.perf_counter() - started < 5:
+            await asyncio.sleep(0.005)
+        latency = time.perf_counter() - started
+        task.cancel()
+        await jobs.stop()
+        results["worker_wakes"] = ((list(fcm["calls"]), latency < jobs.IDLE_WAIT), ([["bench-loop"]], True))
+
+        resp = await client.get("/metrics/jobs")
+        results["metrics_route"] = ((resp.status_code, "redis" in resp.json()), (200, True))
+        return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+    async def measure():
+        result = {}
+
+        async def inline_send(topic_name, title, body, data=None):
+            # 이전 방식: 요청 안에서 FCM 에 보내고 응답
+            await notify.send_batch([{"topic": topic_name, "title": title, "body": body, "data": {}}])
+
+        for label, offset in (("inline", 40), ("queued", 50)):
+            saved = notify.send
+            if label == "inline":
+                notify.send = inline_send
+            fcm["calls"].clear()
+            elapsed_ms = []
+            try:
+                for i, slot in enumerate(future_slots(args.bookings, offset)):
+                    started = time.perf_counter()
+                    resp = await book(i, slot)
+                    elapsed_ms.append((time.perf_counter() - started) * 1000)
+                    assert resp.status_code == 200, resp.text
+            finally:
+                notify.send = saved
+            elapsed_ms.sort()
+            result[label] = {"p50_ms": round(percentile(elapsed_ms, 50), 2),
+                             "p99_ms": round(percentile(elapsed_ms, 99), 2)}
+            if label == "queued":
+                started = time.perf_counter()
+                await drain()
+                result[label]["drain_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            result[label]["send_each_calls"] = len(fcm["calls"])
+            result[label]["messages"] = sum(map(len, fcm["calls"]))
+        return result
+
+    async def _main():
+        async with client:
+            result = {"checks": await checks(), "bookings": await measure()}
+            result["counters"] = {k: v for k, v in metrics.snapshot()["counters"].items()
+                                  if k.startswith(("jobs.", "notify."))}
+            return result
+
+    result = asyncio.run(_main())
+    print(json.dumps({"settings": vars(args), **result}, ensure_ascii=False, indent=2))
+    if not all(r["ok"] for r in result["checks"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
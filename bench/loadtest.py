@@ -0,0 +1,230 @@
+"""
+author:
+Description: 라우터 처리량/지연시간 측정용 부하 테스트
+Fixed:
+Usage:
+    pip install -r bench/requirements.txt
+    python -m bench.loadtest --concurrency 32 --duration 20 --out bench_results.json
+    python -m bench.loadtest --target http://localhost:8000 ...   # 이미 떠 있는 서버 대상
+    python -m bench.compare before.json after.json
+
+    --target을 주지 않으면 로컬 대역(SQLite, fakeredis, 메모리 S3)으로 앱을 프로세스 안에서 띄운다.
+    결과는 라우트별 count/errors/rps/p50/p95/p99(ms)를 담은 JSON이다.
+"""
+
+import argparse, asyncio, json, os, platform, random, subprocess, tempfile, time
+
+# (라우트 이름, 가중치, 요청 생성 함수) - 이름은 결과 JSON의 키로 쓰이므로 커밋 간에 바꾸지 않는다
+def _mix():
+    def clinic_list(rng, d):
+        return "GET", "/clinic/", None
+    def clinic_search(rng, d):
+        return "GET", "/clinic/", {"search": rng.choice(["강남", "마포", "동물병원1", "송파", "종로"])}
+    def clinic_detail(rng, d):
+        return "GET", f"/clinic/{rng.choice(d['clinic_ids'])}", None
+    def available_clinic(rng, d):
+        return "GET", "/available/available_clinic", {"time": _hot_time(rng, d)}
+    def available_clinic_noredis(rng, d):
+        return "GET", "/available/available_clinic_noredis", {"time": _hot_time(rng, d)}
+    def can_reservation(rng, d):
+        return "GET", "/available/can_reservation", {"time": _hot_time(rng, d), "clinic_id": rng.choice(d["clinic_ids"])}
+    def reservation_user(rng, d):
+        return "GET", f"/reservation/user/{rng.choice(d['user_ids'])}", None
+    def reservation_clinic(rng, d):
+        return "GET", f"/reservation/clinic/{rng.choice(d['clinic_ids'])}", {"time": _hot_time(rng, d)[:10]}
+    def reservation_insert(rng, d):
+        uid = rng.choice(d["user_ids"])
+        return "POST", f"/reservation/{uid}", {
+            "clinic_id": rng.choice(d["clinic_ids"]), "time": _hot_time(rng, d),
+            "symptoms": "기침", "pet_id": rng.choice(d["pet_ids"][uid]),
+        }
+    def pets(rng, d):
+        return "GET", "/pet/", {"user_id": rng.choice(d["user_ids"])}
+    def favorites(rng, d):
+        return "GET", f"/favorite/{rng.choice(d['user_ids'])}", None
+    def favorite_like(rng, d):
+        return "GET", f"/favorite/{rng.choice(d['user_ids'])}/like", {"clinic_id": rng.choice(d["clinic_ids"])}
+    def favorite_likes(rng, d):
+        return "GET", f"/favorite/{rng.choice(d['user_ids'])}/likes", {"clinic_ids": ",".join(rng.sample(d["clinic_ids"], 10))}
+    def species_types(rng, d):
+        return "GET", "/species/types", None
+    def species_pet_categories(rng, d):
+        return "GET", "/species/pet_categories", {"type": rng.choice(["강아지", "고양이"])}
+    def mypage(rng, d):
+        return "GET", f"/mypage/{rng.choice(d['user_ids'])}", None
+    def select_user(rng, d):
+        return "GET", "/user/selectuser", {"id": rng.choice(d["user_ids"])}
+
+    return [
+        ("clinic_list", 10, clinic_list),
+        ("clinic_search", 5, clinic_search),
+        ("clinic_detail", 8, clinic_detail),
+        ("available_clinic", 15, available_clinic),
+        ("available_clinic_noredis", 3, available_clinic_noredis),
+        ("can_reservation", 10, can_reservation),
+        ("reservation_user", 6, reservation_user),
+        ("reservation_clinic", 6, reservation_clinic),
+        ("reservation_insert", 3, reservation_insert),
+        ("pets", 8, pets),
+        ("favorites", 5, favorites),
+        ("favorite_like", 8, favorite_like),
+        ("favorite_likes", 4, favorite_likes),
+        ("species_types", 4, species_types),
+        ("species_pet_categories", 4, species_pet_categories),
+        ("mypage", 3, mypage),
+        ("select_user", 2, select_user),
+    ]
+
+
+def _hot_time(rng, d):
+    # 긴급예약은 가까운 시간대에 몰리므로 앞쪽 슬롯에 가중치를 준다
+    times = d["times"]
+    return times[min(int(rng.expovariate(1 / 4)), len(times) - 1)]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def summarize(samples, elapsed):
+    routes = {}
+    for name, values in sorted(samples.items()):
+        latencies = sorted(v for v, _ in values)
+        errors = sum(1 for _, ok in values if not ok)
+        routes[name] = {
+            "count": len(values),
+            "errors": errors,
+            "rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+        }
+    all_latencies = sorted(v for values in samples.values() for v, _ in values)
+    total = {
+        "count": len(all_latencies),
+        "errors": sum(r["errors"] for r in routes.values()),
+        "rps": round(len(all_latencies) / elapsed, 2) if elapsed else 0,
+        "p50_ms": round(percentile(all_latencies, 50) or 0, 3),
+        "p95_ms": round(percentile(all_latencies, 95) or 0, 3),
+        "p99_ms": round(percentile(all_latencies, 99) or 0, 3),
+    }
+    return routes, total
+
+
+def _git_commit():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.check_output(["git", "-C", root, "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+async def run(client, data, concurrency, duration, requests, rng_seed, routes=None, ok_status=(200, 404, 409)):
+    mix = [m for m in _mix() if not routes or m[0] in routes]
+    names = [m[0] for m in mix]
+    weights = [m[1] for m in mix]
+    builders = {m[0]: m[2] for m in mix}
+    samples = {name: [] for name in names}
+    remaining = [requests]
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker(idx):
+        rng = random.Random(rng_seed * 1000 + idx)
+        while True:
+            if deadline and time.perf_counter() >= deadline:
+                return
+            if requests:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            name = rng.choices(names, weights)[0]
+            method, url, params = builders[name](rng, data)
+            start = time.perf_counter()
+            try:
+                resp = await client.request(method, url, params=params)
+                ok = resp.status_code in ok_status
+            except Exception:
+                ok = False
+            samples[name].append(((time.perf_counter() - start) * 1000, ok))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize({k: v for k, v in samples.items() if v}, elapsed), elapsed
+
+
+def make_local_client(workdir, rng_seed, clinics, users):
+    """로컬 대역을 설치하고 앱을 프로세스 안에서 띄운 httpx 클라이언트를 반환"""
+    from bench import standins
+    data = standins.install(workdir, rng_seed=rng_seed, clinics=clinics, users=users)
+    import httpx
+    from main import app
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    return client, data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="vet-api 부하 테스트")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="측정 시간(초), 0이면 --requests 만큼만")
+    parser.add_argument("--requests", type=int, default=0, help="총 요청 수 (0이면 --duration 기준)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="측정 전 워밍업 시간(초)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--clinics", type=int, default=200)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--routes", default="", help="쉼표로 구분한 라우트 이름만 실행")
+    parser.add_argument("--target", default="", help="이미 실행 중인 서버 URL (시드 데이터는 --seed로 동일하게 생성된 것을 가정)")
+    parser.add_argument("--workdir", default="", help="로컬 대역 파일 위치 (기본: 임시 폴더)")
+    parser.add_argument("--out", default="", help="결과 JSON 파일 경로 (기본: stdout)")
+    args = parser.parse_args(argv)
+
+    routes = [r for r in args.routes.split(",") if r]
+
+    async def _main():
+        import httpx
+        if args.target:
+            from bench import standins
+            data = standins.seed_plan(args.seed, clinics=args.clinics, users=args.users)
+            client = httpx.AsyncClient(base_url=args.target, timeout=30)
+        else:
+            workdir = args.workdir or tempfile.mkdtemp(prefix="vet-bench-")
+            client, data = make_local_client(workdir, args.seed, args.clinics, args.users)
+        async with client:
+            if args.warmup:
+                await run(client, data, args.concurrency, args.warmup, 0, args.seed + 1, routes)
+            (route_stats, total), elapsed = await run(
+                client, data, args.concurrency, args.duration, args.requests, args.seed, routes
+            )
+        return route_stats, total, elapsed
+
+    route_stats, total, elapsed = asyncio.run(_main())
+    result = {
+        "meta": {
+            "commit": _git_commit(),
+            "target": args.target or "local-standins",
+            "concurrency": args.concurrency,
+            "duration_s": round(elapsed, 3),
+            "seed": args.seed,
+            "clinics": args.clinics,
+            "users": args.users,
+            "python": platform.python_version(),
+            "timestamp": int(time.time()),
+        },
+        "total": total,
+        "routes": route_stats,
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"results written to {args.out}: {total['rps']} req/s, p99 {total['p99_ms']} ms")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
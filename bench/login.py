@@ -0,0 +1,165 @@
+"""
+author:
+Description: 병원 로그인 처리량(logins/sec, 코어당)과 로그인이 몰릴 때 다른 요청 지연 측정
+Fixed:
+Usage:
+    python -m bench.login --duration 5 --modes inline,thread,1,2
+
+    모드: inline = 이벤트 루프에서 바로 해시 검증 (비교용), thread = 스레드풀,
+          숫자 = 그 수만큼의 프로세스 풀 (passwords.WORKERS)
+    모드마다 POST /user/clinic_login 을 --concurrency 개씩 보내면서
+    로그인 처리량, 로그인 p50/p99, 이벤트 루프 지연(다른 요청이 그만큼 밀린다) p50/p99/max 를 JSON 으로 출력한다.
+    처음 한 번은 시드의 평문 비밀번호가 로그인 성공 시 해시로 바뀌는지, 틀린 비밀번호가 401 인지,
+    병원 조회 응답과 Redis 에 비밀번호나 해시가 남지 않는지, 병원 쪽 쓰기 라우트가 그 병원의 세션(X-Clinic-Session)을
+    요구하는지, Redis 장애 시 로그인이 503 인지 확인하고 틀리면 종료코드 1.
+"""
+
+import argparse, asyncio, json, os, tempfile, time
+
+from bench.loadtest import percentile
+
+SEED_PASSWORD = "qwer1234"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="병원 로그인 처리량 측정")
+    parser.add_argument("--modes", default="inline,thread,1,2")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--clinics", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    os.environ["VET_CLINIC_SESSION_REQUIRED"] = "1"
+    from bench import loadtest
+    from serve import default_workers
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-login-"), args.seed, args.clinics, 20)
+    import cache, hosts, passwords
+    from bench.standins import SQLiteConnection
+
+    real_run = passwords._run
+
+    async def inline_run(func, *a):
+        return func(*a)
+
+    def stored_passwords():
+        conn = SQLiteConnection(data["db_path"])
+        try:
+            curs = conn.cursor()
+            curs.execute("SELECT password FROM clinic")
+            return [row[0] for row in curs.fetchall()]
+        finally:
+            conn.close()
+
+    async def login(clinic_id, password=SEED_PASSWORD):
+        return await client.post("/user/clinic_login", data={"id": clinic_id, "password": password})
+
+    async def checks():
+        before = stored_passwords()
+        results = {
+            "seed_plaintext": (sum(not passwords.is_hashed(p) for p in before), len(before)),
+            "login_ok": ((await login(data["clinic_ids"][0])).status_code, 200),
+            "wrong_password": ((await login(data["clinic_ids"][1], "nope")).status_code, 401),
+            "unknown_clinic": ((await login("no-such-clinic")).status_code, 401),
+            "legacy_selectclinic": (len((await client.get("/user/selectclinic", params={
+                "id": data["clinic_ids"][2], "password": SEED_PASSWORD})).json()["results"]), 1),
+        }
+        await asyncio.gather(*(login(cid) for cid in data["clinic_ids"]))
+        results["migrated_to_hash"] = (sum(passwords.is_hashed(p) for p in stored_passwords()), len(before))
+        results["login_after_migration"] = ((await login(data["clinic_ids"][0])).status_code, 200)
+        # 해시로 바뀐 뒤 병원 목록/검색/상세/즐겨찾기를 읽어 캐시를 채우고, 응답과 Redis 에 해시가 없는지
+        secrets = [SEED_PASSWORD, *stored_passwords()]
+        clinic_id, user_id = data["clinic_ids"][0], data["user_ids"][0]
+        await client.post("/favorite/", params={"clinic_id": clinic_id, "user_id": user_id})
+        bodies = [(await client.get(url, params=params)).text for url, params in [
+            ("/clinic/", None), ("/clinic/", {"search": "병원"}), (f"/clinic/{clinic_id}", None),
+            (f"/favorite/{user_id}", None)]]
+        results["hash_in_responses"] = (sum(secret in body for body in bodies for secret in secrets), 0)
+        leaked = 0
+        async for key in data["redis"].scan_iter(match="*"):
+            value = await data["redis"].get(key) if await data["redis"].type(key) == "string" else ""
+            try:
+                value = json.dumps(cache._unwrap(value)[0], ensure_ascii=False) if value else ""
+            except ValueError:
+                pass
+            leaked += any(secret in key or secret in value for secret in secrets) or "$pbkdf2" in value
+        results["password_in_redis"] = (leaked, 0)
+
+        # 세션: 병원 쪽 쓰기 라우트는 그 병원의 세션이 있어야 하고, 로그아웃하면 끊긴다. Redis 장애면 503
+        own, other = data["clinic_ids"][:2]
+        session = (await login(own)).json()["session"]
+        closure = lambda cid, token=None: client.post(
+            f"/available/closures/{cid}", params={"start": "2031-01-01", "end": "2031-01-02", "reason": "bench"},
+            headers={"X-Clinic-Session": token} if token else {})
+        results["session_required"] = ((await closure(own)).status_code, 401)
+        results["session_own_clinic"] = ((await closure(own, session)).status_code, 200)
+        results["session_other_clinic"] = ((await closure(other, session)).status_code, 403)
+        await client.post("/user/clinic_logout", data={"session": session})
+        results["session_after_logout"] = ((await closure(own, session)).status_code, 401)
+        hosts.redis_breaker.state, hosts.redis_breaker.opened_at = "open", time.monotonic()
+        results["login_redis_down"] = ((await login(own)).status_code, 503)
+        hosts.redis_breaker.reset()
+        return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+    async def measure(mode):
+        passwords.shutdown()
+        passwords._slots = None
+        if mode == "inline":
+            passwords._run = inline_run
+        else:
+            passwords._run = real_run
+            passwords.WORKERS = 0 if mode == "thread" else int(mode)
+            passwords.MAX_PENDING = max(1, passwords.WORKERS) * 4
+            passwords.warm_pool()
+
+        stop = time.perf_counter() + args.duration
+        login_ms, lag_ms, statuses = [], [], {}
+
+        async def storm(idx):
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                resp = await login(data["clinic_ids"][idx % len(data["clinic_ids"])])
+                login_ms.append((time.perf_counter() - started) * 1000)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+        async def probe():
+            # 10ms 잠들었다 깨어날 때 늦어진 만큼이 이벤트 루프가 막혀 있던 시간이다
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lag_ms.append((time.perf_counter() - started) * 1000 - 10)
+
+        started = time.perf_counter()
+        await asyncio.gather(probe(), *(storm(i) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        login_ms.sort()
+        lag_ms.sort()
+        cores = 1 if mode in ("inline", "thread") else min(int(mode), default_workers())
+        ok = statuses.get(200, 0)
+        return {
+            "logins_per_sec": round(ok / elapsed, 1),
+            "logins_per_sec_per_core": round(ok / elapsed / cores, 1),
+            "statuses": statuses,
+            "login_p50_ms": round(percentile(login_ms, 50), 2),
+            "login_p99_ms": round(percentile(login_ms, 99), 2),
+            "loop_lag_p50_ms": round(percentile(lag_ms, 50), 2),
+            "loop_lag_p99_ms": round(percentile(lag_ms, 99), 2),
+            "loop_lag_max_ms": round(lag_ms[-1], 2),
+        }
+
+    async def _main():
+        async with client:
+            result = {"checks": await checks(), "modes": {}}
+            for mode in [m for m in args.modes.split(",") if m]:
+                result["modes"][mode] = await measure(mode)
+            passwords.shutdown()
+            return result
+
+    result = asyncio.run(_main())
+    print(json.dumps({"cpus": default_workers(), "schemes": passwords.SCHEMES, **result}, ensure_ascii=False, indent=2))
+    if not all(r["ok"] for r in result["checks"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
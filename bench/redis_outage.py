@@ -0,0 +1,95 @@
+"""
+author:
+Description: Redis 장애 중에도 API가 응답하는지 확인하는 벤치마크 (정상 -> 장애 -> 복구 구간별 측정)
+Fixed:
+Usage:
+    python -m bench.redis_outage --phase-seconds 5
+    python -m bench.redis_outage --mode refused          # 연결 거부 (즉시 실패)
+    python -m bench.redis_outage --no-breaker            # 비교용: 서킷 브레이커 없이 매번 타임아웃까지 대기
+
+    blackhole 모드는 Redis 명령이 REDIS_TIMEOUT 만큼 멈췄다가 TimeoutError 가 나는 상황을 흉내낸다.
+    구간마다 오류 수, p50/p95, 서킷 상태, 캐시 카운터를 JSON으로 출력하고
+    장애 구간에 오류 응답이 하나라도 있으면 종료코드 1.
+"""
+
+import argparse, asyncio, json, tempfile
+
+
+class FlakyRedis:
+    """down 이면 모든 명령이 실패하는 Redis 대역"""
+
+    def __init__(self, client, mode, timeout):
+        self._client = client
+        self.mode = mode
+        self.timeout = timeout
+        self.down = False
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name in ("pubsub", "pipeline", "scan_iter", "close", "aclose"):
+            return attr
+
+        async def call(*args, **kwargs):
+            if self.down:
+                import redis.exceptions
+                if self.mode == "blackhole":
+                    await asyncio.sleep(self.timeout)
+                    raise redis.exceptions.TimeoutError("Timeout reading from socket")
+                raise redis.exceptions.ConnectionError("Connection refused")
+            return await attr(*args, **kwargs)
+        return call
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Redis 장애 벤치마크")
+    parser.add_argument("--phase-seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mode", choices=["blackhole", "refused"], default="blackhole")
+    parser.add_argument("--no-breaker", action="store_true")
+    parser.add_argument("--reset-seconds", type=float, default=1.0, help="서킷 open -> half_open 대기 (REDIS_BREAKER_RESET)")
+    parser.add_argument("--clinics", type=int, default=50)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from bench import loadtest
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-redis-outage-"), args.seed,
+                                              args.clinics, args.users)
+    import hosts, metrics
+
+    flaky = FlakyRedis(data["redis"]._client, args.mode, hosts.REDIS_TIMEOUT)
+    guarded = hosts.GuardedRedis(flaky)
+
+    async def get_redis_connection():
+        return guarded
+
+    hosts.get_redis_connection = get_redis_connection
+    hosts.redis_breaker.reset_timeout = args.reset_seconds
+    if args.no_breaker:
+        hosts.redis_breaker.failure_threshold = float("inf")
+
+    async def phase(name, down):
+        flaky.down = down
+        before = dict(metrics.snapshot()["counters"])
+        (routes, total), _ = await loadtest.run(client, data, args.concurrency, args.phase_seconds, 0, args.seed)
+        after = metrics.snapshot()
+        return {
+            "phase": name,
+            "total": total,
+            "errors_by_route": {k: v["errors"] for k, v in routes.items() if v["errors"]},
+            "redis": after["redis"],
+            "cache": {k: v - before.get(k, 0) for k, v in after["counters"].items() if k.startswith("cache.")},
+        }
+
+    async def _main():
+        async with client:
+            return [await phase("healthy", False), await phase("outage", True), await phase("recovered", False)]
+
+    results = asyncio.run(_main())
+    print(json.dumps({"mode": args.mode, "breaker": not args.no_breaker, "phases": results}, ensure_ascii=False, indent=2))
+    if results[1]["total"]["errors"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
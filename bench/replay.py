@@ -0,0 +1,125 @@
+"""
+author:
+Description: capture 미들웨어로 기록한 운영 요청을 테스트 서버에 재생하고 라우트별 지연시간 차이를 보고
+Fixed:
+Usage:
+    python -m bench.replay capture/requests.log --target http://localhost:8000 --speed 4
+    --speed 1 은 원래 요청 간격 그대로, N 은 N배 빠르게, 0 은 간격 무시(--concurrency 만큼 동시 실행)
+    기본으로 GET 요청만 재생한다 (쓰기 요청은 --include-writes).
+    recorded는 서버 안에서 잰 처리시간, replayed는 클라이언트 왕복시간이라 네트워크 비용만큼 차이가 난다.
+"""
+
+import argparse, asyncio, glob, json, os, time
+
+from bench.loadtest import percentile
+
+
+def log_files(path):
+    """회전된 파일(.N이 클수록 오래됨)까지 시간순으로 나열"""
+    backups = sorted(
+        (p for p in glob.glob(f"{glob.escape(path)}.*") if p.rsplit(".", 1)[-1].isdigit()),
+        key=lambda p: int(p.rsplit(".", 1)[-1]),
+        reverse=True,
+    )
+    return backups + ([path] if os.path.exists(path) else [])
+
+
+def load(paths, include_writes=False, limit=0):
+    lines = []
+    for path in paths:
+        for name in log_files(path):
+            with open(name, encoding="utf-8") as f:
+                for raw in f:
+                    try:
+                        line = json.loads(raw)
+                    except ValueError:
+                        continue
+                    if not include_writes and line["m"] != "GET":
+                        continue
+                    lines.append(line)
+    lines.sort(key=lambda l: l["t"])
+    return lines[:limit] if limit else lines
+
+
+async def replay(lines, target, speed=1.0, concurrency=32, timeout=30):
+    import httpx
+
+    results = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=target, timeout=timeout) as client:
+        async def issue(line):
+            async with semaphore:
+                url = line["p"] + (f"?{line['q']}" if line["q"] else "")
+                start = time.perf_counter()
+                try:
+                    resp = await client.request(line["m"], url)
+                    status = resp.status_code
+                except Exception:
+                    status = 0
+                results.append((line, (time.perf_counter() - start) * 1000, status))
+
+        tasks = []
+        t0 = lines[0]["t"] if lines else 0
+        started = time.perf_counter()
+        for line in lines:
+            if speed:
+                delay = (line["t"] - t0) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(issue(line)))
+        await asyncio.gather(*tasks)
+    return results
+
+
+def report(results):
+    routes = {}
+    for line, latency, status in results:
+        r = routes.setdefault(f"{line['m']} {line['r']}", {"recorded": [], "replayed": [], "errors": 0, "status_mismatch": 0})
+        r["recorded"].append(line["d"])
+        r["replayed"].append(latency)
+        r["errors"] += status == 0 or status >= 500
+        r["status_mismatch"] += status != line["s"]
+
+    out = {}
+    for name, r in sorted(routes.items()):
+        rec, rep = sorted(r["recorded"]), sorted(r["replayed"])
+        row = {"count": len(rep), "errors": r["errors"], "status_mismatch": r["status_mismatch"]}
+        for p in (50, 95, 99):
+            before, after = percentile(rec, p), percentile(rep, p)
+            row[f"recorded_p{p}_ms"] = round(before, 3)
+            row[f"replayed_p{p}_ms"] = round(after, 3)
+            row[f"delta_p{p}_pct"] = round((after - before) / before * 100, 1) if before else None
+        out[name] = row
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="운영 요청 재생")
+    parser.add_argument("logs", nargs="+", help="capture 로그 파일 (회전 파일은 자동 포함)")
+    parser.add_argument("--target", required=True)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--include-writes", action="store_true")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--out", default="")
+    args = parser.parse_args(argv)
+
+    lines = load(args.logs, include_writes=args.include_writes, limit=args.limit)
+    if not lines:
+        parser.error("no requests to replay")
+    results = asyncio.run(replay(lines, args.target, speed=args.speed, concurrency=args.concurrency))
+    result = {
+        "meta": {"target": args.target, "speed": args.speed, "requests": len(results),
+                 "span_s": round(lines[-1]["t"] - lines[0]["t"], 3)},
+        "routes": report(results),
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+author:
+Description: 읽기 복제본 라우팅 검사 (GET -> 복제본, 쓰기/최근 쓰기 사용자/복제 지연 -> primary)
+Fixed:
+Usage:
+    python -m bench.replica_routing              # SQLite 파일 두 개를 primary / replica 로 사용
+    VET_DB=127.0.0.1 VET_PORT=3306 VET_DB_REPLICAS=127.0.0.1:3307 ... python -m bench.replica_routing --live
+
+    요청마다 hosts 가 연 DB 연결을 기록해 기대한 쪽으로 갔는지 확인하고, 어긋나면 종료코드 1.
+    기본 모드의 replica 는 시드 직후 primary 를 복사한 파일이라 이후 쓰기가 보이지 않는다.
+    그래서 '방금 쓴 예약이 보이는가'(read-your-writes), 무효화 직후 공유 캐시를 primary 에서 다시 채우는지,
+    복제 지연 시 primary 전환까지 확인한다.
+    --live 는 로컬 MySQL 두 대(복제 구성, python -m bench.standins 로 시드)를 대상으로
+    라우팅만 확인한다 (지연은 실제 SHOW REPLICA STATUS 값 사용).
+"""
+
+import argparse, asyncio, os, shutil, sys, tempfile, time
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="읽기 복제본 라우팅 검사")
+    parser.add_argument("--live", action="store_true", help="환경변수의 실제 MySQL primary/replica 사용")
+    parser.add_argument("--sticky-seconds", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    from bench import standins
+    workdir = tempfile.mkdtemp(prefix="vet-replica-")
+    if not args.live:
+        os.environ["VET_DB"] = "primary"
+        os.environ["VET_DB_REPLICAS"] = "replica"
+    standins.prepare_env(workdir)
+    import hosts
+    real_connect, real_open = hosts.connect, hosts._open
+
+    if args.live:
+        data = standins.seed_plan()
+        data.update(standins.install_services())
+    else:
+        data = standins.install(workdir, clinics=20, users=50)
+        replica_path = os.path.join(workdir, "replica.sqlite3")
+        shutil.copy(data["db_path"], replica_path)
+        paths = {"primary": data["db_path"], "replica": replica_path}
+        lag = {"value": 0, "down": False}
+
+        class ReplicaSQLite(standins.SQLiteConnection):
+            # 복제본 서버가 내려가면 풀에 남아 있던 연결도 ping/쿼리가 실패한다
+            def ping(self, reconnect=False):
+                if lag["down"]:
+                    raise ConnectionError("replica down")
+                return True
+
+            def cursor(self, cursor_class=None):
+                if lag["down"]:
+                    raise ConnectionError("replica down")
+                return super().cursor(cursor_class)
+
+        def fake_open(host, port):
+            if host == "replica" and lag["down"]:
+                raise ConnectionError("replica down")
+            return (ReplicaSQLite if host == "replica" else standins.SQLiteConnection)(paths[host])
+
+        real_open = fake_open
+        hosts.replica_lag = lambda conn: lag["value"]
+        hosts.VET_DB_LAG_CHECK_INTERVAL = 0
+
+    opened = []
+
+    def tagged_open(host, port):
+        conn = real_open(host, port)
+        conn.served_by = "primary" if host == hosts.VET_DB and str(port) == str(hosts.VET_PORT) else "replica"
+        return conn
+
+    def recording_connect(*args, **kwargs):
+        # 지연 확인용 연결은 빼고 핸들러가 실제로 받은 연결만 기록
+        conn = real_connect(*args, **kwargs)
+        opened.append(conn.served_by)
+        return conn
+
+    hosts.connect, hosts._open = recording_connect, tagged_open
+
+    import cache, dbroute, httpx
+    from main import app
+    dbroute.STICKY_SECONDS = args.sticky_seconds
+    redis = data["redis"]
+    failures = []
+
+    async def check(client, name, method, url, expect, params=None, verify=None):
+        opened.clear()
+        resp = await client.request(method, url, params=params)
+        served = sorted(set(opened))
+        ok = served == [expect] and resp.status_code < 400 and (verify is None or verify(resp))
+        print(f"[{'ok' if ok else 'FAIL'}] {name}: {method} {url} -> {resp.status_code}, db={served}")
+        if not ok:
+            failures.append(name)
+        return resp
+
+    async def drive():
+        transport = httpx.ASGITransport(app=app)
+        uid_a, uid_b, uid_c = data["user_ids"][:3]
+        slot = "2030-01-02 10:00"
+        booked = lambda resp: any(row[4] == slot for row in resp.json()["results"])
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://replica") as client:
+            await check(client, "GET -> replica", "GET", "/clinic/", "replica")
+            resp = await check(client, "write -> primary", "POST", f"/reservation/{uid_a}", "primary", params={
+                "clinic_id": data["clinic_ids"][0], "time": slot, "symptoms": "검사", "pet_id": data["pet_ids"][uid_a][0],
+            })
+            if "vet_rw" not in resp.headers.get("set-cookie", ""):
+                print("[FAIL] sticky cookie missing")
+                failures.append("cookie")
+            await check(client, "cookie sticky -> primary", "GET", "/pet/", "primary", params={"user_id": uid_b})
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://replica") as client:
+            await check(client, "own write visible (redis sticky)", "GET", f"/reservation/user/{uid_a}", "primary",
+                        verify=None if args.live else booked)
+            await check(client, "other user -> replica", "GET", f"/reservation/user/{uid_b}", "replica")
+            # 예약으로 지운 공유 캐시를 바로 다시 채울 때는 primary 에서 (복제본에는 아직 예약이 없다)
+            await check(client, "refill after invalidation -> primary", "GET", "/available/available_clinic", "primary",
+                        params={"time": slot}, verify=None if args.live else (
+                            lambda resp: data["clinic_ids"][0] not in [row[0] for row in resp.json()["results"]]))
+
+            await asyncio.sleep(max(args.sticky_seconds, cache._recent_seconds()) + 0.2)
+            await redis.delete(f'select_reservation:{{"user_id": "{uid_a}"}}')
+            await check(client, "sticky expired -> replica", "GET", f"/reservation/user/{uid_a}", "replica",
+                        verify=None if args.live else (lambda resp: not booked(resp)))
+
+            if not args.live:
+                lag["value"] = 10
+                await check(client, "lagging replica -> primary", "GET", "/pet/", "primary", params={"user_id": uid_c})
+                lag["value"], lag["down"] = 0, True
+                await check(client, "replica down -> primary", "GET", f"/mypage/{uid_c}", "primary")
+                lag["down"] = False
+                await check(client, "replica recovered", "GET", f"/reservation/user/{uid_c}", "replica")
+
+    started = time.perf_counter()
+    asyncio.run(drive())
+    print(f"{len(failures)} failures ({time.perf_counter() - started:.2f}s)")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+author:
+Description: 워커 수에 따른 처리량 확장 측정 (serve.py 로 1 -> N 워커)
+Fixed:
+Usage:
+    python -m bench.scaling --workers 1,2,4 --duration 10
+    python -m bench.scaling --workers 1,4 --preload --routes clinic_detail,can_reservation
+
+    로컬 대역(SQLite, 워커별 fakeredis, 메모리 S3)으로 DB를 한 번 시드하고
+    워커 수마다 serve.py 를 실제 프로세스로 띄운 뒤 --generators 개 프로세스에서 HTTP 부하를 건다.
+    워커 수별 req/s, 1 워커 대비 배율과 효율(배율 / 워커 수), 응답한 워커 pid 수를 JSON으로 출력한다.
+    부하 생성기도 CPU 를 쓰므로 코어 수가 워커 수 + 생성기 수보다 많아야 확장이 제대로 보인다.
+"""
+
+import argparse, asyncio, json, os, socket, subprocess, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench import standins
+from serve import default_workers
+
+# 여러 워커가 같은 SQLite 파일에 쓰면 잠금 대기가 처리량을 좌우하므로 기본은 조회 라우트만
+READ_ROUTES = "clinic_list,clinic_search,clinic_detail,available_clinic,can_reservation,pets,favorites,species_types"
+
+
+def __getattr__(name):
+    # serve.py --app bench.scaling:app 로 워커가 import 할 때만 대역을 붙이고 앱을 만든다
+    if name == "app":
+        standins.attach(os.environ["VET_BENCH_WORKDIR"])
+        from main import app
+        return app
+    raise AttributeError(name)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _generate(target, seed, clinics, users, concurrency, duration, routes):
+    import httpx
+    from bench import loadtest
+    data = standins.seed_plan(seed, clinics=clinics, users=users)
+
+    async def _main():
+        async with httpx.AsyncClient(base_url=target, timeout=30) as client:
+            return await loadtest.run(client, data, concurrency, duration, 0, seed, routes)
+
+    (_, total), elapsed = asyncio.run(_main())
+    return total, elapsed
+
+
+def _wait_ready(target, timeout=60):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{target}/health/ready", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"server at {target} did not become ready")
+
+
+def _workers_seen(target, probes):
+    import httpx
+    pids = set()
+    # 연결을 재사용하면 같은 워커만 응답하므로 매번 새 연결로
+    for _ in range(probes):
+        pids.add(httpx.get(f"{target}/metrics/", headers={"Connection": "close"}, timeout=5).json()["process"]["pid"])
+    return len(pids)
+
+
+def measure(workers, args, workdir, pool):
+    port = _free_port()
+    target = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, VET_BENCH_WORKDIR=workdir, VET_WARMUP="0",
+               PYTHONPATH=os.pathsep.join(p for p in (standins.REPO_ROOT, os.getenv("PYTHONPATH")) if p))
+    cmd = [sys.executable, os.path.join(standins.REPO_ROOT, "serve.py"), "--app", "bench.scaling:app",
+           "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    if args.preload:
+        cmd.append("--preload")
+    server = subprocess.Popen(cmd, env=env, cwd=workdir, stdout=subprocess.DEVNULL)
+    try:
+        _wait_ready(target)
+        def run(duration):
+            jobs = [(target, args.seed + i, args.clinics, args.users, args.concurrency, duration, args.routes)
+                    for i in range(args.generators)]
+            return list(pool.map(_generate, *zip(*jobs)))
+
+        if args.warmup:
+            run(args.warmup)
+        results = run(args.duration)
+        count = sum(total["count"] for total, _ in results)
+        elapsed = max(elapsed for _, elapsed in results)
+        return {
+            "workers": workers,
+            "rps": round(count / elapsed, 1),
+            "errors": sum(total["errors"] for total, _ in results),
+            "p50_ms": max(total["p50_ms"] for total, _ in results),
+            "p99_ms": max(total["p99_ms"] for total, _ in results),
+            "workers_seen": _workers_seen(target, workers * 8),
+        }
+    finally:
+        server.terminate()
+        server.wait(60)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="워커 수별 처리량 확장 측정")
+    parser.add_argument("--workers", default="1,2,4", help="쉼표로 구분한 워커 수")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--generators", type=int, default=2, help="부하 생성 프로세스 수")
+    parser.add_argument("--concurrency", type=int, default=32, help="생성기 하나의 동시 요청 수")
+    parser.add_argument("--routes", default=READ_ROUTES)
+    parser.add_argument("--preload", action="store_true", help="serve.py --preload (fork) 로 측정")
+    parser.add_argument("--clinics", type=int, default=200)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    args.routes = [r for r in args.routes.split(",") if r]
+
+    workdir = tempfile.mkdtemp(prefix="vet-scaling-")
+    # 시드만 여기서 하고 각 워커는 attach() 로 같은 파일을 쓴다
+    standins.install(workdir, rng_seed=args.seed, clinics=args.clinics, users=args.users)
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=args.generators) as pool:
+        for workers in [int(w) for w in args.workers.split(",") if w]:
+            rows.append(measure(workers, args, workdir, pool))
+    base = rows[0]["rps"] / rows[0]["workers"]
+    for row in rows:
+        row["speedup"] = round(row["rps"] / rows[0]["rps"], 2)
+        row["efficiency"] = round(row["rps"] / (base * row["workers"]), 2)
+
+    print(json.dumps({
+        "cpus": default_workers(),
+        "generators": args.generators,
+        "concurrency": args.concurrency,
+        "preload": args.preload,
+        "results": rows,
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+author:
+Description: 예약 가능 병원 조회를 available_time 테이블 vs 진료 규칙(schedule.py)으로 비교하는 벤치마크
+Fixed:
+Usage:
+    python -m bench.schedule_rules --clinics 500 --days 3 --samples 300
+    python -m bench.schedule_rules --horizon-days 90     # 테이블 방식이 90일치를 미리 만들 때의 행 수 추정
+
+    같은 시드 데이터에서 두 방식의 저장 행 수/바이트와 조회 지연(p50/p95)을 측정하고,
+    샘플 시각마다 두 방식의 결과가 같은지 확인한다 (다르면 종료코드 1).
+    자정을 넘기는 규칙(22:00~06:00)과 24시간 규칙(00:00~00:00)의 is_open/open_clinics/expand,
+    다른 워커가 규칙 버전을 올리면 이 워커도 규칙을 다시 읽는지도 확인한다.
+    Redis 캐시를 거치지 않고 available_time._fetch_available_clinic 를 직접 호출한다.
+"""
+
+import argparse, asyncio, json, random, sqlite3, tempfile, time
+
+from bench.loadtest import percentile
+
+
+def table_size(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        try:
+            # 테이블 + 인덱스 페이지 합계 (dbstat 이 없는 sqlite 빌드면 생략)
+            size = conn.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name = ? OR name IN "
+                "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?)",
+                (table, table),
+            ).fetchone()[0]
+        except sqlite3.OperationalError:
+            size = None
+        return {"rows": rows, "bytes": size}
+    finally:
+        conn.close()
+
+
+def rule_checks(schedule):
+    """자정을 넘기는 규칙과 24시간 규칙. {이름: {got, want, ok}}"""
+    from datetime import datetime, time as dtime
+    # 2030-01-07 은 월요일 (weekday 0)
+    book = schedule.RuleBook([
+        schedule.Rule("night", 0, dtime(22, 0), dtime(6, 0), 30),
+        schedule.Rule("allday", 0, dtime(0, 0), dtime(0, 0), 60),
+        schedule.Rule("day", 0, dtime(9, 0), dtime(18, 0), 30),
+    ], [schedule.Closure(1, "night", datetime(2030, 1, 8, 5), datetime(2030, 1, 8, 6), "bench")])
+    at = lambda day, hour, minute=0: datetime(2030, 1, day, hour, minute)
+    results = {
+        "overnight_evening": (sorted(book.open_clinics(at(7, 23))), ["allday", "night"]),
+        "overnight_after_midnight": (sorted(book.open_clinics(at(8, 2))), ["night"]),
+        "overnight_closure": (book.is_open("night", at(8, 5)), False),
+        "overnight_ends": ((book.is_open("night", at(8, 5, 30)), book.is_open("night", at(8, 6))), (False, False)),
+        "overnight_not_before_open": (book.is_open("night", at(7, 2)), False),
+        "allday_midnight": ((book.is_open("allday", at(7, 0)), book.is_open("allday", at(7, 23))), (True, True)),
+        "allday_next_day_closed": (book.is_open("allday", at(8, 0)), False),
+        "day_unchanged": ((book.is_open("day", at(7, 17, 30)), book.is_open("day", at(7, 18))), (True, False)),
+        "expand_overnight": (
+            [slot.strftime("%d %H:%M") for slot in book.expand("night", at(7, 0), at(9, 0))],
+            ["07 22:00", "07 22:30", "07 23:00", "07 23:30"] + [f"08 {h:02d}:{m:02d}" for h in range(5) for m in (0, 30)],
+        ),
+        "expand_allday": (len(list(book.expand("allday", at(6, 0), at(9, 0)))), 24),
+    }
+    return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="진료 규칙 vs available_time 비교")
+    parser.add_argument("--clinics", type=int, default=500)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=3, help="시드할 available_time 일 수")
+    parser.add_argument("--horizon-days", type=int, default=90, help="테이블 방식 행 수 추정 기간")
+    parser.add_argument("--samples", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from bench import standins
+    data = standins.install(tempfile.mkdtemp(prefix="vet-rules-"), rng_seed=args.seed,
+                            clinics=args.clinics, users=args.users, days=args.days)
+    import available_time, schedule
+
+    rng = random.Random(args.seed)
+    samples = [rng.choice(data["times"]) for _ in range(args.samples)]
+
+    async def measure(source):
+        available_time.AVAILABILITY_SOURCE = source
+        schedule.invalidate_rule_book()
+        await available_time._fetch_available_clinic(samples[0])
+        latencies, results = [], {}
+        for t in samples:
+            start = time.perf_counter()
+            rows = await available_time._fetch_available_clinic(t)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results[t] = sorted(tuple(row) for row in rows)
+        latencies.sort()
+        return {
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+        }, results
+
+    async def version_checks():
+        """다른 워커가 규칙을 바꾸면(Redis 버전만 올라감) 이 워커도 규칙을 다시 읽고 캐시 키가 바뀌는지"""
+        import hosts
+        from datetime import datetime
+        clinic_id = data["clinic_ids"][0]
+        slot = datetime(2030, 1, 7, 10)
+        book = await schedule.get_rule_book()
+        key = await schedule.availability_key("available_clinic", {"time": "2030-01-07 10:00"})
+        conn = hosts.connect()
+        try:
+            conn.cursor().execute("INSERT INTO clinic_closure (clinic_id, start_at, end_at, reason) VALUES (%s, %s, %s, %s)",
+                                  (clinic_id, slot, datetime(2030, 1, 8), "bench"))
+            conn.commit()
+        finally:
+            conn.close()
+        same_worker = await schedule.get_rule_book()
+        await data["redis"].incr(schedule.RULES_VERSION_KEY)  # 다른 워커의 rules_changed()
+        reloaded = await schedule.get_rule_book()
+        results = {
+            "open_before": (book.is_open(clinic_id, slot), True),
+            "cached_until_version_bump": (same_worker is book, True),
+            "reloaded_after_bump": ((reloaded is book, reloaded.is_open(clinic_id, slot)), (False, False)),
+            "cache_key_changes": (key != await schedule.availability_key("available_clinic", {"time": "2030-01-07 10:00"}), True),
+        }
+        return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+    async def _main():
+        return await measure("table"), await measure("rules"), await version_checks()
+
+    (table_stats, table_results), (rules_stats, rules_results), checks = asyncio.run(_main())
+    mismatches = [t for t in table_results if table_results[t] != rules_results[t]]
+
+    slots_per_day = len(data["times"]) // args.days
+    report = {
+        "clinics": args.clinics,
+        "storage": {
+            "available_time": table_size(data["db_path"], "available_time"),
+            "available_time_estimate_rows": args.clinics * slots_per_day * args.horizon_days,
+            "clinic_schedule_rule": table_size(data["db_path"], "clinic_schedule_rule"),
+        },
+        "latency": {"table": table_stats, "rules": rules_stats},
+        "mismatches": mismatches[:10],
+        "rule_checks": {**rule_checks(schedule), **checks},
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if mismatches or not all(r["ok"] for r in report["rule_checks"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+-- 로컬 MySQL 검증용 기본 스키마 (마이그레이션 적용 전 상태)
+-- 빈 DB에 이 파일을 적용한 뒤 python migrate.py 로 migrations/ 를 올린다.
+
+CREATE TABLE IF NOT EXISTS clinic (
+    id VARCHAR(50) PRIMARY KEY,
+    name VARCHAR(100),
+    password VARCHAR(100),
+    latitude DOUBLE,
+    longitude DOUBLE,
+    start_time VARCHAR(20),
+    end_time VARCHAR(20),
+    introduction TEXT,
+    address VARCHAR(200),
+    phone VARCHAR(30),
+    image VARCHAR(200)
+) DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS user (
+    id VARCHAR(100) PRIMARY KEY,
+    password VARCHAR(100),
+    image VARCHAR(200),
+    name VARCHAR(50),
+    phone VARCHAR(30)
+) DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS pet (
+    id VARCHAR(50) PRIMARY KEY,
+    user_id VARCHAR(100),
+    species_type VARCHAR(50),
+    species_category VARCHAR(50),
+    name VARCHAR(50),
+    birthday VARCHAR(20),
+    features TEXT,
+    gender VARCHAR(10),
+    image VARCHAR(200)
+) DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS favorite (
+    user_id VARCHAR(100),
+    clinic_id VARCHAR(50),
+    name VARCHAR(100),
+    password VARCHAR(100),
+    latitude DOUBLE,
+    longitude DOUBLE,
+    start_time VARCHAR(20),
+    end_time VARCHAR(20),
+    introduction TEXT,
+    address VARCHAR(200),
+    phone VARCHAR(30),
+    image VARCHAR(200)
+) DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS reservation (
+    user_id VARCHAR(100),
+    clinic_id VARCHAR(50),
+    time VARCHAR(20),
+    symptoms TEXT,
+    pet_id VARCHAR(50)
+) DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS available_time (
+    clinic_id VARCHAR(50),
+    time VARCHAR(20)
+) DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS species (
+    type VARCHAR(50),
+    category VARCHAR(50)
+) DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS image (
+    id VARCHAR(50) PRIMARY KEY
+) DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,113 @@
+-- 벤치마크용 SQLite 스키마 (운영 MySQL 테이블의 컬럼 순서를 그대로 따름)
+
+CREATE TABLE IF NOT EXISTS clinic (
+    id VARCHAR(50) PRIMARY KEY,
+    name VARCHAR(100),
+    password VARCHAR(100),
+    latitude DOUBLE,
+    longitude DOUBLE,
+    start_time VARCHAR(20),
+    end_time VARCHAR(20),
+    introduction TEXT,
+    address VARCHAR(200),
+    phone VARCHAR(30),
+    image VARCHAR(200)
+);
+
+CREATE TABLE IF NOT EXISTS user (
+    id VARCHAR(100) PRIMARY KEY,
+    password VARCHAR(100),
+    image VARCHAR(200),
+    name VARCHAR(50),
+    phone VARCHAR(30)
+);
+
+CREATE TABLE IF NOT EXISTS pet (
+    id VARCHAR(50) PRIMARY KEY,
+    user_id VARCHAR(100),
+    species_type VARCHAR(50),
+    species_category VARCHAR(50),
+    name VARCHAR(50),
+    birthday VARCHAR(20),
+    features TEXT,
+    gender VARCHAR(10),
+    image VARCHAR(200)
+);
+
+-- migrations/0007_favorite_normalize.sql (병원 정보를 복사하지 않고 (user_id, clinic_id) 만)
+CREATE TABLE IF NOT EXISTS favorite (
+    user_id VARCHAR(100) NOT NULL,
+    clinic_id VARCHAR(50) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, clinic_id)
+);
+CREATE INDEX IF NOT EXISTS idx_favorite_clinic ON favorite (clinic_id);
+
+CREATE TABLE IF NOT EXISTS reservation (
+    user_id VARCHAR(100),
+    clinic_id VARCHAR(50),
+    time DATETIME,
+    symptoms TEXT,
+    pet_id VARCHAR(50)
+);
+
+-- migrations/0001_reservation_slot_unique.sql
+CREATE UNIQUE INDEX IF NOT EXISTS uq_reservation_slot ON reservation (clinic_id, time);
+
+CREATE TABLE IF NOT EXISTS available_time (
+    clinic_id VARCHAR(50),
+    time DATETIME
+);
+
+CREATE TABLE IF NOT EXISTS species (
+    type VARCHAR(50),
+    category VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS image (
+    id VARCHAR(50) PRIMARY KEY
+);
+
+-- migrations/0003_hot_lookup_indexes.sql
+CREATE INDEX IF NOT EXISTS idx_pet_user ON pet (user_id);
+CREATE INDEX IF NOT EXISTS idx_favorite_user_clinic ON favorite (user_id, clinic_id);
+CREATE INDEX IF NOT EXISTS idx_reservation_user ON reservation (user_id);
+CREATE INDEX IF NOT EXISTS idx_available_time_slot ON available_time (time, clinic_id);
+CREATE INDEX IF NOT EXISTS idx_species_type ON species (type, category);
+CREATE INDEX IF NOT EXISTS idx_clinic_name ON clinic (name);
+
+-- migrations/0004_clinic_schedule_rules.sql (open_time/close_time 은 'HH:MM' 문자열로 보관)
+CREATE TABLE IF NOT EXISTS clinic_schedule_rule (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    clinic_id VARCHAR(50) NOT NULL,
+    weekday INTEGER NOT NULL,
+    open_time VARCHAR(8) NOT NULL,
+    close_time VARCHAR(8) NOT NULL,
+    slot_minutes INTEGER NOT NULL DEFAULT 30
+);
+CREATE INDEX IF NOT EXISTS idx_schedule_rule_weekday ON clinic_schedule_rule (weekday, clinic_id);
+CREATE INDEX IF NOT EXISTS idx_schedule_rule_clinic ON clinic_schedule_rule (clinic_id);
+
+CREATE TABLE IF NOT EXISTS clinic_closure (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    clinic_id VARCHAR(50) NOT NULL,
+    start_at DATETIME NOT NULL,
+    end_at DATETIME NOT NULL,
+    reason VARCHAR(200)
+);
+CREATE INDEX IF NOT EXISTS idx_closure_clinic ON clinic_closure (clinic_id, start_at);
+CREATE INDEX IF NOT EXISTS idx_closure_end ON clinic_closure (end_at);
+
+-- migrations/0006_clinic_changelog.sql (기존 병원 기록은 standins.seed 에서 채운다)
+CREATE TABLE IF NOT EXISTS clinic_version (
+    id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO clinic_version (id, version) VALUES (1, 0);
+
+CREATE TABLE IF NOT EXISTS clinic_changelog (
+    version INTEGER PRIMARY KEY,
+    clinic_id VARCHAR(50) NOT NULL,
+    changed_at DATETIME NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_clinic_changelog_clinic ON clinic_changelog (clinic_id, version);
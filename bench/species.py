@@ -0,0 +1,117 @@
+"""
+author:
+Description: 동물 종류 스냅샷 확인 (조회가 DB/Redis 에 가지 않는지, 버전이 바뀌면 다시 읽는지)과 조회 지연 측정
+Fixed:
+Usage:
+    python -m bench.species --requests 2000
+
+    1) 확인 (실제 앱, 로컬 대역): 종류/세부 종류 응답, 조회 중 DB 연결/Redis 호출 0 회, 추가/삭제가 바로 보임,
+       다른 워커가 바꾼 경우(DB 변경 + 버전 증가) refresh() 에서 다시 읽음, 버전이 같으면 다시 읽지 않음,
+       Redis 장애 중에도 조회 가능. 틀리면 종료코드 1.
+    2) 측정: /species/pet_categories --requests 번의 p50/p99 와 스냅샷을 DB 에서 한 번 읽는 시간.
+"""
+
+import argparse, asyncio, json, sqlite3, tempfile, time
+
+from bench.loadtest import percentile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="동물 종류 스냅샷 확인")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from bench import loadtest, standins
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-species-"), args.seed, 5, 5)
+    import hosts, metrics, species
+
+    calls = {"db": 0, "redis": 0}
+    real_connect, real_redis = hosts.connect, hosts.get_redis_connection
+
+    def counting_connect():
+        calls["db"] += 1
+        return real_connect()
+
+    async def counting_redis():
+        calls["redis"] += 1
+        return await real_redis()
+
+    hosts.connect, hosts.get_redis_connection = counting_connect, counting_redis
+
+    def other_worker_insert(species_type, category):
+        conn = sqlite3.connect(data["db_path"])
+        conn.execute("INSERT INTO species (type, category) VALUES (?, ?)", (species_type, category))
+        conn.commit()
+        conn.close()
+
+    async def checks():
+        results = {}
+        results["types"] = (sorted((await client.get("/species/types")).json()), sorted(standins.SPECIES))
+        results["categories"] = (len((await client.get("/species/categories")).json()),
+                                 sum(len(c) for c in standins.SPECIES.values()))
+        results["dog_categories"] = ((await client.get("/species/pet_categories", params={"type": "강아지"})).json(),
+                                     list(standins.SPECIES["강아지"]))
+        results["unknown_type"] = ((await client.get("/species/pet_categories", params={"type": "공룡"})).status_code, 404)
+
+        calls.update(db=0, redis=0)
+        for _ in range(20):
+            await client.get("/species/types")
+            await client.get("/species/categories")
+            await client.get("/species/pet_categories", params={"type": "강아지"})
+        results["reads_touch_db"] = (calls["db"], 0)
+        results["reads_touch_redis"] = (calls["redis"], 0)
+
+        version = species._taxonomy.version
+        await client.post("/species/", params={"species_category": "벤치견", "id": "admin"})
+        results["add_visible"] = ("벤치견" in (await client.get("/species/pet_categories", params={"type": "강아지"})).json(), True)
+        results["add_bumps_version"] = (species._taxonomy.version, version + 1)
+        results["delete"] = ((await client.delete("/species/", params={
+            "species_type": "강아지", "species_category": "벤치견", "id": "admin"})).status_code, 200)
+        results["delete_visible"] = ("벤치견" in (await client.get("/species/pet_categories", params={"type": "강아지"})).json(), False)
+        results["delete_missing"] = ((await client.delete("/species/", params={
+            "species_type": "강아지", "species_category": "벤치견", "id": "admin"})).status_code, 404)
+
+        # 다른 워커가 바꿨다: DB 만 바뀌고 이 워커의 스냅샷은 그대로
+        other_worker_insert("앵무새", "코뉴어")
+        results["stale_until_version"] = ((await client.get("/species/pet_categories", params={"type": "앵무새"})).status_code, 404)
+        before = metrics.snapshot()["counters"].get("species.reload", 0)
+        await species.refresh()
+        results["same_version_no_reload"] = (metrics.snapshot()["counters"].get("species.reload", 0) - before, 0)
+        await data["redis"].incr(species.VERSION_KEY)
+        await species.refresh()
+        results["version_bump_reloads"] = ((await client.get("/species/pet_categories", params={"type": "앵무새"})).json(), ["코뉴어"])
+
+        hosts.redis_breaker.state, hosts.redis_breaker.opened_at = "open", time.monotonic()
+        await species.refresh()
+        results["redis_outage_reads"] = ((await client.get("/species/types")).status_code, 200)
+        hosts.redis_breaker.reset()
+        return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+    async def measure():
+        elapsed_ms = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            await client.get("/species/pet_categories", params={"type": "강아지"})
+            elapsed_ms.append((time.perf_counter() - started) * 1000)
+        elapsed_ms.sort()
+        started = time.perf_counter()
+        species.load_taxonomy()
+        return {
+            "pet_categories_p50_ms": round(percentile(elapsed_ms, 50), 3),
+            "pet_categories_p99_ms": round(percentile(elapsed_ms, 99), 3),
+            "snapshot_load_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    async def _main():
+        async with client:
+            return {"checks": await checks(), "reads": await measure(), "species": species._snapshot()}
+
+    result = asyncio.run(_main())
+    print(json.dumps({"settings": vars(args), **result}, ensure_ascii=False, indent=2))
+    if not all(r["ok"] for r in result["checks"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
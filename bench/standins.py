@@ -0,0 +1,458 @@
+"""
+author:
+Description: 벤치마크용 로컬 대역 (SQLite DB, fakeredis, 메모리 S3, 임시 Firebase 키)
+Fixed:
+Usage:
+    from bench import standins
+    env = standins.install(workdir)   # hosts import 전에 호출
+"""
+
+import io, json, os, random, re, sqlite3, sys
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema_sqlite.sql")
+
+SPECIES = {
+    "강아지": ["말티즈", "푸들", "포메라니안", "시츄", "진돗개", "골든리트리버"],
+    "고양이": ["코리안숏헤어", "페르시안", "러시안블루", "샴", "먼치킨"],
+}
+
+
+# ====================================
+# SQLite (pymysql 호환 커서)
+# ====================================
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+def _translate(sql: str) -> str:
+    # pymysql 스타일(%s, %%)을 sqlite3 스타일(?, %)로 변환
+    return _PLACEHOLDER.sub("?", sql).replace("%%", "%")
+
+
+class SQLiteCursor:
+    """pymysql 기본 커서처럼 동작하는 최소 래퍼 (execute는 영향받은 행 수를 반환)"""
+
+    def __init__(self, conn):
+        self._curs = conn.cursor()
+        self._rows = []
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, sql, params=()):
+        import pymysql
+        try:
+            self._curs.execute(_translate(sql), tuple(params or ()))
+        except sqlite3.IntegrityError as e:
+            # 운영 코드가 MySQL 중복키(1062)를 처리하는 경로를 그대로 타도록 변환
+            raise pymysql.err.IntegrityError(1062, str(e))
+        except sqlite3.OperationalError as e:
+            if str(e) != "interrupted":
+                raise pymysql.err.ProgrammingError(1064, str(e))
+            # interrupt() = MySQL KILL QUERY (1317)
+            raise pymysql.err.OperationalError(1317, "Query execution was interrupted")
+        except sqlite3.Error as e:
+            raise pymysql.err.ProgrammingError(1064, str(e))
+        self.lastrowid = self._curs.lastrowid
+        if self._curs.description is not None:
+            self._rows = [tuple(r) for r in self._curs.fetchall()]
+            self.rowcount = len(self._rows)
+        else:
+            self._rows = []
+            self.rowcount = self._curs.rowcount
+        return self.rowcount
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        self._curs.close()
+
+
+class SQLiteSSCursor(SQLiteCursor):
+    """pymysql SSCursor 처럼 execute 때 결과를 다 읽지 않고 fetchmany 할 때마다 읽는다"""
+
+    def execute(self, sql, params=()):
+        import pymysql
+        try:
+            self._curs.execute(_translate(sql), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise pymysql.err.ProgrammingError(1064, str(e))
+        self.rowcount = -1
+        return 0
+
+    def fetchone(self):
+        row = self._curs.fetchone()
+        return tuple(row) if row is not None else None
+
+    def fetchmany(self, size=1):
+        return [tuple(r) for r in self._curs.fetchmany(size)]
+
+    def fetchall(self):
+        return [tuple(r) for r in self._curs.fetchall()]
+
+
+# MySQL DATETIME처럼 datetime으로 넣고 datetime으로 돌려받는다
+sqlite3.register_adapter(datetime, lambda v: v.strftime("%Y-%m-%d %H:%M:%S"))
+sqlite3.register_converter("DATETIME", lambda v: datetime.strptime(v.decode(), "%Y-%m-%d %H:%M:%S"))
+
+
+class SQLiteConnection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._streams = []
+
+    def cursor(self, cursor_class=None):
+        if cursor_class is not None and cursor_class.__name__ == "SSCursor":
+            # 다 읽지 않은 문장이 남아 있으면 close() 후에도 읽기 잠금이 풀리지 않으므로 함께 닫는다
+            self._streams.append(SQLiteSSCursor(self._conn))
+            return self._streams[-1]
+        return SQLiteCursor(self._conn)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        for curs in self._streams:
+            curs.close()
+        self._conn.close()
+
+    def ping(self, reconnect=False):
+        return True
+
+    def interrupt(self):
+        # 다른 스레드에서 호출하면 실행 중인 문장이 "interrupted" 로 끝난다 (hosts.kill_query 대역)
+        self._conn.interrupt()
+
+
+def create_schema(db_path):
+    conn = sqlite3.connect(db_path)
+    with open(SCHEMA_PATH, encoding="utf-8") as f:
+        conn.executescript(f.read())
+    conn.commit()
+    conn.close()
+
+
+def slot_times(days=3, start_hour=9, end_hour=18, step_minutes=30, base=None):
+    """예약 가능 시간 문자열 목록 ('YYYY-MM-DD HH:MM')"""
+    base = base or datetime(2024, 10, 7)
+    times = []
+    for d in range(days):
+        t = base + timedelta(days=d, hours=start_hour)
+        end = base + timedelta(days=d, hours=end_hour)
+        while t < end:
+            times.append(t.strftime("%Y-%m-%d %H:%M"))
+            t += timedelta(minutes=step_minutes)
+    return times
+
+
+def _dt(value):
+    return datetime.strptime(value, "%Y-%m-%d %H:%M")
+
+
+def seed(conn, clinics=200, users=1000, pets_per_user=2, days=3, reservation_ratio=0.2, rng_seed=42):
+    """conn은 pymysql 스타일(%s) 커넥션이면 무엇이든 가능 (SQLite 래퍼 또는 로컬 MySQL)"""
+    rng = random.Random(rng_seed)
+    times = slot_times(days=days)
+    curs = conn.cursor()
+
+    for t, categories in SPECIES.items():
+        for c in categories:
+            curs.execute("INSERT INTO species (type, category) VALUES (%s, %s)", (t, c))
+
+    clinic_ids = [f"clinic{i:04d}" for i in range(clinics)]
+    for i, cid in enumerate(clinic_ids):
+        curs.execute(
+            "INSERT INTO clinic (id, name, password, latitude, longitude, start_time, end_time, introduction, address, phone, image) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            (cid, f"동물병원{i}", "qwer1234", 37.4 + rng.random() * 0.3, 126.8 + rng.random() * 0.4,
+             "09:00", "18:00", "24시간 진료", f"서울시 {rng.choice(['강남구', '마포구', '송파구', '종로구'])} {i}번길",
+             f"02-000-{i:04d}", f"clinic{i}.png"),
+        )
+        for weekday in range(7):
+            curs.execute(
+                "INSERT INTO clinic_schedule_rule (clinic_id, weekday, open_time, close_time, slot_minutes) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                (cid, weekday, "09:00", "18:00", 30),
+            )
+        for t in times:
+            curs.execute("INSERT INTO available_time (clinic_id, time) VALUES (%s, %s)", (cid, _dt(t)))
+
+    # migrations/0006_clinic_changelog.sql 과 같이 시드 병원을 변경 기록 1..N 번으로
+    for version, cid in enumerate(clinic_ids, 1):
+        curs.execute("INSERT INTO clinic_changelog (version, clinic_id, changed_at) VALUES (%s, %s, %s)",
+                     (version, cid, datetime.now().replace(microsecond=0)))
+    curs.execute("UPDATE clinic_version SET version = %s WHERE id = 1", (len(clinic_ids),))
+
+    user_ids = [f"user{i:05d}@example.com" for i in range(users)]
+    pet_ids = {}
+    for i, uid in enumerate(user_ids):
+        curs.execute(
+            "INSERT INTO user (id, password, image, name, phone) VALUES (%s, %s, %s, %s, %s)",
+            (uid, None, f"user{i}.png", f"사용자{i}", f"010-0000-{i:04d}"),
+        )
+        pet_ids[uid] = []
+        for p in range(pets_per_user):
+            species_type = rng.choice(list(SPECIES))
+            pid = f"pet{i:05d}_{p}"
+            pet_ids[uid].append(pid)
+            curs.execute(
+                "INSERT INTO pet (id, user_id, species_type, species_category, name, birthday, features, gender, image) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                (pid, uid, species_type, rng.choice(SPECIES[species_type]), f"멍멍이{p}",
+                 "2020-01-01", "활발함", rng.choice(["수컷", "암컷"]), f"{pid}.png"),
+            )
+
+    taken = set()
+    for _ in range(int(clinics * len(times) * reservation_ratio)):
+        key = (rng.choice(clinic_ids), rng.choice(times))
+        if key in taken:
+            continue
+        taken.add(key)
+        uid = rng.choice(user_ids)
+        curs.execute(
+            "INSERT INTO reservation (user_id, clinic_id, time, symptoms, pet_id) VALUES (%s, %s, %s, %s, %s)",
+            (uid, key[0], _dt(key[1]), "구토", rng.choice(pet_ids[uid])),
+        )
+
+    for uid in user_ids[: users // 2]:
+        for cid in rng.sample(clinic_ids, 3):
+            curs.execute("INSERT INTO favorite (user_id, clinic_id) VALUES (%s, %s)", (uid, cid))
+    conn.commit()
+    return {"clinic_ids": clinic_ids, "user_ids": user_ids, "pet_ids": pet_ids, "times": times}
+
+
+def seed_plan(rng_seed=42, clinics=200, users=1000, pets_per_user=2, days=3, **kwargs):
+    """seed()가 만드는 식별자만 DB 없이 재현 (원격 서버 대상 부하 테스트용)"""
+    user_ids = [f"user{i:05d}@example.com" for i in range(users)]
+    return {
+        "clinic_ids": [f"clinic{i:04d}" for i in range(clinics)],
+        "user_ids": user_ids,
+        "pet_ids": {uid: [f"pet{i:05d}_{p}" for p in range(pets_per_user)] for i, uid in enumerate(user_ids)},
+        "times": slot_times(days=days),
+    }
+
+
+# ====================================
+# S3 (moto 스타일 메모리 버킷)
+# ====================================
+
+class FakeS3:
+    """boto3 S3 클라이언트 중 이 프로젝트가 쓰는 메서드만 흉내낸 메모리 저장소"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def _not_found(self, op):
+        from botocore.exceptions import ClientError
+        return ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, op)
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None, **kwargs):
+        self.objects[(bucket, key)] = (fileobj.read(), dict(ExtraArgs or {}))
+
+    def upload_file(self, filename, bucket, key, ExtraArgs=None, **kwargs):
+        with open(filename, "rb") as f:
+            self.upload_fileobj(f, bucket, key, ExtraArgs=ExtraArgs)
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        data = Body.read() if hasattr(Body, "read") else Body
+        self.objects[(Bucket, Key)] = (data, kwargs)
+        return {}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        if (Bucket, Key) not in self.objects:
+            raise self._not_found("GetObject")
+        data, _ = self.objects[(Bucket, Key)]
+        return {"Body": io.BytesIO(data), "ContentLength": len(data)}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        if (Bucket, Key) not in self.objects:
+            raise self._not_found("HeadObject")
+        data, _ = self.objects[(Bucket, Key)]
+        return {"ContentLength": len(data)}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self.objects.pop((Bucket, Key), None)
+        return {}
+
+
+# ====================================
+# Firebase (임시 서비스 계정)
+# ====================================
+
+def fake_firebase_key():
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    return {
+        "type": "service_account",
+        "project_id": "vet-bench",
+        "private_key_id": "bench",
+        "private_key": pem,
+        "client_email": "bench@vet-bench.iam.gserviceaccount.com",
+        "client_id": "0",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+
+
+class FirebaseTokenIssuer:
+    """로컬에서 만든 RSA 키로 Firebase ID 토큰과 같은 형식의 토큰을 발급한다 (auth.py 시험용)"""
+
+    def __init__(self, project_id="vet-bench", kid="bench-key"):
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        self.project_id = project_id
+        self.kid = kid
+        self.private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.certs = {kid: self._self_signed_cert()}
+
+    def _self_signed_cert(self):
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.x509.oid import NameOID
+
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.system.gserviceaccount.com")])
+        now = datetime.utcnow()
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(self.private_key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(days=1)).not_valid_after(now + timedelta(days=1))
+            .sign(self.private_key, hashes.SHA256())
+        )
+        return cert.public_bytes(serialization.Encoding.PEM).decode()
+
+    def token(self, uid="user00000@example.com", expires_in=3600, kid=None, **claims):
+        import time
+        from cryptography.hazmat.primitives import serialization
+        from jose import jwt
+
+        now = int(time.time())
+        payload = {
+            "iss": f"https://securetoken.google.com/{self.project_id}",
+            "aud": self.project_id,
+            "auth_time": now,
+            "user_id": uid,
+            "sub": uid,
+            "iat": now,
+            "exp": now + expires_in,
+            "email": uid,
+        }
+        payload.update(claims)
+        pem = self.private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        )
+        return jwt.encode(payload, pem, algorithm="RS256", headers={"kid": kid or self.kid})
+
+
+# ====================================
+# 설치
+# ====================================
+
+def prepare_env(workdir):
+    """hosts import에 필요한 환경변수를 채우고 작업 폴더로 이동한다"""
+    os.makedirs(workdir, exist_ok=True)
+    os.environ.setdefault("VET_FIREBASE_KEY", json.dumps(fake_firebase_key()))
+    os.environ.setdefault("VET_PORT", "3306")
+    os.environ.setdefault("AWS_S3_BUCKET_NAME", "vet-bench")
+    os.environ.setdefault("AWS_REGION", "ap-northeast-2")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    # 라우터들이 import 시점에 cwd 기준 uploads 폴더를 만들기 때문에 작업 폴더로 이동
+    os.chdir(workdir)
+
+
+def install_services():
+    """Redis/S3를 대역으로 교체 (hosts import 후)"""
+    import fakeredis
+    import hosts
+
+    fake_redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    # 운영과 같이 명령은 서킷 브레이커를 거친다
+    guarded = hosts.GuardedRedis(fake_redis)
+
+    async def get_redis_connection():
+        return guarded
+
+    hosts.get_redis_connection = get_redis_connection
+    hosts.redis_pubsub = fake_redis.pubsub
+    hosts.s3 = FakeS3()
+    return {"redis": guarded, "s3": hosts.s3}
+
+
+def install(workdir, rng_seed=42, **seed_kwargs):
+    """hosts를 import하기 전에 환경을 준비하고, import 후 DB/Redis/S3를 대역으로 교체한다.
+
+    workdir 안에 SQLite 파일과 uploads 폴더가 생성되며 시드 데이터 정보를 반환한다.
+    """
+    prepare_env(workdir)
+    db_path = os.path.join(workdir, "vet.sqlite3")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    create_schema(db_path)
+    conn = SQLiteConnection(db_path)
+    data = seed(conn, rng_seed=rng_seed, **seed_kwargs)
+    conn.close()
+
+    data.update(attach(workdir))
+    return data
+
+
+def attach(workdir):
+    """install()로 이미 만들어 둔 workdir의 SQLite DB를 쓰도록 hosts를 교체한다 (다른 프로세스에서 같은 DB 사용)"""
+    prepare_env(workdir)
+    db_path = os.path.join(workdir, "vet.sqlite3")
+    import hosts
+    hosts.connect = lambda *args, **kwargs: SQLiteConnection(db_path)
+    hosts.kill_query = lambda conn: conn.interrupt()
+    hosts.init_db_pools = lambda: None
+    env = install_services()
+    env["db_path"] = db_path
+    return env
+
+
+if __name__ == "__main__":
+    # 로컬 MySQL(VET_DB 등 환경변수)에 같은 시드 데이터를 넣는다: python -m bench.standins
+    import argparse
+    parser = argparse.ArgumentParser(description="로컬 MySQL에 벤치마크 시드 데이터 적재")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--clinics", type=int, default=200)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    import pymysql
+    conn = pymysql.connect(
+        host=os.getenv("VET_DB"), user=os.getenv("VET_DB_USER"), password=os.getenv("VET_DB_PASSWORD"),
+        db=os.getenv("VET_DB_TABLE"), port=int(os.getenv("VET_PORT", "3306")), charset="utf8",
+    )
+    try:
+        seed(conn, clinics=args.clinics, users=args.users, rng_seed=args.seed)
+    finally:
+        conn.close()
+    print("seeded", args.clinics, "clinics /", args.users, "users")
@@ -0,0 +1,190 @@
+"""
+author:
+Description: 이미지 업로드 처리 확인 (형식/크기 제한, 내용 해시 키, 중복 건너뛰기, 캐시 헤더)과 S3 업로드 양 비교
+Fixed:
+Usage:
+    python -m bench.uploads --updates 50 --image-kb 2048
+
+    1) 확인 (실제 앱, 로컬 대역): 반려동물 등록/수정 이미지가 "{sha256}.png" 키로 저장, 같은 이미지는 다시 올리지 않음,
+       이미지가 아니면 415, 너무 크면 413 (Content-Length 있을 때/없을 때), 사용자/병원 이미지 업로드와
+       조회 시 Cache-Control immutable, 공유 객체는 지우지 않음, 조회는 S3 본문을 조각씩 내려보내고
+       클라이언트가 중간에 끊어도 본문을 닫음, 없는 이미지는 404. 틀리면 종료코드 1.
+    2) 측정: 같은 이미지로 반려동물 정보를 --updates 번 수정할 때 S3 업로드 횟수/바이트와 요청 p50/p99.
+       (이전 방식은 수정할 때마다 올렸다)
+"""
+
+import argparse, asyncio, json, os, struct, tempfile, time, zlib
+
+from bench.loadtest import percentile
+
+
+def png(seed, size_kb=1):
+    """seed 가 같으면 같은 내용의 PNG (None 이면 무작위). 픽셀은 압축하지 않고 넣어 크기를 맞춘다."""
+    raw = os.urandom(size_kb * 1024) if seed is None else bytes((seed * 31 + i * 7) % 251 for i in range(size_kb * 1024))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    width = 256
+    rows = max(1, len(raw) // (width * 3))
+    body = b"".join(b"\x00" + raw[r * width * 3:(r + 1) * width * 3].ljust(width * 3, b"\x00") for r in range(rows))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, rows, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(body, 0)) + chunk(b"IEND", b""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="이미지 업로드 처리 확인")
+    parser.add_argument("--updates", type=int, default=50)
+    parser.add_argument("--image-kb", type=int, default=2048)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from bench import export, loadtest
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-uploads-"), args.seed, 5, 5)
+    from main import app
+    import cache, hosts, metrics, uploads
+    s3 = data["s3"]
+    redis = data["redis"]
+    sent = {"uploads": 0, "bytes": 0}
+    real_upload = s3.upload_fileobj
+
+    def counting_upload(fileobj, bucket, key, ExtraArgs=None, **kwargs):
+        real_upload(fileobj, bucket, key, ExtraArgs=ExtraArgs, **kwargs)
+        sent["uploads"] += 1
+        sent["bytes"] += len(s3.objects[(bucket, key)][0])
+
+    s3.upload_fileobj = counting_upload
+    real_get = s3.get_object
+    bodies = []
+
+    def tracking_get(**kwargs):
+        file_obj = real_get(**kwargs)
+        bodies.append(file_obj["Body"])
+        return file_obj
+
+    s3.get_object = tracking_get
+
+    def pet_form(pet_id, user_id):
+        return {"id": pet_id, "user_id": user_id, "species_type": "강아지", "species_category": "말티즈",
+                "name": "초코", "birthday": "2020-01-01", "features": "없음", "gender": "남"}
+
+    async def pet_image(user_id, pet_id):
+        pets = (await client.get("/pet/", params={"user_id": user_id})).json()["results"]
+        return next(p["image"] for p in pets if p["id"] == pet_id)
+
+    async def checks():
+        results = {}
+        users = data["user_ids"]
+        image = png(1)
+        resp = await client.post("/pet/", data=pet_form("bench-pet-1", users[0]),
+                                 files={"image": ("내사진.png", image, "image/png")})
+        url = await pet_image(users[0], "bench-pet-1")
+        key = url.rsplit("/", 1)[-1]
+        results["add_pet"] = (resp.status_code, 200)
+        results["content_key"] = (uploads.is_content_key(key) and key.endswith(".png"), True)
+        _, extra = s3.objects[(hosts.BUCKET_NAME, key)]
+        results["s3_headers"] = (extra, {"ContentType": "image/png", "CacheControl": uploads.CACHE_CONTROL})
+
+        before = sent["uploads"]
+        await client.post("/pet/", data=pet_form("bench-pet-2", users[1]),
+                          files={"image": ("photo.png", image, "image/png")})
+        results["duplicate_skipped"] = (sent["uploads"] - before, 0)
+        results["duplicate_same_url"] = (await pet_image(users[1], "bench-pet-2"), url)
+        await client.put("/pet/", data=pet_form("bench-pet-1", users[0]), files={"image": ("내사진.png", image, "image/png")})
+        results["update_same_image_skipped"] = (sent["uploads"] - before, 0)
+        await client.put("/pet/", data=pet_form("bench-pet-1", users[0]), files={"image": ("new.png", png(2), "image/png")})
+        results["update_new_image"] = ((sent["uploads"] - before, await pet_image(users[0], "bench-pet-1") != url), (1, True))
+
+        resp = await client.post("/pet/", data=pet_form("bench-pet-3", users[2]),
+                                 files={"image": ("evil.png", b"#!/bin/sh\necho hi\n", "image/png")})
+        results["not_an_image"] = (resp.status_code, 415)
+        pets = (await client.get("/pet/", params={"user_id": users[2]})).json().get("results", [])
+        results["not_an_image_no_pet"] = ("bench-pet-3" in [p["id"] for p in pets], False)
+
+        big = png(3, uploads.MAX_BYTES // 1024 + 64)
+        resp = await client.post("/pet/", data=pet_form("bench-pet-4", users[2]), files={"image": ("big.png", big, "image/png")})
+        results["too_large_content_length"] = (resp.status_code, 413)
+
+        boundary = "benchboundary"
+        body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.png\"\r\n"
+                f"Content-Type: image/png\r\n\r\n").encode() + big + f"\r\n--{boundary}--\r\n".encode()
+
+        async def chunked():
+            for start in range(0, len(body), 64 * 1024):
+                yield body[start:start + 64 * 1024]
+        resp = await client.post("/mypage/userimage", content=chunked(),
+                                 headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        results["too_large_chunked"] = (resp.status_code, 413)
+        results["too_large_counted"] = (metrics.snapshot()["counters"].get("uploads.rejected.request_size", 0), 2)
+
+        resp = await client.post("/mypage/userimage", files={"file": ("me.png", png(4), "image/png")})
+        user_key = resp.json()["s3_key"]
+        view = await client.get(f"/mypage/view/{user_key}")
+        results["user_image"] = ((uploads.is_content_key(user_key), view.headers.get("cache-control"),
+                                  view.headers.get("content-type")), (True, uploads.CACHE_CONTROL, "image/png"))
+        results["user_image_streamed"] = ((view.content == png(4), view.headers.get("content-length"), bodies[-1].closed),
+                                          (True, str(len(png(4))), True))
+        results["user_image_missing"] = ((await client.get("/mypage/view/missing.png")).status_code, 404)
+        # 큰 이미지를 두 조각 받고 끊으면 나머지는 읽지 않고 S3 본문을 닫는다
+        big_key = (await client.post("/mypage/userimage", files={
+            "file": ("big.png", png(6, 1024), "image/png")})).json()["s3_key"]
+        saved_chunk, uploads.CHUNK_BYTES = uploads.CHUNK_BYTES, 64 * 1024
+        state = await export.call(app, f"/mypage/view/{big_key}", "", disconnect_after=2)
+        uploads.CHUNK_BYTES = saved_chunk
+        results["user_image_disconnect"] = ((state["status"], state["bytes"] < len(png(6, 1024)), bodies[-1].closed),
+                                            (200, True, True))
+        await client.delete(f"/mypage/{user_key}")
+        results["shared_not_deleted"] = ((hosts.BUCKET_NAME, user_key) in s3.objects, True)
+        results["user_image_not_image"] = ((await client.post("/mypage/userimage", files={
+            "file": ("a.txt", b"hello", "text/plain")})).json()["result"], "Error")
+
+        resp = await client.post("/clinic/files", files={"file": ("clinic.png", png(5), "image/png")})
+        clinic_key = resp.json()["s3_key"]
+        view = await client.get(f"/clinic/files/{clinic_key}")
+        results["clinic_image"] = ((view.status_code, view.headers.get("cache-control")), (200, uploads.CACHE_CONTROL))
+        # 이미지는 JSON 캐시(Redis/워커 메모리)를 거치지 않고 S3 에서 바로 내려보낸다
+        for _ in range(2):
+            again = await client.get(f"/clinic/files/{clinic_key}")
+        results["clinic_image_streamed"] = ((again.content == png(5), again.headers.get("content-length"),
+                                             len(cache.local_cache), await redis.exists(
+                                                 cache.generate_cache_key("view_file", {"file_name": clinic_key}))),
+                                            (True, str(len(png(5))), 0, 0))
+        results["clinic_image_missing"] = ((await client.get("/clinic/files/missing.png")).status_code, 404)
+        results["clinic_not_image"] = ((await client.post("/clinic/files", files={
+            "file": ("a.txt", b"hello", "text/plain")})).status_code, 415)
+        return {name: {"got": got, "want": want, "ok": got == want} for name, (got, want) in results.items()}
+
+    async def measure():
+        user_id = data["user_ids"][3]
+        image = png(None, args.image_kb)
+        await client.post("/pet/", data=pet_form("bench-pet-measure", user_id))
+        sent.update(uploads=0, bytes=0)
+        elapsed_ms = []
+        for _ in range(args.updates):
+            started = time.perf_counter()
+            resp = await client.put("/pet/", data=pet_form("bench-pet-measure", user_id),
+                                    files={"image": ("same.png", image, "image/png")})
+            elapsed_ms.append((time.perf_counter() - started) * 1000)
+            assert resp.status_code == 200, resp.text
+        elapsed_ms.sort()
+        return {
+            "image_bytes": len(image),
+            "before_s3_uploads": args.updates,
+            "before_s3_bytes": args.updates * len(image),
+            "s3_uploads": sent["uploads"],
+            "s3_bytes": sent["bytes"],
+            "update_p50_ms": round(percentile(elapsed_ms, 50), 2),
+            "update_p99_ms": round(percentile(elapsed_ms, 99), 2),
+        }
+
+    async def _main():
+        async with client:
+            return {"checks": await checks(), "updates": await measure()}
+
+    result = asyncio.run(_main())
+    print(json.dumps({"settings": vars(args), **result}, ensure_ascii=False, indent=2))
+    if not all(r["ok"] for r in result["checks"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+author:
+Description: 배포 직후 첫 요청 지연 비교 (시작 시 캐시 예열 vs 예열 없음)
+Fixed:
+Usage:
+    python -m bench.warmup --db-delay-ms 30
+
+    앱의 lifespan(startup)을 직접 돌리고 /health/ready 가 200 이 될 때까지 기다린 뒤
+    병원 목록, 동물 종류, 가까운 슬롯 예약 가능 병원을 한 번씩 호출해 첫 요청 지연을 잰다.
+    예열 여부는 lifecycle.WARMUP_ENABLED 로 바꿔가며 같은 프로세스에서 두 번 측정한다.
+    DB 지연은 hosts.connect() 에 time.sleep 을 넣어 흉내낸다.
+"""
+
+import argparse, asyncio, json, tempfile, time
+
+
+class Lifespan:
+    """ASGI lifespan 을 직접 돌린다: start() 는 startup 완료까지, stop() 은 shutdown 완료까지 기다린다"""
+
+    def __init__(self, app):
+        self.app = app
+        self.messages = asyncio.Queue()
+        self.replies = asyncio.Queue()
+        self.task = None
+
+    async def _send(self, message):
+        await self.replies.put(message["type"])
+
+    async def start(self):
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}}
+        self.task = asyncio.get_running_loop().create_task(self.app(scope, self.messages.get, self._send))
+        await self.messages.put({"type": "lifespan.startup"})
+        return await self.replies.get()
+
+    async def stop(self):
+        await self.messages.put({"type": "lifespan.shutdown"})
+        reply = await self.replies.get()
+        await self.task
+        return reply
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="시작 예열 효과 측정")
+    parser.add_argument("--db-delay-ms", type=float, default=30.0)
+    parser.add_argument("--slots", type=int, default=4, help="측정할 가까운 슬롯 수")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    from bench import loadtest
+    client, data = loadtest.make_local_client(tempfile.mkdtemp(prefix="vet-warmup-"), args.seed, 200, 50)
+    import hosts, lifecycle
+    from main import app
+
+    real_connect = hosts.connect
+
+    def slow_connect(*a, **kw):
+        time.sleep(args.db_delay_ms / 1000)
+        return real_connect(*a, **kw)
+
+    hosts.connect = slow_connect
+    hot = [("/clinic/", None), ("/species/types", None), ("/species/categories", None)] + [
+        ("/available/available_clinic", {"time": t}) for t in lifecycle.upcoming_slots(args.slots)
+    ]
+
+    async def measure(warm):
+        await data["redis"].flushdb()
+        lifecycle.WARMUP_ENABLED = warm
+        lifecycle.status.update(ready=False, warmed=[], errors=[], warmed_at=None)
+        started = time.perf_counter()
+        lifespan = Lifespan(app)
+        await lifespan.start()
+        while (await client.get("/health/ready")).status_code != 200:
+            await asyncio.sleep(0.01)
+        ready_s = time.perf_counter() - started
+        first = {}
+        for path, params in hot:
+            t0 = time.perf_counter()
+            resp = await client.get(path, params=params)
+            assert resp.status_code in (200, 404), (path, resp.status_code)
+            first[path if not params else f"{path}?time={params['time']}"] = round((time.perf_counter() - t0) * 1000, 2)
+        await lifespan.stop()
+        return {
+            "ready_seconds": round(ready_s, 3),
+            "first_request_ms": first,
+            "first_request_total_ms": round(sum(first.values()), 2),
+        }
+
+    async def _main():
+        async with client:
+            return {"cold": await measure(False), "warmed": await measure(True)}
+
+    print(json.dumps({"db_delay_ms": args.db_delay_ms, **asyncio.run(_main())}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+author:
+Description: 외부 의존성(Redis 등) 장애 시 빠르게 실패하도록 하는 서킷 브레이커
+Fixed:
+Usage:
+    redis_breaker = CircuitBreaker("redis", failure_threshold=5, reset_timeout=10)
+    value = await redis_breaker.call(redis_client.get, key)   # 열린 상태면 CircuitOpenError
+
+    closed    : 정상. 연속 실패가 failure_threshold 에 닿으면 open
+    open      : 호출하지 않고 즉시 CircuitOpenError. reset_timeout 이 지나면 half_open
+    half_open : 시험 호출 한 건만 통과. 성공하면 closed, 실패하면 다시 open
+"""
+
+import time
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=10.0, failure_types=(Exception,)):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failure_types = failure_types
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.stats = {"calls": 0, "failures": 0, "short_circuited": 0, "opened": 0}
+        self.last_error = None
+
+    def _allow(self):
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def _success(self):
+        self.failures = 0
+        self.probing = False
+        if self.state != "closed":
+            print(f"Circuit {self.name} closed")
+        self.state = "closed"
+
+    def _failure(self, error):
+        self.failures += 1
+        self.stats["failures"] += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        self.probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                print(f"Circuit {self.name} opened ({self.last_error})")
+                self.stats["opened"] += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    async def call(self, func, *args, **kwargs):
+        if not self._allow():
+            self.stats["short_circuited"] += 1
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        self.stats["calls"] += 1
+        try:
+            result = await func(*args, **kwargs)
+        except self.failure_types as e:
+            self._failure(e)
+            raise
+        except BaseException:
+            # 명령 오류(잘못된 타입 등)는 연결 장애가 아니다
+            self.probing = False
+            raise
+        self._success()
+        return result
+
+    def reset(self):
+        """상태와 통계를 처음으로 (fork 된 워커에서 부모의 상태를 물려받지 않도록)"""
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.stats = dict.fromkeys(self.stats, 0)
+        self.last_error = None
+
+    def snapshot(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "last_error": self.last_error,
+            **self.stats,
+        }
@@ -0,0 +1,544 @@
+"""
+author:
+Description: 라우터 공용 Redis 캐시 (조회 캐시, 무효화, Redis 장애 시 로컬 캐시)
+Fixed:
+Usage:
+    from cache import generate_cache_key, get_cached_or_fetch, invalidate
+
+    cache_key = generate_cache_key("get_pets", {"user_id": user_id})
+    rows = await get_cached_or_fetch(cache_key, fetch_data)
+    await invalidate(cache_key)        # Redis 오류는 삼키고 로그만 남긴다
+    rows = await get_many_cached_or_fetch(keys, fetch_missing)   # 여러 키를 MGET 한 번으로, 빠진 것만 한 번에 조회
+
+    네임스페이스(키의 ':' 앞부분)마다 POLICIES 의 CachePolicy 를 따른다.
+    - ttl 에 ±jitter 비율을 섞어 같은 시각에 만든 키들이 한꺼번에 만료되지 않게 한다.
+    - stale_ttl: 만료 후 이 시간 동안은 이전 값을 바로 돌려주고 백그라운드에서 다시 가져온다.
+    - refresh_ahead: 이 워커에서 hot_hits 번 이상 읽힌 키는 만료 refresh_ahead 초 전에 미리 다시 가져온다.
+    - cold_ttl: 창(seen_window 초) 안에서 처음 캐시되는 키는 이 시간만 둔다. 한 번 찾고 마는 검색어는
+      금방 사라지고, 다시 찾는 키(창 안에서 두 번째 저장부터)는 ttl 을 다 받는다.
+      본 키는 네임스페이스마다 ZSET 하나(cachemeta:{네임스페이스}:seen)에 두고 SEEN_MAX 개까지만 남긴다 (넘치면 오래된 것부터 잊는다).
+    - max_keys / max_bytes: 네임스페이스 예산. 넘으면 곧 만료될 키(짧게 둔 키가 먼저)부터 지운다. 0 이면 제한 없음.
+      예산보다 큰 값은 캐시하지 않는다.
+    값은 JSON 으로 저장하므로 JSON 으로 바꿀 수 있어야 한다 (bytes 는 안 되고 TypeError 가 그대로 올라간다).
+    Redis 에는 {"v": 값, "s": 신선한 기한(epoch)} 로 저장하고 키 TTL 은 ttl + stale_ttl 이다.
+    VET_CACHE_COMPRESS_MIN 바이트 이상이면 zlib 으로 압축해 "z:" + base64 로 저장한다
+    (클라이언트가 decode_responses 라 문자열이어야 한다).
+    키마다 크기와 만료 시각을 cachemeta:{네임스페이스}:size / :exp 에, 네임스페이스별 합계를 cachemeta:bytes 에
+    Lua 스크립트로 함께 기록한다 (단일 Redis 기준). 네임스페이스별 사용량은 GET /metrics/cache 에서 본다.
+    백그라운드 갱신은 refresh:{키} 락으로 워커 전체에서 한 번만 실행되고, 갱신을 시작할 때 읽은 값이 그대로일 때만 저장한다.
+    읽기 복제본을 쓰면 지운 키/네임스페이스에 VET_DB_MAX_LAG + VET_DB_LAG_CHECK_INTERVAL 초 동안
+    cachemeta:recent: 표시를 남기고, 그동안 다시 채우는 조회는 primary 에서 읽는다 (복제 지연으로 쓰기 이전 값이 캐시되지 않게).
+
+    Redis 가 응답하지 않거나 서킷이 열려 있으면(REDIS_ERRORS) DB 에서 바로 가져오고,
+    그 결과를 워커 메모리의 작은 LRU(VET_LOCAL_CACHE_SIZE 개, VET_LOCAL_CACHE_TTL 초)에 둔다.
+    로컬 캐시는 Redis 를 쓸 수 없을 때만 읽으므로 평소 동작(워커 간 일관성)은 그대로다.
+"""
+
+import os, json, time, fnmatch, random, asyncio, base64, hashlib, zlib
+from collections import OrderedDict
+from redis.exceptions import NoScriptError, RedisError
+import hosts
+import metrics
+from breaker import CircuitOpenError
+
+CACHE_TTL = 3600
+COMPRESS_MIN_BYTES = int(os.getenv("VET_CACHE_COMPRESS_MIN", "1024"))  # 0 이면 압축하지 않음
+COMPRESSED_PREFIX = "z:"
+META_PREFIX = "cachemeta:"
+LOCAL_CACHE_SIZE = int(os.getenv("VET_LOCAL_CACHE_SIZE", "1000"))
+LOCAL_CACHE_TTL = float(os.getenv("VET_LOCAL_CACHE_TTL", "30"))
+SEEN_MAX = int(os.getenv("VET_CACHE_SEEN_MAX", "10000"))  # cold_ttl 용 처음 본 키 기록, 네임스페이스마다
+# Redis 를 쓸 수 없다는 뜻의 오류만 로컬 캐시로 넘어간다. 직렬화 오류 같은 코드 문제는 그대로 올린다
+REDIS_ERRORS = (RedisError, CircuitOpenError, OSError)
+
+
+def generate_cache_key(endpoint: str, params: dict):
+    return f"{endpoint}:{json.dumps(params, sort_keys=True)}"
+
+
+class CachePolicy:
+    def __init__(self, ttl=CACHE_TTL, stale_ttl=0, refresh_ahead=0, hot_hits=5, jitter=0.1,
+                 cold_ttl=0, seen_window=CACHE_TTL, max_keys=0, max_bytes=0):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.refresh_ahead = refresh_ahead
+        self.hot_hits = hot_hits
+        self.jitter = jitter
+        self.cold_ttl = cold_ttl
+        self.seen_window = seen_window
+        self.max_keys = max_keys
+        self.max_bytes = max_bytes
+
+    def fresh_seconds(self):
+        return self.ttl * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+DEFAULT_POLICY = CachePolicy()
+
+MB = 1024 * 1024
+
+# 쓰기 시 명시적으로 지우는 키들이라 stale 구간은 만료(TTL)로 인한 재조회 비용만 숨긴다
+# 검색어는 끝이 없으므로 짧게 두고 예산을 건다. 예약 가능 병원은 슬롯(시각) 수만큼만 생긴다.
+POLICIES = {
+    "clinic_list": CachePolicy(stale_ttl=600, refresh_ahead=120, max_bytes=8 * MB),
+    "clinic_search": CachePolicy(stale_ttl=300, cold_ttl=120, max_keys=5000, max_bytes=32 * MB),
+    "available_clinic": CachePolicy(stale_ttl=60, refresh_ahead=60, max_keys=2000, max_bytes=32 * MB),
+    "can_reservation": CachePolicy(stale_ttl=60),
+    "select_reservation_clinic": CachePolicy(stale_ttl=60),
+}
+
+
+def policy_for(cache_key):
+    return POLICIES.get(cache_key.split(":", 1)[0], DEFAULT_POLICY)
+
+
+class LocalCache:
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._items = OrderedDict()
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return item
+
+    def set(self, key, value, ttl=None):
+        if self.size <= 0:
+            return
+        self._items[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+    def delete(self, *keys):
+        for key in keys:
+            self._items.pop(key, None)
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+local_cache = LocalCache(LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL)
+
+# Redis 장애 중에 지우지 못한 키. 복구 후 첫 조회 전에 지워서 오래된 캐시가 살아나지 않게 한다
+PENDING_INVALIDATIONS_MAX = 10000
+_pending_invalidations = set()
+
+metrics.register("local_cache", lambda: {
+    "size": len(local_cache), "max": local_cache.size, "pending_invalidations": len(_pending_invalidations),
+})
+
+
+async def _flush_pending(redis_client):
+    keys = list(_pending_invalidations)
+    await _forget(redis_client, keys)
+    _pending_invalidations.difference_update(keys)
+
+
+def log_redis_error(action, e):
+    # 서킷이 열려 있는 동안은 요청마다 로그를 남기지 않는다
+    if not isinstance(e, CircuitOpenError):
+        print(f"Redis {action} error: {e}")
+
+
+def _wrap(data, policy):
+    fresh = policy.fresh_seconds()
+    body = json.dumps({"v": data, "s": round(time.time() + fresh, 3)})
+    if COMPRESS_MIN_BYTES and len(body) >= COMPRESS_MIN_BYTES:
+        packed = COMPRESSED_PREFIX + base64.b64encode(zlib.compress(body.encode())).decode()
+        if len(packed) < len(body):
+            metrics.incr("cache.compressed")
+            metrics.incr("cache.compressed_saved_bytes", len(body) - len(packed))
+            body = packed
+    return body, int(fresh + policy.stale_ttl) + 1
+
+
+def _unwrap(raw):
+    if raw.startswith(COMPRESSED_PREFIX):
+        raw = zlib.decompress(base64.b64decode(raw[len(COMPRESSED_PREFIX):]))
+    value = json.loads(raw)
+    if isinstance(value, dict) and value.keys() == {"v", "s"}:
+        return value["v"], value["s"]
+    # 봉투 없이 저장된 이전 형식 (Redis TTL 로만 만료)
+    return value, float("inf")
+
+
+# ---------- 네임스페이스별 크기 기록과 예산 (Lua) ----------
+# 키 이름에서 네임스페이스(':' 앞)를 구해 cachemeta 키를 스크립트 안에서 만든다 (단일 Redis 기준)
+
+_META_LUA = """
+local META = ARGV[1]
+local function ns_of(key) return string.match(key, '^[^:]*') end
+local function drop(ns, key)
+    local size = redis.call('HGET', META .. ns .. ':size', key)
+    if size then
+        redis.call('HDEL', META .. ns .. ':size', key)
+        redis.call('ZREM', META .. ns .. ':exp', key)
+        redis.call('HINCRBY', META .. 'bytes', ns, -tonumber(size))
+    end
+end
+local function prune(ns, now, limit)
+    local expired = redis.call('ZRANGEBYSCORE', META .. ns .. ':exp', '-inf', now, 'LIMIT', 0, limit)
+    for _, key in ipairs(expired) do drop(ns, key) end
+    return #expired
+end
+"""
+
+# KEYS: 캐시 키들, ARGV: META, now, expect, seen_max, 키마다 (값, ex, max_keys, max_bytes, cold_ex, seen_window)
+# expect 가 '' 이 아니면 (키 하나) 지금 값이 expect 와 같을 때만 저장한다
+# 반환: {저장한 수, 예산 때문에 지운 수, 짧게 둔 수}
+CACHE_SET = _META_LUA + """
+local now = tonumber(ARGV[2])
+local expect = ARGV[3]
+local seen_max = tonumber(ARGV[4])
+local stored, evicted, cold = 0, 0, 0
+for i, key in ipairs(KEYS) do
+    local base = 4 + (i - 1) * 6
+    local body = ARGV[base + 1]
+    local ex = tonumber(ARGV[base + 2])
+    local max_keys = tonumber(ARGV[base + 3])
+    local max_bytes = tonumber(ARGV[base + 4])
+    local cold_ex = tonumber(ARGV[base + 5])
+    if expect == '' or redis.call('GET', key) == expect then
+        local ns = ns_of(key)
+        if cold_ex > 0 then
+            -- 처음 본 시각을 네임스페이스 ZSET 하나에: 창이 지난 것은 지우고, 넘치면 오래된 것부터 잊는다
+            local seen_key = META .. ns .. ':seen'
+            local window = tonumber(ARGV[base + 6])
+            redis.call('ZREMRANGEBYSCORE', seen_key, '-inf', now - window)
+            if not redis.call('ZSCORE', seen_key, key) then
+                redis.call('ZADD', seen_key, now, key)
+                local over = redis.call('ZCARD', seen_key) - seen_max
+                if over > 0 then redis.call('ZPOPMIN', seen_key, over) end
+                redis.call('EXPIRE', seen_key, window)
+                if cold_ex < ex then
+                    ex = cold_ex
+                    cold = cold + 1
+                end
+            end
+        end
+        prune(ns, now, 100)
+        drop(ns, key)
+        redis.call('SET', key, body, 'EX', ex)
+        redis.call('ZADD', META .. ns .. ':exp', now + ex, key)
+        redis.call('HSET', META .. ns .. ':size', key, #body)
+        redis.call('HINCRBY', META .. 'bytes', ns, #body)
+        stored = stored + 1
+        -- 예산을 넘으면 곧 만료될 키부터 지운다 (방금 넣은 키는 남긴다)
+        while true do
+            local count = redis.call('ZCARD', META .. ns .. ':exp')
+            local bytes = tonumber(redis.call('HGET', META .. 'bytes', ns) or '0')
+            if not ((max_keys > 0 and count > max_keys) or (max_bytes > 0 and bytes > max_bytes)) then break end
+            local oldest = redis.call('ZRANGE', META .. ns .. ':exp', 0, 1)
+            local victim = oldest[1]
+            if victim == key then victim = oldest[2] end
+            if not victim then break end
+            redis.call('DEL', victim)
+            drop(ns, victim)
+            evicted = evicted + 1
+        end
+    end
+end
+return {stored, evicted, cold}
+"""
+
+# KEYS: 지울 캐시 키들, ARGV: META, 최근 무효화 표시를 둘 ms (0 이면 두지 않음)
+CACHE_FORGET = _META_LUA + """
+local recent_ms = tonumber(ARGV[2])
+local deleted = 0
+for _, key in ipairs(KEYS) do
+    deleted = deleted + redis.call('DEL', key)
+    drop(ns_of(key), key)
+    if recent_ms > 0 then
+        redis.call('SET', META .. 'recent:' .. key, 1, 'PX', recent_ms)
+    end
+end
+return deleted
+"""
+
+# ARGV: META, now. 반환: {네임스페이스, 키 수, 바이트, ...}
+CACHE_USAGE = _META_LUA + """
+local now = tonumber(ARGV[2])
+local result = {}
+for _, ns in ipairs(redis.call('HKEYS', META .. 'bytes')) do
+    while prune(ns, now, 1000) == 1000 do end
+    local count = redis.call('ZCARD', META .. ns .. ':exp')
+    local bytes = tonumber(redis.call('HGET', META .. 'bytes', ns) or '0')
+    if count == 0 then
+        redis.call('HDEL', META .. 'bytes', ns)
+    else
+        table.insert(result, ns)
+        table.insert(result, count)
+        table.insert(result, bytes)
+    end
+end
+return result
+"""
+
+_SHAS = {}
+
+
+async def run_script(redis_client, script, keys, args):
+    """Lua 스크립트를 EVALSHA 로 실행하고, Redis 에 아직 없으면 EVAL 로 올리며 실행한다"""
+    sha = _SHAS.get(script)
+    if sha is None:
+        sha = _SHAS[script] = hashlib.sha1(script.encode()).hexdigest()
+    try:
+        return await redis_client.evalsha(sha, len(keys), *keys, *args)
+    except NoScriptError:
+        return await redis_client.eval(script, len(keys), *keys, *args)
+
+
+async def _store(redis_client, entries, expect=None):
+    """entries: [(키, 값, 정책)]. 압축하고 네임스페이스 예산 안에서 저장한다.
+    expect: 키가 하나일 때, Redis 의 지금 값이 이것과 같을 때만 저장 (읽은 뒤 무효화/다시 채워졌으면 건너뜀)"""
+    keys, args = [], []
+    for cache_key, data, policy in entries:
+        body, ex = _wrap(data, policy)
+        if policy.max_bytes and len(body) > policy.max_bytes:
+            metrics.incr("cache.too_large")
+            continue
+        keys.append(cache_key)
+        args += [body, ex, policy.max_keys, policy.max_bytes, policy.cold_ttl, policy.seen_window]
+    if not keys:
+        return
+    stored, evicted, cold = await run_script(
+        redis_client, CACHE_SET, keys, [META_PREFIX, f"{time.time():.3f}", expect or "", SEEN_MAX, *args])
+    if evicted:
+        metrics.incr("cache.evicted", evicted)
+    if cold:
+        metrics.incr("cache.cold_set", cold)
+
+
+async def _forget(redis_client, keys):
+    # 스크립트 인자가 너무 길어지지 않게 나눠서
+    keys = list(keys)
+    recent_ms = int(_recent_seconds() * 1000)
+    for start in range(0, len(keys), 500):
+        await run_script(redis_client, CACHE_FORGET, keys[start:start + 500], [META_PREFIX, recent_ms])
+
+
+# ---------- 무효화 직후 다시 채울 때는 primary 에서 ----------
+# 복제본은 VET_DB_MAX_LAG 만큼 늦을 수 있어, 무효화 직후 복제본에서 다시 채우면 쓰기 이전 값이
+# TTL 동안 공유 캐시에 남는다. 지운 키(와 통째로 지운 네임스페이스)에 잠깐 표시를 남기고,
+# 표시가 있는 동안의 캐시 채우기는 primary 에서 읽는다. 복제본을 쓰지 않으면 아무것도 하지 않는다.
+RECENT_PREFIX = META_PREFIX + "recent:"
+
+
+def _recent_seconds():
+    # 지연 확인 사이에 지연이 늘 수 있으므로 확인 간격만큼 더
+    if not hosts.VET_DB_REPLICAS:
+        return 0
+    return hosts.VET_DB_MAX_LAG + hosts.VET_DB_LAG_CHECK_INTERVAL
+
+
+def _recent_keys(cache_key):
+    return [RECENT_PREFIX + cache_key, RECENT_PREFIX + "ns:" + cache_key.split(":", 1)[0]]
+
+
+async def _fetch(fetch_func, recent):
+    if not recent:
+        return await fetch_func()
+    metrics.incr("cache.fill_primary")
+    with hosts.primary_reads():
+        return await fetch_func()
+
+
+async def usage():
+    """네임스페이스별 {keys, bytes} 와 예산. 만료된 기록은 이때 정리한다."""
+    redis_client = await hosts.get_redis_connection()
+    flat = await run_script(redis_client, CACHE_USAGE, [], [META_PREFIX, f"{time.time():.3f}"])
+    namespaces = {}
+    for i in range(0, len(flat), 3):
+        ns, count, size = flat[i], int(flat[i + 1]), int(flat[i + 2])
+        policy = POLICIES.get(ns, DEFAULT_POLICY)
+        namespaces[ns] = {"keys": count, "bytes": size, "max_keys": policy.max_keys, "max_bytes": policy.max_bytes}
+    return {
+        "total_bytes": sum(n["bytes"] for n in namespaces.values()),
+        "namespaces": dict(sorted(namespaces.items(), key=lambda item: -item[1]["bytes"])),
+    }
+
+
+# 워커 안 조회 수 (refresh-ahead 대상 선정)와 진행 중인 백그라운드 갱신
+HIT_COUNTS_MAX = 10000
+_hits = {}
+_refreshing = {}
+
+
+def _count_hit(cache_key):
+    if len(_hits) >= HIT_COUNTS_MAX:
+        _hits.clear()
+    _hits[cache_key] = _hits.get(cache_key, 0) + 1
+    return _hits[cache_key]
+
+
+async def _refresh(redis_client, cache_key, raw, fetch_func, policy, reason):
+    lock = f"refresh:{cache_key}"
+    try:
+        # 다른 워커가 이미 갱신 중이면 건너뛴다
+        if not await redis_client.set(lock, 1, nx=True, ex=30):
+            return
+        try:
+            data = await fetch_func()
+            # 읽었던 값(raw)이 그대로일 때만: 갱신 중에 무효화된 키를 되살리거나,
+            # 무효화 뒤 새로 채운 값을 쓰기 이전에 읽은 데이터로 덮어쓰지 않는다
+            await _store(redis_client, [(cache_key, data, policy)], expect=raw)
+            _hits.pop(cache_key, None)
+            metrics.incr(f"cache.{reason}")
+        finally:
+            await redis_client.delete(lock)
+    except Exception as e:
+        log_redis_error("refresh", e)
+
+
+def _spawn_refresh(redis_client, cache_key, raw, fetch_func, policy, reason):
+    if cache_key in _refreshing:
+        return
+    task = asyncio.get_running_loop().create_task(_refresh(redis_client, cache_key, raw, fetch_func, policy, reason))
+    _refreshing[cache_key] = task
+    task.add_done_callback(lambda _: _refreshing.pop(cache_key, None))
+
+
+async def get_cached_or_fetch(cache_key, fetch_func, policy=None):
+    policy = policy or policy_for(cache_key)
+    redis_client = await hosts.get_redis_connection()
+    redis_ok = True
+    recent = False
+    try:
+        if _pending_invalidations:
+            await _flush_pending(redis_client)
+        if _recent_seconds():
+            cached_data, *marks = await redis_client.mget([cache_key, *_recent_keys(cache_key)])
+            recent = any(marks)
+        else:
+            cached_data = await redis_client.get(cache_key)
+        if cached_data:
+            value, fresh_until = _unwrap(cached_data)
+            left = fresh_until - time.time()
+            if left > 0:
+                metrics.incr("cache.hit")
+                if policy.refresh_ahead and left <= policy.refresh_ahead and _count_hit(cache_key) >= policy.hot_hits:
+                    _spawn_refresh(redis_client, cache_key, cached_data, fetch_func, policy, "refresh_ahead")
+                return value
+            if -left <= policy.stale_ttl:
+                # stale-while-revalidate
+                metrics.incr("cache.stale_hit")
+                _spawn_refresh(redis_client, cache_key, cached_data, fetch_func, policy, "revalidate")
+                return value
+    except REDIS_ERRORS as e:
+        log_redis_error("get", e)
+        redis_ok = False
+        item = local_cache.get(cache_key)
+        if item is not None:
+            metrics.incr("cache.local_hit")
+            return item[1]
+
+    # Cache miss, fetch from DB
+    metrics.incr("cache.miss")
+    data = await _fetch(fetch_func, recent)
+    if redis_ok:
+        try:
+            await _store(redis_client, [(cache_key, data, policy)])
+        except REDIS_ERRORS as e:
+            log_redis_error("set", e)
+            redis_ok = False
+    if not redis_ok:
+        local_cache.set(cache_key, data)
+    return data
+
+
+async def get_many_cached_or_fetch(cache_keys, fetch_missing, policy=DEFAULT_POLICY):
+    """여러 키를 MGET 한 번으로 읽는다. 없거나 만료된 키만 fetch_missing(키 목록) -> {키: 값} 으로 한 번에 가져와 채운다.
+    fetch_missing 결과에 없는 키(DB 에도 없는 행)는 캐시하지 않고 결과에서도 빠진다. stale/refresh-ahead 는 쓰지 않는다."""
+    if not cache_keys:
+        return {}
+    found, missing = {}, []
+    redis_client = await hosts.get_redis_connection()
+    redis_ok = True
+    recent = False
+    try:
+        if _pending_invalidations:
+            await _flush_pending(redis_client)
+        now = time.time()
+        marks = []
+        if _recent_seconds():
+            marks = sorted({mark for key in cache_keys for mark in _recent_keys(key)})
+        values = await redis_client.mget([*cache_keys, *marks])
+        recent = any(values[len(cache_keys):])
+        for key, raw in zip(cache_keys, values):
+            if raw:
+                value, fresh_until = _unwrap(raw)
+                if fresh_until > now:
+                    found[key] = value
+                    continue
+            missing.append(key)
+        metrics.incr("cache.hit", len(found))
+    except REDIS_ERRORS as e:
+        log_redis_error("get", e)
+        redis_ok = False
+        for key in cache_keys:
+            item = local_cache.get(key)
+            if item is not None:
+                found[key] = item[1]
+            else:
+                missing.append(key)
+        metrics.incr("cache.local_hit", len(found))
+
+    if not missing:
+        return found
+    metrics.incr("cache.miss", len(missing))
+    fetched = await _fetch(lambda: fetch_missing(missing), recent)
+    found.update(fetched)
+    if fetched and redis_ok:
+        try:
+            await _store(redis_client, [(key, value, policy) for key, value in fetched.items()])
+        except REDIS_ERRORS as e:
+            log_redis_error("set", e)
+            redis_ok = False
+    if not redis_ok:
+        for key, value in fetched.items():
+            local_cache.set(key, value)
+    return found
+
+
+async def invalidate(*keys):
+    """쓰기 후 캐시 삭제. 실패해도 요청은 성공으로 처리한다 (TTL 로 결국 정리됨)"""
+    if not keys:
+        return
+    local_cache.delete(*keys)
+    try:
+        redis_client = await hosts.get_redis_connection()
+        await _forget(redis_client, keys)
+    except Exception as e:
+        log_redis_error("delete", e)
+        if len(_pending_invalidations) < PENDING_INVALIDATIONS_MAX:
+            _pending_invalidations.update(keys)
+
+
+async def invalidate_pattern(*patterns):
+    """패턴에 맞는 키를 모두 삭제 (SCAN 사용, 드문 관리 작업용)"""
+    for key in list(local_cache._items):
+        if any(fnmatch.fnmatchcase(key, pattern) for pattern in patterns):
+            local_cache.delete(key)
+    try:
+        redis_client = await hosts.get_redis_connection()
+        recent_ms = int(_recent_seconds() * 1000)
+        for pattern in patterns:
+            if recent_ms and pattern.endswith(":*"):
+                # 네임스페이스 전체를 지우면 새로 생길 키(규칙 버전이 바뀐 키 등)도 primary 에서 채우도록
+                await redis_client.set(RECENT_PREFIX + "ns:" + pattern[:-2], 1, px=recent_ms)
+            keys = [key async for key in redis_client.scan_iter(match=pattern, count=500)]
+            if keys:
+                await _forget(redis_client, keys)
+    except Exception as e:
+        log_redis_error("delete", e)
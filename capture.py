@@ -0,0 +1,130 @@
+"""
+author:
+Description: 운영 트래픽 샘플링 기록 미들웨어 (replay용)
+Fixed:
+Usage:
+    VET_CAPTURE=1 로 켜면 요청의 일부를 JSON Lines로 기록한다.
+    본문(body)과 헤더는 기록하지 않고, 비밀번호/토큰 같은 쿼리 값은 가린다.
+    기록된 파일은 python -m bench.replay 로 테스트 서버에 재생할 수 있다.
+
+    VET_CAPTURE_SAMPLE     : 샘플링 비율 (기본 0.01)
+    VET_CAPTURE_PATH       : 기록 파일 경로 (기본 capture/requests.log)
+    VET_CAPTURE_MAX_BYTES  : 파일 하나의 최대 크기 (기본 50MB, 넘으면 회전)
+    VET_CAPTURE_BACKUPS    : 보관할 회전 파일 수 (기본 5)
+
+    serve.py 로 여러 워커를 띄우면 워커마다 capture/requests.w{번호}.log 에 따로 기록한다.
+"""
+
+import json, logging, logging.handlers, os, queue, random, time
+from urllib.parse import parse_qsl, urlencode
+
+CAPTURE_ENABLED = os.getenv("VET_CAPTURE", "0") == "1"
+CAPTURE_SAMPLE = float(os.getenv("VET_CAPTURE_SAMPLE", "0.01"))
+CAPTURE_PATH = os.getenv("VET_CAPTURE_PATH", "capture/requests.log")
+CAPTURE_MAX_BYTES = int(os.getenv("VET_CAPTURE_MAX_BYTES", str(50 * 1024 * 1024)))
+CAPTURE_BACKUPS = int(os.getenv("VET_CAPTURE_BACKUPS", "5"))
+
+# 값이 기록되면 안 되는 쿼리 파라미터 이름 (부분 일치)
+SECRET_PARAMS = ("password", "token", "secret", "key", "authorization")
+REDACTED = "***"
+
+
+def redact_query(query_string: str) -> str:
+    params = parse_qsl(query_string, keep_blank_values=True)
+    return urlencode([
+        (k, REDACTED if any(s in k.lower() for s in SECRET_PARAMS) else v)
+        for k, v in params
+    ])
+
+
+_route_paths = {}
+
+def route_template(scope) -> str:
+    """라우팅이 끝난 scope에서 '/reservation/clinic/{clinic_id}' 같은 경로 템플릿을 찾는다"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return scope.get("path", "")
+    if endpoint not in _route_paths:
+        app = scope.get("app")
+        for route in getattr(app, "routes", []):
+            if getattr(route, "endpoint", None) is endpoint:
+                _route_paths[endpoint] = route.path
+                break
+        else:
+            _route_paths[endpoint] = scope.get("path", "")
+    return _route_paths[endpoint]
+
+
+def worker_path(path):
+    """워커 여러 개가 한 파일을 회전시키면 서로 덮어쓰므로 워커 번호를 붙인다"""
+    index = os.getenv("VET_WORKER_INDEX")
+    if index is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.w{index}{ext}"
+
+
+def _make_logger(path):
+    """파일 쓰기는 QueueListener 스레드에서 처리해 이벤트 루프를 막지 않는다"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=CAPTURE_MAX_BYTES, backupCount=CAPTURE_BACKUPS, encoding="utf-8"
+    )
+    file_handler.setFormatter(logging.Formatter("%(message)s"))
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, file_handler)
+    listener.start()
+
+    logger = logging.getLogger("vet.capture")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.handlers.clear()
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    return logger, listener
+
+
+class CaptureMiddleware:
+    """요청 한 줄 = {"t": 시작시각, "m": 메서드, "r": 라우트, "p": 경로, "q": 쿼리, "s": 상태코드, "d": ms}"""
+
+    def __init__(self, app, sample: float = CAPTURE_SAMPLE, path: str = CAPTURE_PATH):
+        self.app = app
+        self.sample = sample
+        self.path = path
+        self.logger = self.listener = None
+        self._pid = None
+
+    def _ensure_logger(self):
+        # 미들웨어는 import 시점(serve.py preload 면 마스터)에 만들어지므로
+        # 기록 스레드와 파일은 요청을 처리하는 프로세스에서 처음 쓸 때 연다
+        if self._pid != os.getpid():
+            self.logger, self.listener = _make_logger(worker_path(self.path))
+            self._pid = os.getpid()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.time()
+        perf_started = time.perf_counter()
+        status = [0]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            line = {
+                "t": round(started, 4),
+                "m": scope["method"],
+                "r": route_template(scope),
+                "p": scope["path"],
+                "q": redact_query(scope.get("query_string", b"").decode("latin-1")),
+                "s": status[0],
+                "d": round((time.perf_counter() - perf_started) * 1000, 2),
+            }
+            self._ensure_logger()
+            self.logger.info(json.dumps(line, ensure_ascii=False, separators=(",", ":")))
@@ -6,40 +6,21 @@ Usage:
 """
 
 from fastapi import APIRouter, File, UploadFile, HTTPException
-import os, json
-import hosts
+import os
+from datetime import datetime
+import deadline, favorite, hosts, passwords, schedule, uploads, user
+from cache import generate_cache_key, get_cached_or_fetch, get_many_cached_or_fetch, invalidate, invalidate_pattern
 from botocore.exceptions import NoCredentialsError
-from botocore.exceptions import ClientError
-from fastapi.responses import StreamingResponse
-import io
 
 router = APIRouter()
+# 병원 정보를 바꾸는 라우트: VET_CLINIC_SESSION_REQUIRED=1 이면 그 병원의 로그인 세션이 필요 (user.py)
+CLINIC_SESSION = user.clinic_session_dependencies()
 
 UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 
-def generate_cache_key(endpoint: str, params: dict):
-    return f"{endpoint}:{json.dumps(params, sort_keys=True)}"
-
-async def get_cached_or_fetch(cache_key, fetch_func):
-    redis_client = await hosts.get_redis_connection()
-    try:
-        cached_data = await redis_client.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
-    except Exception as e:
-        print(f"Redis get error: {e}")
-
-    # Cache miss, fetch from DB
-    data = await fetch_func()
-    try:
-        await redis_client.set(cache_key, json.dumps(data), ex=3600)
-    except Exception as e:
-        print(f"Redis set error: {e}")
-    return data
-
 # [DELETE] 이미지 삭제
 @router.delete("/images/{id}")
 async def delete_image(id: str):
@@ -61,9 +42,10 @@ async def delete_image(id: str):
 @router.post("/files")
 async def upload_file(file: UploadFile = File(...)):
     try:
-        s3_key = file.filename
-        hosts.s3.upload_fileobj(file.file, hosts.BUCKET_NAME, s3_key)
-        return {'result': 'OK', 's3_key': s3_key}
+        stored = await uploads.ingest(file)
+        return {'result': 'OK', 's3_key': stored.key}
+    except HTTPException:
+        raise
     except NoCredentialsError:
         raise HTTPException(status_code=500, detail='AWS credentials not available.')
     except Exception as e:
@@ -74,23 +56,121 @@ async def upload_file(file: UploadFile = File(...)):
 # [GET] S3에서 파일 조회 (이미지 반환)
 @router.get("/files/{file_name}")
 async def get_file(file_name: str):
-    cache_key = generate_cache_key("view_file", {"file_name": file_name})
-
-    async def fetch_file():
-        file_obj = hosts.s3.get_object(Bucket=hosts.BUCKET_NAME, Key=file_name)
-        file_data = file_obj['Body'].read()
-        return file_data
-
-    file_data = await get_cached_or_fetch(cache_key, fetch_file)
-    if not file_data:
-        raise HTTPException(status_code=404, detail="File not found in S3.")
-    return StreamingResponse(io.BytesIO(file_data), media_type="image/jpeg")
+    # S3 에서 조각씩 읽어 바로 내려보낸다 (uploads.stream_object)
+    return await uploads.stream_object(file_name)
 
 
 # ====================================
 # Clinic(병원/클리닉) 관련 엔드포인트
 # ====================================
 
+# 앱에 내려주는 병원 컬럼 (비밀번호 제외)
+CLINIC_COLUMNS = ["id", "name", "latitude", "longitude", "start_time", "end_time", "introduction", "address", "phone", "image"]
+# 예전 SELECT * 와 같은 순서의 행 (password 자리는 항상 NULL). 응답과 캐시에 비밀번호 해시가 들어가지 않게
+CLINIC_ROW_SELECT = ", ".join(CLINIC_COLUMNS[:2] + ["NULL AS password"] + CLINIC_COLUMNS[2:])
+CHANGES_LIMIT = 500
+CHANGES_MAX_LIMIT = 5000
+
+
+def _record_change(curs, clinic_id):
+    """병원을 바꾼 트랜잭션 안에서 호출: 변경 번호를 하나 받아 clinic_changelog 에 남긴다.
+    clinic_version 행을 커밋할 때까지 잠가 번호 순서와 커밋 순서가 같게 한다."""
+    curs.execute("UPDATE clinic_version SET version = version + 1 WHERE id = 1")
+    curs.execute("SELECT version FROM clinic_version WHERE id = 1")
+    version = curs.fetchone()[0]
+    curs.execute(
+        "INSERT INTO clinic_changelog (version, clinic_id, changed_at) VALUES (%s, %s, %s)",
+        (version, clinic_id, datetime.now().replace(microsecond=0)),
+    )
+    return version
+
+
+def _select_hours(curs, clinic_id):
+    # 바꾸기 전 진료 시간 (규칙을 같이 옮기기 위해)
+    curs.execute("SELECT start_time, end_time FROM clinic WHERE id = %s", (clinic_id,))
+    return curs.fetchone()
+
+
+def _row_key(clinic_id):
+    return generate_cache_key("clinic_row", {"id": clinic_id})
+
+
+async def clinic_rows(clinic_ids):
+    """{병원 id: clinic 행 (CLINIC_ROW_SELECT)} (없는 병원은 빠진다). 병원별로 캐시해 여러 화면이 함께 쓴다."""
+    keys = {_row_key(clinic_id): clinic_id for clinic_id in dict.fromkeys(clinic_ids)}
+
+    async def fetch_missing(missing):
+        conn = hosts.connect()
+        try:
+            with conn.cursor() as curs:
+                placeholders = ", ".join(["%s"] * len(missing))
+                curs.execute(f"SELECT {CLINIC_ROW_SELECT} FROM clinic WHERE id IN ({placeholders})", [keys[key] for key in missing])
+                return {_row_key(row[0]): list(row) for row in curs.fetchall()}
+        finally:
+            conn.close()
+
+    cached = await get_many_cached_or_fetch(list(keys), fetch_missing)
+    return {keys[key]: row for key, row in cached.items()}
+
+
+async def _after_clinic_change(clinic_id):
+    await invalidate(generate_cache_key("clinic_list", {}), _row_key(clinic_id))
+    await invalidate_pattern("clinic_search:*")
+
+
+# [GET] 마지막 동기화 이후 바뀐 병원만 조회 (앱은 로컬에 목록을 두고 변경분만 받는다)
+# since=0 이면 전체 목록. 응답의 next 를 다음 요청의 since 로 쓰고, has_more 면 바로 이어서 요청한다.
+# 각 항목은 병원의 최신 상태 하나이며, deleted=true 면 로컬에서 지운다.
+# reset=true 면 (DB 복구 등으로) 번호가 맞지 않으니 since=0 부터 다시 받는다.
+@router.get("/changes")
+async def get_clinic_changes(since: int = 0, limit: int = CHANGES_LIMIT):
+    if since < 0 or limit < 1:
+        raise HTTPException(status_code=400, detail="since는 0 이상, limit은 1 이상이어야 합니다.")
+    limit = min(limit, CHANGES_MAX_LIMIT)
+    columns = ", ".join(f"c.{name}" for name in CLINIC_COLUMNS)
+    # 병원마다 마지막 변경 기록만 (idx_clinic_changelog_clinic), clinic 행이 없으면 삭제된 병원
+    sql = f"""
+    SELECT l.version, l.clinic_id, l.changed_at, {columns}
+    FROM clinic_changelog l LEFT OUTER JOIN clinic c ON c.id = l.clinic_id
+    WHERE l.version > %s
+      AND l.version = (SELECT MAX(version) FROM clinic_changelog WHERE clinic_id = l.clinic_id)
+    ORDER BY l.version
+    LIMIT %s
+    """
+    conn = hosts.connect()
+    try:
+        with conn.cursor() as curs:
+            # 같은 트랜잭션(스냅샷)에서 읽어 현재 번호와 변경 목록이 어긋나지 않는다
+            curs.execute("SELECT version FROM clinic_version WHERE id = 1")
+            row = curs.fetchone()
+            current = row[0] if row else 0
+            if since > current:
+                return {"since": since, "next": 0, "reset": True, "has_more": False, "changes": []}
+            curs.execute(sql, (since, limit))
+            rows = curs.fetchall()
+    except Exception as e:
+        print("Database error:", e)
+        raise HTTPException(status_code=500, detail="Error fetching clinic changes")
+    finally:
+        conn.close()
+
+    changes = []
+    for version, clinic_id, changed_at, *values in rows:
+        deleted = values[0] is None
+        change = {"version": version, "id": clinic_id, "updated_at": str(changed_at), "deleted": deleted}
+        if not deleted:
+            change.update(zip(CLINIC_COLUMNS[1:], values[1:]))
+        changes.append(change)
+    has_more = len(rows) == limit
+    return {
+        "since": since,
+        "next": changes[-1]["version"] if has_more else current,
+        "reset": False,
+        "has_more": has_more,
+        "changes": changes,
+    }
+
+
 # [GET] 특정 클리닉의 이름 조회 (ID로 조회)
 @router.get("/{id}/name")
 async def get_clinic_name_by_id(id: str):
@@ -108,7 +188,6 @@ async def get_clinic_name_by_id(id: str):
         conn.close()
 
 
-
 # [GET] 특정 클리닉의 ID 조회 (이름으로 조회)
 @router.get("/by-name/{name}/id")
 async def get_clinic_id_by_name(name: str):
@@ -127,6 +206,18 @@ async def get_clinic_id_by_name(name: str):
         conn.close()
 
 
+def _select_clinics(conn, search):
+    with conn.cursor() as curs:
+        if search:
+            sql = f"SELECT {CLINIC_ROW_SELECT} FROM clinic WHERE name LIKE %s OR address LIKE %s"
+            keyword = f"%{search}%"
+            curs.execute(deadline.sql(sql), (keyword, keyword))
+        else:
+            sql = f"SELECT {CLINIC_ROW_SELECT} FROM clinic"
+            curs.execute(deadline.sql(sql))
+        return curs.fetchall()
+
+
 # [GET] 클리닉 목록 조회 (검색어 제공 시 이름 또는 주소로 검색)
 @router.get("/")
 async def list_clinics(search: str = None):
@@ -137,23 +228,14 @@ async def list_clinics(search: str = None):
         cache_key = generate_cache_key("clinic_list", {})
 
     async def fetch_data():
-        conn = hosts.connect()
+        # 스레드에서 제한 시간 안에 조회 (넘기면 504, 클라이언트가 끊기면 쿼리도 멈춘다)
         try:
-            with conn.cursor() as curs:
-                if search:
-                    sql = "SELECT * FROM clinic WHERE name LIKE %s OR address LIKE %s"
-                    keyword = f"%{search}%"
-                    curs.execute(sql, (keyword, keyword))
-                else:
-                    sql = "SELECT * FROM clinic"
-                    curs.execute(sql)
-                rows = curs.fetchall()
-            return rows
+            return await deadline.query("clinic_search" if search else "clinic_list", _select_clinics, search)
+        except HTTPException:
+            raise
         except Exception as e:
             print("Database error:", e)
             return []
-        finally:
-            conn.close()
 
     results = await get_cached_or_fetch(cache_key, fetch_data)
     return {"results": results}
@@ -166,7 +248,7 @@ async def get_clinic_detail(id: str):
     conn = hosts.connect()
     try:
         with conn.cursor() as curs:
-            sql = "SELECT * FROM clinic WHERE id=%s"
+            sql = f"SELECT {CLINIC_ROW_SELECT} FROM clinic WHERE id=%s"
             curs.execute(sql, (id,))
             row = curs.fetchone()
         return row
@@ -192,7 +274,7 @@ async def create_clinic(clinic: dict):  # 실제 프로젝트에서는 Pydantic
             curs.execute(sql, (
                 clinic.get("id"),
                 clinic.get("name"),
-                clinic.get("password"),
+                await passwords.hash_if_plain(clinic.get("password")),
                 clinic.get("latitude"),
                 clinic.get("longitude"),
                 clinic.get("starttime"),
@@ -202,21 +284,31 @@ async def create_clinic(clinic: dict):  # 실제 프로젝트에서는 Pydantic
                 clinic.get("phone"),
                 clinic.get("image"),
             ))
+            # 진료 시간으로 매일 같은 규칙 (형식이 틀리면 PUT /available/rules/{id} 로 따로 넣어야 예약 가능 병원에 나온다)
+            hours = schedule.clinic_hours(clinic.get("starttime"), clinic.get("endtime"))
+            if hours:
+                schedule.insert_daily_rules(curs, clinic.get("id"), hours)
+            _record_change(curs, clinic.get("id"))
             conn.commit()
-        return {"result": "OK"}
     except Exception as e:
         print("Error:", e)
         raise HTTPException(status_code=500, detail="Error creating clinic")
     finally:
         conn.close()
+    await _after_clinic_change(clinic.get("id"))
+    if hours:
+        await schedule.rules_changed()
+    return {"result": "OK"}
 
 
 # [PUT] 클리닉 정보 업데이트 (전체 정보 갱신)
-@router.put("/{id}")
+@router.put("/{id}", dependencies=CLINIC_SESSION)
 async def update_clinic(id: str, clinic: dict):  # 실제 프로젝트에서는 Pydantic 모델을 사용하는 것이 좋습니다.
     conn = hosts.connect()
+    rules_changed = False
     try:
         with conn.cursor() as curs:
+            old_hours = _select_hours(curs, id)
             sql = """
             UPDATE clinic
             SET name = %s,
@@ -231,9 +323,9 @@ async def update_clinic(id: str, clinic: dict):  # 실제 프로젝트에서는
                 image = %s
             WHERE id = %s
             """
-            curs.execute(sql, (
+            changed = curs.execute(sql, (
                 clinic.get("name"),
-                clinic.get("password"),
+                await passwords.hash_if_plain(clinic.get("password")),
                 clinic.get("latitude"),
                 clinic.get("longitude"),
                 clinic.get("starttime"),
@@ -244,13 +336,20 @@ async def update_clinic(id: str, clinic: dict):  # 실제 프로젝트에서는
                 clinic.get("image"),
                 id
             ))
+            if changed:
+                rules_changed = schedule.sync_clinic_hours(curs, id, old_hours, (clinic.get("starttime"), clinic.get("endtime")))
+                _record_change(curs, id)
             conn.commit()
-        return {"result": "OK"}
     except Exception as e:
         print("Error:", e)
         raise HTTPException(status_code=500, detail="Error updating clinic")
     finally:
         conn.close()
+    if changed:
+        await _after_clinic_change(id)
+    if rules_changed:
+        await schedule.rules_changed()
+    return {"result": "OK"}
 
 
 # [GET] 클리닉 카드용 간략 정보 조회 (예: 이름, 주소, 이미지)
@@ -270,8 +369,7 @@ async def get_clinic_cards():
         conn.close()
 
 
-
-@router.put("/{id}/all")
+@router.put("/{id}/all", dependencies=CLINIC_SESSION)
 async def update_all(
     id: str ,
     name: str = None, 
@@ -286,8 +384,10 @@ async def update_all(
     image: str = None,
 ):
     conn = hosts.connect()
+    rules_changed = False
     try:
         with conn.cursor() as curs:
+            old_hours = _select_hours(curs, id)
             sql = """
             UPDATE clinic
             SET name = %s,
@@ -302,12 +402,52 @@ async def update_all(
             image = %s
             WHERE id = %s
             """
-            curs.execute(sql, (name, password, latitude, longitude, starttime, endtime, introduction, address, phone, image, id))
+            password = await passwords.hash_if_plain(password)
+            changed = curs.execute(sql, (name, password, latitude, longitude, starttime, endtime, introduction, address, phone, image, id))
+            if changed:
+                rules_changed = schedule.sync_clinic_hours(curs, id, old_hours, (starttime, endtime))
+                _record_change(curs, id)
             conn.commit()
-        return {"result": "OK"}
     except Exception as e:
         print("Error:", e)
         return {"result": "Error"}
     finally:
         conn.close()
+    if changed:
+        await _after_clinic_change(id)
+    if rules_changed:
+        await schedule.rules_changed()
+    return {"result": "OK"}
+
+
+# [DELETE] 클리닉 삭제 (진료 규칙/휴진/즐겨찾기도 함께, 예약 내역은 남긴다)
+# 변경 기록이 남아 /changes 로 동기화하는 앱에서도 지워진다
+@router.delete("/{id}", dependencies=CLINIC_SESSION)
+async def delete_clinic(id: str):
+    conn = hosts.connect()
+    try:
+        with conn.cursor() as curs:
+            deleted = curs.execute("DELETE FROM clinic WHERE id = %s", (id,))
+            if not deleted:
+                raise HTTPException(status_code=404, detail="병원이 없습니다.")
+            curs.execute("DELETE FROM clinic_schedule_rule WHERE clinic_id = %s", (id,))
+            curs.execute("DELETE FROM clinic_closure WHERE clinic_id = %s", (id,))
+            curs.execute("SELECT user_id FROM favorite WHERE clinic_id = %s", (id,))
+            favorite_users = [row[0] for row in curs.fetchall()]
+            curs.execute("DELETE FROM favorite WHERE clinic_id = %s", (id,))
+            _record_change(curs, id)
+            conn.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        print("Error:", e)
+        raise HTTPException(status_code=500, detail="Error deleting clinic")
+    finally:
+        conn.close()
+    await _after_clinic_change(id)
+    await favorite.forget_users(favorite_users)
+    # 예약 가능 병원 목록에서도 빠지도록
+    await schedule.rules_changed()
+    return {"result": "OK"}
 
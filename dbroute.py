@@ -0,0 +1,99 @@
+"""
+author:
+Description: 요청별 읽기/쓰기 DB 라우팅 (GET은 복제본, 쓰기와 최근 쓰기한 사용자는 primary)
+Fixed:
+Usage:
+    VET_DB_REPLICAS=replica1:3306,replica2:3306 로 설정하면 main.py 에서 미들웨어가 추가된다.
+
+    - GET/HEAD 요청은 hosts.connect() 가 복제본으로 연결한다.
+    - 쓰기 요청이 성공하면 VET_DB_STICKY_SECONDS 동안 같은 사용자의 읽기를 primary 로 보낸다.
+      쿠키(vet_rw)와, 경로/쿼리에 user_id 가 있으면 Redis 키(db:sticky:{user_id}) 둘 다로 판단한다.
+    - 복제 지연이 VET_DB_MAX_LAG 를 넘거나 복제본에 연결할 수 없으면 primary 로 보낸다 (hosts.py).
+    VET_DB_STICKY_SECONDS 는 VET_DB_MAX_LAG 보다 커야 자신이 쓴 내용을 바로 읽을 수 있다.
+"""
+
+import os
+from urllib.parse import parse_qs
+from starlette.routing import Match
+import hosts
+from breaker import CircuitOpenError
+
+STICKY_SECONDS = int(os.getenv("VET_DB_STICKY_SECONDS", "5"))
+STICKY_COOKIE = "vet_rw"
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def _sticky_key(user_id):
+    return f"db:sticky:{user_id}"
+
+
+def request_user(scope):
+    """경로 파라미터 또는 쿼리의 user_id (없으면 None)"""
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if query.get("user_id"):
+        return query["user_id"][0]
+    app = scope.get("app")
+    for route in getattr(app, "routes", []):
+        match, child = route.matches(scope)
+        if match == Match.FULL:
+            return child.get("path_params", {}).get("user_id")
+    return None
+
+
+def _has_cookie(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"cookie" and f"{STICKY_COOKIE}=".encode() in value:
+            return True
+    return False
+
+
+async def _is_sticky(user_id):
+    try:
+        redis_client = await hosts.get_redis_connection()
+        return bool(await redis_client.exists(_sticky_key(user_id)))
+    except CircuitOpenError:
+        return True
+    except Exception as e:
+        # 판단할 수 없으면 자신이 쓴 내용을 놓치지 않도록 primary 로
+        print(f"Redis get error: {e}")
+        return True
+
+
+async def _mark_sticky(user_id):
+    try:
+        redis_client = await hosts.get_redis_connection()
+        await redis_client.set(_sticky_key(user_id), 1, ex=STICKY_SECONDS)
+    except Exception as e:
+        print(f"Redis set error: {e}")
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        write = scope["method"] not in READ_METHODS
+        user_id = request_user(scope)
+        read_only = not write and not _has_cookie(scope)
+        if read_only and user_id:
+            read_only = not await _is_sticky(user_id)
+        state = {"write": write, "read_only": read_only, "wrote": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state["wrote"] and message["status"] < 400:
+                # 응답을 보내기 전에 표시해야 바로 이어지는 GET 이 primary 로 간다
+                if user_id:
+                    await _mark_sticky(user_id)
+                cookie = f"{STICKY_COOKIE}=1; Max-Age={STICKY_SECONDS}; Path=/; HttpOnly"
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        token = hosts.db_request.set(state)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            hosts.db_request.reset(token)
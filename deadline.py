@@ -0,0 +1,212 @@
+"""
+author:
+Description: 라우트별 DB 조회 제한 시간과 클라이언트가 끊긴 요청의 조회 취소
+Fixed:
+Usage:
+    import deadline
+
+    def _select(conn, keyword):
+        with conn.cursor() as curs:
+            curs.execute(deadline.sql("SELECT * FROM clinic WHERE name LIKE %s"), (keyword,))
+            return curs.fetchall()
+
+    rows = await deadline.query("clinic_search", _select, keyword)
+
+    - query() 는 func(conn, *args) 를 스레드에서 실행한다 (DB 를 기다리는 동안 이벤트 루프를 막지 않는다).
+      연결은 query() 가 hosts.connect() 로 열고 닫는다.
+    - 제한 시간(ms)은 이름마다 DEADLINES 에 있고 VET_QUERY_TIMEOUT_<이름>_MS 로 바꾼다 (0 이면 제한 없음).
+      1) 서버: deadline.sql() 이 SELECT 에 /*+ MAX_EXECUTION_TIME(ms) */ 힌트를 붙여 MySQL 이 직접 멈춘다 (오류 3024).
+      2) 앱: 힌트가 듣지 않는 경우(잠금 대기, 복제본 등)를 위해 ms + VET_QUERY_KILL_GRACE 초가 지나면
+         다른 연결로 KILL QUERY 를 보낸다 (hosts.kill_query).
+      어느 쪽이든 504 를 돌려주고, 멈춘 연결은 풀에 돌려주지 않고 버린다.
+    - CancelOnDisconnectMiddleware: GET 요청 중 클라이언트가 끊기면 처리 중인 핸들러를 취소한다.
+      query() 가 기다리던 중이면 KILL QUERY 로 DB 쿼리도 멈추고, 아직 스레드가 시작하지 않았으면 실행하지 않는다.
+    - 횟수: 카운터 db.deadline.<이름>.timeout/cancelled/killed, requests.disconnected.<핸들러>
+      와 GET /metrics 의 "query_deadlines".
+"""
+
+import asyncio, contextvars, functools, os, re, threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+import pymysql
+import hosts, metrics
+
+DEFAULT_MS = int(os.getenv("VET_QUERY_TIMEOUT_MS", "5000"))
+KILL_GRACE = float(os.getenv("VET_QUERY_KILL_GRACE", "0.5"))
+CANCEL_ON_DISCONNECT = os.getenv("VET_CANCEL_ON_DISCONNECT", "1") == "1"
+
+# 이름 -> 제한 시간 (ms). 없는 이름은 DEFAULT_MS
+DEADLINES = {
+    name: int(os.getenv(f"VET_QUERY_TIMEOUT_{name.upper()}_MS", str(ms)))
+    for name, ms in {
+        "clinic_list": 3000,
+        "clinic_search": 2000,
+        "reservation_clinic": 2000,
+        "reservation_schedule": 3000,
+    }.items()
+}
+
+# MySQL: 3024 = MAX_EXECUTION_TIME 초과, 1317 = KILL QUERY 로 중단
+INTERRUPTED = (3024, 1317)
+
+# KILL QUERY 는 조회 스레드가 모두 바쁠 때도 바로 보낼 수 있도록 따로
+_kill_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="kill-query")
+
+_current_ms = contextvars.ContextVar("query_deadline_ms", default=0)
+_SELECT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+
+class QueryCancelled(Exception):
+    """스레드가 시작하기 전에 요청이 취소됐다"""
+
+
+def deadline_ms(name):
+    return DEADLINES.get(name, DEFAULT_MS)
+
+
+@functools.lru_cache(maxsize=256)
+def _hinted(text, ms):
+    return _SELECT.sub(f"SELECT /*+ MAX_EXECUTION_TIME({ms}) */", text, count=1)
+
+
+def sql(text):
+    """query() 안에서 실행하는 SELECT 에 서버 측 제한 시간 힌트를 붙인다. 그 밖에서는 그대로."""
+    ms = _current_ms.get()
+    return _hinted(text, ms) if ms > 0 else text
+
+
+class _Query:
+    """스레드에서 실행 중인 조회 하나. KILL QUERY 가 끝난 연결을 다른 요청이 받지 않도록 lock 으로 순서를 맞춘다."""
+
+    def __init__(self, ms):
+        self.ms = ms
+        self.lock = threading.Lock()
+        self.conn = None
+        self.done = False
+        self.killed = False
+
+    def run(self, func, args):
+        _current_ms.set(self.ms)
+        conn = hosts.connect()
+        with self.lock:
+            if self.killed:
+                conn.close()
+                raise QueryCancelled()
+            self.conn = conn
+        try:
+            return func(conn, *args)
+        finally:
+            with self.lock:
+                self.done = True
+                killed = self.killed
+            if killed:
+                getattr(conn, "discard", conn.close)()
+            else:
+                conn.close()
+
+    def kill(self):
+        """실행 중이면 KILL QUERY. 아직 시작하지 않았으면 시작하지 않게 한다."""
+        with self.lock:
+            if self.done:
+                return False
+            self.killed = True
+            if self.conn is None:
+                return False
+            try:
+                hosts.kill_query(self.conn)
+            except Exception as e:
+                print(f"Kill query error: {e}")
+                return False
+            return True
+
+
+def _abandon(future):
+    # 멈춘 조회의 오류(1317)는 받을 곳이 없다 ("exception was never retrieved" 경고 방지)
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
+def _timed_out(name):
+    metrics.incr(f"db.deadline.{name}.timeout")
+    return HTTPException(status_code=504, detail="조회 시간이 초과되었습니다. 잠시 후 다시 시도해주세요.")
+
+
+async def query(name, func, *args):
+    """func(conn, *args) 를 스레드에서 실행하고 결과를 돌려준다. 제한 시간을 넘기면 HTTPException(504)."""
+    ms = deadline_ms(name)
+    call = _Query(ms)
+    loop = asyncio.get_running_loop()
+    # 복제본 라우팅(hosts.db_request)이 스레드에서도 보이도록 컨텍스트를 넘긴다
+    future = loop.run_in_executor(None, contextvars.copy_context().run, call.run, func, args)
+    try:
+        if ms > 0:
+            return await asyncio.wait_for(asyncio.shield(future), ms / 1000 + KILL_GRACE)
+        return await asyncio.shield(future)
+    except asyncio.TimeoutError:
+        _abandon(future)
+        if await loop.run_in_executor(_kill_pool, call.kill):
+            metrics.incr(f"db.deadline.{name}.killed")
+        raise _timed_out(name)
+    except asyncio.CancelledError:
+        # 클라이언트가 끊겼다. 응답을 기다릴 곳이 없으니 끝나기를 기다리지 않고 멈추기만 한다
+        metrics.incr(f"db.deadline.{name}.cancelled")
+        _abandon(future)
+
+        def killed(f):
+            if not f.exception() and f.result():
+                metrics.incr(f"db.deadline.{name}.killed")
+        loop.run_in_executor(_kill_pool, call.kill).add_done_callback(killed)
+        raise
+    except pymysql.err.OperationalError as e:
+        if e.args and e.args[0] in INTERRUPTED:
+            raise _timed_out(name)
+        raise
+
+
+def _route_name(scope):
+    endpoint = scope.get("endpoint")
+    return getattr(endpoint, "__name__", None) or "unmatched"
+
+
+class CancelOnDisconnectMiddleware:
+    """GET 요청 처리 중 클라이언트가 끊기면(http.disconnect) 핸들러 태스크를 취소한다"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue()
+
+        async def watch():
+            # 앱이 receive 를 부르면 받아 둔 메시지를 그대로 넘긴다 (StreamingResponse 의 끊김 감지 등)
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        app_task = loop.create_task(self.app(scope, messages.get, send))
+        watch_task = loop.create_task(watch())
+        try:
+            await asyncio.wait({app_task, watch_task}, return_when=asyncio.FIRST_COMPLETED)
+            if not app_task.done():
+                metrics.incr(f"requests.disconnected.{_route_name(scope)}")
+                app_task.cancel()
+            try:
+                await app_task
+            except asyncio.CancelledError:
+                if not watch_task.done():
+                    raise
+        finally:
+            for task in (app_task, watch_task):
+                if not task.done():
+                    task.cancel()
+
+
+metrics.register("query_deadlines", lambda: {
+    "default_ms": DEFAULT_MS, "kill_grace_seconds": KILL_GRACE, "deadlines_ms": DEADLINES,
+})
@@ -3,59 +3,151 @@ author: Aeong
 Description: favorite (Redis Caching Applied)
 Fixed: 24.10.14
 Usage: Manage favorite
+
+    즐겨찾기는 (user_id, clinic_id) 만 저장하고, 병원 정보는 읽을 때 병원별 캐시(clinic.clinic_rows)에서 채운다.
+    사용자별 즐겨찾기 병원 id 는 Redis set(favorite_ids:{user_id})으로 두어
+    카드 한 화면의 즐겨찾기 여부를 SMISMEMBER 한 번으로 확인한다.
+    set 에는 빈 목록도 캐시되도록 "" 를 함께 넣고, 없으면(만료/무효화) DB 에서 다시 채운다.
+    쓰기 후에는 set 을 지워 다음 조회에서 다시 채운다 (Redis 장애 시에는 DB 에서 바로 확인).
+    지울 때 사용자별 세대 번호(favorite_gen:{user_id})도 올리고, 다시 채울 때는 DB 를 읽기 전에 본 번호가
+    그대로일 때만 넣는다 (STORE_IDS). 쓰기 전에 DB 를 읽은 조회가 지운 뒤에 이전 목록을 넣지 못한다.
 """
 
+import os
+import pymysql
 from fastapi import APIRouter, HTTPException
-import hosts
-import json
+import clinic, hosts, metrics
+from cache import log_redis_error, run_script
 
 router = APIRouter()
 
-def generate_cache_key(endpoint: str, params: dict):
-    return f"{endpoint}:{json.dumps(params, sort_keys=True)}"
+FAVORITE_IDS_TTL = int(os.getenv("VET_FAVORITE_IDS_TTL", "3600"))
+LIKES_MAX = 200  # 한 번에 확인할 수 있는 병원 수
+SENTINEL = ""    # set 이 있다는 표시 (빈 즐겨찾기 목록도 캐시)
+DUPLICATE_ENTRY = 1062
+
+
+def _ids_key(user_id):
+    return f"favorite_ids:{user_id}"
+
+
+def _gen_key(user_id):
+    return f"favorite_gen:{user_id}"
+
+
+# KEYS: set, 세대 번호, ARGV: DB 를 읽기 전에 본 세대 번호, ttl, SENTINEL, 병원 id...
+# 그사이 forget_users 가 번호를 올렸거나 다른 조회가 이미 채웠으면 넣지 않는다. 반환: 넣었으면 1
+STORE_IDS = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] or redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('SADD', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+def _load_ids(user_id):
+    conn = hosts.connect()
+    try:
+        curs = conn.cursor()
+        curs.execute("SELECT clinic_id FROM favorite WHERE user_id = %s", (user_id,))
+        return {row[0] for row in curs.fetchall()}
+    finally:
+        conn.close()
+
+
+async def _read(redis_client, user_id, command, *args):
+    """set 조회와 세대 번호를 한 번에. (조회 결과, 세대 번호 문자열)"""
+    async with redis_client.pipeline(transaction=True) as pipe:
+        getattr(pipe, command)(_ids_key(user_id), *args)
+        pipe.get(_gen_key(user_id))
+        result, gen = await pipe.execute()
+    return result, gen or "0"
 
-async def get_cached_or_fetch(cache_key, fetch_func):
-    redis_client = await hosts.get_redis_connection()
+
+async def _store_ids(redis_client, user_id, ids, gen):
     try:
-        cached_data = await redis_client.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
+        stored = await run_script(redis_client, STORE_IDS, [_ids_key(user_id), _gen_key(user_id)],
+                                  [gen, FAVORITE_IDS_TTL, SENTINEL, *ids])
+        if not stored:
+            metrics.incr("favorite.ids_store_skipped")
     except Exception as e:
-        print(f"Redis get error: {e}")
+        log_redis_error("set", e)
+
 
-    # Cache miss, fetch from DB
-    data = await fetch_func()
+async def favorite_ids(user_id):
+    """사용자의 즐겨찾기 병원 id 집합"""
     try:
-        await redis_client.set(cache_key, json.dumps(data), ex=3600)
+        redis_client = await hosts.get_redis_connection()
+        members, gen = await _read(redis_client, user_id, "smembers")
     except Exception as e:
-        print(f"Redis set error: {e}")
-    return data
+        log_redis_error("get", e)
+        return _load_ids(user_id)
+    if SENTINEL in members:
+        metrics.incr("favorite.ids_hit")
+        members.discard(SENTINEL)
+        return members
+    metrics.incr("favorite.ids_miss")
+    ids = _load_ids(user_id)
+    await _store_ids(redis_client, user_id, ids, gen)
+    return ids
+
+
+async def is_favorite(user_id, clinic_ids):
+    """clinic_ids 순서대로 즐겨찾기 여부 (True/False) 목록. set 이 있으면 SMISMEMBER 한 번."""
+    try:
+        redis_client = await hosts.get_redis_connection()
+        flags, gen = await _read(redis_client, user_id, "smismember", [SENTINEL, *clinic_ids])
+    except Exception as e:
+        log_redis_error("get", e)
+        ids = _load_ids(user_id)
+        return [clinic_id in ids for clinic_id in clinic_ids]
+    if flags[0]:
+        metrics.incr("favorite.ids_hit")
+        return [bool(flag) for flag in flags[1:]]
+    metrics.incr("favorite.ids_miss")
+    ids = _load_ids(user_id)
+    await _store_ids(redis_client, user_id, ids, gen)
+    return [clinic_id in ids for clinic_id in clinic_ids]
+
+
+async def forget_users(user_ids):
+    """즐겨찾기가 바뀐 사용자들의 set 을 지우고 세대 번호를 올린다 (다음 조회에서 DB 로 다시 채움)"""
+    if not user_ids:
+        return
+    try:
+        redis_client = await hosts.get_redis_connection()
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for user_id in set(user_ids):
+                # 번호도 TTL 을 두되, 진행 중인 조회(수 초)가 채우기 전에 사라지지 않을 만큼 길게
+                pipe.incr(_gen_key(user_id))
+                pipe.expire(_gen_key(user_id), FAVORITE_IDS_TTL)
+                pipe.delete(_ids_key(user_id))
+            await pipe.execute()
+    except Exception as e:
+        log_redis_error("delete", e)
+
 
 # 사용자의 즐겨찾기 목록 불러오기
+# 예전 favorite 테이블 행과 같은 순서 (user_id, clinic_id, name, password(항상 None), latitude, ...)
 @router.get('/{user_id}')
 async def get_favorite_clinics(user_id: str):
-    cache_key = generate_cache_key("favorite_clinics", {"user_id": user_id})
-
-    async def fetch_data():
-        conn = hosts.connect()
-        try:
-            curs = conn.cursor()
-            sql = "SELECT * FROM favorite WHERE user_id = %s"
-            curs.execute(sql, (user_id,))
-            rows = curs.fetchall()
-            return rows
-        except Exception as e:
-            print("Database error:", e)
-            return []
-        finally:
-            conn.close()
-
-    rows = await get_cached_or_fetch(cache_key, fetch_data)
-
-    if not rows:
+    try:
+        ids = await favorite_ids(user_id)
+        rows = await clinic.clinic_rows(sorted(ids))
+    except Exception as e:
+        print("Database error:", e)
+        rows = {}
+
+    results = []
+    for clinic_id in sorted(rows):
+        results.append([user_id] + list(rows[clinic_id]))
+
+    if not results:
         raise HTTPException(status_code=404, detail="즐겨찾기 병원이 없습니다.")
-    
-    return {'results': rows}
+
+    return {'results': results}
 
 # 즐겨찾기 추가
 @router.post('/')
@@ -63,32 +155,29 @@ async def add_favorite(clinic_id: str, user_id: str):
     conn = hosts.connect()
     try:
         curs = conn.cursor()
-
-        # 중복 확인
-        sql_check = "SELECT * FROM favorite WHERE user_id = %s AND clinic_id = %s"
-        curs.execute(sql_check, (user_id, clinic_id))
-        result = curs.fetchone()
-
-        if result:
-            raise HTTPException(status_code=400, detail="이미 즐겨찾기 목록에 있습니다.")
-
-        # 즐겨찾기 추가 (clinic 테이블에서 데이터를 가져와 favorite 테이블에 삽입)
-        sql = """
-            INSERT INTO favorite (user_id, clinic_id, name, password, latitude, longitude, start_time, end_time, introduction, address, phone, image)
-            SELECT %s, id, name, password, latitude, longitude, start_time, end_time, introduction, address, phone, image
-            FROM clinic WHERE id = %s
-        """
-        curs.execute(sql, (user_id, clinic_id))
+        # 있는 병원일 때만 추가, (user_id, clinic_id) 기본 키로 중복을 막는다
+        sql = "INSERT INTO favorite (user_id, clinic_id) SELECT %s, id FROM clinic WHERE id = %s"
+        result = curs.execute(sql, (user_id, clinic_id))
         conn.commit()
-
-
-        return {"message": "즐겨찾기 병원이 추가되었습니다."}
+        if result == 0:
+            raise HTTPException(status_code=404, detail="병원이 없습니다.")
+    except HTTPException:
+        raise
+    except pymysql.err.IntegrityError as e:
+        conn.rollback()
+        if e.args and e.args[0] == DUPLICATE_ENTRY:
+            raise HTTPException(status_code=400, detail="이미 즐겨찾기 목록에 있습니다.")
+        print("Error:", e)
+        raise HTTPException(status_code=500, detail="즐겨찾기 추가 중 문제가 발생했습니다.")
     except Exception as e:
         print("Error:", e)
         raise HTTPException(status_code=500, detail="즐겨찾기 추가 중 문제가 발생했습니다.")
     finally:
         conn.close()
 
+    await forget_users([user_id])
+    return {"message": "즐겨찾기 병원이 추가되었습니다."}
+
 # 즐겨찾기 삭제
 @router.delete('/')
 async def delete_favorite(clinic_id: str, user_id: str):
@@ -103,26 +192,35 @@ async def delete_favorite(clinic_id: str, user_id: str):
 
         if result == 0:
             raise HTTPException(status_code=404, detail="해당 병원이 즐겨찾기에 없습니다.")
-
-        return {"message": "즐겨찾기 병원이 삭제되었습니다."}
+    except HTTPException:
+        raise
     except Exception as e:
         print("Error:", e)
         raise HTTPException(status_code=500, detail="즐겨찾기 삭제 중 문제가 발생했습니다.")
     finally:
         conn.close()
 
-# 즐겨찾기 여부 검사
+    await forget_users([user_id])
+    return {"message": "즐겨찾기 병원이 삭제되었습니다."}
+
+# 즐겨찾기 여부 검사 (1 또는 0)
 @router.get('/{user_id}/like')
 async def search_favorite_clinic(clinic_id: str, user_id: str):
-    conn = hosts.connect()
     try:
-        curs = conn.cursor()
-        sql = "SELECT COUNT(*) FROM favorite WHERE user_id = %s AND clinic_id = %s"
-        curs.execute(sql, (user_id, clinic_id))
-        rows = curs.fetchall()
-        return rows[0][0]
+        return int((await is_favorite(user_id, [clinic_id]))[0])
     except Exception as e:
         print("Database error:", e)
         return 0
-    finally:
-        conn.close()
\ No newline at end of file
+
+# 병원 카드 여러 개의 즐겨찾기 여부를 한 번에 (clinic_ids=a,b,c) -> {"results": {"a": 1, "b": 0, ...}}
+@router.get('/{user_id}/likes')
+async def search_favorite_clinics(clinic_ids: str, user_id: str):
+    ids = [clinic_id for clinic_id in dict.fromkeys(clinic_ids.split(",")) if clinic_id]
+    if len(ids) > LIKES_MAX:
+        raise HTTPException(status_code=400, detail=f"한 번에 최대 {LIKES_MAX}개까지 확인할 수 있습니다.")
+    try:
+        flags = await is_favorite(user_id, ids)
+    except Exception as e:
+        print("Database error:", e)
+        flags = [False] * len(ids)
+    return {'results': {clinic_id: int(flag) for clinic_id, flag in zip(ids, flags)}}
@@ -0,0 +1,224 @@
+"""
+author:
+Description: Redis pub/sub 기반 실시간 이벤트 피드 (Server-Sent Events)
+Fixed:
+Usage:
+    clinic_feed = Hub("feed:clinic:")
+    await clinic_feed.publish(clinic_id, {...})           # 쓰기 핸들러에서
+    return clinic_feed.response(clinic_id, last_event_id)   # SSE 엔드포인트에서
+
+    이벤트는 Redis Stream(최근 VET_FEED_MAXLEN개)에 쌓고 같은 이름의 채널로 PUBLISH 한다.
+    워커마다 패턴 구독 하나만 열어 로컬 접속자에게 나눠주고,
+    재접속 시 Last-Event-ID 이후 이벤트는 Stream에서 다시 읽어 보내준다 (형식이 틀리면 400).
+    처음 화면(snapshot)은 구독을 시작하고 Stream 의 마지막 id 를 본 뒤에 읽어 그 id 로 보내고,
+    그 뒤 이벤트는 Stream 에서 다시 읽는다. 스냅샷을 읽는 사이의 예약/취소도 빠지지 않고, 클라이언트는 스냅샷부터 이어 받을 수 있다.
+    워커당 접속 수는 VET_FEED_MAX_CONNECTIONS 까지: response() 에서 자리를 잡고 응답이 끝나면 돌려준다.
+"""
+
+import asyncio, json, os, re
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+import hosts
+
+FEED_MAXLEN = int(os.getenv("VET_FEED_MAXLEN", "1000"))
+FEED_HEARTBEAT = float(os.getenv("VET_FEED_HEARTBEAT", "15"))
+FEED_MAX_CONNECTIONS = int(os.getenv("VET_FEED_MAX_CONNECTIONS", "500"))
+FEED_QUEUE_SIZE = 100
+# Redis Stream id "<ms>-<seq>"
+EVENT_ID = re.compile(r"^\d{1,20}-\d{1,20}$")
+
+
+def _id_key(event_id: str):
+    # Redis Stream id "1700000000000-0" 비교용
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def format_event(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class Hub:
+    def __init__(self, prefix: str, max_connections: int = FEED_MAX_CONNECTIONS):
+        self.prefix = prefix
+        self.max_connections = max_connections
+        self.subscribers = {}   # topic -> set(asyncio.Queue)
+        self.connections = 0
+        self._listener = None
+        self._listening = None  # 패턴 구독이 열려 있는 동안 set
+
+    # ---------- 발행 ----------
+    async def publish(self, topic: str, data: dict, event: str = "message"):
+        redis_client = await hosts.get_redis_connection()
+        name = f"{self.prefix}{topic}"
+        payload = json.dumps({"event": event, "data": data}, ensure_ascii=False)
+        event_id = await redis_client.xadd(name, {"payload": payload}, maxlen=FEED_MAXLEN, approximate=True)
+        await redis_client.publish(name, json.dumps({"id": event_id, "payload": payload}, ensure_ascii=False))
+        return event_id
+
+    # ---------- 워커 안 팬아웃 ----------
+    def _ensure_listener(self):
+        if self._listening is None:
+            self._listening = asyncio.Event()
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _wait_listening(self):
+        # 첫 접속이면 패턴 구독이 열릴 때까지 (Redis 장애면 heartbeat 만큼만 기다리고 backlog 에 맡긴다)
+        try:
+            await asyncio.wait_for(self._listening.wait(), timeout=FEED_HEARTBEAT)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _listen(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = hosts.redis_pubsub()
+                await pubsub.psubscribe(f"{self.prefix}*")
+                self._listening.set()
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    topic = message["channel"][len(self.prefix):]
+                    queues = self.subscribers.get(topic)
+                    if not queues:
+                        continue
+                    body = json.loads(message["data"])
+                    item = (body["id"], json.loads(body["payload"]))
+                    for queue in list(queues):
+                        try:
+                            queue.put_nowait(item)
+                        except asyncio.QueueFull:
+                            # 너무 느린 접속자는 끊고 Last-Event-ID로 다시 붙게 한다
+                            while not queue.empty():
+                                queue.get_nowait()
+                            queue.put_nowait(None)
+                            queues.discard(queue)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Feed listener error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                self._listening.clear()
+                if pubsub is not None:
+                    try:
+                        await pubsub.close()
+                    except Exception:
+                        pass
+
+    def subscribe(self, topic: str) -> asyncio.Queue:
+        self._ensure_listener()
+        queue = asyncio.Queue(maxsize=FEED_QUEUE_SIZE)
+        self.subscribers.setdefault(topic, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, topic: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(topic)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[topic]
+
+    async def last_id(self, topic: str):
+        """Stream 의 마지막 이벤트 id (비어 있으면 "0-0")"""
+        redis_client = await hosts.get_redis_connection()
+        entries = await redis_client.xrevrange(f"{self.prefix}{topic}", count=1)
+        return entries[0][0] if entries else "0-0"
+
+    async def backlog(self, topic: str, last_event_id: str):
+        redis_client = await hosts.get_redis_connection()
+        entries = await redis_client.xrange(f"{self.prefix}{topic}", min=f"({last_event_id}", count=FEED_MAXLEN)
+        return [(event_id, json.loads(fields["payload"])) for event_id, fields in entries]
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+
+    # ---------- SSE ----------
+    async def stream(self, topic: str, last_event_id: str = None, snapshot=None, predicate=None):
+        # 클라이언트가 끊기면 StreamingResponse가 이 제너레이터를 취소하므로 finally에서 구독이 정리된다
+        # snapshot: 처음 보낼 (event, data) 를 돌려주는 async 함수 (재접속이면 None)
+        # predicate가 있으면 이벤트 data가 조건에 맞는 것만 보낸다 (예: 위치 반경)
+        queue = self.subscribe(topic)
+        try:
+            yield "retry: 3000\n\n"
+            await self._wait_listening()
+            if snapshot is not None:
+                # 구독 -> 마지막 id -> 스냅샷 순서. 스냅샷을 읽는 동안 생긴 이벤트는 아래 backlog 로 다시 보낸다
+                last_event_id = await self.last_id(topic)
+                event, data = await snapshot()
+                yield format_event(last_event_id, event, data)
+
+            last_seen = _id_key(last_event_id) if last_event_id else None
+            if last_event_id:
+                for event_id, body in await self.backlog(topic, last_event_id):
+                    last_seen = _id_key(event_id)
+                    if predicate is None or predicate(body["data"]):
+                        yield format_event(event_id, body["event"], body["data"])
+
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=FEED_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if item is None:
+                    break
+                event_id, body = item
+                # 구독 직후 backlog와 겹친 이벤트는 건너뛴다
+                if last_seen is not None and _id_key(event_id) <= last_seen:
+                    continue
+                last_seen = _id_key(event_id)
+                if predicate is None or predicate(body["data"]):
+                    yield format_event(event_id, body["event"], body["data"])
+        finally:
+            self.unsubscribe(topic, queue)
+
+    def response(self, topic: str, last_event_id: str = None, snapshot=None, predicate=None):
+        # 형식이 틀린 Last-Event-ID 는 스트림 중간에 XRANGE 가 실패하기 전에 400
+        if last_event_id and not EVENT_ID.match(last_event_id):
+            raise HTTPException(status_code=400, detail="Last-Event-ID 형식이 올바르지 않습니다.")
+        # 연결 수 초과는 스트림을 시작하기 전에 503으로 돌려준다.
+        # 자리는 여기서 바로 잡는다 (스트림이 시작될 때 세면 동시에 들어온 접속이 모두 검사를 통과한다)
+        if self.connections >= self.max_connections:
+            raise HTTPException(status_code=503, detail="실시간 연결이 너무 많습니다.", headers={"Retry-After": "5"})
+        self.connections += 1
+        return _FeedResponse(
+            self.stream(topic, last_event_id, snapshot, predicate),
+            release=self._release,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    def _release(self):
+        self.connections -= 1
+
+
+class _FeedResponse(StreamingResponse):
+    """응답이 끝나면(끊김/오류 포함) response() 가 잡은 연결 자리를 돌려준다"""
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+# 병원별 예약 피드
+clinic_feed = Hub("feed:clinic:")
+
+# 시간 슬롯별 예약 가능 여부 변화 (긴급예약 화면)
+slot_feed = Hub("feed:slot:")
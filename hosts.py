@@ -1,8 +1,10 @@
 import pymysql
-import os, json
-import boto3
+import os, json, time, itertools, contextlib, contextvars, threading
+from collections import deque
 import redis.asyncio as redis
-from firebase_admin import credentials, initialize_app
+import redis.exceptions
+from breaker import CircuitBreaker
+import metrics
 
 AWS_ACCESS_KEY = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
@@ -16,69 +18,501 @@ VET_PORT = os.getenv('VET_PORT')
 REDIS_HOST = os.getenv('REDIS_HOST')
 REDIS_PORT = os.getenv("REDIS_PORT")
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
+# Redis 가 응답하지 않을 때 요청이 오래 묶이지 않도록 짧게 (초)
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.25"))
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "0.5"))
 
+# 읽기 전용 복제 DB 목록 "host[:port],host[:port]" (비어 있으면 모든 쿼리가 VET_DB 로 간다)
+VET_DB_REPLICAS = [
+    (h.split(':')[0], h.split(':')[1] if ':' in h else VET_PORT)
+    for h in os.getenv('VET_DB_REPLICAS', '').replace(' ', '').split(',') if h
+]
+VET_DB_MAX_LAG = float(os.getenv('VET_DB_MAX_LAG', '2'))  # 이 이상 밀린 복제본은 쓰지 않음 (초)
+VET_DB_LAG_CHECK_INTERVAL = float(os.getenv('VET_DB_LAG_CHECK_INTERVAL', '5'))
+# DB 연결 풀: 보관할 유휴 연결 수 (0 이면 풀 없이 매번 새로 연결), 시작 시 미리 열어둘 수
+VET_DB_POOL_SIZE = int(os.getenv('VET_DB_POOL_SIZE', '10'))
+VET_DB_POOL_MIN = int(os.getenv('VET_DB_POOL_MIN', '2'))
+VET_DB_POOL_PING_AFTER = float(os.getenv('VET_DB_POOL_PING_AFTER', '30'))  # 이보다 오래 쉰 연결은 ping 후 사용
+# 복제본은 내려가도 GET 이 계속 몰리므로 풀에서 꺼낼 때마다 ping (0) 해서 죽은 연결을 바로 걸러낸다
+VET_DB_REPLICA_PING_AFTER = float(os.getenv('VET_DB_REPLICA_PING_AFTER', '0'))
 
 
-s3 = boto3.client(
-    's3',
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=REGION
+
+# 시작 시(lifecycle) 미리 만들어 둘 외부 서비스 "s3,firebase" (비어 있으면 처음 쓸 때 만든다)
+VET_EAGER_SERVICES = [n for n in os.getenv('VET_EAGER_SERVICES', '').replace(' ', '').split(',') if n]
+
+
+# ====================================
+# 외부 서비스 (처음 쓸 때 생성)
+# ====================================
+# boto3 클라이언트 생성과 Firebase 초기화는 import 시간과 워커당 메모리를 크게 늘리므로
+# hosts import 시점이 아니라 처음 사용할 때(또는 VET_EAGER_SERVICES 로 시작 시) 만든다.
+
+_service_factories = {}
+_services = {}
+_services_lock = threading.Lock()
+
+def register_service(name, factory):
+    _service_factories[name] = factory
+
+def service(name):
+    """이름으로 서비스 객체를 돌려준다. 처음 호출할 때 한 번만 만든다."""
+    if name not in _services:
+        with _services_lock:
+            if name not in _services:
+                started = time.perf_counter()
+                _services[name] = _service_factories[name]()
+                print(f"Service {name} initialized ({(time.perf_counter() - started) * 1000:.0f}ms)")
+    return _services[name]
+
+def init_services(names=None):
+    for name in (VET_EAGER_SERVICES if names is None else names):
+        service(name)
+
+def _create_s3():
+    import boto3
+    return boto3.client(
+        's3',
+        aws_access_key_id=AWS_ACCESS_KEY,
+        aws_secret_access_key=AWS_SECRET_KEY,
+        region_name=REGION
+    )
+
+def _create_firebase():
+    from firebase_admin import credentials, initialize_app
+    firebase_key_json = os.getenv("VET_FIREBASE_KEY")
+    if not firebase_key_json:
+        raise ValueError("VET_FIREBASE_KEY environment variable is not set")
+
+    # JSON 문자열을 Python 딕셔너리로 변환
+    firebase_key = json.loads(firebase_key_json)
+
+    # Firebase 초기화
+    cred = credentials.Certificate(firebase_key)
+    return initialize_app(cred)
+
+register_service("s3", _create_s3)
+register_service("firebase", _create_firebase)
+
+def firebase_app():
+    return service("firebase")
+
+def firebase_project_id():
+    """Firebase 프로젝트 ID (VET_FIREBASE_PROJECT_ID, 없으면 서비스 계정 키의 project_id). 앱 초기화는 하지 않는다."""
+    project_id = os.getenv("VET_FIREBASE_PROJECT_ID")
+    if not project_id and os.getenv("VET_FIREBASE_KEY"):
+        project_id = json.loads(os.getenv("VET_FIREBASE_KEY")).get("project_id")
+    return project_id
+
+if not os.getenv("VET_FIREBASE_KEY"):
+    # 초기화는 처음 쓸 때 하지만 설정 누락은 배포 로그에서 바로 보이도록
+    print("Warning: VET_FIREBASE_KEY environment variable is not set")
+
+def __getattr__(name):
+    # hosts.s3 는 기존 코드 그대로 쓸 수 있게 첫 접근 시 생성한다 (hosts.s3 = ... 로 바꿔 끼우는 것도 가능)
+    if name == "s3":
+        return service("s3")
+    raise AttributeError(f"module 'hosts' has no attribute {name!r}")
+
+
+# 연속 실패가 쌓이면 Redis 를 건너뛰고 캐시 없이(또는 로컬 캐시로) 응답한다
+redis_breaker = CircuitBreaker(
+    "redis",
+    failure_threshold=int(os.getenv("REDIS_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("REDIS_BREAKER_RESET", "10")),
+    failure_types=(redis.exceptions.ConnectionError, redis.exceptions.TimeoutError, OSError, TimeoutError),
 )
+metrics.register("redis", redis_breaker.snapshot)
+
 
+class GuardedRedis:
+    """Redis 클라이언트의 명령을 서킷 브레이커로 감싼다.
+    pubsub(), pipeline(), scan_iter() 처럼 await 하지 않는 것은 그대로 넘긴다."""
 
-firebase_key_json = os.getenv("VET_FIREBASE_KEY")
-if not firebase_key_json:
-    raise ValueError("VET_FIREBASE_KEY environment variable is not set")
+    PASSTHROUGH = {
+        "pubsub", "pipeline", "lock", "register_script", "monitor",
+        "scan_iter", "hscan_iter", "sscan_iter", "zscan_iter", "close", "aclose",
+    }
 
-# JSON 문자열을 Python 딕셔너리로 변환
-firebase_key = json.loads(firebase_key_json)
+    def __init__(self, client, breaker=redis_breaker):
+        self._client = client
+        self._breaker = breaker
 
-# Firebase 초기화
-cred = credentials.Certificate(firebase_key)
-print(cred)
-initialize_app(cred)
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr) or name in self.PASSTHROUGH:
+            return attr
+
+        async def guarded(*args, **kwargs):
+            return await self._breaker.call(attr, *args, **kwargs)
+        return guarded
 
 
 redis_client = None
 async def get_redis_connection():
+    """항상 클라이언트를 돌려준다. 연결 실패는 명령 실행 시점에 (브레이커를 거쳐) 드러난다."""
     global redis_client
     if not redis_client:
+        print("Initializing Redis connection pool...")
+        # Redis 연결 풀 생성
+        connection_pool = redis.ConnectionPool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            max_connections=10,  # 연결 풀 크기 설정
+            socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+            socket_timeout=REDIS_TIMEOUT,
+            decode_responses=True  # 문자열 디코딩 활성화
+        )
+        redis_client = GuardedRedis(redis.Redis(connection_pool=connection_pool))
+        # 연결 테스트
         try:
-            print("Initializing Redis connection pool...")
-            # Redis 연결 풀 생성
-            connection_pool = redis.ConnectionPool(
-                host=REDIS_HOST,
-                port=REDIS_PORT,
-                max_connections=10,  # 연결 풀 크기 설정
-                decode_responses=True  # 문자열 디코딩 활성화
-            )
-            redis_client = redis.Redis(connection_pool=connection_pool)
-            # 연결 테스트
             await redis_client.ping()
             print("Redis connection pool established.")
         except Exception as e:
             print(f"Failed to connect to Redis: {e}")
-            redis_client = None
-            raise e
     return redis_client
 
+# pub/sub 구독은 메시지가 없을 때도 계속 읽고 있어야 하므로 명령용 클라이언트(짧은 socket_timeout,
+# 서킷 브레이커)와 분리한다. 재연결은 구독하는 쪽(feed.py)에서 처리한다.
+pubsub_client = None
+def redis_pubsub():
+    global pubsub_client
+    if not pubsub_client:
+        pubsub_client = redis.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+            decode_responses=True
+        )
+    return pubsub_client.pubsub()
+
 async def close_redis_connection():
-    global redis_client
+    global redis_client, pubsub_client
     if redis_client:
         print("Closing Redis connection pool...")
         await redis_client.close()
         redis_client = None
         print("Redis connection pool closed.")
+    if pubsub_client:
+        await pubsub_client.close()
+        pubsub_client = None
+
+
+# 요청 단위 DB 라우팅 상태 (dbroute.ReplicaRoutingMiddleware 가 설정)
+# {"write": 쓰기 메서드인지, "read_only": 복제본을 써도 되는지, "wrote": primary 에 쓰기 연결을 열었는지}
+db_request = contextvars.ContextVar("db_request", default=None)
 
+_replica_health = {}  # (host, port) -> (마지막 확인 시각, 사용 가능 여부)
+_replica_turn = itertools.count()
 
-def connect():
-    conn = pymysql.connect(
-        host=VET_DB,
+
+def _open(host, port):
+    return pymysql.connect(
+        host=host,
         user=VET_USER,
         password=VET_PASSWORD,
         charset='utf8',
         db=VET_TABLE,
-        port=int(VET_PORT)
+        port=int(port)
     )
-    return conn
\ No newline at end of file
+
+
+class PooledConnection:
+    """close() 하면 실제로 닫지 않고 풀로 돌려준다. 나머지는 pymysql 연결과 같다."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def discard(self):
+        """풀에 돌려주지 않고 닫는다 (KILL QUERY 로 멈춘 연결 등)"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool._discard(conn)
+
+
+class ConnectionPool:
+    def __init__(self, host, port, size=VET_DB_POOL_SIZE, ping_after=VET_DB_POOL_PING_AFTER):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.ping_after = ping_after
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "reused": 0, "discarded": 0}
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                item = self._idle.pop() if self._idle else None
+            if item is None:
+                self.stats["opened"] += 1
+                return PooledConnection(self, _open(self.host, self.port))
+            conn, released_at = item
+            if time.monotonic() - released_at >= self.ping_after:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    self._discard(conn)
+                    continue
+            self.stats["reused"] += 1
+            return PooledConnection(self, conn)
+
+    def release(self, conn):
+        result = getattr(conn, "_result", None)
+        if result is not None and getattr(result, "unbuffered_active", False):
+            # 서버 측 커서(SSCursor)를 다 읽기 전에 닫았다. rollback 하면 남은 행을 모두 받아 버리므로
+            # 연결째 버린다 (MySQL 은 보내기에 실패하면 쿼리를 멈춘다)
+            self._discard(conn)
+            return
+        try:
+            # 커밋하지 않은 트랜잭션(조회 스냅샷 포함)을 끝내야 다음 사용자가 최신 데이터를 본다
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._discard(conn)
+
+    def _discard(self, conn):
+        self.stats["discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def fill(self, count):
+        conns = [self.acquire() for _ in range(min(count, self.size))]
+        for conn in conns:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def snapshot(self):
+        return {"idle": len(self._idle), "size": self.size, **self.stats}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _pool(host, port):
+    key = (host, str(port))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            replica = any(key == (h, str(p)) for h, p in VET_DB_REPLICAS)
+            pool = _pools.setdefault(key, ConnectionPool(
+                host, port, ping_after=VET_DB_REPLICA_PING_AFTER if replica else VET_DB_POOL_PING_AFTER))
+    return pool
+
+def _acquire(host, port):
+    if VET_DB_POOL_SIZE <= 0:
+        return _open(host, port)
+    return _pool(host, port).acquire()
+
+def init_db_pools():
+    """시작 시 primary(와 복제본) 연결을 미리 열어둔다. 연결 실패는 그대로 올린다."""
+    if VET_DB_POOL_SIZE <= 0:
+        return
+    for host, port in [(VET_DB, VET_PORT)] + VET_DB_REPLICAS:
+        _pool(host, port).fill(VET_DB_POOL_MIN)
+
+def close_db_pools():
+    for pool in list(_pools.values()):
+        pool.close()
+
+metrics.register("db_pool", lambda: {f"{host}:{port}": pool.snapshot() for (host, port), pool in _pools.items()})
+
+
+# ====================================
+# fork 후 초기화
+# ====================================
+# serve.py 가 main 을 미리 import 한 뒤 fork 하면(VET_PRELOAD=1) 부모가 만든 연결과 클라이언트가
+# 워커에 그대로 복사된다. 같은 소켓을 여러 프로세스가 쓰면 응답이 섞이므로 워커에서는 모두 버리고
+# 처음 쓸 때 새로 만든다. 부모의 객체를 닫으면(QUIT 등) 부모 쪽 연결까지 끊기므로 닫지 않고
+# _inherited 에 잡아 두어 가비지 컬렉션 시 정리 코드도 돌지 않게 한다.
+
+_inherited = []
+
+def _reset_after_fork():
+    global redis_client, pubsub_client, _pools, _pools_lock, _services, _services_lock, _replica_health
+    _inherited.append((redis_client, pubsub_client, _pools, _services))
+    redis_client = None
+    pubsub_client = None
+    _pools = {}
+    _pools_lock = threading.Lock()
+    _services = {}
+    _services_lock = threading.Lock()
+    _replica_health = {}
+    redis_breaker.reset()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def replica_lag(conn):
+    """복제 지연(초). 복제가 멈췄거나 복제본이 아니면 None"""
+    curs = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        curs.execute("SHOW REPLICA STATUS")
+    except pymysql.err.MySQLError:
+        # MySQL 8.0.22 이전
+        curs.execute("SHOW SLAVE STATUS")
+    row = curs.fetchone()
+    if not row:
+        return None
+    return row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+
+
+# 연결이 끊겼다는 뜻의 오류 (2003 연결 불가, 2006 server has gone away, 2013 쿼리 중 끊김, 2055 읽기 실패)
+CONNECTION_LOST = (2003, 2006, 2013, 2055)
+
+def _connection_lost(error):
+    if isinstance(error, (pymysql.err.InterfaceError, ConnectionError)):
+        return True
+    return isinstance(error, pymysql.err.OperationalError) and bool(error.args) and error.args[0] in CONNECTION_LOST
+
+
+def mark_replica_down(replica, error):
+    """다음 확인 시각까지 복제본을 쓰지 않고, 풀에 남은 (아마 끊긴) 연결도 버린다"""
+    print(f"Replica {replica[0]} marked down: {error}")
+    metrics.incr("db.replica_down")
+    _replica_health[replica] = (time.monotonic(), False)
+    pool = _pools.get((replica[0], str(replica[1])))
+    if pool is not None:
+        pool.close()
+
+
+class ReplicaConnection:
+    """복제본 연결. 쿼리 중 연결이 끊기면 복제본을 내리고 primary 연결로 바꿔 같은 쿼리를 다시 실행한다
+    (복제본은 읽기 전용 요청에만 쓰므로 다시 실행해도 안전하다)."""
+
+    def __init__(self, conn, replica):
+        self._conn = conn
+        self._replica = replica
+        self.failed_over = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args):
+        return _FailoverCursor(self, args)
+
+    def _failover(self, error):
+        mark_replica_down(self._replica, error)
+        getattr(self._conn, "discard", self._conn.close)()
+        self._conn = _acquire(VET_DB, VET_PORT)
+        self.failed_over = True
+        metrics.incr("db.replica_failover")
+
+    def close(self):
+        self._conn.close()
+
+
+class _FailoverCursor:
+    def __init__(self, conn, args):
+        self._owner = conn
+        self._args = args
+        self._curs = conn._conn.cursor(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._curs, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._curs.close()
+
+    def execute(self, query, args=None):
+        try:
+            return self._curs.execute(query, args)
+        except Exception as e:
+            if self._owner.failed_over or not _connection_lost(e):
+                raise
+            self._owner._failover(e)
+            self._curs = self._owner._conn.cursor(*self._args)
+            return self._curs.execute(query, args)
+
+
+def _connect_replica():
+    # 순서대로 돌아가며 고르고, 연결 실패/지연 초과인 복제본은 다음 확인 시각까지 건너뛴다
+    for _ in range(len(VET_DB_REPLICAS)):
+        replica = VET_DB_REPLICAS[next(_replica_turn) % len(VET_DB_REPLICAS)]
+        checked_at, healthy = _replica_health.get(replica, (None, True))
+        now = time.monotonic()
+        due = checked_at is None or now - checked_at >= VET_DB_LAG_CHECK_INTERVAL
+        if not healthy and not due:
+            continue
+        try:
+            conn = _acquire(*replica)
+        except Exception as e:
+            mark_replica_down(replica, f"connect error {e}")
+            continue
+        if due:
+            try:
+                lag = replica_lag(conn)
+            except Exception as e:
+                print(f"Replica lag check error {replica[0]}: {e}")
+                lag = None
+            healthy = lag is not None and lag <= VET_DB_MAX_LAG
+            _replica_health[replica] = (now, healthy)
+            if not healthy:
+                print(f"Replica {replica[0]} skipped (lag: {lag})")
+                conn.close()
+                continue
+        return ReplicaConnection(conn, replica)
+    return None
+
+
+def kill_query(conn):
+    """conn 에서 실행 중인 쿼리를 다른 연결로 멈춘다 (KILL QUERY). conn 쪽 execute 는 오류 1317 로 끝난다."""
+    killer = _acquire(conn.host, conn.port)
+    try:
+        with killer.cursor() as curs:
+            curs.execute("KILL QUERY %s", (conn.thread_id(),))
+    finally:
+        killer.close()
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """이 블록 안의 connect() 는 읽기도 primary 로 보낸다 (쓰기로 표시하지 않으므로 sticky 쿠키는 붙지 않는다)"""
+    state = db_request.get()
+    if state is None or not state["read_only"]:
+        yield
+        return
+    token = db_request.set({**state, "read_only": False})
+    try:
+        yield
+    finally:
+        db_request.reset(token)
+
+
+def connect(primary=False):
+    """GET 요청은 복제본, 그 외(쓰기, 최근 쓰기한 사용자, 복제본 장애)는 VET_DB 로 연결한다.
+    GET 이면서 쓰기를 하는 핸들러는 primary=True 로 호출한다."""
+    state = db_request.get()
+    if state is not None:
+        if primary or state["write"]:
+            state["wrote"] = True
+        elif state["read_only"] and VET_DB_REPLICAS:
+            conn = _connect_replica()
+            if conn is not None:
+                return conn
+    return _acquire(VET_DB, VET_PORT)
@@ -0,0 +1,433 @@
+"""
+author:
+Description: 쓰기 후 부가 작업(푸시 알림 등)을 요청 밖에서 처리하는 작업 큐와 워커
+Fixed:
+Usage:
+    import jobs
+    jobs.register("notify", send_batch, batch_size=100)   # 모듈 import 시 처리 함수 등록
+    await jobs.enqueue("notify", {"topic": "clinic-1", ...})   # 쓰기 핸들러: DB 커밋 뒤 넣고 바로 응답
+
+    - 큐는 Redis 리스트다 (VET_JOBS_BACKEND=redis, 기본). local 이면 프로세스 메모리 큐(LocalQueue)만 쓴다 (벤치/시험용).
+        jobs:{큐}                  대기 (LPUSH 로 넣고 오른쪽에서 꺼낸다)
+        jobs:{큐}:processing:{워커} 꺼내 간 작업. 끝나면 지운다. 워커가 죽으면 다른 워커가 대기로 되돌린다
+        jobs:{큐}:delayed          재시도 대기 (점수 = 다시 실행할 시각)
+        jobs:{큐}:dead             VET_JOBS_MAX_ATTEMPTS 번 실패했거나 다시 해도 안 되는(Permanent) 작업
+      Redis 에 넣지 못하면 이 프로세스의 LocalQueue 에 넣어 처리한다 (프로세스가 죽으면 잃는다).
+    - 각 웹 워커 프로세스가 lifecycle 에서 run() 을 띄운다 (VET_JOBS_WORKER=0 이면 넣기만 한다).
+      한 번에 VET_JOBS_BATCH 개까지 꺼내 종류별로 모아 처리한다. batch_size 가 1 보다 큰 처리 함수는
+      args 목록을 받아 작업마다 None(성공) 또는 예외를 돌려준다.
+    - 실패하면 VET_JOBS_RETRY_BASE x 2^(시도-1) 초 뒤 다시 한다.
+    - VET_JOBS_TIMEOUT 이 지나면 기다리기만 그만둔다 (스레드에서 보내는 중이면 끝까지 보낸다).
+      다시 하면 두 번 갈 수 있는 작업(푸시 알림)은 register(..., retry_timeout=False) 로 시간 초과를 dead 로 보낸다.
+    - 상태: GET /metrics/jobs, 카운터 jobs.<종류>.enqueued/done/retried/dead.
+      죽은 작업 되살리기: await jobs.requeue_dead()
+    - 예약 직후 보여야 하는 캐시 무효화(슬롯, 예약 내역)는 지금처럼 요청 안에서 한다.
+"""
+
+import asyncio, json, os, random, socket, time, uuid
+import hosts, metrics
+from cache import log_redis_error, run_script
+
+BACKEND = os.getenv("VET_JOBS_BACKEND", "redis")
+WORKER_ENABLED = os.getenv("VET_JOBS_WORKER", "1") == "1"
+QUEUE = os.getenv("VET_JOBS_QUEUE", "default")
+BATCH = int(os.getenv("VET_JOBS_BATCH", "100"))
+MAX_ATTEMPTS = int(os.getenv("VET_JOBS_MAX_ATTEMPTS", "5"))
+RETRY_BASE = float(os.getenv("VET_JOBS_RETRY_BASE", "2"))
+JOB_TIMEOUT = float(os.getenv("VET_JOBS_TIMEOUT", "30"))
+IDLE_WAIT = float(os.getenv("VET_JOBS_IDLE_WAIT", "1"))     # 비어 있을 때 다시 볼 때까지 (초)
+HEARTBEAT = float(os.getenv("VET_JOBS_HEARTBEAT", "10"))    # 지연 작업 옮기기/죽은 워커 작업 회수 주기
+DEAD_MAX = 10000
+
+
+class Permanent(Exception):
+    """다시 해도 성공하지 않을 실패. 재시도 없이 dead 로 보낸다."""
+
+
+_handlers = {}
+
+
+def register(kind, func, batch_size=1, retry_timeout=True):
+    _handlers[kind] = (func, batch_size, retry_timeout)
+
+
+def _job(kind, args, attempts=0, job_id=None):
+    return {"id": job_id or uuid.uuid4().hex, "kind": kind, "args": args, "attempts": attempts,
+            "enqueued_at": round(time.time(), 3)}
+
+
+def _fresh(raw):
+    """dead 에서 되살릴 때 시도 횟수를 처음부터"""
+    job = json.loads(raw)
+    job["attempts"] = 0
+    job.pop("error", None)
+    return json.dumps(job, ensure_ascii=False)
+
+
+# ---------- 큐 ----------
+
+class LocalQueue:
+    """RedisQueue 와 같은 동작을 프로세스 메모리에서 (시험용, Redis 장애 시 임시)"""
+
+    def __init__(self):
+        self.ready = []
+        self.processing = []
+        self.delayed = []
+        self.dead = []
+
+    async def push(self, raw):
+        self.ready.append(raw)
+
+    async def claim(self, count):
+        taken, self.ready = self.ready[:count], self.ready[count:]
+        self.processing += taken
+        return taken
+
+    async def ack(self, raw):
+        self.processing.remove(raw)
+
+    async def retry(self, raw, new_raw, run_at):
+        self.processing.remove(raw)
+        self.delayed.append((run_at, new_raw))
+
+    async def bury(self, raw, new_raw):
+        self.processing.remove(raw)
+        self.dead = ([new_raw] + self.dead)[:DEAD_MAX]
+
+    async def maintain(self):
+        now = time.time()
+        due = [item for item in self.delayed if item[0] <= now]
+        self.delayed = [item for item in self.delayed if item[0] > now]
+        self.ready += [raw for _, raw in sorted(due)]
+
+    async def release(self):
+        self.ready = self.processing + self.ready
+        self.processing = []
+
+    async def requeue_dead(self):
+        dead, self.dead = self.dead[::-1], []
+        self.ready += [_fresh(raw) for raw in dead]
+        return len(dead)
+
+    async def stats(self):
+        return {"ready": len(self.ready), "processing": len(self.processing),
+                "delayed": len(self.delayed), "dead": len(self.dead)}
+
+
+# 오른쪽(오래된 것)부터 count 개를 processing 으로 옮긴다
+CLAIM = """
+local items = {}
+for i = 1, tonumber(ARGV[1]) do
+    local item = redis.call('RPOPLPUSH', KEYS[1], KEYS[2])
+    if not item then break end
+    items[#items + 1] = item
+end
+return items
+"""
+
+# 다시 할 시각이 된 재시도 작업을 대기열로
+PROMOTE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, item in ipairs(due) do
+    redis.call('ZREM', KEYS[1], item)
+    redis.call('LPUSH', KEYS[2], item)
+end
+return #due
+"""
+
+# processing 에 남은 작업을 모두 대기열 맨 앞(먼저 꺼낼 쪽)으로
+RESTORE = """
+local moved = 0
+while redis.call('LMOVE', KEYS[1], KEYS[2], 'LEFT', 'RIGHT') do
+    moved = moved + 1
+end
+return moved
+"""
+
+ACK_RETRY = """
+redis.call('LREM', KEYS[1], 1, ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[2])
+return 1
+"""
+
+ACK_BURY = """
+redis.call('LREM', KEYS[1], 1, ARGV[1])
+redis.call('LPUSH', KEYS[2], ARGV[2])
+redis.call('LTRIM', KEYS[2], 0, tonumber(ARGV[3]) - 1)
+return 1
+"""
+
+
+class RedisQueue:
+    def __init__(self, name, worker_id):
+        self.ready_key = f"jobs:{name}"
+        self.processing_prefix = f"jobs:{name}:processing:"
+        self.processing_key = self.processing_prefix + worker_id
+        self.delayed_key = f"jobs:{name}:delayed"
+        self.dead_key = f"jobs:{name}:dead"
+        self.worker_key = f"jobs:worker:{worker_id}"
+
+    async def _redis(self):
+        return await hosts.get_redis_connection()
+
+    async def push(self, raw):
+        await (await self._redis()).lpush(self.ready_key, raw)
+
+    async def claim(self, count):
+        return await run_script(await self._redis(), CLAIM, [self.ready_key, self.processing_key], [count])
+
+    async def ack(self, raw):
+        await (await self._redis()).lrem(self.processing_key, 1, raw)
+
+    async def retry(self, raw, new_raw, run_at):
+        await run_script(await self._redis(), ACK_RETRY, [self.processing_key, self.delayed_key],
+                         [raw, new_raw, f"{run_at:.3f}"])
+
+    async def bury(self, raw, new_raw):
+        await run_script(await self._redis(), ACK_BURY, [self.processing_key, self.dead_key], [raw, new_raw, DEAD_MAX])
+
+    async def heartbeat(self):
+        await (await self._redis()).set(self.worker_key, 1, ex=max(1, int(HEARTBEAT * 3)))
+
+    async def maintain(self):
+        """재시도 시각이 된 작업과 죽은 워커(heartbeat 가 끊긴)가 꺼내 간 작업을 대기열로 옮긴다"""
+        redis_client = await self._redis()
+        await run_script(redis_client, PROMOTE, [self.delayed_key, self.ready_key], [f"{time.time():.3f}", 1000])
+        async for key in redis_client.scan_iter(match=self.processing_prefix + "*", count=100):
+            worker_id = key[len(self.processing_prefix):]
+            if key != self.processing_key and not await redis_client.exists(f"jobs:worker:{worker_id}"):
+                moved = await run_script(redis_client, RESTORE, [key, self.ready_key], [])
+                if moved:
+                    print(f"Jobs: recovered {moved} jobs from worker {worker_id}")
+                    metrics.incr("jobs.recovered", moved)
+
+    async def release(self):
+        redis_client = await self._redis()
+        await run_script(redis_client, RESTORE, [self.processing_key, self.ready_key], [])
+        await redis_client.delete(self.worker_key)
+
+    async def requeue_dead(self):
+        redis_client = await self._redis()
+        count = 0
+        while True:
+            raw = await redis_client.rpop(self.dead_key)
+            if raw is None:
+                return count
+            await redis_client.lpush(self.ready_key, _fresh(raw))
+            count += 1
+
+    async def stats(self):
+        redis_client = await self._redis()
+        processing = 0
+        async for key in redis_client.scan_iter(match=self.processing_prefix + "*", count=100):
+            processing += await redis_client.llen(key)
+        return {
+            "ready": await redis_client.llen(self.ready_key),
+            "processing": processing,
+            "delayed": await redis_client.zcard(self.delayed_key),
+            "dead": await redis_client.llen(self.dead_key),
+        }
+
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+local_queue = LocalQueue()
+queue = local_queue if BACKEND == "local" else RedisQueue(QUEUE, WORKER_ID)
+
+
+def _after_fork():
+    global WORKER_ID, queue
+    WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+    if isinstance(queue, RedisQueue):
+        queue = RedisQueue(QUEUE, WORKER_ID)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+_wakeup = None
+
+
+def _wake():
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    _wakeup.set()
+
+
+async def enqueue(kind, args):
+    """작업을 넣는다. Redis 에 넣지 못하면 이 프로세스 메모리 큐에 넣는다. 실패로 요청을 막지 않는다."""
+    raw = json.dumps(_job(kind, args), ensure_ascii=False)
+    try:
+        await queue.push(raw)
+    except Exception as e:
+        log_redis_error("enqueue", e)
+        metrics.incr("jobs.enqueue_fallback")
+        await local_queue.push(raw)
+    metrics.incr(f"jobs.{kind}.enqueued")
+    _wake()
+
+
+# ---------- 워커 ----------
+
+async def _call(func, args, retry_timeout=True):
+    try:
+        return await asyncio.wait_for(func(args), JOB_TIMEOUT)
+    except asyncio.TimeoutError as e:
+        if retry_timeout:
+            return e
+        # 기다리기만 취소된다. 실행기 스레드는 계속 보내므로 다시 하면 중복된다
+        return Permanent(f"timed out after {JOB_TIMEOUT}s (may have been sent)")
+    except Exception as e:
+        return e
+
+
+async def _run_handler(kind, items):
+    """items: [(raw, job)] -> [(raw, job, 오류 또는 None)]"""
+    handler = _handlers.get(kind)
+    if handler is None:
+        return [(raw, job, Permanent(f"unknown job kind {kind}")) for raw, job in items]
+    func, batch_size, retry_timeout = handler
+    results = []
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        if batch_size == 1:
+            errors = [await _call(func, chunk[0][1]["args"], retry_timeout)]
+        else:
+            errors = await _call(func, [job["args"] for _, job in chunk], retry_timeout)
+            if isinstance(errors, BaseException):
+                errors = [errors] * len(chunk)
+        results += [(raw, job, error if isinstance(error, BaseException) else None)
+                    for (raw, job), error in zip(chunk, errors)]
+    return results
+
+
+async def process(source, raws):
+    """꺼낸 작업을 종류별로 처리하고 성공은 지우고, 실패는 재시도 또는 dead 로 보낸다"""
+    by_kind = {}
+    for raw in raws:
+        try:
+            job = json.loads(raw)
+        except ValueError:
+            await source.bury(raw, raw)
+            continue
+        by_kind.setdefault(job.get("kind"), []).append((raw, job))
+
+    for kind, items in by_kind.items():
+        for raw, job, error in await _run_handler(kind, items):
+            if error is None:
+                metrics.incr(f"jobs.{kind}.done")
+                await source.ack(raw)
+                continue
+            attempts = job.get("attempts", 0) + 1
+            failed = json.dumps({**job, "attempts": attempts, "error": str(error)[:500]}, ensure_ascii=False)
+            if isinstance(error, Permanent) or attempts >= MAX_ATTEMPTS:
+                print(f"Job {kind} {job.get('id')} failed permanently: {error}")
+                metrics.incr(f"jobs.{kind}.dead")
+                await source.bury(raw, failed)
+            else:
+                delay = RETRY_BASE * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+                metrics.incr(f"jobs.{kind}.retried")
+                await source.retry(raw, failed, time.time() + delay)
+
+
+def _sources():
+    return [local_queue] if queue is local_queue else [local_queue, queue]
+
+
+async def run_once():
+    """대기 중인 작업을 한 번 꺼내 처리한다. 처리한 수를 돌려준다."""
+    handled = 0
+    for source in _sources():
+        try:
+            raws = await source.claim(BATCH)
+        except Exception as e:
+            log_redis_error("claim", e)
+            continue
+        if raws:
+            await process(source, raws)
+            handled += len(raws)
+    return handled
+
+
+async def maintain():
+    for source in _sources():
+        try:
+            await source.maintain()
+        except Exception as e:
+            log_redis_error("jobs maintain", e)
+
+
+async def _heartbeat():
+    # 오래 걸리는 작업을 처리하는 중에도 살아 있다고 알려 다른 워커가 작업을 회수하지 않게 한다
+    while True:
+        try:
+            await queue.heartbeat()
+        except Exception as e:
+            log_redis_error("jobs heartbeat", e)
+        await asyncio.sleep(HEARTBEAT)
+
+
+async def run():
+    """lifecycle 이 띄우는 워커 루프"""
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    if queue is not local_queue:
+        # 같은 이름(호스트:pid)으로 다시 뜬 경우 이전 프로세스가 끝내지 못한 작업부터 되돌린다
+        try:
+            await queue.release()
+        except Exception as e:
+            log_redis_error("jobs release", e)
+    beat = asyncio.get_running_loop().create_task(_heartbeat()) if queue is not local_queue else None
+    next_maintain = 0
+    try:
+        while True:
+            if time.monotonic() >= next_maintain:
+                await maintain()
+                next_maintain = time.monotonic() + HEARTBEAT
+            try:
+                handled = await run_once()
+            except Exception as e:
+                print(f"Jobs worker error: {e}")
+                handled = 0
+            if not handled:
+                _wakeup.clear()
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), IDLE_WAIT)
+                except asyncio.TimeoutError:
+                    pass
+    finally:
+        if beat is not None:
+            beat.cancel()
+
+
+async def stop():
+    """종료 시 이 워커가 꺼내 두고 끝내지 못한 작업을 대기열로 돌려준다 (메모리 큐의 작업은 Redis 로 옮겨 본다)"""
+    if queue is local_queue:
+        return
+    try:
+        await queue.release()
+        await local_queue.release()
+        while local_queue.ready:
+            await queue.push(local_queue.ready[0])
+            local_queue.ready.pop(0)
+    except Exception as e:
+        log_redis_error("jobs release", e)
+    if local_queue.ready:
+        print(f"Jobs: {len(local_queue.ready)} local jobs dropped at shutdown")
+
+
+async def requeue_dead():
+    return await queue.requeue_dead()
+
+
+metrics.register("jobs", lambda: {"backend": BACKEND, "worker": WORKER_ID, "local": {
+    "ready": len(local_queue.ready), "processing": len(local_queue.processing),
+    "delayed": len(local_queue.delayed), "dead": len(local_queue.dead)}})
+
+
+async def stats():
+    result = {"backend": BACKEND, "worker": WORKER_ID, "local": await local_queue.stats()}
+    if queue is not local_queue:
+        result["redis"] = await queue.stats()
+    return result
@@ -0,0 +1,163 @@
+"""
+author:
+Description: 앱 시작/종료 시 자원 준비와 정리, 캐시 예열, 준비 상태 확인 (/health)
+Fixed:
+Usage:
+    main.py 에서 app.on_event("startup"/"shutdown") 으로 연결한다.
+
+    시작: DB 연결 풀(VET_DB_POOL_MIN 개)과 Redis 연결, VET_EAGER_SERVICES 에 적은 외부 서비스(s3, firebase),
+          비밀번호 검증 프로세스 풀을 먼저 준비하고, 백그라운드에서 캐시를 예열한다.
+          병원 목록, 동물 종류/세부 종류, 지금부터 VET_WARMUP_SLOTS 개 슬롯의 예약 가능 병원.
+          DB 에 연결할 수 없으면 VET_WARMUP_RETRY 초마다 다시 시도한다.
+    GET /health/live  : 프로세스가 떠 있으면 200
+    GET /health/ready : 예열이 끝나야 200, 그 전에는 503 (배포 시 트래픽 전환 기준)
+    워커 지표: VET_METRICS_PUBLISH 초마다 Redis 에 올린다 (GET /metrics/workers).
+    동물 종류 스냅샷: VET_SPECIES_REFRESH 초마다 Redis 버전을 보고 바뀌었으면 다시 읽는다 (species.py).
+    작업 워커: VET_JOBS_WORKER=1 이면 푸시 알림 등 부가 작업을 처리한다 (jobs.py).
+    종료: 작업 워커(끝내지 못한 작업은 대기열로 되돌림), 실시간 피드 구독, Redis, DB 연결 풀, 비밀번호 검증 프로세스 풀을 닫는다.
+
+    VET_WARMUP=0 이면 예열 없이 자원 준비만 하고 바로 ready 가 된다.
+"""
+
+import asyncio, os, time
+from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+import hosts, jobs, metrics, passwords, species
+from feed import clinic_feed, slot_feed
+from timeslot import format_time
+
+router = APIRouter()
+
+WARMUP_ENABLED = os.getenv("VET_WARMUP", "1") != "0"
+WARMUP_SLOTS = int(os.getenv("VET_WARMUP_SLOTS", "16"))
+WARMUP_SLOT_MINUTES = 30
+WARMUP_RETRY = float(os.getenv("VET_WARMUP_RETRY", "2"))
+
+# (경로, 인자) - 라우터의 GET 핸들러를 그대로 호출해 같은 캐시 키를 채운다
+WARMUP_TARGETS = [
+    ("/clinic/", {}),
+    ("/species/types", {}),
+    ("/species/categories", {}),
+]
+
+status = {"ready": False, "started_at": None, "warmed_at": None, "warmed": [], "errors": []}
+_warm_task = None
+_publish_task = None
+_species_task = None
+_jobs_task = None
+
+
+def upcoming_slots(count, now=None):
+    """now 이후 처음 오는 슬롯부터 count 개 ('YYYY-MM-DD HH:MM')"""
+    now = now or datetime.now()
+    start = now.replace(second=0, microsecond=0)
+    start += timedelta(minutes=-start.minute % WARMUP_SLOT_MINUTES)
+    return [format_time(start + timedelta(minutes=WARMUP_SLOT_MINUTES * i)) for i in range(count)]
+
+
+def _endpoint(app, path):
+    for route in app.routes:
+        if getattr(route, "path", None) == path and "GET" in getattr(route, "methods", ()):
+            return route.endpoint
+    raise LookupError(path)
+
+
+async def _init_resources():
+    # 풀 채우기와 서비스 생성은 동기 I/O 라서 이벤트 루프를 막지 않도록 스레드에서
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, hosts.init_db_pools)
+    await loop.run_in_executor(None, hosts.init_services)
+    await loop.run_in_executor(None, passwords.warm_pool)
+    await hosts.get_redis_connection()
+
+
+async def warm(app):
+    targets = list(WARMUP_TARGETS) + [("/available/available_clinic", {"time": t}) for t in upcoming_slots(WARMUP_SLOTS)]
+    for path, kwargs in targets:
+        started = time.perf_counter()
+        try:
+            try:
+                await _endpoint(app, path)(**kwargs)
+            except HTTPException as e:
+                # 빈 결과(404)도 캐시에는 채워진다
+                if e.status_code != 404:
+                    raise
+            status["warmed"].append({"path": path, **kwargs, "ms": round((time.perf_counter() - started) * 1000, 1)})
+        except Exception as e:
+            status["errors"].append(f"{path} {kwargs}: {e}")
+
+
+async def _prepare(app):
+    while True:
+        try:
+            await _init_resources()
+            break
+        except Exception as e:
+            print(f"Startup resource error: {e}")
+            status["errors"].append(f"startup: {e}")
+            del status["errors"][:-50]
+            await asyncio.sleep(WARMUP_RETRY)
+    if WARMUP_ENABLED:
+        await warm(app)
+    status["warmed_at"] = time.time()
+    status["ready"] = True
+    print(f"Ready ({len(status['warmed'])} warmed, {len(status['errors'])} errors)")
+
+
+async def _publish_metrics():
+    while True:
+        await asyncio.sleep(metrics.PUBLISH_INTERVAL)
+        try:
+            await metrics.publish(await hosts.get_redis_connection())
+        except Exception as e:
+            print(f"Metrics publish error: {e}")
+
+
+async def startup(app):
+    global _warm_task, _publish_task, _species_task, _jobs_task
+    status["started_at"] = time.time()
+    loop = asyncio.get_running_loop()
+    _warm_task = loop.create_task(_prepare(app))
+    if metrics.PUBLISH_INTERVAL > 0:
+        _publish_task = loop.create_task(_publish_metrics())
+    if species.REFRESH_INTERVAL > 0:
+        _species_task = loop.create_task(species.watch())
+    if jobs.WORKER_ENABLED:
+        _jobs_task = loop.create_task(jobs.run())
+
+
+async def shutdown():
+    for task in (_warm_task, _publish_task, _species_task, _jobs_task):
+        if task is not None and not task.done():
+            task.cancel()
+    if _jobs_task is not None:
+        await jobs.stop()
+    if _publish_task is not None:
+        try:
+            redis_client = await hosts.get_redis_connection()
+            await redis_client.delete(metrics.worker_key())
+        except Exception as e:
+            print(f"Redis delete error: {e}")
+    await clinic_feed.close()
+    await slot_feed.close()
+    await hosts.close_redis_connection()
+    hosts.close_db_pools()
+    passwords.shutdown()
+
+
+@router.get("/live")
+async def live():
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready():
+    body = {
+        "ready": status["ready"],
+        "warmed": len(status["warmed"]),
+        "errors": status["errors"][-10:],
+    }
+    if status["started_at"] and status["warmed_at"]:
+        body["warmup_seconds"] = round(status["warmed_at"] - status["started_at"], 3)
+    return JSONResponse(body, status_code=200 if status["ready"] else 503)
@@ -5,7 +5,7 @@ Fixed:
 Usage: 
 """
 
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI
 from clinic import router as clinic_router
 from favorite import router as favorite_router
 from user import router as user_router
@@ -14,22 +14,51 @@ from available_time import router as available_router
 from species import router as species_router 
 from reservation import router as reservation_router
 from myprofile import mypage_router
+from metrics import router as metrics_router
+import lifecycle
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import APIKeyHeader
+import admission
+import auth
+import capture
+import dbroute
+import deadline
+import hosts
+import uploads
 
 app = FastAPI()
 
-API_KEY_HEADER = APIKeyHeader(name="Authorization", auto_error=False)
+# VET_AUTH=1 이면 VET_AUTH_ROUTERS 에 적은 라우터는 Firebase ID 토큰이 있어야 호출할 수 있다 (auth.py)
+app.include_router(clinic_router, prefix="/clinic", tags=["clinic"], dependencies=auth.dependencies("clinic"))
+app.include_router(favorite_router, prefix="/favorite", tags=["favorite"], dependencies=auth.dependencies("favorite"))
+app.include_router(user_router, prefix="/user", tags=["user"], dependencies=auth.dependencies("user"))
+app.include_router(pet_router, prefix="/pet", tags=["pet"], dependencies=auth.dependencies("pet"))
+app.include_router(mypage_router, prefix="/mypage", tags=["mypage"], dependencies=auth.dependencies("mypage"))
+app.include_router(available_router, prefix="/available", tags=["available"], dependencies=auth.dependencies("available"))
+app.include_router(species_router, prefix="/species", tags=["species"], dependencies=auth.dependencies("species"))
+app.include_router(reservation_router, prefix="/reservation", tags=["reservation"], dependencies=auth.dependencies("reservation"))
+app.include_router(metrics_router, prefix="/metrics", tags=["metrics"])
+app.include_router(lifecycle.router, prefix="/health", tags=["health"])
 
-app.include_router(clinic_router, prefix="/clinic", tags=["clinic"])
-                #    , dependencies=[Depends(API_KEY_HEADER)])
-app.include_router(favorite_router, prefix="/favorite", tags=["favorite"])
-app.include_router(user_router, prefix="/user", tags=["user"])
-app.include_router(pet_router, prefix="/pet", tags=["pet"])
-app.include_router(mypage_router, prefix="/mypage", tags=["mypage"])
-app.include_router(available_router, prefix="/available", tags=["available"])
-app.include_router(species_router, prefix="/species", tags=["species"])
-app.include_router(reservation_router, prefix="/reservation", tags=["reservation"])
+# 시작 시 DB 풀/Redis 연결을 열고 캐시를 예열, 종료 시 정리
+@app.on_event("startup")
+async def on_startup():
+    await lifecycle.startup(app)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await lifecycle.shutdown()
+
+# 이미지 업로드 요청이 너무 크면 본문을 다 받기 전에 413
+app.add_middleware(uploads.UploadLimitMiddleware)
+
+# 라우트별 동시 처리 한도/우선순위/속도 제한 (VET_ADMISSION=1 일 때만)
+# CORS 보다 먼저 추가해 503/429 응답에도 CORS 헤더가 붙게 한다
+if admission.ENABLED:
+    app.add_middleware(admission.AdmissionMiddleware)
+
+# 클라이언트가 끊긴 GET 요청은 처리(와 DB 쿼리)를 멈춘다. 대기열에서 기다리던 요청도 풀려나도록 admission 바깥에 둔다
+if deadline.CANCEL_ON_DISCONNECT:
+    app.add_middleware(deadline.CancelOnDisconnectMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -39,6 +68,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 읽기 복제본이 설정되어 있으면 GET 요청을 복제본으로 라우팅
+if hosts.VET_DB_REPLICAS:
+    app.add_middleware(dbroute.ReplicaRoutingMiddleware)
+
+# 운영 트래픽 샘플링 기록 (VET_CAPTURE=1 일 때만)
+if capture.CAPTURE_ENABLED:
+    app.add_middleware(capture.CaptureMiddleware)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host = "0.0.0.0", port = 8000)
\ No newline at end of file
@@ -0,0 +1,116 @@
+"""
+author:
+Description: 프로세스 내 카운터와 상태 수집 (GET /metrics 로 노출)
+Fixed:
+Usage:
+    import metrics
+    metrics.incr("cache.hit")
+    metrics.register("redis", hosts.redis_breaker.snapshot)   # 호출 시점의 상태를 함께 노출
+
+    값은 워커 프로세스마다 따로 집계된다. 응답의 "process" 로 어느 워커의 값인지 알 수 있다.
+    각 워커는 VET_METRICS_PUBLISH 초마다 자기 스냅샷을 Redis 에 올리고 (lifecycle.py)
+    GET /metrics/workers 는 살아 있는 모든 워커의 스냅샷을 모아 보여준다.
+    GET /metrics/cache 는 Redis 캐시의 네임스페이스별 키 수/바이트와 예산을 보여준다.
+    GET /metrics/jobs 는 작업 큐(jobs.py)의 대기/처리 중/재시도/dead 작업 수를 보여준다.
+"""
+
+import json, os, socket, time
+from collections import defaultdict
+from fastapi import APIRouter, HTTPException
+
+router = APIRouter()
+
+PUBLISH_INTERVAL = float(os.getenv("VET_METRICS_PUBLISH", "10"))  # 0 이면 올리지 않음
+WORKER_KEY_PREFIX = "metrics:worker:"
+
+_counters = defaultdict(int)
+_collectors = {}
+process = {"pid": os.getpid(), "worker": os.getenv("VET_WORKER_INDEX"), "started_at": time.time()}
+
+
+def set_worker(index):
+    process.update(pid=os.getpid(), worker=str(index), started_at=time.time())
+
+
+def _after_fork():
+    # 부모(preload 한 마스터)에서 쌓인 값은 이 워커의 것이 아니다
+    _counters.clear()
+    process.update(pid=os.getpid(), started_at=time.time())
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def incr(name, amount=1):
+    _counters[name] += amount
+
+
+def register(name, collect):
+    _collectors[name] = collect
+
+
+def snapshot():
+    result = {
+        "process": {**process, "uptime_seconds": round(time.time() - process["started_at"], 1)},
+        "counters": dict(sorted(_counters.items())),
+    }
+    for name, collect in _collectors.items():
+        try:
+            result[name] = collect()
+        except Exception as e:
+            result[name] = {"error": str(e)}
+    return result
+
+
+def worker_key():
+    return f"{WORKER_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+
+
+async def publish(redis_client):
+    """이 워커의 스냅샷을 Redis 에 올린다. 워커가 죽으면 몇 주기 뒤 사라진다."""
+    await redis_client.set(worker_key(), json.dumps(snapshot(), default=str), ex=max(1, int(PUBLISH_INTERVAL * 3)))
+
+
+@router.get("/")
+async def get_metrics():
+    return snapshot()
+
+
+@router.get("/workers")
+async def get_worker_metrics():
+    import hosts  # hosts 가 metrics 를 import 하므로 여기서
+    workers = {}
+    try:
+        redis_client = await hosts.get_redis_connection()
+        keys = [key async for key in redis_client.scan_iter(match=f"{WORKER_KEY_PREFIX}*")]
+        values = await redis_client.mget(keys) if keys else []
+        for key, value in zip(keys, values):
+            if value:
+                workers[key[len(WORKER_KEY_PREFIX):]] = json.loads(value)
+    except Exception as e:
+        print(f"Redis get error: {e}")
+    # Redis 에 올라가기 전이거나 Redis 장애여도 응답한 워커 자신은 보이도록
+    workers.setdefault(worker_key()[len(WORKER_KEY_PREFIX):], snapshot())
+    return {"count": len(workers), "workers": dict(sorted(workers.items()))}
+
+
+@router.get("/cache")
+async def get_cache_usage():
+    """Redis 캐시의 네임스페이스별 키 수와 바이트 (cache.py 가 저장할 때 기록한 크기)"""
+    import cache  # cache 가 metrics 를 import 하므로 여기서
+    try:
+        return await cache.usage()
+    except Exception as e:
+        print(f"Redis usage error: {e}")
+        raise HTTPException(status_code=503, detail="캐시 사용량을 읽을 수 없습니다.")
+
+
+@router.get("/jobs")
+async def get_job_stats():
+    """작업 큐 길이 (대기/처리 중/재시도 대기/dead). 종류별 처리 수는 카운터 jobs.<종류>.*"""
+    import jobs  # jobs 가 metrics 를 import 하므로 여기서
+    try:
+        return await jobs.stats()
+    except Exception as e:
+        print(f"Redis jobs stats error: {e}")
+        raise HTTPException(status_code=503, detail="작업 큐 상태를 읽을 수 없습니다.")
@@ -0,0 +1,123 @@
+"""
+author:
+Description: migrations/NNNN_*.sql 을 순서대로 적용하는 스키마 마이그레이션 도구
+Fixed:
+Usage:
+    python migrate.py                 # 적용 안 된 마이그레이션 모두 적용
+    python migrate.py --status        # 적용 여부 확인
+    python migrate.py --dry-run       # 실행할 SQL만 출력
+    python migrate.py --mark-applied 0001_reservation_slot_unique   # 수동으로 적용했던 것 기록
+
+    적용 이력은 schema_migrations 테이블에 남는다.
+    MySQL의 DDL은 자동 커밋되므로 파일 중간에서 실패하면 남은 문장을 확인 후 수동으로 정리해야 한다.
+"""
+
+import argparse, glob, os, sys
+import pymysql
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def connect():
+    # 앱 서비스(Redis, S3, Firebase) 없이 DB만 연결
+    return pymysql.connect(
+        host=os.getenv('VET_DB'),
+        user=os.getenv('VET_DB_USER'),
+        password=os.getenv('VET_DB_PASSWORD'),
+        charset='utf8',
+        db=os.getenv('VET_DB_TABLE'),
+        port=int(os.getenv('VET_PORT', '3306')),
+    )
+
+
+def available():
+    return [
+        (os.path.basename(path)[:-4], path)
+        for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, "[0-9][0-9][0-9][0-9]_*.sql")))
+    ]
+
+
+def statements(path):
+    """-- 주석 줄을 빼고 줄 끝의 ; 기준으로 문장을 나눈다"""
+    with open(path, encoding="utf-8") as f:
+        lines = [line for line in f if not line.strip().startswith("--")]
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if line.rstrip().endswith(";"):
+            sql = "".join(buffer).strip().rstrip(";").strip()
+            if sql:
+                yield sql
+            buffer = []
+    rest = "".join(buffer).strip()
+    if rest:
+        yield rest
+
+
+def ensure_table(curs):
+    curs.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(255) PRIMARY KEY,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied(curs):
+    curs.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in curs.fetchall()}
+
+
+def mark(curs, version):
+    curs.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+
+
+def migrate(conn, dry_run=False, target=None):
+    curs = conn.cursor()
+    ensure_table(curs)
+    done = applied(curs)
+    for version, path in available():
+        if version in done:
+            continue
+        if target and version > target:
+            break
+        print(f"==> {version}")
+        for sql in statements(path):
+            print(sql + ";\n")
+            if not dry_run:
+                curs.execute(sql)
+        if not dry_run:
+            mark(curs, version)
+            conn.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="스키마 마이그레이션")
+    parser.add_argument("--status", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--target", default=None, help="이 버전까지만 적용")
+    parser.add_argument("--mark-applied", default=None, help="실행하지 않고 적용된 것으로 기록")
+    args = parser.parse_args(argv)
+
+    conn = connect()
+    try:
+        curs = conn.cursor()
+        ensure_table(curs)
+        if args.status:
+            done = applied(curs)
+            for version, _ in available():
+                print(f"[{'x' if version in done else ' '}] {version}")
+            return
+        if args.mark_applied:
+            if args.mark_applied not in dict(available()):
+                sys.exit(f"unknown migration: {args.mark_applied}")
+            mark(curs, args.mark_applied)
+            conn.commit()
+            return
+        migrate(conn, dry_run=args.dry_run, target=args.target)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
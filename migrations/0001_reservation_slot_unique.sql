@@ -0,0 +1,9 @@
+-- 같은 병원의 같은 시간(clinic_id, time)은 한 건만 예약되도록 보장
+-- insert_reservation은 중복키 오류(1062)를 409로 돌려준다.
+--
+-- 적용 전 이미 중복 예약된 슬롯이 있는지 확인하고 정리해야 한다:
+--   SELECT clinic_id, time, COUNT(*) FROM reservation
+--   GROUP BY clinic_id, time HAVING COUNT(*) > 1;
+
+ALTER TABLE reservation
+    ADD UNIQUE KEY uq_reservation_slot (clinic_id, time);
@@ -0,0 +1,22 @@
+-- reservation.time, available_time.time 을 문자열('YYYY-MM-DD HH:MM')에서 DATETIME으로 변환
+-- 범위 조회(time >= ? AND time < ?)가 (clinic_id, time) 인덱스를 탈 수 있게 한다.
+--
+-- 적용 전 변환되지 않는 값이 없는지 확인 (두 쿼리 모두 결과가 없어야 한다):
+--   SELECT time FROM reservation    WHERE STR_TO_DATE(LEFT(time, 16), '%Y-%m-%d %H:%i') IS NULL;
+--   SELECT time FROM available_time WHERE STR_TO_DATE(LEFT(time, 16), '%Y-%m-%d %H:%i') IS NULL;
+--
+-- 코드는 DATETIME 컬럼을 기준으로 동작하므로 이 마이그레이션과 함께 배포해야 한다.
+
+ALTER TABLE reservation ADD COLUMN time_dt DATETIME NULL;
+UPDATE reservation SET time_dt = STR_TO_DATE(LEFT(time, 16), '%Y-%m-%d %H:%i');
+ALTER TABLE reservation
+    DROP INDEX uq_reservation_slot,
+    DROP COLUMN time,
+    CHANGE COLUMN time_dt time DATETIME NOT NULL,
+    ADD UNIQUE KEY uq_reservation_slot (clinic_id, time);
+
+ALTER TABLE available_time ADD COLUMN time_dt DATETIME NULL;
+UPDATE available_time SET time_dt = STR_TO_DATE(LEFT(time, 16), '%Y-%m-%d %H:%i');
+ALTER TABLE available_time
+    DROP COLUMN time,
+    CHANGE COLUMN time_dt time DATETIME NOT NULL;
@@ -0,0 +1,20 @@
+-- 라우터의 조회 조건에 맞춘 인덱스
+-- reservation (clinic_id, time) 은 0001의 uq_reservation_slot 이 이미 담당한다.
+
+-- pet.get_pets: WHERE user_id = ?
+ALTER TABLE pet ADD INDEX idx_pet_user (user_id);
+
+-- favorite: WHERE user_id = ? [AND clinic_id = ?]
+ALTER TABLE favorite ADD INDEX idx_favorite_user_clinic (user_id, clinic_id);
+
+-- reservation.select_reservation: WHERE user_id = ?
+ALTER TABLE reservation ADD INDEX idx_reservation_user (user_id);
+
+-- available_time: WHERE time = ? (+ clinic_id 조인)
+ALTER TABLE available_time ADD INDEX idx_available_time_slot (time, clinic_id);
+
+-- species: WHERE type = ? / DISTINCT type (category까지 포함해 커버링)
+ALTER TABLE species ADD INDEX idx_species_type (type, category);
+
+-- clinic.get_clinic_id_by_name: WHERE name = ?
+ALTER TABLE clinic ADD INDEX idx_clinic_name (name);
@@ -0,0 +1,73 @@
+-- 예약 가능 슬롯을 available_time 처럼 슬롯마다 행으로 만들지 않고
+-- 병원 x 요일 진료 규칙 + 휴진 구간으로 저장한다 (schedule.py 에서 계산).
+-- available_time 은 VET_AVAILABILITY_SOURCE=table 로 되돌릴 수 있도록 남겨둔다.
+
+-- weekday: 0=월 ~ 6=일 (파이썬 datetime.weekday() 와 같음)
+CREATE TABLE clinic_schedule_rule (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    clinic_id VARCHAR(50) NOT NULL,
+    weekday TINYINT NOT NULL,
+    open_time TIME NOT NULL,
+    close_time TIME NOT NULL,
+    slot_minutes SMALLINT NOT NULL DEFAULT 30,
+    INDEX idx_schedule_rule_weekday (weekday, clinic_id),
+    INDEX idx_schedule_rule_clinic (clinic_id)
+) DEFAULT CHARSET=utf8mb4;
+
+-- 휴진 구간 [start_at, end_at)
+CREATE TABLE clinic_closure (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    clinic_id VARCHAR(50) NOT NULL,
+    start_at DATETIME NOT NULL,
+    end_at DATETIME NOT NULL,
+    reason VARCHAR(200),
+    INDEX idx_closure_clinic (clinic_id, start_at),
+    INDEX idx_closure_end (end_at)
+) DEFAULT CHARSET=utf8mb4;
+
+-- 규칙은 기존 available_time 행에서 만든다 (clinic.start_time/end_time 은 실제 슬롯과 다를 수 있다).
+-- 최근 4주 + 앞으로의 행을 병원 x 요일 x 시각으로 모아, 30분 간격으로 이어지는 시각들을 한 규칙으로 묶는다
+-- (점심시간처럼 비는 구간이 있으면 규칙이 둘로 나뉜다). 자정까지 여는 규칙은 close_time 이 24:00:00 이다.
+INSERT INTO clinic_schedule_rule (clinic_id, weekday, open_time, close_time, slot_minutes)
+WITH slots AS (
+    SELECT DISTINCT clinic_id, WEEKDAY(time) AS weekday, HOUR(time) * 60 + MINUTE(time) AS minute
+    FROM available_time
+    WHERE time >= CURDATE() - INTERVAL 28 DAY
+),
+runs AS (
+    SELECT clinic_id, weekday, minute,
+           minute - 30 * ROW_NUMBER() OVER (PARTITION BY clinic_id, weekday ORDER BY minute) AS run
+    FROM slots
+)
+SELECT clinic_id, weekday, SEC_TO_TIME(MIN(minute) * 60), SEC_TO_TIME((MAX(minute) + 30) * 60), 30
+FROM runs
+GROUP BY clinic_id, weekday, run;
+
+-- 앞으로 available_time 이 있는 기간 중 규칙상 여는 요일인데 행이 하나도 없는 날(공휴일 등)은 휴진으로 옮긴다
+INSERT INTO clinic_closure (clinic_id, start_at, end_at, reason)
+WITH RECURSIVE horizon AS (
+    SELECT clinic_id, MAX(DATE(time)) AS last_day FROM available_time WHERE time >= CURDATE() GROUP BY clinic_id
+),
+days AS (
+    SELECT CURDATE() AS day
+    UNION ALL
+    SELECT day + INTERVAL 1 DAY FROM days
+    WHERE day < (SELECT MAX(last_day) FROM horizon) AND day < CURDATE() + INTERVAL 365 DAY
+)
+SELECT h.clinic_id, d.day, d.day + INTERVAL 1 DAY, 'available_time 이관: 예약 가능 시간 없음'
+FROM horizon h
+JOIN days d ON d.day <= h.last_day
+WHERE EXISTS (SELECT 1 FROM clinic_schedule_rule r WHERE r.clinic_id = h.clinic_id AND r.weekday = WEEKDAY(d.day))
+  AND NOT EXISTS (
+      SELECT 1 FROM available_time a
+      WHERE a.clinic_id = h.clinic_id AND a.time >= d.day AND a.time < d.day + INTERVAL 1 DAY
+  );
+
+-- 확인 (VET_AVAILABILITY_SOURCE=rules 로 바꾸기 전에):
+-- 1) 규칙에 없는 앞으로의 available_time 슬롯 -> 0 행이어야 한다
+--   SELECT a.clinic_id, a.time FROM available_time a
+--   WHERE a.time >= NOW() AND NOT EXISTS (
+--       SELECT 1 FROM clinic_schedule_rule r
+--       WHERE r.clinic_id = a.clinic_id AND r.weekday = WEEKDAY(a.time)
+--         AND TIME(a.time) >= r.open_time AND TIME(a.time) < r.close_time);
+-- 2) 하루 중 일부만 빠진 날은 옮기지 않으므로 python -m bench.schedule_rules 처럼 두 방식의 결과를 비교해 본다.
@@ -0,0 +1,7 @@
+-- 병원 비밀번호를 passlib 해시로 저장한다 (passwords.py).
+-- pbkdf2_sha256 해시는 90자 안팎이고 argon2 등은 더 길 수 있어 여유 있게 늘린다.
+-- 기존 평문 값은 그대로 두고, 병원이 로그인에 성공할 때 해시로 바뀐다 (user.authenticate_clinic).
+-- favorite 테이블은 병원 행을 복사해 두므로 같은 길이로 맞춘다.
+
+ALTER TABLE clinic MODIFY password VARCHAR(255);
+ALTER TABLE favorite MODIFY password VARCHAR(255);
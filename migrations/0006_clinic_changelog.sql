@@ -0,0 +1,23 @@
+-- 병원 목록 변경분 동기화 (GET /clinic/changes?since=)
+-- 병원을 만들거나 고치거나 지울 때마다 같은 트랜잭션에서 clinic_version 을 1 올리고
+-- 그 번호로 clinic_changelog 에 한 줄을 남긴다 (clinic.py _record_change).
+-- 번호를 주는 행 하나를 잠그므로 커밋도 번호 순서대로 되어, 앱이 받은 번호보다 작은 변경이 늦게 보이는 일이 없다.
+-- 삭제는 clinic 행이 없어진 병원의 변경 기록이 곧 삭제 표시(tombstone)가 된다.
+
+CREATE TABLE clinic_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL
+) DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE clinic_changelog (
+    version BIGINT PRIMARY KEY,
+    clinic_id VARCHAR(50) NOT NULL,
+    changed_at DATETIME NOT NULL,
+    INDEX idx_clinic_changelog_clinic (clinic_id, version)
+) DEFAULT CHARSET=utf8mb4;
+
+-- 기존 병원은 1..N 번으로 한 번씩 기록해 since=0 이 전체 목록이 되게 한다
+SET @clinic_version := 0;
+INSERT INTO clinic_changelog (version, clinic_id, changed_at)
+SELECT (@clinic_version := @clinic_version + 1), id, NOW() FROM clinic ORDER BY id;
+INSERT INTO clinic_version (id, version) SELECT 1, COUNT(*) FROM clinic;
@@ -0,0 +1,20 @@
+-- 즐겨찾기에 병원 행을 복사해 두지 않고 (user_id, clinic_id) 만 저장한다 (favorite.py).
+-- 병원 정보는 읽을 때 병원별 캐시에서 채우므로 병원을 고쳐도 즐겨찾기 목록이 어긋나지 않고,
+-- 복사돼 있던 병원 비밀번호도 더 이상 남지 않는다.
+-- 중복 행은 하나로 합치고, 기본 키 (user_id, clinic_id) 가 중복 추가를 막는다.
+-- 이전 테이블은 favorite_legacy 로 남겨 두니 확인 후 DROP TABLE favorite_legacy 로 지운다.
+-- 이전 버전 앱 서버는 복사 컬럼으로 INSERT 하므로, 이 마이그레이션은 새 버전 배포와 함께 적용한다.
+
+CREATE TABLE favorite_new (
+    user_id VARCHAR(100) NOT NULL,
+    clinic_id VARCHAR(50) NOT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, clinic_id),
+    INDEX idx_favorite_clinic (clinic_id)
+) DEFAULT CHARSET=utf8mb4;
+
+INSERT IGNORE INTO favorite_new (user_id, clinic_id)
+SELECT user_id, clinic_id FROM favorite
+WHERE user_id IS NOT NULL AND clinic_id IS NOT NULL;
+
+RENAME TABLE favorite TO favorite_legacy, favorite_new TO favorite;
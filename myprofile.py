@@ -6,8 +6,8 @@ Usage:
 """
 
 from fastapi import APIRouter, File, UploadFile, HTTPException
-import os, hosts, io, json
-from fastapi.responses import StreamingResponse
+import os, hosts, uploads
+from cache import generate_cache_key, get_cached_or_fetch, invalidate
 from botocore.exceptions import ClientError, NoCredentialsError
 
 mypage_router = APIRouter()
@@ -17,24 +17,6 @@ UPLOAD_FOLDER = 'uploads'
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
-def generate_cache_key(endpoint: str, params: dict):
-    return f"{endpoint}:{json.dumps(params, sort_keys=True)}"
-
-async def get_cached_or_fetch(cache_key, fetch_func):
-    redis_client = await hosts.get_redis_connection()
-    try:
-        cached_data = await redis_client.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
-    except Exception as e:
-        print(f"Redis get error: {e}")
-
-    data = await fetch_func()
-    try:
-        await redis_client.set(cache_key, json.dumps(data), ex=3600)
-    except Exception as e:
-        print(f"Redis set error: {e}")
-    return data
 
 @mypage_router.get('/{id}')
 async def select_mypage(id: str):
@@ -64,7 +46,6 @@ async def select_mypage(id: str):
 @mypage_router.put('/{id}')
 async def update_mypage(id: str, name: str = None):
     conn = hosts.connect()
-    redis_client = await hosts.get_redis_connection()
     try:
         curs = conn.cursor()
         sql = "UPDATE user SET name=%s WHERE id=%s"
@@ -72,7 +53,7 @@ async def update_mypage(id: str, name: str = None):
         conn.commit()
 
         cache_key = generate_cache_key("select_mypage", {"id": id})
-        await redis_client.delete(cache_key)
+        await invalidate(cache_key)
 
         return {'result': "ok"}
     except Exception as e:
@@ -84,7 +65,6 @@ async def update_mypage(id: str, name: str = None):
 @mypage_router.put('/{id}/all')
 async def update_all(id: str, name: str = None, image: str = None):
     conn = hosts.connect()
-    redis_client = await hosts.get_redis_connection()
     try:
         curs = conn.cursor()
         sql = "UPDATE user SET name=%s, image=%s WHERE id=%s"
@@ -92,7 +72,7 @@ async def update_all(id: str, name: str = None, image: str = None):
         conn.commit()
 
         cache_key = generate_cache_key("select_mypage", {"id": id})
-        await redis_client.delete(cache_key)
+        await invalidate(cache_key)
 
         return {'result': "ok"}
     except Exception as e:
@@ -103,23 +83,16 @@ async def update_all(id: str, name: str = None, image: str = None):
 
 @mypage_router.get('/view/{file_name}')
 async def get_user_image(file_name: str):
-    try:
-        file_obj = hosts.s3.get_object(Bucket=hosts.BUCKET_NAME, Key=file_name)
-        file_data = file_obj['Body'].read()
-        return StreamingResponse(io.BytesIO(file_data), media_type="image/jpeg")
-    except ClientError as e:
-        print(f"Error fetching file: {file_name}. Error: {e}")
-        return {"result": "Error", "message": "File not found in S3."}
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        return {"result": "Error", "message": str(e)}
+    # S3 에서 조각씩 읽어 바로 내려보낸다 (uploads.stream_object). 없으면 404
+    return await uploads.stream_object(file_name)
 
 @mypage_router.post("/userimage")
 async def upload_file(file: UploadFile = File(...)):
     try:
-        s3_key = file.filename
-        hosts.s3.upload_fileobj(file.file, hosts.BUCKET_NAME, s3_key)
-        return {'result': 'OK', 's3_key': s3_key}
+        stored = await uploads.ingest(file)
+        return {'result': 'OK', 's3_key': stored.key}
+    except HTTPException as e:
+        return {'result': 'Error', 'message': e.detail}
     except NoCredentialsError:
         return {'result': 'Error', 'message': 'AWS credentials not available.'}
     except Exception as e:
@@ -128,6 +101,9 @@ async def upload_file(file: UploadFile = File(...)):
 
 @mypage_router.delete("/{file_name}")
 async def delete_file(file_name: str):
+    # 내용 해시 키는 다른 사용자도 같은 객체를 가리킬 수 있어 지우지 않는다
+    if uploads.is_content_key(file_name):
+        return {"result": "OK", "message": f"File {file_name} is shared and kept"}
     try:
         hosts.s3.delete_object(Bucket=hosts.BUCKET_NAME, Key=file_name)
         return {"result": "OK", "message": f"File {file_name} deleted successfully from bucket {hosts.BUCKET_NAME}"}
@@ -0,0 +1,84 @@
+"""
+author:
+Description: 예약/취소 푸시 알림 (FCM 토픽). 작업 큐(jobs.py)로 넣고 워커가 모아서 보낸다.
+Fixed:
+Usage:
+    import notify
+    await notify.reservation_event("reservation", user_id, clinic_id, time, clinic_name, user_name)
+
+    - 앱은 병원 기기는 clinic-{병원 id}, 사용자 기기는 user-{사용자 id} 토픽을 구독한다 (topic() 참고).
+    - 요청에서는 작업만 넣고 바로 응답한다. 워커는 알림 작업을 VET_NOTIFY_BATCH 개(최대 500)씩
+      firebase_admin.messaging.send_each 한 번으로 보낸다 (스레드에서).
+    - 일시적인 FCM 오류(UNAVAILABLE, INTERNAL, 할당량 초과, 시간 초과)는 재시도, 나머지는 dead 로 보낸다.
+      VET_JOBS_TIMEOUT 안에 send_each 가 끝나지 않은 묶음은 이미 갔을 수 있어 재시도하지 않고 dead 로 보낸다.
+    - VET_NOTIFY=0 이면 보내지 않는다. 기본값은 VET_FIREBASE_KEY 가 있을 때만 켜짐.
+"""
+
+import asyncio, os
+from urllib.parse import quote
+import hosts, jobs, metrics
+
+ENABLED = os.getenv("VET_NOTIFY", "1" if os.getenv("VET_FIREBASE_KEY") else "0") == "1"
+BATCH = min(500, int(os.getenv("VET_NOTIFY_BATCH", "100")))  # send_each 는 한 번에 500 개까지
+
+
+def topic(kind, id):
+    # FCM 토픽 이름은 [a-zA-Z0-9-_.~%]+ 만 쓸 수 있다
+    return f"{kind}-{quote(str(id), safe='-_.~')}"
+
+
+async def send(topic_name, title, body, data=None):
+    if not ENABLED:
+        return
+    await jobs.enqueue("notify", {"topic": topic_name, "title": title, "body": body,
+                                  "data": {k: str(v) for k, v in (data or {}).items() if v is not None}})
+
+
+async def reservation_event(event, user_id, clinic_id, time, clinic_name=None, user_name=None):
+    """event: reservation(예약) / cancellation(취소). 병원과 사용자에게 각각 보낸다."""
+    data = {"event": event, "clinic_id": clinic_id, "user_id": user_id, "time": time}
+    who = f"{user_name}님 " if user_name else ""
+    if event == "reservation":
+        await send(topic("clinic", clinic_id), "새 예약", f"{time} {who}예약이 들어왔습니다.", data)
+        await send(topic("user", user_id), "예약 완료", f"{clinic_name or '병원'} {time} 예약이 완료되었습니다.", data)
+    else:
+        await send(topic("clinic", clinic_id), "예약 취소", f"{time} {who}예약이 취소되었습니다.", data)
+        await send(topic("user", user_id), "예약 취소", f"{clinic_name or '병원'} {time} 예약이 취소되었습니다.", data)
+
+
+def _send_each(messages):
+    from firebase_admin import messaging
+    return messaging.send_each(messages, app=hosts.firebase_app())
+
+
+def _retryable(error):
+    from firebase_admin import exceptions, messaging
+    return isinstance(error, (exceptions.UnavailableError, exceptions.InternalError,
+                              exceptions.DeadlineExceededError, messaging.QuotaExceededError))
+
+
+async def send_batch(batch):
+    """jobs 처리 함수: args 목록 -> 작업마다 None 또는 예외"""
+    from firebase_admin import messaging
+    messages = [
+        messaging.Message(topic=args["topic"], data=args.get("data") or None,
+                          notification=messaging.Notification(title=args["title"], body=args["body"]))
+        for args in batch
+    ]
+    response = await asyncio.get_running_loop().run_in_executor(None, _send_each, messages)
+    metrics.incr("notify.sent", response.success_count)
+    metrics.incr("notify.batches")
+    errors = []
+    for result in response.responses:
+        if result.success:
+            errors.append(None)
+        elif _retryable(result.exception):
+            errors.append(result.exception)
+        else:
+            metrics.incr("notify.rejected")
+            errors.append(jobs.Permanent(str(result.exception)))
+    return errors
+
+
+# 시간 초과여도 스레드의 send_each 는 계속 보내므로 재시도하지 않는다 (중복 푸시)
+jobs.register("notify", send_batch, batch_size=BATCH, retry_timeout=False)
@@ -0,0 +1,127 @@
+"""
+author:
+Description: 비밀번호 해시/검증 (passlib), CPU 를 많이 쓰는 계산은 별도 프로세스 풀에서
+Fixed:
+Usage:
+    ok, new_hash = await passwords.verify(password, stored)   # new_hash 가 있으면 DB 에 저장
+    stored = await passwords.hash_password(password)
+
+    - 기본 방식은 pbkdf2_sha256 (VET_PASSWORD_SCHEMES 에 bcrypt, argon2 등을 앞에 두면 새 해시는 그 방식으로,
+      예전 방식 해시는 로그인 성공 시 new_hash 로 바뀐다). 평문으로 저장된 값도 검증하고 해시로 바꾸게 한다.
+    - 계산은 VET_PASSWORD_WORKERS 개 프로세스 풀에서 해 이벤트 루프를 막지 않는다 (0 이면 스레드풀).
+    - 동시에 VET_PASSWORD_MAX_PENDING 개까지만 받고, 자리가 나기를 VET_PASSWORD_QUEUE_TIMEOUT 초 넘게
+      기다려야 하면 503 (Retry-After) 으로 돌려보낸다. 로그인이 몰려도 다른 API 가 밀리지 않게 한다.
+"""
+
+import asyncio, hmac, os
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from fastapi import HTTPException
+from passlib.context import CryptContext
+import metrics
+
+
+def _cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+SCHEMES = [s for s in os.getenv("VET_PASSWORD_SCHEMES", "pbkdf2_sha256").replace(" ", "").split(",") if s]
+ROUNDS = int(os.getenv("VET_PASSWORD_ROUNDS", "0"))  # 0 이면 passlib 기본값
+WORKERS = int(os.getenv("VET_PASSWORD_WORKERS", str(min(_cpus(), 4))))
+MAX_PENDING = int(os.getenv("VET_PASSWORD_MAX_PENDING", str(max(1, WORKERS) * 4)))
+QUEUE_TIMEOUT = float(os.getenv("VET_PASSWORD_QUEUE_TIMEOUT", "2"))
+
+_settings = {f"{SCHEMES[0]}__rounds": ROUNDS} if ROUNDS else {}
+context = CryptContext(schemes=SCHEMES, deprecated="auto", **_settings)
+
+
+def is_hashed(value):
+    return bool(value) and context.identify(value, required=False) is not None
+
+
+# ---------- 풀에서 실행되는 함수 (모듈 최상위에 있어야 pickle 된다) ----------
+
+def _hash(password):
+    return context.hash(password)
+
+
+def _verify(password, stored):
+    """(일치 여부, 새로 저장할 해시 또는 None)"""
+    if not stored or password is None:
+        # 없는 아이디도 같은 시간이 걸리게 해 응답 시간으로 가입 여부를 알 수 없게 한다
+        context.dummy_verify()
+        return False, None
+    if not is_hashed(stored):
+        # 예전 평문 행: 맞으면 해시로 바꾼다
+        if hmac.compare_digest(password.encode(), stored.encode()):
+            return True, context.hash(password)
+        return False, None
+    return context.verify_and_update(password, stored)
+
+
+# ---------- 이벤트 루프 쪽 ----------
+
+_pool = None
+_pool_pid = None
+_slots = None
+
+
+def _executor():
+    global _pool, _pool_pid
+    if WORKERS <= 0:
+        return None
+    if _pool is None or _pool_pid != os.getpid():
+        # 앱 프로세스에는 스레드가 여럿이라 fork 대신 spawn (이 모듈과 passlib 만 import 한다)
+        _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        _pool_pid = os.getpid()
+    return _pool
+
+
+async def _run(func, *args):
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(MAX_PENDING)
+    try:
+        await asyncio.wait_for(_slots.acquire(), QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        metrics.incr("password.rejected")
+        raise HTTPException(status_code=503, detail="로그인 요청이 많습니다. 잠시 후 다시 시도해주세요.",
+                            headers={"Retry-After": "1"})
+    try:
+        metrics.incr(f"password.{func.__name__.lstrip('_')}")
+        return await asyncio.get_running_loop().run_in_executor(_executor(), func, *args)
+    finally:
+        _slots.release()
+
+
+async def hash_password(password):
+    return await _run(_hash, password)
+
+
+async def verify(password, stored):
+    return await _run(_verify, password, stored)
+
+
+async def hash_if_plain(password):
+    """저장 직전에 호출: 평문이면 해시로, 이미 해시거나 비어 있으면 그대로"""
+    if not password or is_hashed(password):
+        return password
+    return await hash_password(password)
+
+
+def warm_pool():
+    """풀 프로세스를 미리 띄운다 (첫 로그인에서 spawn 비용을 치르지 않도록)"""
+    pool = _executor()
+    if pool is not None:
+        for future in [pool.submit(is_hashed, "") for _ in range(WORKERS)]:
+            future.result()
+
+
+def shutdown():
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
@@ -6,36 +6,25 @@ Usage: Manage Pet
 """
 
 from fastapi import APIRouter, HTTPException, File, UploadFile, Form
-import os, shutil, hosts, json
+import hosts, uploads
+from cache import generate_cache_key, get_cached_or_fetch, invalidate
 from botocore.exceptions import NoCredentialsError
 
 
 router = APIRouter()
 
-UPLOAD_DIRECTORY = "uploads/"  # 이미지 저장 경로
 
-# 이미지 저장 디렉터리 확인 및 생성
-if not os.path.exists(UPLOAD_DIRECTORY):
-    os.makedirs(UPLOAD_DIRECTORY)
-
-def generate_cache_key(endpoint: str, params: dict):
-    return f"{endpoint}:{json.dumps(params, sort_keys=True)}"
-
-async def get_cached_or_fetch(cache_key, fetch_func):
-    redis_client = await hosts.get_redis_connection()
+# 이미지는 내용 해시 키로 S3 에 두고 URL 을 저장한다 (uploads.py)
+async def _store_image(image):
     try:
-        cached_data = await redis_client.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
+        return (await uploads.ingest(image)).url
+    except HTTPException:
+        raise
+    except NoCredentialsError:
+        raise HTTPException(status_code=500, detail="AWS credentials not available.")
     except Exception as e:
-        print(f"Redis get error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to upload image to S3: {str(e)}")
 
-    data = await fetch_func()
-    try:
-        await redis_client.set(cache_key, json.dumps(data), ex=3600)
-    except Exception as e:
-        print(f"Redis set error: {e}")
-    return data
 
 # 반려동물 조회
 @router.get("/")
@@ -89,14 +78,9 @@ async def add_pet(
     gender: str = Form(...),
     image: UploadFile = File(None)
 ):
-    redis_client = await hosts.get_redis_connection()
-    image_filename = ""
+    image_url = ""
     if image:
-        image_filename = image.filename
-        image_path = os.path.join(UPLOAD_DIRECTORY, image_filename)
-
-        with open(image_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
+        image_url = await _store_image(image)
 
     conn = hosts.connect()
     try:
@@ -107,12 +91,12 @@ async def add_pet(
             """
             cursor.execute(sql, (
                 id, user_id, species_type, species_category, name, 
-                birthday, features, gender, image_filename
+                birthday, features, gender, image_url
             ))
             conn.commit()
 
             cache_key = generate_cache_key("get_pets", {"user_id": user_id})
-            await redis_client.delete(cache_key)
+            await invalidate(cache_key)
 
             return {"message": "Pet added successfully!"}
     except Exception as e:
@@ -134,20 +118,13 @@ async def update_pet(
     gender: str = Form(...),
     image: UploadFile = File(None)
 ):
-    redis_client = await hosts.get_redis_connection()
+    # 같은 이미지를 다시 보내면 키가 같아 S3 에 다시 올리지 않는다
+    image_url = await _store_image(image) if image else None
+
     conn = hosts.connect()
     try:
         with conn.cursor() as cursor:
-            if image:
-                s3_key = f"pets/{user_id}/{image.filename}"
-                try:
-                    hosts.s3.upload_fileobj(image.file, hosts.BUCKET_NAME, s3_key)
-                    image_url = f"https://{hosts.BUCKET_NAME}.s3.{hosts.REGION}.amazonaws.com/{s3_key}"
-                except NoCredentialsError:
-                    raise HTTPException(status_code=500, detail="AWS credentials not available.")
-                except Exception as e:
-                    raise HTTPException(status_code=500, detail=f"Failed to upload image to S3: {str(e)}")
-
+            if image_url:
                 sql = """
                     UPDATE pet 
                     SET species_type = %s, species_category = %s, name = %s, 
@@ -173,7 +150,7 @@ async def update_pet(
             conn.commit()
 
             cache_key = generate_cache_key("get_pets", {"user_id": user_id})
-            await redis_client.delete(cache_key)
+            await invalidate(cache_key)
 
             return {"message": "Pet updated successfully!"}
     except Exception as e:
@@ -185,7 +162,6 @@ async def update_pet(
 # 반려동물 삭제
 @router.delete("/{pet_id}")
 async def delete_pet(pet_id: str, id: str):
-    redis_client = await hosts.get_redis_connection()
     conn = hosts.connect()
     try:
         with conn.cursor() as cursor:
@@ -197,7 +173,7 @@ async def delete_pet(pet_id: str, id: str):
                 raise HTTPException(status_code=404, detail="Pet not found.")
 
             cache_key = generate_cache_key("get_pets", {"user_id": id})
-            await redis_client.delete(cache_key)
+            await invalidate(cache_key)
 
             return {"message": "Pet deleted successfully!"}
     finally:
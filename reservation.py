@@ -5,46 +5,117 @@ Fixed:
 Usage: 
 """
 
-from fastapi import APIRouter, HTTPException
-import hosts, json
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from concurrent.futures import ThreadPoolExecutor
+import asyncio, csv, io, json, os, re
+import deadline, hosts, metrics, notify, schedule
+from cache import generate_cache_key, get_cached_or_fetch, invalidate
+from feed import clinic_feed, slot_feed
+from timeslot import covering_prefixes, format_rows, format_time, parse_bound, parse_time, prefix_range
+from datetime import datetime, timedelta
+import pymysql
 
 router = APIRouter()
 
-def generate_cache_key(endpoint: str, params: dict):
-    return f"{endpoint}:{json.dumps(params, sort_keys=True)}"
+# MySQL ER_DUP_ENTRY
+DUPLICATE_ENTRY = 1062
 
-async def get_cached_or_fetch(cache_key, fetch_func):
-    redis_client = await hosts.get_redis_connection()
+
+def _fetch_or_none(curs, sql, params):
+    # 알림용 부가 조회는 실패해도 예약 처리 자체에는 영향을 주지 않는다
     try:
-        cached_data = await redis_client.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
+        curs.execute(sql, params)
+        return curs.fetchone()
     except Exception as e:
-        print(f"Redis get error: {e}")
+        print("Database error:", e)
+        return None
+
+async def _bookable(clinic_id, slot):
+    # 취소로 빈 슬롯을 다시 예약할 수 있는지: 지난 시각이거나 진료 시간 밖/휴진이면 아니다
+    if slot <= datetime.now():
+        return False
+    try:
+        book = await schedule.get_rule_book()
+    except Exception as e:
+        print("Database error:", e)
+        return False
+    return book.is_open(clinic_id, slot)
+
+async def _after_slot_change(user_id, clinic_id, time, event, clinic_row, detail, bookable=False):
+    """event: reservation(예약) / cancellation(취소). bookable: 취소로 빈 슬롯을 다시 예약할 수 있는지"""
+    cancelled = event == "cancellation"
+    # Redis 캐시 무효화 (예약내역 + 해당 슬롯의 예약 가능 목록을 한 번에)
+    keys = [
+        generate_cache_key("select_reservation", {"user_id": user_id}),
+    ]
+    # 병원 예약 현황은 연/월/일/시/분 단위로 따로 캐시되므로 이 슬롯을 포함하는 구간을 모두
+    keys += [_clinic_view_key(clinic_id, *prefix_range(prefix)) for prefix in covering_prefixes(time)]
+    if not cancelled or bookable:
+        version = await schedule.rules_version()
+        keys += [
+            await schedule.availability_key("available_clinic", {"time": time}, version),
+            await schedule.availability_key("can_reservation", {"time": time, "clinic_id": clinic_id}, version),
+        ]
+    await invalidate(*keys)
 
-    data = await fetch_func()
+    # 실시간 피드 발행 (모든 워커가 Redis pub/sub으로 받아 접속 중인 화면에 전달)
+    # 슬롯 피드: 예약 -> unavailable, 다시 예약 가능한 취소 -> available, 그 밖의 취소(지난 시각/휴진 등) -> cancelled
     try:
-        await redis_client.set(cache_key, json.dumps(data), ex=3600)
+        await clinic_feed.publish(clinic_id, detail, event=event)
+        if clinic_row:
+            id, name, latitude, longitude, address, image = clinic_row
+            await slot_feed.publish(time, {
+                "id": id, "name": name, "latitude": latitude, "longitude": longitude,
+                "address": address, "image": image, "time": time, "available": cancelled and bookable,
+            }, event=("available" if bookable else "cancelled") if cancelled else "unavailable")
     except Exception as e:
-        print(f"Redis set error: {e}")
-    return data
+        print(f"Feed publish error: {e}")
+
+    # 병원/사용자 푸시 알림은 작업 큐로 넘기고 바로 응답한다 (워커가 모아서 FCM 으로 보낸다)
+    await notify.reservation_event(event, user_id, clinic_id, time,
+                                   clinic_name=clinic_row[1] if clinic_row else None, user_name=detail.get("name"))
+
+CLINIC_SLOT_SQL = "SELECT id, name, latitude, longitude, address, image FROM clinic WHERE id = %s"
+DETAIL_SQL = (
+    "SELECT user.name, pet.species_type, pet.species_category, pet.features "
+    "FROM user, pet WHERE user.id = %s AND pet.id = %s"
+)
+
+def _detail(row, symptoms, time):
+    # 병원 예약 현황 조회와 같은 필드
+    name, species_type, species_category, features = row or (None, None, None, None)
+    return {
+        "name": name,
+        "species_type": species_type,
+        "species_category": species_category,
+        "features": features,
+        "symptoms": symptoms,
+        "time": time,
+    }
 
 # 긴급예약에서 예약하기 눌렀을 시 예약DB에 저장
+# (clinic_id, time) 유니크 키로 슬롯을 원자적으로 선점하고, 이미 선점된 슬롯이면 409를 돌려준다
 @router.post('/{user_id}')
 async def insert_reservation(clinic_id: str, time: str, symptoms: str, pet_id: str, user_id: str):
+    slot = parse_time(time)
+    time = format_time(slot)
     conn = hosts.connect()
-    redis_client = await hosts.get_redis_connection()
     try:
         curs = conn.cursor()
         sql = "INSERT INTO reservation(user_id, clinic_id, time, symptoms, pet_id) VALUES (%s, %s, %s, %s, %s)"
-        curs.execute(sql, (user_id, clinic_id, time, symptoms, pet_id))
+        curs.execute(sql, (user_id, clinic_id, slot, symptoms, pet_id))
         conn.commit()
 
-        # Redis 캐시 무효화
-        cache_key = generate_cache_key("select_reservation", {"user_id": user_id})
-        await redis_client.delete(cache_key)
-
-        return {'results': 'OK'}
+        detail = _fetch_or_none(curs, DETAIL_SQL, (user_id, pet_id))
+        clinic_row = _fetch_or_none(curs, CLINIC_SLOT_SQL, (clinic_id,))
+    except pymysql.err.IntegrityError as e:
+        conn.rollback()
+        if e.args and e.args[0] == DUPLICATE_ENTRY:
+            raise HTTPException(status_code=409, detail="이미 예약된 시간입니다.")
+        print(f"Error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to insert reservation.")
     except Exception as e:
         conn.rollback()
         print(f"Error: {e}")
@@ -52,6 +123,44 @@ async def insert_reservation(clinic_id: str, time: str, symptoms: str, pet_id: s
     finally:
         conn.close()
 
+    await _after_slot_change(user_id, clinic_id, time, "reservation", clinic_row, _detail(detail, symptoms, time))
+    return {'results': 'OK'}
+
+# 예약 취소 (슬롯이 다시 예약 가능하면 그렇다고 알린다)
+@router.delete('/{user_id}')
+async def cancel_reservation(clinic_id: str, time: str, user_id: str):
+    slot = parse_time(time)
+    time = format_time(slot)
+    conn = hosts.connect()
+    try:
+        curs = conn.cursor()
+        reservation = _fetch_or_none(
+            curs,
+            "SELECT symptoms, pet_id FROM reservation WHERE user_id = %s AND clinic_id = %s AND time = %s",
+            (user_id, clinic_id, slot),
+        )
+        sql = "DELETE FROM reservation WHERE user_id = %s AND clinic_id = %s AND time = %s"
+        result = curs.execute(sql, (user_id, clinic_id, slot))
+        conn.commit()
+        if result == 0:
+            raise HTTPException(status_code=404, detail="예약 내역이 없습니다.")
+
+        symptoms, pet_id = reservation or (None, None)
+        detail = _fetch_or_none(curs, DETAIL_SQL, (user_id, pet_id))
+        clinic_row = _fetch_or_none(curs, CLINIC_SLOT_SQL, (clinic_id,))
+    except HTTPException:
+        raise
+    except Exception as e:
+        conn.rollback()
+        print(f"Error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to cancel reservation.")
+    finally:
+        conn.close()
+
+    await _after_slot_change(user_id, clinic_id, time, "cancellation", clinic_row, _detail(detail, symptoms, time),
+                             bookable=await _bookable(clinic_id, slot))
+    return {'results': 'OK'}
+
 # 예약내역 보여주는 리스트
 @router.get('/user/{user_id}')
 async def select_reservation(user_id: str):
@@ -68,7 +177,7 @@ async def select_reservation(user_id: str):
             '''
             curs.execute(sql, (user_id,))
             rows = curs.fetchall()
-            return rows
+            return format_rows(rows, 4)
         except Exception as e:
             print("Database error:", e)
             return []
@@ -78,32 +187,221 @@ async def select_reservation(user_id: str):
     rows = await get_cached_or_fetch(cache_key, fetch_data)
     return {'results': rows}
 
-# 병원에서 보는 예약 현황
+# 병원 예약 현황을 [start, end) 구간으로 조회 ((clinic_id, time) 인덱스 범위 스캔)
+SCHEDULE_SQL = '''
+SELECT user.name, pet.species_type, pet.species_category, pet.features, reservation.symptoms, reservation.time
+FROM reservation
+    INNER JOIN pet ON reservation.pet_id = pet.id
+    INNER JOIN user ON reservation.user_id = user.id
+WHERE reservation.clinic_id = %s AND reservation.time >= %s AND reservation.time < %s
+ORDER BY reservation.time ASC
+'''
+SCHEDULE_MAX_DAYS = 92
+
+def _select_schedule(conn, clinic_id, start, end):
+    curs = conn.cursor()
+    curs.execute(deadline.sql(SCHEDULE_SQL), (clinic_id, start, end))
+    return format_rows(curs.fetchall(), 5)
+
+async def _fetch_schedule(name, clinic_id, start, end):
+    # 스레드에서 제한 시간 안에 조회 (넘기면 504, 클라이언트가 끊기면 쿼리도 멈춘다)
+    try:
+        return await deadline.query(name, _select_schedule, clinic_id, start, end)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print("Database error:", e)
+        return []
+
+def _clinic_view_key(clinic_id, start, end):
+    # 입력 형식('2024-10-07T09' 등)과 관계없이 같은 구간이면 같은 키 (예약/취소 시 _after_slot_change 에서 지운다)
+    return generate_cache_key("select_reservation_clinic",
+                              {"clinic_id": clinic_id, "from": format_time(start), "to": format_time(end)})
+
+# 병원에서 보는 예약 현황 (time은 '2024-10-07' 같은 날짜/시간 앞부분)
 @router.get('/clinic/{clinic_id}')
 async def select_reservation_clinic(clinic_id: str, time: str):
-    cache_key = generate_cache_key("select_reservation_clinic", {"clinic_id": clinic_id, "time": time})
+    start, end = prefix_range(time)
+    cache_key = _clinic_view_key(clinic_id, start, end)
 
     async def fetch_data():
-        conn = hosts.connect()
-        try:
-            curs = conn.cursor()
-            sql = '''
-            SELECT user.name, res.species_type, res.species_category, res.features, res.symptoms, res.time
-            FROM user,
-                (SELECT reservation.user_id, pet.species_type, pet.species_category, pet.features, reservation.symptoms, reservation.time
-                 FROM reservation 
-                 INNER JOIN pet ON reservation.pet_id = pet.id AND clinic_id = %s) AS res
-            WHERE res.user_id = user.id AND time LIKE %s ORDER BY time ASC
-            '''
-            time1 = f'{time}%'
-            curs.execute(sql, (clinic_id, time1))
-            rows = curs.fetchall()
-            return rows
-        except Exception as e:
-            print("Database error:", e)
-            return []
-        finally:
-            conn.close()
+        return await _fetch_schedule("reservation_clinic", clinic_id, start, end)
 
     rows = await get_cached_or_fetch(cache_key, fetch_data)
     return {'results': rows}
+
+
+# 병원 예약 일정 (일/주 단위 화면용), from 이상 to 미만
+# from/to는 'YYYY-MM-DD' 또는 'YYYY-MM-DD HH:MM', to를 생략하면 from부터 7일
+@router.get('/clinic/{clinic_id}/schedule')
+async def select_reservation_schedule(clinic_id: str, from_: str = Query(..., alias="from"), to: str = None):
+    start = parse_bound(from_)
+    end = parse_bound(to) if to else start + timedelta(days=7)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="to는 from보다 뒤여야 합니다.")
+    if end - start > timedelta(days=SCHEDULE_MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"조회 기간은 최대 {SCHEDULE_MAX_DAYS}일입니다.")
+
+    rows = await _fetch_schedule("reservation_schedule", clinic_id, start, end)
+    return {'from': format_time(start), 'to': format_time(end), 'results': rows}
+
+
+# ====================================
+# 예약 내역 내보내기 (NDJSON / CSV 스트리밍)
+# ====================================
+# 서버 측(unbuffered) 커서로 EXPORT_BATCH 행씩 읽어 바로 내보내므로 기간이 길어도 메모리는 일정하다.
+# 클라이언트가 끊기면 StreamingResponse 가 제너레이터를 취소하고, 다 읽지 않은 연결은 버려서
+# (hosts.ConnectionPool.release) MySQL 쪽 쿼리도 멈춘다.
+# 내보내기는 DB 연결을 오래 잡으므로 워커당 VET_EXPORT_MAX_CONCURRENT 개까지만 동시에 받는다.
+
+EXPORT_BATCH = int(os.getenv("VET_EXPORT_BATCH", "500"))
+EXPORT_MAX_CONCURRENT = int(os.getenv("VET_EXPORT_MAX_CONCURRENT", "2"))
+EXPORT_COLUMNS = ["time", "user_id", "name", "pet_id", "species_type", "species_category", "features", "symptoms"]
+EXPORT_SQL = '''
+SELECT reservation.time, reservation.user_id, user.name, reservation.pet_id,
+       pet.species_type, pet.species_category, pet.features, reservation.symptoms
+FROM reservation
+    INNER JOIN pet ON reservation.pet_id = pet.id
+    INNER JOIN user ON reservation.user_id = user.id
+WHERE reservation.clinic_id = %s AND reservation.time >= %s AND reservation.time < %s
+ORDER BY reservation.time ASC
+'''
+EXPORT_MIN_TIME = "1970-01-01"
+EXPORT_MAX_TIME = "9999-01-01"
+
+# fetchmany 는 DB 를 기다리며 블록되므로 이벤트 루프 밖에서. 취소돼도 실행 중인 fetch 가 끝나야 연결을 닫을 수 있어
+# concurrent.futures 의 Future 를 직접 다룬다
+_export_pool = ThreadPoolExecutor(max_workers=EXPORT_MAX_CONCURRENT, thread_name_prefix="export")
+
+
+class ReservationExport:
+    running = 0
+
+    def __init__(self, clinic_id, start, end):
+        self.params = (clinic_id, start, end)
+        self.conn = None
+        self.curs = None
+        self.pending = None
+        self.rows = 0
+        self.finished = False
+        self.closed = False
+
+    async def _call(self, func, *args):
+        self.pending = _export_pool.submit(func, *args)
+        return await asyncio.wrap_future(self.pending)
+
+    async def open(self):
+        ReservationExport.running += 1
+        metrics.incr("export.started")
+        try:
+            self.conn = hosts.connect()
+            self.curs = self.conn.cursor(pymysql.cursors.SSCursor)
+            await self._call(self.curs.execute, EXPORT_SQL, self.params)
+        except Exception:
+            self.close()
+            raise
+
+    async def batches(self):
+        try:
+            while True:
+                rows = await self._call(self.curs.fetchmany, EXPORT_BATCH)
+                if not rows:
+                    self.finished = True
+                    return
+                self.rows += len(rows)
+                yield rows
+        finally:
+            self.close()
+
+    def _close_conn(self, *_):
+        self.conn.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        ReservationExport.running -= 1
+        metrics.incr("export.rows", self.rows)
+        if not self.finished:
+            metrics.incr("export.aborted")
+        if self.conn is None:
+            return
+        if self.pending is not None and not self.pending.done():
+            # 스레드에서 아직 읽는 중: 끝나면 닫는다
+            self.pending.add_done_callback(self._close_conn)
+        else:
+            self._close_conn()
+
+
+def _export_row(row):
+    values = list(row)
+    values[0] = format_time(values[0])
+    return values
+
+
+async def _ndjson(export):
+    async for rows in export.batches():
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, _export_row(row))), ensure_ascii=False, default=str) + "\n"
+            for row in rows
+        )
+
+
+async def _csv(export):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # 엑셀에서 한글이 깨지지 않도록 BOM
+    yield "\ufeff"
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in export.batches():
+        writer.writerows(_export_row(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    "ndjson": (_ndjson, "application/x-ndjson"),
+    "csv": (_csv, "text/csv; charset=utf-8"),
+}
+
+
+# 병원 예약 내역 다운로드, from 이상 to 미만 (생략하면 처음부터 / 끝까지)
+# format=ndjson (한 줄에 예약 하나) 또는 csv
+@router.get('/clinic/{clinic_id}/export')
+async def export_reservation_clinic(clinic_id: str, from_: str = Query(None, alias="from"), to: str = None,
+                                    format: str = "ndjson"):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format은 ndjson 또는 csv 입니다.")
+    start = parse_bound(from_ or EXPORT_MIN_TIME)
+    end = parse_bound(to or EXPORT_MAX_TIME)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="to는 from보다 뒤여야 합니다.")
+    if ReservationExport.running >= EXPORT_MAX_CONCURRENT:
+        raise HTTPException(status_code=503, detail="내보내기 요청이 많습니다. 잠시 후 다시 시도해주세요.",
+                            headers={"Retry-After": "10"})
+
+    export = ReservationExport(clinic_id, start, end)
+    try:
+        await export.open()
+    except Exception as e:
+        print(f"Error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to export reservations.")
+
+    encode, media_type = EXPORT_FORMATS[format]
+    filename = f"reservations-{re.sub(r'[^A-Za-z0-9_.-]', '_', clinic_id)}-{start:%Y%m%d}-{end:%Y%m%d}.{format}"
+    return StreamingResponse(
+        encode(export),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+        # 스트림을 시작하기 전에 끊겨 제너레이터가 돌지 않은 경우에도 연결을 돌려준다
+        background=BackgroundTask(export.close),
+    )
+
+
+# 병원 예약 현황 실시간 피드 (Server-Sent Events)
+# 재접속 시 브라우저가 보내는 Last-Event-ID 이후의 예약부터 다시 받는다
+@router.get('/clinic/{clinic_id}/feed')
+async def reservation_feed(clinic_id: str, last_event_id: str = Header(None)):
+    return clinic_feed.response(clinic_id, last_event_id)
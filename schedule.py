@@ -0,0 +1,256 @@
+"""
+author:
+Description: 병원 진료 시간 규칙(요일별 시간/슬롯 길이/휴진)으로 예약 가능 슬롯을 계산
+Fixed:
+Usage:
+    book = await get_rule_book()
+    book.open_clinics(slot)                 # 해당 시각에 진료하는 병원 id 집합
+    book.expand(clinic_id, start, end)      # [start, end) 구간의 슬롯 (lazy)
+
+    available_time 테이블처럼 슬롯마다 행을 만들지 않고, clinic_schedule_rule(병원 x 요일)과
+    clinic_closure(휴진 구간)만 저장한다. close <= open 인 규칙은 자정을 넘겨 다음 날 close 까지 연다
+    (같으면 24시간, 새벽 슬롯은 전날 요일의 규칙으로 계산). 규칙은 워커 메모리에 통째로 올려두고
+    SCHEDULE_RULES_TTL 초마다, 또는 Redis 의 규칙 버전(RULES_VERSION_KEY)이 바뀌면 다시 읽는다.
+    예약 가능 캐시 키에도 버전을 넣는다(availability_key). 규칙이 바뀐 뒤 다른 워커가 이전 규칙으로
+    캐시를 다시 채워도 그 값은 이전 버전 키에만 들어가 읽히지 않는다.
+
+    병원을 만들면 clinic.start_time/end_time 으로 매일 같은 규칙을 넣고(insert_daily_rules),
+    진료 시간을 바꾸면 이전 시간과 같던 규칙만 새 시간으로 바꾼다(sync_clinic_hours, 요일별로 따로 정한 규칙은 그대로).
+    규칙/휴진을 바꾼 트랜잭션을 커밋한 뒤에는 await rules_changed() (버전을 올린다).
+"""
+
+import os, time
+from collections import namedtuple
+from datetime import datetime, timedelta, time as dtime
+import hosts
+from cache import REDIS_ERRORS, generate_cache_key, invalidate_pattern, log_redis_error
+
+SCHEDULE_RULES_TTL = float(os.getenv("VET_SCHEDULE_RULES_TTL", "30"))
+DEFAULT_SLOT_MINUTES = 30
+
+Rule = namedtuple("Rule", "clinic_id weekday open close slot_minutes")
+Closure = namedtuple("Closure", "id clinic_id start end reason")
+
+
+def to_time(value) -> dtime:
+    """MySQL TIME(pymysql은 timedelta로 돌려줌), 'HH:MM[:SS]' 문자열, time 모두 처리"""
+    if isinstance(value, dtime):
+        return value
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return dtime(seconds // 3600 % 24, seconds // 60 % 60)
+    parts = str(value).split(":")
+    return dtime(int(parts[0]), int(parts[1]))
+
+
+def _minutes(t: dtime) -> int:
+    return t.hour * 60 + t.minute
+
+
+DAY_MINUTES = 24 * 60
+
+
+def _window(rule):
+    """규칙 요일 0시부터의 [시작, 끝) 분. close <= open 이면 자정을 넘긴다 (같으면 24시간)."""
+    start, end = _minutes(rule.open), _minutes(rule.close)
+    if end <= start:
+        end += DAY_MINUTES
+    return start, end
+
+
+def _overnight(rule) -> bool:
+    return _minutes(rule.close) <= _minutes(rule.open)
+
+
+class RuleBook:
+    def __init__(self, rules, closures):
+        self.by_weekday = {}
+        self.by_clinic = {}
+        # 자정을 넘기는 규칙은 다음 날 새벽 슬롯도 가지므로 요일별로 따로 둔다
+        self.overnight = {}
+        for rule in rules:
+            self.by_weekday.setdefault(rule.weekday, []).append(rule)
+            self.by_clinic.setdefault(rule.clinic_id, []).append(rule)
+            if _overnight(rule):
+                self.overnight.setdefault(rule.weekday, []).append(rule)
+        self.closures = {}
+        for closure in closures:
+            self.closures.setdefault(closure.clinic_id, []).append(closure)
+        self.rule_count = len(rules)
+        self.loaded_at = time.monotonic()
+
+    @staticmethod
+    def _on_slot(rule, minute) -> bool:
+        """minute: 규칙 요일 0시부터 분 (전날 규칙이면 1440 이상)"""
+        start, end = _window(rule)
+        return start <= minute and minute + rule.slot_minutes <= end and (minute - start) % rule.slot_minutes == 0
+
+    def _candidates(self, slot: datetime, rules=None):
+        """slot 을 가질 수 있는 (규칙, 규칙 요일 기준 분): 그날 규칙과 전날에서 넘어온 규칙"""
+        if slot.second:
+            return
+        weekday, minute = slot.weekday(), slot.hour * 60 + slot.minute
+        yesterday = (weekday - 1) % 7
+        if rules is None:
+            today, carried = self.by_weekday.get(weekday, ()), self.overnight.get(yesterday, ())
+        else:
+            today = [r for r in rules if r.weekday == weekday]
+            carried = [r for r in rules if r.weekday == yesterday and _overnight(r)]
+        for rule in today:
+            yield rule, minute
+        for rule in carried:
+            yield rule, minute + DAY_MINUTES
+
+    def _closed(self, clinic_id, slot: datetime) -> bool:
+        return any(c.start <= slot < c.end for c in self.closures.get(clinic_id, ()))
+
+    def is_open(self, clinic_id, slot: datetime) -> bool:
+        return any(
+            self._on_slot(rule, minute) for rule, minute in self._candidates(slot, self.by_clinic.get(clinic_id, ()))
+        ) and not self._closed(clinic_id, slot)
+
+    def open_clinics(self, slot: datetime):
+        return {
+            rule.clinic_id
+            for rule, minute in self._candidates(slot)
+            if self._on_slot(rule, minute) and not self._closed(rule.clinic_id, slot)
+        }
+
+    def expand(self, clinic_id, start: datetime, end: datetime):
+        """[start, end) 구간의 예약 슬롯을 시간순으로 생성 (휴진 제외)"""
+        rules = self.by_clinic.get(clinic_id, ())
+        day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day < end:
+            slots = set()
+            yesterday = (day.weekday() - 1) % 7
+            for rule in rules:
+                # 그날 규칙의 자정 전 부분과 전날 규칙의 자정 넘은 부분
+                if rule.weekday == day.weekday():
+                    offset = 0
+                elif rule.weekday == yesterday and _overnight(rule):
+                    offset = DAY_MINUTES
+                else:
+                    continue
+                minute, stop = _window(rule)
+                while minute + rule.slot_minutes <= stop:
+                    if 0 <= minute - offset < DAY_MINUTES:
+                        slots.add(day + timedelta(minutes=minute - offset))
+                    minute += rule.slot_minutes
+            for slot in sorted(slots):
+                if start <= slot < end and not self._closed(clinic_id, slot):
+                    yield slot
+            day += timedelta(days=1)
+
+
+def clinic_hours(start, end):
+    """clinic.start_time/end_time ('HH:MM') -> (open, close). 비어 있거나 형식이 틀리면 None"""
+    try:
+        return to_time(start), to_time(end)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def insert_daily_rules(curs, clinic_id, hours, slot_minutes=DEFAULT_SLOT_MINUTES):
+    open_, close = hours
+    for weekday in range(7):
+        curs.execute(
+            "INSERT INTO clinic_schedule_rule (clinic_id, weekday, open_time, close_time, slot_minutes) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (clinic_id, weekday, open_.strftime("%H:%M"), close.strftime("%H:%M"), slot_minutes),
+        )
+
+
+def sync_clinic_hours(curs, clinic_id, old, new) -> bool:
+    """병원 진료 시간을 바꾼 트랜잭션 안에서 호출. old/new: (start_time, end_time). 규칙을 바꿨으면 True"""
+    new_hours = clinic_hours(*new)
+    if new_hours is None:
+        return False
+    curs.execute("SELECT COUNT(*) FROM clinic_schedule_rule WHERE clinic_id = %s", (clinic_id,))
+    if not curs.fetchone()[0]:
+        insert_daily_rules(curs, clinic_id, new_hours)
+        return True
+    old_hours = clinic_hours(*old) if old else None
+    if old_hours is None or old_hours == new_hours:
+        return False
+    changed = curs.execute(
+        "UPDATE clinic_schedule_rule SET open_time = %s, close_time = %s "
+        "WHERE clinic_id = %s AND open_time = %s AND close_time = %s",
+        (*(t.strftime("%H:%M") for t in new_hours), clinic_id, *(t.strftime("%H:%M") for t in old_hours)),
+    )
+    return bool(changed)
+
+
+def load_rule_book(conn=None) -> RuleBook:
+    own = conn is None
+    conn = conn or hosts.connect()
+    try:
+        curs = conn.cursor()
+        curs.execute("SELECT clinic_id, weekday, open_time, close_time, slot_minutes FROM clinic_schedule_rule")
+        rules = [
+            Rule(row[0], int(row[1]), to_time(row[2]), to_time(row[3]), int(row[4] or DEFAULT_SLOT_MINUTES))
+            for row in curs.fetchall()
+        ]
+        # 지난 휴진은 필요 없다
+        curs.execute(
+            "SELECT id, clinic_id, start_at, end_at, reason FROM clinic_closure WHERE end_at >= %s",
+            (datetime.now() - timedelta(days=1),),
+        )
+        closures = [Closure(*row) for row in curs.fetchall()]
+        return RuleBook(rules, closures)
+    finally:
+        if own:
+            conn.close()
+
+
+_book = None
+# 규칙/휴진을 바꿀 때마다 올리는 번호. 워커마다 가진 규칙과 예약 가능 캐시 키가 이 번호를 따른다
+RULES_VERSION_KEY = "schedule:rules_version"
+
+
+async def rules_version():
+    """Redis 의 규칙 버전. Redis 를 쓸 수 없으면 None (그동안은 SCHEDULE_RULES_TTL 로만 다시 읽는다)"""
+    try:
+        redis_client = await hosts.get_redis_connection()
+        return int(await redis_client.get(RULES_VERSION_KEY) or 0)
+    except REDIS_ERRORS as e:
+        log_redis_error("get", e)
+        return None
+
+
+async def availability_key(endpoint, params, version=None):
+    """available_clinic / can_reservation 캐시 키. 규칙 버전이 들어가므로 규칙이 바뀐 뒤에는
+    다른 워커가 이전 규칙으로 채운 값(이전 버전 키)을 읽지 않는다."""
+    if version is None:
+        version = await rules_version()
+    return generate_cache_key(endpoint, {**params, "rules": version})
+
+
+async def get_rule_book() -> RuleBook:
+    global _book
+    version = await rules_version()
+    if (_book is None or time.monotonic() - _book.loaded_at > SCHEDULE_RULES_TTL
+            or (version is not None and _book.version != version)):
+        # 버전이 막 바뀌었을 수 있으니 복제 지연 없이 primary 에서
+        with hosts.primary_reads():
+            book = load_rule_book()
+        book.version = version
+        _book = book
+    return _book
+
+
+def invalidate_rule_book():
+    global _book
+    _book = None
+
+
+async def rules_changed():
+    """규칙/휴진을 바꾼 트랜잭션을 커밋한 뒤 호출: 버전을 올려 모든 워커가 규칙을 다시 읽게 하고 이전 캐시를 지운다"""
+    invalidate_rule_book()
+    # 먼저 지운다: 이전 버전 키는 더 읽히지 않지만 예산을 차지하지 않도록, 그리고 새 버전 키를 처음 채울 때
+    # primary 에서 읽도록 네임스페이스에 최근 무효화 표시를 남긴다 (cache.py)
+    await invalidate_pattern("available_clinic:*", "can_reservation:*")
+    try:
+        redis_client = await hosts.get_redis_connection()
+        await redis_client.incr(RULES_VERSION_KEY)
+    except REDIS_ERRORS as e:
+        log_redis_error("incr", e)
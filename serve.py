@@ -0,0 +1,172 @@
+"""
+author:
+Description: 멀티 프로세스 실행 (워커 N개, 워커별 자원 초기화, 무중단 교체)
+Fixed:
+Usage:
+    python serve.py                                  # VET_WORKERS 개 워커 (기본: 사용 가능한 CPU 수)
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+    python serve.py --forwarded-allow-ips 10.0.0.5        # 프록시 뒤: 그 프록시의 X-Forwarded-For 만 믿는다
+    kill -HUP <마스터 pid>                           # 워커를 하나씩 교체 (새 워커가 뜬 뒤 이전 워커 종료)
+    kill -TERM <마스터 pid>                          # 처리 중인 요청을 마치고 종료
+
+    마스터가 포트를 열고 워커들이 같은 소켓에서 요청을 받는다. 워커가 죽으면 다시 띄운다.
+    기본은 spawn: 워커마다 main 을 새로 import 하므로 HUP 교체 시 새 코드가 반영된다.
+    VET_PRELOAD=1 이면 마스터가 main 을 한 번 import 한 뒤 fork 해 워커끼리 메모리를 공유한다.
+      fork 직후 hosts 가 DB 풀/Redis/S3/Firebase 클라이언트를 버리고 워커에서 새로 만든다.
+      이 모드에서 코드 변경은 HUP 으로 반영되지 않으므로 마스터를 다시 시작해야 한다.
+    DB 연결은 워커마다 풀(VET_DB_POOL_SIZE)을 가지므로 워커 수 x 풀 크기가 DB 최대 연결 수 안에 들어와야 한다.
+
+    VET_GRACEFUL_TIMEOUT    : 종료 신호 후 처리 중인 요청을 기다리는 시간 (기본 30초, 넘으면 강제 종료)
+    VET_WORKER_BOOT_TIMEOUT : HUP 교체 시 새 워커가 뜰 때까지 기다리는 시간 (기본 60초)
+    VET_FORWARDED_ALLOW_IPS : X-Forwarded-For/Proto 를 믿을 프록시 IP (쉼표 구분). 비우면 프록시 헤더를 쓰지 않아
+                              프록시 뒤에서는 모든 요청의 클라이언트 IP 가 프록시 IP 가 된다 (admission.py 의 IP 제한 참고)
+"""
+
+import argparse, multiprocessing, os, signal, time
+import uvicorn
+
+
+def default_workers():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+WORKERS = int(os.getenv("VET_WORKERS", "0")) or default_workers()
+PRELOAD = os.getenv("VET_PRELOAD", "0") == "1"
+GRACEFUL_TIMEOUT = float(os.getenv("VET_GRACEFUL_TIMEOUT", "30"))
+BOOT_TIMEOUT = float(os.getenv("VET_WORKER_BOOT_TIMEOUT", "60"))
+FORWARDED_ALLOW_IPS = os.getenv("VET_FORWARDED_ALLOW_IPS", "")
+RESPAWN_BACKOFF = 1.0  # 뜨자마자 죽는 워커를 계속 띄우지 않도록
+
+
+class WorkerServer(uvicorn.Server):
+    """startup(lifespan 포함)이 끝나면 ready 이벤트로 마스터에 알린다"""
+
+    def __init__(self, config, ready):
+        super().__init__(config)
+        self.ready = ready
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if not self.should_exit:
+            self.ready.set()
+
+
+def run_worker(index, config_kwargs, sockets, ready):
+    os.environ["VET_WORKER_INDEX"] = str(index)
+    # HUP 은 마스터만 처리한다
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    import metrics
+    metrics.set_worker(index)
+    WorkerServer(uvicorn.Config(**config_kwargs), ready).run(sockets=sockets)
+
+
+class Master:
+    def __init__(self, config_kwargs, workers=WORKERS, preload=PRELOAD):
+        self.config_kwargs = config_kwargs
+        self.count = workers
+        self.preload = preload
+        self.ctx = multiprocessing.get_context("fork" if preload else "spawn")
+        # 번호 -> (프로세스, ready 이벤트, 시작 시각)
+        # spawn 된 워커가 이벤트를 다시 열기 전에 마스터에서 사라지면 안 되므로 함께 보관한다
+        self.workers = {}
+        self.should_exit = False
+        self.reload_requested = False
+        self.socket = None
+
+    def _spawn(self, index):
+        ready = self.ctx.Event()
+        process = self.ctx.Process(
+            target=run_worker, args=(index, self.config_kwargs, [self.socket], ready), name=f"vet-worker-{index}"
+        )
+        process.start()
+        print(f"Worker {index} started [{process.pid}]")
+        return process, ready, time.monotonic()
+
+    def _stop(self, processes):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        for process in processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                print(f"Worker [{process.pid}] did not stop in {GRACEFUL_TIMEOUT}s, killing")
+                process.kill()
+                process.join()
+
+    def reload(self):
+        """워커를 하나씩 교체한다. 새 워커가 준비되지 않으면 이전 워커를 그대로 두고 중단한다."""
+        print("Reloading workers...")
+        for index in sorted(self.workers):
+            worker = self._spawn(index)
+            process, ready, _ = worker
+            if not ready.wait(BOOT_TIMEOUT):
+                print(f"Worker {index} failed to boot, reload aborted")
+                self._stop([process])
+                return
+            old = self.workers[index][0]
+            self.workers[index] = worker
+            self._stop([old])
+        print("Workers reloaded")
+
+    def _check_workers(self):
+        for index, (process, _, started) in list(self.workers.items()):
+            if process.is_alive():
+                continue
+            print(f"Worker {index} [{process.pid}] exited with {process.exitcode}, restarting")
+            if time.monotonic() - started < RESPAWN_BACKOFF:
+                time.sleep(RESPAWN_BACKOFF)
+            self.workers[index] = self._spawn(index)
+
+    def _on_exit(self, sig, frame):
+        self.should_exit = True
+
+    def _on_reload(self, sig, frame):
+        self.reload_requested = True
+
+    def run(self):
+        self.socket = uvicorn.Config(**self.config_kwargs).bind_socket()
+        if self.preload:
+            app_module = self.config_kwargs["app"].split(":")[0]
+            __import__(app_module)
+        signal.signal(signal.SIGINT, self._on_exit)
+        signal.signal(signal.SIGTERM, self._on_exit)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        print(f"Master [{os.getpid()}] starting {self.count} workers ({self.ctx.get_start_method()})")
+        for index in range(self.count):
+            self.workers[index] = self._spawn(index)
+        try:
+            while not self.should_exit:
+                if self.reload_requested:
+                    self.reload_requested = False
+                    self.reload()
+                self._check_workers()
+                time.sleep(0.2)
+        finally:
+            print("Stopping workers...")
+            self._stop([process for process, _, _ in self.workers.values()])
+            self.socket.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="멀티 프로세스 서버")
+    parser.add_argument("--app", default="main:app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--preload", action="store_true", default=PRELOAD)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--forwarded-allow-ips", default=FORWARDED_ALLOW_IPS)
+    args = parser.parse_args(argv)
+
+    config_kwargs = {"app": args.app, "host": args.host, "port": args.port, "log_level": args.log_level}
+    if args.forwarded_allow_ips:
+        config_kwargs.update(proxy_headers=True, forwarded_allow_ips=args.forwarded_allow_ips)
+    Master(config_kwargs, workers=args.workers, preload=args.preload).run()
+
+
+if __name__ == "__main__":
+    main()
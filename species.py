@@ -1,111 +1,185 @@
 """
 author: Aeong
-Description: species with Redis Caching
+Description: species with in-process snapshot
 Fixed: 2024.10.12
 Usage: Manage species types and categories
+
+    종류/세부 종류는 거의 바뀌지 않으므로 워커마다 메모리에 스냅샷(Taxonomy)을 두고 조회는 그것만 읽는다
+    (요청마다 DB 나 Redis 에 가지 않는다). 스냅샷은 만든 뒤 바꾸지 않고 통째로 교체한다.
+    추가/삭제하면 Redis 의 species:version 을 올리고, 각 워커는 VET_SPECIES_REFRESH 초마다 버전만 보고
+    바뀌었을 때 DB 에서 다시 읽는다 (lifecycle.py 가 watch() 를 띄운다).
+    Redis 에 닿지 않아도 VET_SPECIES_MAX_AGE 초가 지나면 DB 에서 다시 읽는다.
 """
 
-from fastapi import APIRouter, HTTPException, Query
-import hosts, json
+import asyncio, os, time
+from types import MappingProxyType
+from fastapi import APIRouter, HTTPException
+import hosts, metrics
 
 router = APIRouter()
 
-def generate_cache_key(endpoint: str, params: dict):
-    return f"{endpoint}:{json.dumps(params, sort_keys=True)}"
+VERSION_KEY = "species:version"
+REFRESH_INTERVAL = float(os.getenv("VET_SPECIES_REFRESH", "5"))
+MAX_AGE = float(os.getenv("VET_SPECIES_MAX_AGE", "300"))
+
+
+class Taxonomy:
+    """종류 -> 세부 종류 목록. 만든 뒤에는 바꾸지 않는다."""
+
+    def __init__(self, rows, version):
+        by_type = {}
+        for species_type, category in rows:
+            by_type.setdefault(species_type, []).append(category)
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.types = tuple(by_type)
+        self.categories = tuple(category for _, category in rows)
+        self.by_type = MappingProxyType({t: tuple(c) for t, c in by_type.items()})
+
+
+def load_taxonomy(version=None) -> Taxonomy:
+    conn = hosts.connect()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT type, category FROM species")
+            return Taxonomy([(row[0], row[1]) for row in cursor.fetchall()], version)
+    finally:
+        conn.close()
+
+
+_taxonomy = None
+_lock = None
+
 
-async def get_cached_or_fetch(cache_key, fetch_func):
+async def _redis_version():
     redis_client = await hosts.get_redis_connection()
+    return int(await redis_client.get(VERSION_KEY) or 0)
+
+
+async def reload(version=None, force=True):
+    """DB 에서 다시 읽어 스냅샷을 교체한다. 버전은 DB 를 읽기 전에 본 값이어야 한다."""
+    global _taxonomy, _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        # 처음 읽을 때 동시에 들어온 요청은 먼저 읽은 것을 함께 쓴다
+        if not force and _taxonomy is not None:
+            return _taxonomy
+        if version is None:
+            try:
+                version = await _redis_version()
+            except Exception as e:
+                print(f"Redis get error: {e}")
+        loop = asyncio.get_running_loop()
+        _taxonomy = await loop.run_in_executor(None, load_taxonomy, version)
+        metrics.incr("species.reload")
+    return _taxonomy
+
+
+async def get_taxonomy() -> Taxonomy:
+    if _taxonomy is None:
+        return await reload(force=False)
+    return _taxonomy
+
+
+async def refresh():
+    """Redis 버전이 스냅샷과 다르거나 스냅샷이 너무 오래됐으면 다시 읽는다"""
     try:
-        cached_data = await redis_client.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
+        version = await _redis_version()
     except Exception as e:
         print(f"Redis get error: {e}")
+        version = None
+    current = _taxonomy
+    if current is None or (version is not None and version != current.version) \
+            or time.monotonic() - current.loaded_at > MAX_AGE:
+        await reload(version)
+
+
+async def watch():
+    while True:
+        await asyncio.sleep(REFRESH_INTERVAL)
+        try:
+            await refresh()
+        except Exception as e:
+            print(f"Species refresh error: {e}")
+
 
-    data = await fetch_func()
+async def _after_species_change():
+    # DB 에 반영한 뒤 버전을 올려야 다른 워커가 새 버전으로 읽을 때 바뀐 내용이 보인다
+    version = None
     try:
-        await redis_client.set(cache_key, json.dumps(data), ex=3600)
+        redis_client = await hosts.get_redis_connection()
+        version = await redis_client.incr(VERSION_KEY)
     except Exception as e:
-        print(f"Redis set error: {e}")
-    return data
+        print(f"Redis incr error: {e}")
+    await reload(version)
+
+
+def _snapshot():
+    current = _taxonomy
+    if current is None:
+        return {"loaded": False}
+    return {
+        "loaded": True,
+        "version": current.version,
+        "age_seconds": round(time.monotonic() - current.loaded_at, 1),
+        "types": len(current.types),
+        "categories": len(current.categories),
+    }
+
+
+metrics.register("species", _snapshot)
+
 
 # 모든 종류 조회 API (GET)
 @router.get("/types")
 async def get_species_types():
-    conn = hosts.connect()
     try:
-        with conn.cursor() as cursor:
-            sql = "SELECT DISTINCT type FROM species"
-            cursor.execute(sql)
-            types = cursor.fetchall()
-            return [type[0] for type in types] if types else []
+        return list((await get_taxonomy()).types)
     except Exception as e:
         print("Database error:", e)
         return []
-    finally:
-        conn.close()
 
 
 # 특정 종류의 세부 종류 조회 API (GET)
 @router.get("/categories")
 async def get_species_categories():
-    conn = hosts.connect()
     try:
-        curs = conn.cursor()
-        sql = "SELECT category FROM species"
-        curs.execute(sql)
-        rows = curs.fetchall()
-        return [row[0] for row in rows] if rows else []
+        return list((await get_taxonomy()).categories)
     except Exception as e:
         print("Database error:", e)
         return []
-    finally:
-        conn.close()
 
 # 특정 종류에 따른 세부 종류 조회 API
 @router.get("/pet_categories")
-async def get_species_categories(type: str):
-    conn =hosts.connect()
-    try:
-        with conn.cursor() as cursor:
-            sql = "SELECT category FROM species WHERE type = %s"
-            cursor.execute(sql, (type,))
-            categories = cursor.fetchall()
-
-            if not categories:
-                raise HTTPException(status_code=404, detail="No categories found for this species type.")
-
-            return [category[0] for category in categories]
-    finally:
-        conn.close()
+async def get_pet_categories(type: str):
+    categories = (await get_taxonomy()).by_type.get(type)
+    if not categories:
+        raise HTTPException(status_code=404, detail="No categories found for this species type.")
+    return list(categories)
 
 # 새로운 종류 추가 API
 @router.post("/")
 async def add_species(species_category: str, id: str):
     conn = hosts.connect()
-    redis_client = await hosts.get_redis_connection()
     try:
         curs = conn.cursor()
         sql = "INSERT INTO species (type, category) VALUES (%s, %s)"
         curs.execute(sql, ('강아지', species_category))
         conn.commit()
-
-        # Redis 캐시 무효화
-        cache_key = generate_cache_key("get_species_categories", {"user_id": id})
-        await redis_client.delete(cache_key)
-
-        return {"results": "OK"}
     except Exception as e:
         print("Error:", e)
         return {"result": "Error"}
     finally:
         conn.close()
 
+    await _after_species_change()
+    return {"results": "OK"}
+
 # 종류 삭제 API (DELETE)
 @router.delete("/")
 async def delete_species(species_type: str, species_category: str, id: str):
     conn = hosts.connect()
-    redis_client = await hosts.get_redis_connection()
     try:
         with conn.cursor() as cursor:
             sql = "DELETE FROM species WHERE type = %s AND category = %s"
@@ -114,14 +188,13 @@ async def delete_species(species_type: str, species_category: str, id: str):
 
             if result == 0:
                 raise HTTPException(status_code=404, detail="Species not found.")
-
-            # Redis 캐시 무효화
-            cache_key = generate_cache_key("get_species_categories", {"user_id": id})
-            await redis_client.delete(cache_key)
-
-            return {"message": "Species deleted successfully!"}
+    except HTTPException:
+        raise
     except Exception as e:
         print("Error:", e)
         raise HTTPException(status_code=500, detail="Failed to delete species.")
     finally:
         conn.close()
+
+    await _after_species_change()
+    return {"message": "Species deleted successfully!"}
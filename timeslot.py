@@ -0,0 +1,94 @@
+"""
+author:
+Description: 예약/예약가능 시간(DATETIME) 파싱과 API 응답용 문자열 변환
+Fixed:
+Usage:
+    DB에는 DATETIME으로 저장하고, API 입출력과 캐시 키는 기존과 같은 'YYYY-MM-DD HH:MM' 문자열을 쓴다.
+    slot = parse_time("2024-10-07 10:00")       # datetime
+    start, end = prefix_range("2024-10-07")    # 하루 범위 [start, end)
+"""
+
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+_PARSE_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M",
+)
+
+
+def parse_time(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    value = str(value).strip()
+    for fmt in _PARSE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise HTTPException(status_code=400, detail=f"잘못된 시간 형식입니다: {value} (YYYY-MM-DD HH:MM)")
+
+
+def format_time(value) -> str:
+    if value is None:
+        return None
+    return parse_time(value).strftime(TIME_FORMAT)
+
+
+def normalize(value) -> str:
+    """캐시 키/피드 토픽용: 같은 시각이면 입력 형식과 관계없이 같은 문자열"""
+    return format_time(parse_time(value))
+
+
+def prefix_range(prefix: str):
+    """예전 `time LIKE '2024-10-07%'` 조회와 같은 구간을 [start, end) 범위로 변환
+
+    'YYYY', 'YYYY-MM', 'YYYY-MM-DD', 'YYYY-MM-DD HH', 'YYYY-MM-DD HH:MM' 을 지원한다.
+    """
+    prefix = prefix.strip().replace("T", " ")
+    try:
+        if len(prefix) == 4:
+            start = datetime.strptime(prefix, "%Y")
+            return start, start.replace(year=start.year + 1)
+        if len(prefix) == 7:
+            start = datetime.strptime(prefix, "%Y-%m")
+            return start, (start + timedelta(days=32)).replace(day=1)
+        if len(prefix) == 10:
+            start = datetime.strptime(prefix, "%Y-%m-%d")
+            return start, start + timedelta(days=1)
+        if len(prefix) == 13:
+            start = datetime.strptime(prefix, "%Y-%m-%d %H")
+            return start, start + timedelta(hours=1)
+        start = parse_time(prefix)
+        return start, start + timedelta(minutes=1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"잘못된 날짜 형식입니다: {prefix}")
+
+
+def covering_prefixes(value):
+    """value 시각을 포함하는 prefix_range 접두어들 (연, 월, 일, 시, 분)"""
+    text = format_time(value)
+    return [text[:n] for n in (4, 7, 10, 13, 16)]
+
+
+def parse_bound(value: str) -> datetime:
+    """schedule 조회의 from/to: 날짜만 주면 그 날 0시"""
+    value = value.strip()
+    if len(value) == 10:
+        try:
+            return datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"잘못된 날짜 형식입니다: {value}")
+    return parse_time(value)
+
+
+def format_rows(rows, index):
+    """rows의 index번째 컬럼(DATETIME)을 문자열로 바꿔 JSON 캐시에 넣을 수 있게 한다"""
+    return [
+        [format_time(v) if i == index else v for i, v in enumerate(row)]
+        for row in rows
+    ]
@@ -0,0 +1,216 @@
+"""
+author:
+Description: 이미지 업로드 공용 처리 (크기/형식 제한, 읽으면서 SHA-256, 내용 해시 키로 S3 저장과 중복 건너뛰기)
+Fixed:
+Usage:
+    import uploads
+    stored = await uploads.ingest(image)          # UploadFile -> Stored(key, url, content_type, size, created)
+    pet.image = stored.url                         # 병원/사용자 이미지는 stored.key 를 쓴다
+
+    - 업로드는 CHUNK_BYTES 씩 읽는다. 디스크로 넘어간 업로드(1MB 초과)는 스레드에서 읽는다.
+      첫 조각의 시그니처로 형식을 확인하고(JPEG/PNG/GIF/WEBP/HEIC), MAX_BYTES 를 넘는 순간 413 으로 멈춘다.
+    - S3 키는 "{sha256}.{확장자}" 다. 같은 내용은 같은 키라서 head_object 로 이미 있으면 올리지 않고,
+      객체는 바뀌지 않으므로 Cache-Control 을 1년 immutable 로 둔다. 키에 '/' 가 없어
+      기존 /clinic/files/{file_name}, /mypage/view/{file_name} 로 그대로 조회된다.
+    - 같은 객체를 여러 사용자가 가리킬 수 있으므로 내용 해시 키는 지우지 않는다 (is_content_key).
+    - UploadLimitMiddleware: multipart 요청은 본문을 다 받기 전에 Content-Length (없으면 받은 바이트)로
+      REQUEST_MAX_BYTES 를 넘는지 보고 413 으로 끊는다. 폼 파싱이 끝난 뒤 검사하면 이미 다 받은 뒤다.
+    - S3 호출(head_object/upload_fileobj)은 스레드에서 실행해 이벤트 루프를 막지 않는다.
+    - 조회: return await uploads.stream_object(file_name). get_object 는 스레드에서, 본문은 CHUNK_BYTES 씩
+      읽어 내려보내고 응답이 끝나면(클라이언트가 끊겨도) 본문을 닫는다. 없으면 404.
+"""
+
+import asyncio, functools, hashlib, os, re
+from fastapi import HTTPException
+from starlette.responses import JSONResponse, StreamingResponse
+import hosts, metrics
+
+MAX_BYTES = int(os.getenv("VET_UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+CHUNK_BYTES = int(os.getenv("VET_UPLOAD_CHUNK", str(256 * 1024)))
+# 폼의 다른 필드와 multipart 경계 여유
+REQUEST_MAX_BYTES = MAX_BYTES + 64 * 1024
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+CONTENT_KEY = re.compile(r"^[0-9a-f]{64}\.(jpg|png|gif|webp|heic)$")
+CONTENT_TYPES = {"jpg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp", "heic": "image/heic"}
+
+
+class Stored:
+    def __init__(self, key, content_type, size, created):
+        self.key = key
+        self.content_type = content_type
+        self.size = size
+        self.created = created  # False 면 같은 내용이 이미 있어 올리지 않았다
+
+    @property
+    def url(self):
+        return f"https://{hosts.BUCKET_NAME}.s3.{hosts.REGION}.amazonaws.com/{self.key}"
+
+
+def sniff(head: bytes):
+    """파일 앞부분으로 확장자를 정한다. 허용하지 않는 형식이면 None"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    # iPhone 사진 (ISO BMFF: ....ftypheic)
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "heic"
+    return None
+
+
+def is_content_key(key):
+    return bool(key and CONTENT_KEY.match(key))
+
+
+def content_type_for(key, default="image/jpeg"):
+    return CONTENT_TYPES.get(key.rsplit(".", 1)[-1], default) if key else default
+
+
+def _reject(status, reason, detail):
+    metrics.incr(f"uploads.rejected.{reason}")
+    return HTTPException(status_code=status, detail=detail)
+
+
+async def _digest(upload):
+    """(sha256 hex, 확장자, 크기). 조각씩 읽으며 형식과 크기를 확인한다."""
+    await upload.seek(0)
+    digest = hashlib.sha256()
+    ext, size = None, 0
+    while True:
+        chunk = await upload.read(CHUNK_BYTES)
+        if not chunk:
+            break
+        if ext is None:
+            ext = sniff(chunk[:16])
+            if ext is None:
+                raise _reject(415, "type", "지원하지 않는 이미지 형식입니다. (JPEG, PNG, GIF, WEBP, HEIC)")
+        size += len(chunk)
+        if size > MAX_BYTES:
+            raise _reject(413, "size", f"이미지는 {MAX_BYTES // (1024 * 1024)}MB 까지 올릴 수 있습니다.")
+        digest.update(chunk)
+    if size == 0:
+        raise _reject(400, "empty", "빈 파일입니다.")
+    return digest.hexdigest(), ext, size
+
+
+def _put_if_missing(fileobj, key, content_type):
+    """이미 있으면 False. 없으면 올리고 True (스레드에서 실행)"""
+    from botocore.exceptions import ClientError
+    try:
+        hosts.s3.head_object(Bucket=hosts.BUCKET_NAME, Key=key)
+        return False
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey", "NotFound"):
+            raise
+    fileobj.seek(0)
+    hosts.s3.upload_fileobj(fileobj, hosts.BUCKET_NAME, key, ExtraArgs={
+        "ContentType": content_type, "CacheControl": CACHE_CONTROL,
+    })
+    return True
+
+
+async def ingest(upload) -> Stored:
+    """UploadFile 을 검사해 내용 해시 키로 S3 에 둔다. 형식/크기 오류는 HTTPException(415/413/400)."""
+    sha, ext, size = await _digest(upload)
+    key = f"{sha}.{ext}"
+    content_type = CONTENT_TYPES[ext]
+    created = await asyncio.get_running_loop().run_in_executor(None, _put_if_missing, upload.file, key, content_type)
+    metrics.incr("uploads.stored" if created else "uploads.deduped")
+    metrics.incr("uploads.bytes", size)
+    return Stored(key, content_type, size, created)
+
+
+async def stream_object(file_name):
+    """S3 객체를 조각씩 내려보내는 응답. 이미지는 JSON 캐시에 넣지 않고 워커 메모리에 통째로 두지 않는다.
+    내용 해시 키는 Cache-Control 로 브라우저/CDN 이 캐시한다"""
+    from botocore.exceptions import ClientError
+    try:
+        file_obj = await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(hosts.s3.get_object, Bucket=hosts.BUCKET_NAME, Key=file_name))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            raise HTTPException(status_code=404, detail="File not found in S3.")
+        print(f"Error fetching file: {file_name}. Error: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching file")
+    body = file_obj['Body']
+    # 동기 이터레이터라 StreamingResponse 가 스레드에서 읽는다
+    chunks = iter(lambda: body.read(CHUNK_BYTES), b"")
+    headers = {"Cache-Control": CACHE_CONTROL} if is_content_key(file_name) else {}
+    if file_obj.get("ContentLength") is not None:
+        headers["Content-Length"] = str(file_obj["ContentLength"])
+    return _ObjectResponse(chunks, body, media_type=content_type_for(file_name), headers=headers)
+
+
+class _ObjectResponse(StreamingResponse):
+    """응답이 끝나면(끊김/오류 포함) S3 본문을 닫아 연결을 돌려준다"""
+
+    def __init__(self, content, body, **kwargs):
+        super().__init__(content, **kwargs)
+        self._body = body
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                self._body.close()
+            except Exception as e:
+                print(f"Error closing S3 body: {e}")
+
+
+class UploadLimitMiddleware:
+    """multipart 요청 본문이 REQUEST_MAX_BYTES 를 넘으면 다 받기 전에 413"""
+
+    def __init__(self, app, max_bytes=None):
+        self.app = app
+        self.max_bytes = max_bytes or REQUEST_MAX_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+        length = headers.get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await self._too_large(scope, receive, send)
+            return
+
+        # Content-Length 가 없으면(chunked) 받으면서 센다. 넘으면 앱이 만든 응답(폼 파싱 400) 대신 413
+        state = {"received": 0, "exceeded": False, "started": False}
+
+        async def limited_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["received"] += len(message.get("body", b""))
+                if state["received"] > self.max_bytes:
+                    state["exceeded"] = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if state["exceeded"]:
+                return
+            state["started"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not state["exceeded"]:
+                raise
+        if state["exceeded"] and not state["started"]:
+            await self._too_large(scope, receive, send)
+
+    async def _too_large(self, scope, receive, send):
+        metrics.incr("uploads.rejected.request_size")
+        response = JSONResponse({"detail": f"이미지는 {MAX_BYTES // (1024 * 1024)}MB 까지 올릴 수 있습니다."},
+                                status_code=413, headers={"Connection": "close"})
+        await response(scope, receive, send)
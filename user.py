@@ -5,29 +5,17 @@ Fixed: 07/Oct/2024
 Usage: store user (including clinic) account information
 """
 
-from fastapi import APIRouter, HTTPException
-import hosts, json
+from fastapi import APIRouter, Depends, HTTPException, Form, Header, Request
+import json, os, secrets, time
+import hosts, passwords
+from cache import generate_cache_key, get_cached_or_fetch, invalidate
 
 router = APIRouter()
 
-def generate_cache_key(endpoint: str, params: dict):
-    return f"{endpoint}:{json.dumps(params, sort_keys=True)}"
+CLINIC_SESSION_TTL = int(os.getenv("VET_CLINIC_SESSION_TTL", str(12 * 3600)))
+# 1 이면 병원 정보/진료 규칙/휴진을 바꾸는 라우트에 X-Clinic-Session 헤더가 필요하다 (앱이 세션을 보내게 된 뒤 켠다)
+CLINIC_SESSION_REQUIRED = os.getenv("VET_CLINIC_SESSION_REQUIRED", "0") == "1"
 
-async def get_cached_or_fetch(cache_key, fetch_func):
-    redis_client = await hosts.get_redis_connection()
-    try:
-        cached_data = await redis_client.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
-    except Exception as e:
-        print(f"Redis get error: {e}")
-
-    data = await fetch_func()
-    try:
-        await redis_client.set(cache_key, json.dumps(data), ex=3600)
-    except Exception as e:
-        print(f"Redis set error: {e}")
-    return data
 
 ## Check User account from db  (안창빈)
 @router.get("/selectuser")
@@ -54,8 +42,7 @@ async def select_user(id: str):
 ## Add Google account to sql db if it is a new user  (안창빈)
 @router.get("/insertuser")
 async def insert_user(id: str, password: str = None, image: str = None, name: str = None, phone: str = None):
-    conn = hosts.connect()
-    redis_client = await hosts.get_redis_connection()
+    conn = hosts.connect(primary=True)
     try:
         curs = conn.cursor()
         sql = "INSERT INTO user (id, password, image, name, phone) VALUES (%s, %s, %s, %s, %s)"
@@ -64,7 +51,7 @@ async def insert_user(id: str, password: str = None, image: str = None, name: st
 
         # Redis cache invalidation
         cache_key = generate_cache_key("select_user", {"id": id})
-        await redis_client.delete(cache_key)
+        await invalidate(cache_key)
 
         return {"results": "OK"}
     except Exception as e:
@@ -74,27 +61,129 @@ async def insert_user(id: str, password: str = None, image: str = None, name: st
     finally:
         conn.close()
 
+# ====================================
+# 병원 로그인
+# ====================================
+# 비밀번호는 passlib 해시로 저장하고 검증은 passwords 의 프로세스 풀에서 한다.
+# 평문으로 저장되어 있던 병원은 로그인에 성공할 때 해시로 바뀐다.
+# 비밀번호나 해시는 캐시에 두지 않는다. 로그인 후에는 병원 id 만 담은 세션을 Redis 에 둔다.
+# 앱은 받은 session 을 X-Clinic-Session 헤더로 보내고, 병원 쪽 쓰기 라우트는 require_clinic_session 으로
+# 세션의 병원과 경로의 병원이 같은지 확인한다 (VET_CLINIC_SESSION_REQUIRED=1 일 때).
+# 세션은 Redis 에만 있으므로 Redis 장애 중에는 로그인/로그아웃/세션 확인이 503 이다.
+
+def _clinic_password(id):
+    conn = hosts.connect()
+    try:
+        curs = conn.cursor()
+        curs.execute("SELECT password FROM clinic WHERE id=%s", (id,))
+        row = curs.fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def _store_password_hash(id, old, new):
+    # 그 사이 비밀번호가 바뀌었으면 덮어쓰지 않는다
+    conn = hosts.connect(primary=True)
+    try:
+        curs = conn.cursor()
+        curs.execute("UPDATE clinic SET password=%s WHERE id=%s AND password=%s", (new, id, old))
+        conn.commit()
+    except Exception as e:
+        print("Database error:", e)
+    finally:
+        conn.close()
+
+
+async def authenticate_clinic(id, password):
+    try:
+        stored = _clinic_password(id)
+    except Exception as e:
+        print("Database error:", e)
+        raise HTTPException(status_code=500, detail="로그인 처리 중 오류가 발생했습니다.")
+    ok, new_hash = await passwords.verify(password, stored)
+    if ok and new_hash:
+        _store_password_hash(id, stored, new_hash)
+    return ok
+
+
+def _session_key(token):
+    return f"clinic_session:{token}"
+
+
+def _session_unavailable():
+    return HTTPException(status_code=503, detail="로그인 세션을 처리할 수 없습니다. 잠시 후 다시 시도해주세요.",
+                         headers={"Retry-After": "5"})
+
+
+async def _create_clinic_session(id):
+    token = secrets.token_urlsafe(32)
+    try:
+        redis_client = await hosts.get_redis_connection()
+        session = {"clinic_id": id, "created_at": int(time.time())}
+        await redis_client.set(_session_key(token), json.dumps(session), ex=CLINIC_SESSION_TTL)
+    except Exception as e:
+        print(f"Redis set error: {e}")
+        raise _session_unavailable()
+    return token
+
+
+async def get_clinic_session(token):
+    """로그인 세션 {"clinic_id", "created_at"} (없거나 만료되었으면 None, Redis 장애면 503)"""
+    try:
+        redis_client = await hosts.get_redis_connection()
+        value = await redis_client.get(_session_key(token))
+    except Exception as e:
+        print(f"Redis get error: {e}")
+        raise _session_unavailable()
+    return json.loads(value) if value else None
+
+
+async def require_clinic_session(request: Request, x_clinic_session: str = Header(None)):
+    """X-Clinic-Session 의 세션을 확인하고 request.state.clinic_session 에 둔다.
+    경로에 병원 id(id 또는 clinic_id)가 있으면 세션의 병원과 같아야 한다."""
+    session = await get_clinic_session(x_clinic_session) if x_clinic_session else None
+    if session is None:
+        raise HTTPException(status_code=401, detail="병원 로그인이 필요합니다.")
+    clinic_id = request.path_params.get("id", request.path_params.get("clinic_id"))
+    if clinic_id is not None and clinic_id != session["clinic_id"]:
+        raise HTTPException(status_code=403, detail="다른 병원의 정보는 바꿀 수 없습니다.")
+    request.state.clinic_session = session
+    return session
+
+
+def clinic_session_dependencies():
+    """병원 쪽 쓰기 라우트의 dependencies=... 에 넘길 목록"""
+    if CLINIC_SESSION_REQUIRED:
+        return [Depends(require_clinic_session)]
+    return []
+
+
+@router.post("/clinic_login")
+async def clinic_login(id: str = Form(...), password: str = Form(...)):
+    if not await authenticate_clinic(id, password):
+        raise HTTPException(status_code=401, detail="아이디 또는 비밀번호가 올바르지 않습니다.")
+    return {"result": "OK", "clinic_id": id, "session": await _create_clinic_session(id)}
+
+
+@router.post("/clinic_logout")
+async def clinic_logout(session: str = Form(...)):
+    try:
+        redis_client = await hosts.get_redis_connection()
+        await redis_client.delete(_session_key(session))
+    except Exception as e:
+        print(f"Redis delete error: {e}")
+        raise _session_unavailable()
+    return {"result": "OK"}
+
+
 ## Check clinic account from db  (안창빈)
+# 예전 앱 호환용. 응답 모양은 그대로 두되 저장된 값(해시)은 돌려주지 않는다.
 @router.get("/selectclinic")
 async def select_clinic(id: str, password: str = None):
-    cache_key = generate_cache_key("select_clinic", {"id": id, "password": password})
-
-    async def fetch_data():
-        conn = hosts.connect()
-        try:
-            curs = conn.cursor()
-            sql = "SELECT id, password FROM clinic WHERE id=%s AND password=%s"
-            curs.execute(sql, (id, password))
-            rows = curs.fetchall()
-            return [{'id': row[0], 'password': row[1]} for row in rows]
-        except Exception as e:
-            print("Database error:", e)
-            return []
-        finally:
-            conn.close()
-
-    result = await get_cached_or_fetch(cache_key, fetch_data)
-    return {"results": result}
+    if password is None or not await authenticate_clinic(id, password):
+        return {"results": []}
+    return {"results": [{'id': id, 'password': password}]}
 
 """
 author: 이원영